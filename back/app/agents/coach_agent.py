@@ -6,6 +6,7 @@ import json
 
 from app.core.config import settings
 from app.agents.openai_agent import retrieve_context_from_kb
+from app.utils.metrics import timed
 
 logger = logging.getLogger(__name__)
 client = OpenAI(api_key=settings.OPENAI_API_KEY)
@@ -99,12 +100,13 @@ def process_coach_message(assessment_data: Dict, plan_text: str, history: List[d
     try:
         messages = [{"role": "system", "content": system_prompt}] + history
         
-        completion = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            temperature=0.7,
-            max_tokens=500
-        )
+        with timed("openai_request_seconds", call_site="coach"):
+            completion = client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=messages,
+                temperature=0.7,
+                max_tokens=500
+            )
         
         response = completion.choices[0].message.content
         logger.info("Coach response generated successfully")
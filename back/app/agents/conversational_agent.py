@@ -9,7 +9,9 @@ from app.core.config import settings
 # Asegúrate de que las rutas de importación sean correctas
 from app.schemas.analisis_schema import AnalisisEntrada, PrediccionResultado
 from app.services.ml_service import obtener_prediccion
+from app.services.inference_executor import InferenceQueueFullError, call_single_prediction
 from app.agents.openai_agent import generar_plan_con_rag
+from app.utils.metrics import timed
 
 logger = logging.getLogger(__name__)
 client = OpenAI(api_key=settings.OPENAI_API_KEY)
@@ -136,12 +138,13 @@ def process_chat_message(history: List[dict]) -> tuple[str, dict | None, bool]:
     
     # 1. Llamar a OpenAI con el historial y las herramientas
     try:
-        completion = client.chat.completions.create(
-            model="gpt-4o-mini", 
-            messages=[{"role": "system", "content": SYSTEM_PROMPT}] + history,
-            tools=TOOLS,
-            tool_choice="auto"
-        )
+        with timed("openai_request_seconds", call_site="conversational"):
+            completion = client.chat.completions.create(
+                model="gpt-4o-mini", 
+                messages=[{"role": "system", "content": SYSTEM_PROMPT}] + history,
+                tools=TOOLS,
+                tool_choice="auto"
+            )
         response_message = completion.choices[0].message
     except Exception as e:
         logger.error(f"Error en API de OpenAI: {e}")
@@ -198,7 +201,11 @@ def process_chat_message(history: List[dict]) -> tuple[str, dict | None, bool]:
             ml_input = AnalisisEntrada(**ml_input_data) 
             
             # Llamamos al servicio de ML con el modelo seleccionado (posiblemente corregido)
-            pred_result = obtener_prediccion(ml_input, model_type=modelo_elegido)
+            try:
+                pred_result = call_single_prediction(obtener_prediccion, ml_input, model_type=modelo_elegido)
+            except InferenceQueueFullError as e:
+                logger.warning(f"Inferencia rechazada: {e}")
+                return "Estoy atendiendo muchas solicitudes en este momento. ¿Puedes intentarlo de nuevo en unos segundos?", None, False
             logger.info(f"Predicción obtenida con modelo '{modelo_elegido}': score={pred_result.get('score')}, risk_level={pred_result.get('categoria_riesgo')}")
             
             if "error" in pred_result:
@@ -244,6 +251,7 @@ def process_chat_message(history: List[dict]) -> tuple[str, dict | None, bool]:
             # Preparamos los datos completos para el frontend
             user_data = tool_data.model_dump()
             user_data["model_used"] = modelo_elegido
+            user_data["model_version"] = prediccion_obj.model_version  # Trazabilidad de la evaluación guardada
             user_data["plan_text"] = plan_ia
             user_data["citations"] = citas_kb
             logger.info(f"Datos del usuario preparados con plan_text y {len(citas_kb)} citas")
@@ -2,6 +2,7 @@ from openai import OpenAI
 from app.core.config import settings
 from app.agents.rag_service import buscar_en_kb
 from app.schemas.analisis_schema import AnalisisEntrada, PrediccionResultado
+from app.utils.metrics import timed
 from app.utils.token_counter import count_tokens, estimate_cost
 import logging
 import re
@@ -15,6 +16,7 @@ if settings.OPENAI_API_KEY:
 else:
     logger.warning("OpenAI API key not configured. Chat features will be disabled.")
 
+@timed("kb_search_seconds", function="retrieve_context_from_kb")
 def retrieve_context_from_kb(message: str, top_k: int = 2) -> str:
     """
     Retrieves context from the knowledge base based on the user's message.
@@ -124,12 +126,13 @@ Tarea: Explica riesgo "{prediccion.categoria_riesgo}" + 2-3 acciones concretas (
         prompt_tokens_est = count_tokens(system_prompt) + count_tokens(user_prompt) + 10  # +10 for formatting
         logger.info(f"📨 RAG prompt: ~{prompt_tokens_est} tokens (sistema: {count_tokens(system_prompt)}, KB+datos: {count_tokens(user_prompt)})")
         
-        completion = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages_for_api,
-            temperature=0.5,
-            max_tokens=500,  # Explicit limit for 150-word response (~200 tokens) + safety margin
-        )
+        with timed("openai_request_seconds", call_site="plan_rag"):
+            completion = client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=messages_for_api,
+                temperature=0.5,
+                max_tokens=500,  # Explicit limit for 150-word response (~200 tokens) + safety margin
+            )
         plan_ia = completion.choices[0].message.content.strip()
         
         # Log actual API usage
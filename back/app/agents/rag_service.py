@@ -5,6 +5,7 @@ import json
 from pathlib import Path
 from app.utils.token_counter import count_tokens, truncate_to_budget
 from app.core.config import settings
+from app.utils.metrics import timed
 
 logger = logging.getLogger(__name__)
 
@@ -152,6 +153,7 @@ def load_kb_content(termino_clave: str) -> dict | None:
         return None
 
 
+@timed("kb_search_seconds", function="buscar_en_kb")
 def buscar_en_kb(terminos_clave: list[str], max_tokens: int = None) -> tuple[str, list[str]]:
     """
     Busca en la /kb los archivos .json basados en los drivers.
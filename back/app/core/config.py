@@ -13,6 +13,43 @@ class Settings(BaseSettings):
     TOKEN_BUDGET_HISTORY_PCT: float = 0.30  # 30% for history
     TOKEN_BUDGET_RAG_PCT: float = 0.70      # 70% for RAG KB
     SLIDING_WINDOW_SIZE: int = 10           # Keep last N messages
+
+    # ML Serving Configuration
+    DRIVER_BACKEND: str = "native"          # "native" (XGBoost pred_contribs) or "shap"
+    WARMUP_ON_STARTUP: bool = True          # Load models/explainer/tokenizer/KB in lifespan
+    PREDICTION_CACHE_SIZE: int = 2048       # Max cached predictions (0 disables the cache)
+    PREDICTION_CACHE_TTL_SECONDS: float = 900.0
+    PREDICTION_CACHE_DECIMALS: int = 3      # Rounding of engineered features in the cache key
+    INFERENCE_EXECUTOR: str = "thread"      # "thread" or "process"
+    INFERENCE_MAX_WORKERS: int = 4
+    INFERENCE_QUEUE_SIZE: int = 64          # Queued calls beyond the busy workers before 503
+    INFERENCE_HEALTH_CHECK_SECONDS: float = 5.0   # Idle ping interval per forked worker
+    INFERENCE_TASK_TIMEOUT_SECONDS: float = 30.0  # Forked worker is replaced after this
+    INFERENCE_WORKER_THREADS: int = 1       # XGBoost threads per forked worker
+    MICRO_BATCHING_ENABLED: bool = False    # Group concurrent single predictions
+    MICRO_BATCH_MAX_SIZE: int = 64
+    MICRO_BATCH_MAX_WAIT_MS: float = 2.0
+    MICRO_BATCH_MAX_PENDING: int = 1024
+    ML_MODELS_DIR: Optional[str] = None       # Legacy artifacts directory (default: app/ml/models)
+    MODEL_REGISTRY_DIR: Optional[str] = None  # Default: <models dir>/registry
+    ADMIN_API_TOKEN: Optional[str] = None     # X-Admin-Token for /api/admin (disabled if unset)
+    COMPILED_SCORERS: bool = True           # Closed-form scorers compiled at load time when supported
+    SHADOW_CANDIDATE: Optional[str] = None    # "<type>@<registry version>" or "<type>@<path/to/model.pkl>"
+    SHADOW_SAMPLE_RATE: float = 0.1           # Fraction of served predictions re-scored by the candidate
+    SHADOW_MAX_QUEUE: int = 256               # Pending shadow jobs before new samples are dropped
+    SHADOW_LOG_PATH: Optional[str] = None     # JSONL comparison log (default: back/logs/shadow_scores.jsonl)
+    PREDICTION_LOG_SAMPLE_RATE: float = 0.01  # Fraction of predictions logged at INFO (all of them at DEBUG)
+    WHAT_IF_MAX_SCENARIOS: int = 256          # Largest what-if grid scored in one request
+    UNCERTAINTY_SAMPLES: int = 1000           # Monte Carlo draws for risk intervals (measurement error)
+    BULK_SCORING_CHUNK_ROWS: int = 500        # Rows scored per batch call in /predict/bulk streams
+    AUDIT_LOG_ENABLED: bool = False           # Record every prediction to the local audit log
+    AUDIT_LOG_DIR: Optional[str] = None       # Rotating Parquet or JSONL files (default: back/logs/audit)
+    AUDIT_FLUSH_SECONDS: float = 5.0          # Background flush interval of the audit buffer
+    AUDIT_FLUSH_RECORDS: int = 1000           # Pending records that trigger an early flush
+    AUDIT_ROTATE_RECORDS: int = 100_000       # Rows per audit file before rotating
+    AUDIT_ROTATE_SECONDS: float = 3600.0      # Age of an audit file before rotating
+    AUDIT_MAX_BUFFER: int = 100_000           # Buffered records before new ones are dropped
+    POPULATION_REFERENCE_DIR: Optional[str] = None  # NHANES percentile arrays per model version (default: <models dir>/population)
     
     @property
     def TOKEN_BUDGET_HISTORY(self) -> int:
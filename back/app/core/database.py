@@ -1,5 +1,6 @@
 from supabase import create_client, Client
 from app.core.config import settings
+from app.utils.metrics import timed
 import logging
 import uuid
 from typing import List, Optional
@@ -39,6 +40,7 @@ def get_supabase(access_token: Optional[str] = None) -> Client:
 
 
 #analisis_salud
+@timed("supabase_request_seconds", operation="guardar_analisis")
 def guardar_analisis(usuario_id: str, datos: dict):
     supabase = get_supabase()
     try:
@@ -62,6 +64,7 @@ def guardar_analisis(usuario_id: str, datos: dict):
         return {"error": str(e)}
 
 
+@timed("supabase_request_seconds", operation="obtener_historial_analisis")
 def obtener_historial_analisis(usuario_id: str):
     supabase = get_supabase()
     try:
@@ -82,6 +85,7 @@ def obtener_historial_analisis(usuario_id: str):
 
 
 #profiles
+@timed("supabase_request_seconds", operation="obtener_perfil")
 def obtener_perfil(usuario_id: str):
     supabase = get_supabase()
     try:
@@ -100,6 +104,7 @@ def obtener_perfil(usuario_id: str):
         return None
 
 
+@timed("supabase_request_seconds", operation="actualizar_perfil")
 def actualizar_perfil(usuario_id: str, datos: dict):
     supabase = get_supabase()
     try:
@@ -119,6 +124,7 @@ def actualizar_perfil(usuario_id: str, datos: dict):
 
 
 #mensajes_agente
+@timed("supabase_request_seconds", operation="guardar_mensaje_agente")
 def guardar_mensaje_agente(usuario_id: str, rol: str, contenido: str, analisis_id: int | None = None):
     supabase = get_supabase()
     try:
@@ -139,6 +145,7 @@ def guardar_mensaje_agente(usuario_id: str, rol: str, contenido: str, analisis_i
         logger.error(f"Error al guardar mensaje del agente: {e}")
         return {"error": str(e)}
 
+@timed("supabase_request_seconds", operation="get_or_create_session")
 def get_or_create_session(user_id: str, session_id: str | None = None, access_token: Optional[str] = None) -> dict:
     """
     Busca una sesión por ID. Si no existe o es nula, crea una nueva.
@@ -169,6 +176,7 @@ def get_or_create_session(user_id: str, session_id: str | None = None, access_to
         logger.error(f"Error crítico al crear sesión: {e}")
         return {"error": str(e)}
 
+@timed("supabase_request_seconds", operation="get_messages_by_session")
 def get_messages_by_session(session_id: str, access_token: Optional[str] = None) -> List[dict]:
     """
     Obtiene todo el historial de mensajes de una sesión, ordenado.
@@ -187,6 +195,7 @@ def get_messages_by_session(session_id: str, access_token: Optional[str] = None)
         logger.error(f"Error al obtener historial de mensajes: {e}")
         return []
 
+@timed("supabase_request_seconds", operation="save_chat_message")
 def save_chat_message(session_id: str, role: str, content: str, access_token: Optional[str] = None) -> dict:
     """
     Guarda un nuevo mensaje (de 'user' o 'assistant') en la BD.
@@ -207,6 +216,7 @@ def save_chat_message(session_id: str, role: str, content: str, access_token: Op
         logger.error(f"Error al guardar mensaje: {e}")
         return {"error": str(e)}
 
+@timed("supabase_request_seconds", operation="link_assessment_to_session")
 def link_assessment_to_session(session_id: str, assessment_id: str, access_token: Optional[str] = None):
     """
     (Opcional pero recomendado) Vincula la predicción (assessment)
@@ -219,6 +229,7 @@ def link_assessment_to_session(session_id: str, assessment_id: str, access_token
     except Exception as e:
         logger.error(f"Error al vincular assessment: {e}")
 
+@timed("supabase_request_seconds", operation="delete_chat_session")
 def delete_chat_session(session_id: str, user_id: str, access_token: Optional[str] = None) -> dict:
     """
     Elimina una sesión de chat y todos sus mensajes asociados.
@@ -244,6 +255,7 @@ def delete_chat_session(session_id: str, user_id: str, access_token: Optional[st
         logger.error(f"Error al eliminar sesión: {e}")
         return {"error": str(e)}
 
+@timed("supabase_request_seconds", operation="delete_all_user_data")
 def delete_all_user_data(user_id: str, access_token: Optional[str] = None) -> dict:
     """
     Elimina TODOS los datos del usuario: mensajes, sesiones, assessments y análisis.
@@ -299,6 +311,7 @@ def delete_all_user_data(user_id: str, access_token: Optional[str] = None) -> di
         logger.error(f"Error al eliminar todos los datos del usuario: {e}")
         return {"error": str(e)}
 
+@timed("supabase_request_seconds", operation="save_assessment")
 def save_assessment(user_id: str, data: dict, access_token: Optional[str] = None) -> dict:
     """
     Guarda el resultado de la predicción en la nueva tabla 'assessments'.
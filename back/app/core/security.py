@@ -1,6 +1,8 @@
+import hmac
 from fastapi import Header, HTTPException, status
 import requests
 from app.core.config import settings
+from app.utils.metrics import timed
 
 async def verify_supabase_token(authorization: str = Header(None)):
     """
@@ -22,14 +24,15 @@ async def verify_supabase_token(authorization: str = Header(None)):
     token = authorization.split(" ")[1]
 
     try:
-        res = requests.get(
-            f"{settings.SUPABASE_URL}/auth/v1/user",
-            headers={
-                "Authorization": f"Bearer {token}",
-                "apikey": settings.SUPABASE_ANON_KEY,
-            },
-            timeout=5,
-        )
+        with timed("auth_request_seconds", provider="supabase"):
+            res = requests.get(
+                f"{settings.SUPABASE_URL}/auth/v1/user",
+                headers={
+                    "Authorization": f"Bearer {token}",
+                    "apikey": settings.SUPABASE_ANON_KEY,
+                },
+                timeout=5,
+            )
     except requests.exceptions.RequestException:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -45,3 +48,22 @@ async def verify_supabase_token(authorization: str = Header(None)):
     user_data = res.json()
     user_data["_access_token"] = token  # Add token for RLS
     return user_data
+
+
+async def verify_admin_token(x_admin_token: str = Header(None)):
+    """
+    Protege los endpoints de administración (/api/admin) con ADMIN_API_TOKEN.
+    Sin token configurado los endpoints quedan deshabilitados.
+    """
+    if not settings.ADMIN_API_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Administración deshabilitada (ADMIN_API_TOKEN no configurado)"
+        )
+
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, settings.ADMIN_API_TOKEN):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token de administración inválido"
+        )
+    return True
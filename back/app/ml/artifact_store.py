@@ -0,0 +1,367 @@
+"""
+Exported (pickle-free) artifact format for the diabetes bundle.
+
+Layout of `models/diabetes_bundle/`:
+
+    manifest.json                 format version, feature names, calibration params,
+                                  and sha256 + size of every other file
+    booster_<fold>.ubj            one XGBoost booster per calibrated fold (native UBJSON)
+    imputer_statistics.npy        SimpleImputer medians, loaded with mmap_mode="r"
+    isotonic_<fold>_x.npy / _y.npy   isotonic calibration maps (mmap-able)
+
+The loaded objects expose the attributes the serving code already relies on
+(`predict_proba`, `calibrated_classifiers_[i].estimator.get_booster()`,
+`statistics_`, `transform`) so `predictor.py` does not care which format was loaded.
+
+Export from the pickled artifacts with:
+
+    python -m app.ml.artifact_store export [--models-dir PATH]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import math
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy.special import expit
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+EXPORTED_BUNDLE_DIRS = {"diabetes": "diabetes_bundle"}
+
+
+class ArtifactIntegrityError(RuntimeError):
+    """Manifest missing/invalid or an artifact does not match its checksum."""
+
+
+def sha256_file(path: Path) -> str:
+    """Hex sha256 of a file's contents, read in 1 MiB chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_exported_bundle_dir(models_dir: Path, model_type: str) -> Optional[Path]:
+    """Directory of the exported bundle for `model_type`, or None if there is none."""
+    dirname = EXPORTED_BUNDLE_DIRS.get(model_type)
+    if dirname is None:
+        return None
+    bundle_dir = Path(models_dir) / dirname
+    return bundle_dir if (bundle_dir / MANIFEST_NAME).is_file() else None
+
+
+# ---------------------------------------------------------------------------
+# Runtime objects
+# ---------------------------------------------------------------------------
+
+def isotonic_interp(T: np.ndarray, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    Linear interpolation with the exact arithmetic of scipy's `interp1d(kind="linear")`,
+    which IsotonicRegression uses: slope and offset are computed in the thresholds'
+    dtype (float32 for XGBoost outputs). `np.interp` works in float64 and differs by
+    up to one float32 ulp after the final cast. `T` must already be clipped to
+    [x[0], x[-1]].
+    """
+    hi = np.clip(np.searchsorted(x, T), 1, len(x) - 1)
+    lo = hi - 1
+    x_lo = x[lo]
+    y_lo = y[lo]
+    slope = (y[hi] - y_lo) / (x[hi] - x_lo)
+    return slope * (T - x_lo) + y_lo
+
+
+class ImputerStatistics:
+    """Median imputation from precomputed statistics (SimpleImputer.transform equivalent)."""
+
+    missing_values = np.nan
+
+    def __init__(self, statistics: np.ndarray):
+        self.statistics_ = statistics
+        self._valid_mask = ~np.isnan(statistics)
+
+    def transform(self, X) -> np.ndarray:
+        values = np.asarray(X, dtype=np.float64)
+        imputed = np.where(np.isnan(values), self.statistics_, values)
+        return imputed[:, self._valid_mask]
+
+
+class FoldCalibrator:
+    """Isotonic (clipped linear interpolation) or sigmoid calibration of one fold."""
+
+    def __init__(self, method: str, params: Dict[str, Any], x_thresholds=None, y_thresholds=None):
+        self.method = method
+        if method == "isotonic":
+            self.x_thresholds = x_thresholds
+            self.y_thresholds = y_thresholds
+            self.x_min = np.asarray(params["x_min"], dtype=x_thresholds.dtype)
+            self.x_max = np.asarray(params["x_max"], dtype=x_thresholds.dtype)
+        elif method == "sigmoid":
+            self.a = np.float64(params["a"])
+            self.b = np.float64(params["b"])
+        else:
+            raise ArtifactIntegrityError(f"Unsupported calibration method: {method}")
+
+    def predict(self, T: np.ndarray) -> np.ndarray:
+        if self.method == "sigmoid":
+            return expit(-(self.a * T + self.b))
+
+        # Igual que IsotonicRegression(out_of_bounds="clip"): se trabaja en el dtype de los umbrales
+        T = np.clip(np.asarray(T, dtype=self.x_thresholds.dtype), self.x_min, self.x_max)
+        if len(self.y_thresholds) == 1:
+            return np.repeat(self.y_thresholds, T.shape[0]).astype(T.dtype)
+        return isotonic_interp(T, self.x_thresholds, self.y_thresholds).astype(T.dtype)
+
+
+class BoosterClassifier:
+    """
+    Minimal binary XGBClassifier replacement around a native Booster: same
+    `inplace_predict` call the sklearn wrapper makes, without its pickled state.
+    """
+
+    def __init__(self, booster, iteration_range: Tuple[int, int] = (0, 0), missing: float = np.nan):
+        self._booster = booster
+        self.iteration_range = tuple(iteration_range)
+        self.missing = missing
+        self.classes_ = np.array([0, 1])
+
+    def get_booster(self):
+        return self._booster
+
+    def set_params(self, **params) -> "BoosterClassifier":
+        if "n_jobs" in params:
+            self._booster.set_param({"nthread": params["n_jobs"]})
+        return self
+
+    def predict_proba(self, X) -> np.ndarray:
+        positive = self._booster.inplace_predict(
+            X,
+            iteration_range=self.iteration_range,
+            predict_type="value",
+            missing=self.missing,
+            validate_features=False,
+        )
+        return np.vstack((1.0 - positive, positive)).T
+
+
+class CalibratedFold:
+    def __init__(self, estimator, calibrator: FoldCalibrator):
+        self.estimator = estimator
+        self.calibrator = calibrator
+
+    def predict_positive(self, X: np.ndarray) -> np.ndarray:
+        proba = self.calibrator.predict(self.estimator.predict_proba(X)[:, 1])
+        proba = np.asarray(proba, dtype=np.float64)
+        proba[(1.0 < proba) & (proba <= 1.0 + 1e-5)] = 1.0
+        return proba
+
+
+class CalibratedBoosterModel:
+    """Stand-in for CalibratedClassifierCV(XGBClassifier) built from exported folds."""
+
+    def __init__(self, folds: List[CalibratedFold], method: str):
+        self.calibrated_classifiers_ = folds
+        self.method = method
+        self.classes_ = np.array([0, 1])
+
+    def predict_proba(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64)
+        mean_proba = np.zeros((X.shape[0], 2))
+        for fold in self.calibrated_classifiers_:
+            positive = fold.predict_positive(X)
+            mean_proba[:, 1] += positive
+            mean_proba[:, 0] += 1.0 - positive
+        mean_proba /= len(self.calibrated_classifiers_)
+        return mean_proba
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+def _float(value) -> float:
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(f"Non-finite calibration parameter: {value}")
+    return value
+
+
+def export_diabetes_bundle(model, imputer, feature_names: List[str], dest: Path) -> Path:
+    """
+    Write the exported format for a CalibratedClassifierCV(XGBClassifier) + SimpleImputer
+    bundle. The directory is written next to `dest` and swapped in at the end so a
+    concurrent loader never sees a half-written bundle. Returns the manifest path.
+    """
+    from sklearn.isotonic import IsotonicRegression
+
+    dest = Path(dest)
+    if list(getattr(model, "classes_", [])) != [0, 1]:
+        raise ValueError("Only binary 0/1 calibrated models can be exported")
+    if getattr(imputer, "add_indicator", False) or getattr(imputer, "keep_empty_features", False):
+        raise ValueError("Imputers with add_indicator/keep_empty_features are not supported")
+    missing = getattr(imputer, "missing_values", np.nan)
+    if not (isinstance(missing, float) and math.isnan(missing)):
+        raise ValueError("Only imputers with missing_values=NaN are supported")
+
+    staging = dest.with_name(dest.name + ".staging")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+
+    statistics = np.asarray(imputer.statistics_, dtype=np.float64)
+    if len(statistics) != len(feature_names):
+        raise ValueError("Imputer statistics do not match feature_names")
+    np.save(staging / "imputer_statistics.npy", statistics)
+
+    method = getattr(model, "method", None)
+    folds = []
+    for idx, fold in enumerate(model.calibrated_classifiers_):
+        estimator = fold.estimator
+        estimator = getattr(estimator, "estimator", estimator)  # FrozenEstimator
+        booster_name = f"booster_{idx}.ubj"
+        estimator.get_booster().save_model(staging / booster_name)
+        try:
+            iteration_range = [0, int(estimator.best_iteration) + 1]
+        except AttributeError:
+            iteration_range = [0, 0]
+        missing = float(getattr(estimator, "missing", np.nan))
+
+        calibrator = fold.calibrators[0]
+        entry: Dict[str, Any] = {
+            "booster": booster_name,
+            "iteration_range": iteration_range,
+            "missing": None if math.isnan(missing) else missing,
+            "method": fold.method,
+        }
+        if isinstance(calibrator, IsotonicRegression):
+            if calibrator.out_of_bounds != "clip":
+                raise ValueError("Only out_of_bounds='clip' isotonic calibrators are supported")
+            x_name, y_name = f"isotonic_{idx}_x.npy", f"isotonic_{idx}_y.npy"
+            np.save(staging / x_name, np.asarray(calibrator.X_thresholds_))
+            np.save(staging / y_name, np.asarray(calibrator.y_thresholds_))
+            entry.update(
+                x_thresholds=x_name,
+                y_thresholds=y_name,
+                params={"x_min": _float(calibrator.X_min_), "x_max": _float(calibrator.X_max_)},
+            )
+        elif fold.method == "sigmoid":
+            entry["params"] = {"a": _float(calibrator.a_), "b": _float(calibrator.b_)}
+        else:
+            raise ValueError(f"Unsupported calibration method: {fold.method}")
+        folds.append(entry)
+
+    files = {
+        path.name: {"sha256": sha256_file(path), "bytes": path.stat().st_size}
+        for path in sorted(staging.iterdir())
+    }
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "model_type": "diabetes",
+        "method": method,
+        "feature_names": list(feature_names),
+        "folds": folds,
+        "files": files,
+    }
+    (staging / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2))
+
+    previous = dest.with_name(dest.name + ".previous")
+    shutil.rmtree(previous, ignore_errors=True)
+    if dest.exists():
+        dest.rename(previous)
+    staging.rename(dest)
+    shutil.rmtree(previous, ignore_errors=True)
+
+    logger.info("Exported diabetes bundle to %s (%s folds)", dest, len(folds))
+    return dest / MANIFEST_NAME
+
+
+# ---------------------------------------------------------------------------
+# Load
+# ---------------------------------------------------------------------------
+
+def read_manifest(bundle_dir: Path, verify: bool = True) -> Dict[str, Any]:
+    """Read the manifest and (by default) check size and sha256 of every listed file."""
+    bundle_dir = Path(bundle_dir)
+    try:
+        manifest = json.loads((bundle_dir / MANIFEST_NAME).read_text())
+    except (OSError, ValueError) as e:
+        raise ArtifactIntegrityError(f"Invalid manifest in {bundle_dir}: {e}") from e
+
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ArtifactIntegrityError(
+            f"Unsupported bundle format {manifest.get('format_version')} in {bundle_dir}"
+        )
+
+    if verify:
+        for name, expected in manifest.get("files", {}).items():
+            path = bundle_dir / name
+            if not path.is_file():
+                raise ArtifactIntegrityError(f"Missing artifact {path}")
+            if path.stat().st_size != expected["bytes"] or sha256_file(path) != expected["sha256"]:
+                raise ArtifactIntegrityError(f"Checksum mismatch for {path}")
+    return manifest
+
+
+def load_diabetes_bundle(bundle_dir: Path, mmap_mode: Optional[str] = "r") -> Tuple[Any, Any, List[str]]:
+    """Load (model, imputer, feature_names) from an exported bundle directory."""
+    import xgboost as xgb
+
+    bundle_dir = Path(bundle_dir)
+    manifest = read_manifest(bundle_dir)
+
+    def _array(name: str) -> np.ndarray:
+        return np.load(bundle_dir / name, mmap_mode=mmap_mode, allow_pickle=False)
+
+    folds = []
+    for entry in manifest["folds"]:
+        booster = xgb.Booster()
+        booster.load_model(bundle_dir / entry["booster"])
+        missing = entry.get("missing")
+        estimator = BoosterClassifier(
+            booster,
+            iteration_range=entry.get("iteration_range", (0, 0)),
+            missing=np.nan if missing is None else missing,
+        )
+        if entry["method"] == "isotonic":
+            calibrator = FoldCalibrator(
+                "isotonic",
+                entry["params"],
+                x_thresholds=_array(entry["x_thresholds"]),
+                y_thresholds=_array(entry["y_thresholds"]),
+            )
+        else:
+            calibrator = FoldCalibrator(entry["method"], entry["params"])
+        folds.append(CalibratedFold(estimator, calibrator))
+
+    model = CalibratedBoosterModel(folds, manifest.get("method"))
+    imputer = ImputerStatistics(_array("imputer_statistics.npy"))
+    return model, imputer, list(manifest["feature_names"])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from app.ml import model_loader
+
+    parser = argparse.ArgumentParser(description="Export model bundles to the mmap-able format")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Export the pickled diabetes bundle")
+    export.add_argument("--models-dir", type=Path, default=None)
+    args = parser.parse_args(argv)
+
+    models_dir = args.models_dir or model_loader.get_models_dir()
+    model, imputer, feature_names = model_loader.load_pickled_diabetes_bundle(models_dir)
+    manifest_path = export_diabetes_bundle(
+        model, imputer, feature_names, models_dir / EXPORTED_BUNDLE_DIRS["diabetes"]
+    )
+    print(f"Bundle exportado: {manifest_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    raise SystemExit(main())
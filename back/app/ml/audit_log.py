@@ -0,0 +1,356 @@
+"""
+Audit log de predicciones: un registro por predicción servida (entradas, features
+derivadas, score, drivers, versión del modelo y latencia) para análisis offline.
+
+The request path takes the per-row values it needs (score, risk level, drivers, the
+AUDIT_INPUTS and sex, a copy of the features) and appends them to an in-memory deque
+without serializing anything, so callers may mutate their profiles and results
+afterwards. A background thread drains the buffer every
+AUDIT_FLUSH_SECONDS, or earlier once AUDIT_FLUSH_RECORDS are pending, turns the
+batch into columns and appends it to the current file under AUDIT_LOG_DIR
+(`predictions-<time>-<pid>-<seq>.parquet`, or `.jsonl` without pyarrow). Files rotate
+after AUDIT_ROTATE_RECORDS rows or AUDIT_ROTATE_SECONDS in both formats. A Parquet
+file only gets its footer when it is closed, so the open one is written by a
+ParquetWriter under a hidden name and renamed on rotation or shutdown: readers never
+see a partial file, but the rows of the open window only become visible (and survive
+a hard crash) once it rotates. JSONL lines are visible as soon as they are flushed.
+Forked inference workers write their own files and close them on exit. When the
+buffer holds AUDIT_MAX_BUFFER records new ones are dropped and counted instead of
+growing memory.
+
+    pd.read_parquet("back/logs/audit")   # o read_audit_log() para JSONL y Parquet
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Entradas de predict_risk guardadas como columnas propias (float64, salvo sex)
+AUDIT_INPUTS = (
+    "age", "height_cm", "weight_kg", "bmi", "waist_cm", "sleep_hours", "smokes_cig_day",
+    "days_mvpa_week", "systolic_bp", "total_cholesterol", "glucosa_mgdl", "hdl_mgdl", "ldl_mgdl",
+    "trigliceridos_mgdl",
+)
+# Orden de columnas del archivo; features y drivers van como JSON
+AUDIT_COLUMNS = (
+    "ts", "model_type", "model_version", "path", "score", "risk_level", "latency_ms", "sex",
+    *AUDIT_INPUTS, "features", "drivers",
+)
+_FLOAT_COLUMNS = {"ts", "score", "latency_ms", *AUDIT_INPUTS}
+
+
+def _float(value: Any) -> float:
+    try:
+        return float(value) if value is not None else math.nan
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _json(value: Any) -> str:
+    # NaN no es JSON válido: las features faltantes se guardan como null. Reemplazar el
+    # texto es mucho más barato que recorrer cada dict (json.dumps siempre escribe ": NaN")
+    return json.dumps(value, ensure_ascii=False, default=float).replace(": NaN", ": null")
+
+
+def _copy_drivers(drivers: Optional[Sequence[Mapping[str, Any]]]) -> tuple:
+    return tuple([dict(driver) for driver in drivers]) if drivers else ()
+
+
+class AuditSink:
+    """Buffers prediction records and writes them to rotating files from a background thread."""
+
+    def __init__(
+        self,
+        directory: Path,
+        flush_seconds: float = 5.0,
+        flush_records: int = 1000,
+        rotate_records: int = 100_000,
+        rotate_seconds: float = 3600.0,
+        max_buffer: int = 100_000,
+        parquet: Optional[bool] = None,
+    ):
+        self.directory = Path(directory)
+        self.flush_seconds = flush_seconds
+        self.flush_records = flush_records
+        self.rotate_records = rotate_records
+        self.rotate_seconds = rotate_seconds
+        self.max_buffer = max_buffer
+        if parquet is None:
+            try:
+                import pyarrow  # noqa: F401
+                parquet = True
+            except ImportError:
+                logger.warning("pyarrow is not installed; the prediction audit log is written as JSONL")
+                parquet = False
+        self.parquet = parquet
+        # (ts, model_type, version, path, filas, features, latencia por fila)
+        self._buffer: deque = deque()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._io_lock = threading.Lock()
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.files = 0
+        self._schema = None
+        self._file: Optional[Path] = None
+        self._writer = None
+        self._file_rows = 0
+        self._file_opened = 0.0
+        self._thread = threading.Thread(target=self._run, name="audit-sink", daemon=True)
+        self._thread.start()
+
+    def record(
+        self,
+        model_type: str,
+        version: Optional[str],
+        path: str,
+        profiles: Sequence[Mapping[str, Any]],
+        features: Any,
+        results: Sequence[Mapping[str, Any]],
+        latency: float,
+    ) -> None:
+        """
+        Hot path: snapshot one served call (one or many rows). `features` is a feature
+        dict (one row) or an N-row DataFrame; `latency` covers the whole call.
+        """
+        rows = len(results)
+        with self._lock:
+            if self._pending + rows > self.max_buffer:
+                self.dropped += rows
+                return
+            self._pending += rows
+            self.recorded += rows
+            wake = self._pending >= self.flush_records
+        # Solo escalares o copias: el caller puede mutar profiles/results después de esta
+        # llamada. Una tupla plana por fila (el GC deja de seguirla) y la serialización
+        # queda para el flush.
+        snapshot = tuple([
+            (
+                result["score"],
+                result.get("risk_level"),
+                profile.get("sex"),
+                _copy_drivers(result.get("drivers")),
+                *map(profile.get, AUDIT_INPUTS),
+            )
+            for profile, result in zip(profiles, results)
+        ])
+        if isinstance(features, pd.DataFrame):
+            features = (list(features.columns), features.to_numpy(copy=True))
+        else:
+            features = dict(features)
+        item = (time.time(), model_type, version, path, snapshot, features, latency / max(rows, 1))
+        with self._lock:
+            self._buffer.append(item)
+        if wake:
+            self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stopping:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        """Write everything buffered so far (background thread, tests and shutdown)."""
+        with self._io_lock:
+            with self._lock:
+                batch = list(self._buffer)
+                self._buffer.clear()
+                rows = sum(len(item[4]) for item in batch)
+                self._pending -= rows
+            if not batch:
+                self._maybe_rotate(0)
+                return
+            try:
+                self._write(self._columns(batch))
+                self.written += rows
+            except Exception as e:
+                self.failed += rows
+                logger.warning("Could not write %s audit records: %s", rows, e)
+
+    def _columns(self, batch: List[Tuple]) -> Dict[str, list]:
+        columns: Dict[str, list] = {name: [] for name in AUDIT_COLUMNS}
+        for ts, model_type, version, path, snapshot, features, latency in batch:
+            if isinstance(features, tuple):
+                names, values = features
+                feature_rows = [dict(zip(names, row)) for row in values.tolist()]
+            else:
+                feature_rows = [features] * len(snapshot)
+            for (score, risk_level, sex, drivers, *inputs), feature_row in zip(snapshot, feature_rows):
+                columns["ts"].append(ts)
+                columns["model_type"].append(model_type)
+                columns["model_version"].append(version)
+                columns["path"].append(path)
+                columns["score"].append(float(score))
+                columns["risk_level"].append(risk_level)
+                columns["latency_ms"].append(latency * 1000.0)
+                columns["sex"].append(None if sex is None else str(sex))
+                for name, value in zip(AUDIT_INPUTS, inputs):
+                    columns[name].append(_float(value))
+                columns["features"].append(_json(feature_row))
+                columns["drivers"].append(_json(drivers))
+        return columns
+
+    def _maybe_rotate(self, incoming: int) -> None:
+        if self._file is None:
+            return
+        too_big = self._file_rows and self._file_rows + incoming > self.rotate_records
+        too_old = time.monotonic() - self._file_opened >= self.rotate_seconds
+        if too_big or too_old:
+            self._close_file()
+
+    def _open_file(self, suffix: str) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        self._file = self.directory / f"predictions-{stamp}-{os.getpid()}-{self.files:04d}.{suffix}"
+        self._file_opened = time.monotonic()
+        self._file_rows = 0
+        self.files += 1
+
+    def _close_file(self) -> None:
+        if self._writer is not None:
+            # Footer escrito: recién ahora el archivo aparece con su nombre final
+            self._writer.close()
+            self._writer = None
+            os.replace(self._hidden(self._file), self._file)
+        self._file = None
+
+    @staticmethod
+    def _hidden(path: Path) -> Path:
+        return path.with_name(f".{path.name}.tmp")
+
+    def _write(self, columns: Dict[str, list]) -> None:
+        rows = len(columns["ts"])
+        self._maybe_rotate(rows)
+        if self.parquet:
+            self._write_parquet(columns)
+        else:
+            self._append_jsonl(columns)
+        self._file_rows += rows
+
+    def _write_parquet(self, columns: Dict[str, list]) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._schema is None:
+            self._schema = pa.schema(
+                [(name, pa.float64() if name in _FLOAT_COLUMNS else pa.string()) for name in AUDIT_COLUMNS]
+            )
+        if self._file is None:
+            self._open_file("parquet")
+            self._writer = pq.ParquetWriter(self._hidden(self._file), self._schema)
+        # Un row group por flush dentro del archivo de la ventana
+        self._writer.write_table(pa.Table.from_pydict(columns, schema=self._schema))
+
+    def _append_jsonl(self, columns: Dict[str, list]) -> None:
+        if self._file is None:
+            self._open_file("jsonl")
+        # Un solo write por flush: las líneas ya escritas siempre están completas
+        text = pd.DataFrame(columns).to_json(orient="records", lines=True)
+        with open(self._file, "a") as f:
+            f.write(text if text.endswith("\n") else text + "\n")
+
+    def stop(self) -> None:
+        self._stopping = True
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self.flush()
+        with self._io_lock:
+            try:
+                self._close_file()
+            except Exception as e:
+                logger.warning("Could not close audit file %s: %s", self._file, e)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "directory": str(self.directory),
+                "format": "parquet" if self.parquet else "jsonl",
+                "pending": self._pending,
+                "recorded": self.recorded,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "files": self.files,
+            }
+
+
+def read_audit_log(directory: Path) -> pd.DataFrame:
+    """All audit records under `directory` (Parquet and/or JSONL files), oldest file first."""
+    frames = []
+    for path in sorted(Path(directory).glob("predictions-*")):
+        if path.suffix == ".parquet":
+            frames.append(pd.read_parquet(path))
+        elif path.suffix == ".jsonl" and path.stat().st_size:
+            frames.append(pd.read_json(path, lines=True))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+_audit_sink: Optional[AuditSink] = None
+_audit_lock = threading.Lock()
+
+
+def _default_directory() -> Path:
+    if settings.AUDIT_LOG_DIR:
+        return Path(settings.AUDIT_LOG_DIR)
+    return Path(__file__).resolve().parents[2] / "logs" / "audit"
+
+
+def get_audit_sink() -> AuditSink:
+    """Audit sink compartido, configurado con AUDIT_LOG_DIR / AUDIT_FLUSH_* / AUDIT_ROTATE_*."""
+    global _audit_sink
+    if _audit_sink is None:
+        with _audit_lock:
+            if _audit_sink is None:
+                _audit_sink = AuditSink(
+                    _default_directory(),
+                    flush_seconds=settings.AUDIT_FLUSH_SECONDS,
+                    flush_records=settings.AUDIT_FLUSH_RECORDS,
+                    rotate_records=settings.AUDIT_ROTATE_RECORDS,
+                    rotate_seconds=settings.AUDIT_ROTATE_SECONDS,
+                    max_buffer=settings.AUDIT_MAX_BUFFER,
+                )
+    return _audit_sink
+
+
+def stop_audit_sink() -> None:
+    global _audit_sink
+    with _audit_lock:
+        if _audit_sink is not None:
+            _audit_sink.stop()
+            _audit_sink = None
+
+
+# Sinks heredados del padre en un worker forkeado. Se mantienen vivos a propósito: si se
+# liberaran, el destructor del ParquetWriter cerraría el archivo abierto del padre
+# (mismo fd, mismo offset) escribiéndole un footer desde el hijo.
+_inherited_sinks: List[AuditSink] = []
+
+
+def _reset_after_fork() -> None:
+    # El hilo de escritura no sobrevive al fork: cada worker abre sus propios archivos
+    global _audit_sink, _audit_lock
+    if _audit_sink is not None:
+        _inherited_sinks.append(_audit_sink)
+    _audit_sink = None
+    _audit_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
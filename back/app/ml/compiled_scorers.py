@@ -0,0 +1,337 @@
+"""
+Closed-form scorers compiled from fitted sklearn models at load time.
+
+Both expose `predict_proba_positive(X)`, the positive-class column of the wrapped
+model's `predict_proba`, and are attached to the serving snapshot as `ActiveModel.scorer`.
+
+`CompiledCardiovascularScorer` folds the cardiovascular CalibratedClassifierCV
+(ColumnTransformer[imputer -> scaler] -> LogisticRegression, per calibration fold)
+into one weight matrix, intercepts and the fitted calibration maps, so a single
+matrix product gives every fold's margin and the per-feature contributions used
+as drivers, without running the sklearn pipeline twice per request.
+"""
+
+import logging
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.special import expit
+
+from .artifact_store import FoldCalibrator
+from .feature_engineering import CARDIO_FEATURE_COLUMNS, CARDIO_SERVING_CONSTANTS
+
+logger = logging.getLogger(__name__)
+
+
+class NotCompilableError(ValueError):
+    """The fitted model has a structure the compiled scorer does not reproduce."""
+
+
+def _fold_calibrator(calibrator, method: str) -> FoldCalibrator:
+    if method == "sigmoid":
+        return FoldCalibrator("sigmoid", {"a": calibrator.a_, "b": calibrator.b_})
+    if method == "isotonic":
+        if getattr(calibrator, "out_of_bounds", "clip") != "clip":
+            raise NotCompilableError("Isotonic calibrator without out_of_bounds='clip'")
+        return FoldCalibrator(
+            "isotonic",
+            {"x_min": calibrator.X_min_, "x_max": calibrator.X_max_},
+            x_thresholds=calibrator.X_thresholds_,
+            y_thresholds=calibrator.y_thresholds_,
+        )
+    raise NotCompilableError(f"Unsupported calibration method: {method}")
+
+
+def _column_steps(transformer) -> Tuple[Optional[np.ndarray], Optional[np.ndarray], Optional[np.ndarray]]:
+    """
+    (fill, mean, scale) of a ColumnTransformer branch: an optional SimpleImputer
+    followed by StandardScalers, or 'passthrough'. None means identity for that step.
+    """
+    if transformer == "passthrough":
+        return None, None, None
+
+    steps = [step for _, step in transformer.steps] if hasattr(transformer, "steps") else [transformer]
+    fill = mean = scale = None
+    for position, step in enumerate(steps):
+        name = type(step).__name__
+        if name == "SimpleImputer" and position == 0:
+            if getattr(step, "add_indicator", False):
+                raise NotCompilableError("SimpleImputer(add_indicator=True) is not supported")
+            missing = step.missing_values
+            if not (isinstance(missing, float) and np.isnan(missing)):
+                raise NotCompilableError("Only NaN missing_values are supported")
+            fill = np.asarray(step.statistics_, dtype=np.float64)
+            if np.isnan(fill).any() and not getattr(step, "keep_empty_features", False):
+                raise NotCompilableError("Imputer drops all-missing columns")
+        elif name == "StandardScaler":
+            step_mean = step.mean_ if step.with_mean else None
+            step_scale = step.scale_ if step.with_std else None
+            # Escaladores encadenados: ((x - m1)/s1 - m2)/s2 = (x - (m1 + m2*s1)) / (s1*s2)
+            if step_mean is not None:
+                mean = step_mean if mean is None else mean + step_mean * (scale if scale is not None else 1.0)
+            if step_scale is not None:
+                scale = step_scale if scale is None else scale * step_scale
+        else:
+            raise NotCompilableError(f"Unsupported preprocessing step {name}")
+    return fill, mean, scale
+
+
+def _linear_fold(pipeline, feature_names: Sequence[str]):
+    """
+    Per-output-column arrays for one fitted pipeline:
+    (source input index, fill, weight, offset, output name) with
+    logit = sum(weight * fill_nan(x[source]) - offset) + intercept.
+    """
+    steps = getattr(pipeline, "named_steps", None)
+    if steps is None or "pre" not in steps or "clf" not in steps:
+        raise NotCompilableError("Expected a pipeline with 'pre' and 'clf' steps")
+    for name, step in pipeline.steps:
+        if name not in ("pre", "clf") and not hasattr(step, "fit_resample"):
+            # Los samplers (SMOTE) solo actúan en fit; cualquier otro paso cambia la predicción
+            raise NotCompilableError(f"Unsupported pipeline step {name}")
+
+    classifier = steps["clf"]
+    if type(classifier).__name__ != "LogisticRegression" or classifier.coef_.shape[0] != 1:
+        raise NotCompilableError("Final step must be a binary LogisticRegression")
+
+    preprocessor = steps["pre"]
+    inputs = list(getattr(preprocessor, "feature_names_in_", feature_names))
+    position = {name: idx for idx, name in enumerate(feature_names)}
+
+    sources, fills, means, scales, names = [], [], [], [], []
+    for branch, transformer, columns in preprocessor.transformers_:
+        if transformer == "drop" or len(columns) == 0:
+            continue
+        columns = [inputs[c] if isinstance(c, (int, np.integer)) else str(c) for c in columns]
+        missing = [c for c in columns if c not in position]
+        if missing:
+            raise NotCompilableError(f"Columns not in the serving frame: {missing}")
+
+        fill, mean, scale = _column_steps(transformer)
+        n = len(columns)
+        sources.extend(position[c] for c in columns)
+        fills.append(np.full(n, np.nan) if fill is None else fill)
+        means.append(np.zeros(n) if mean is None else np.asarray(mean, dtype=np.float64))
+        scales.append(np.ones(n) if scale is None else np.asarray(scale, dtype=np.float64))
+        names.extend(columns)
+
+    coef = np.asarray(classifier.coef_[0], dtype=np.float64)
+    if coef.shape[0] != len(sources):
+        raise NotCompilableError("Coefficient count does not match the transformed columns")
+
+    scales = np.concatenate(scales)
+    weight = coef / scales
+    offset = weight * np.concatenate(means)
+    return (
+        np.asarray(sources, dtype=np.intp),
+        np.concatenate(fills),
+        weight,
+        offset,
+        float(classifier.intercept_[0]),
+        names,
+    )
+
+
+class CompiledCardiovascularScorer:
+    """
+    Closed-form scorer for the cardiovascular CalibratedClassifierCV.
+
+    With z = x where observed and the fold's imputation value where missing, fold k
+    has margin  m_k = w_k . z_k + c_k  (scaler folded into w_k and c_k). Writing
+    z_k = x0 + mask * fill_k turns every fold into one product
+    [x0 | mask] @ [W ; W * F].T. Columns that are constant at serving time
+    (`CARDIO_SERVING_CONSTANTS`) are folded into c_k. The probability is the mean
+    of the fold calibration maps applied to m_k, as in `predict_proba`; the drivers
+    are fold 0's per-feature terms w_0 * (z_0 - mean_0), as before.
+    """
+
+    def __init__(self, model, feature_names: Sequence[str]):
+        folds = getattr(model, "calibrated_classifiers_", None)
+        if not folds:
+            raise NotCompilableError("Expected a fitted CalibratedClassifierCV")
+        if list(getattr(model, "classes_", [0, 1])) != [0, 1]:
+            raise NotCompilableError("Expected binary classes [0, 1]")
+
+        # Sin nombres inferidos el builder usa CARDIO_FEATURE_COLUMNS como columnas del frame
+        self.feature_names = list(feature_names) or list(CARDIO_FEATURE_COLUMNS)
+        compiled = [_linear_fold(fold.estimator, self.feature_names) for fold in folds]
+        self.calibrators = [_fold_calibrator(fold.calibrators[0], fold.method) for fold in folds]
+
+        sources = compiled[0][0]
+        if any(not np.array_equal(sources, c[0]) for c in compiled):
+            raise NotCompilableError("Calibration folds use different column layouts")
+        self.output_names: List[str] = compiled[0][5]
+        self.output_sources = sources
+        fills = np.vstack([c[1] for c in compiled])
+        weights = np.vstack([c[2] for c in compiled])
+        offsets = np.vstack([c[3] for c in compiled])
+        intercepts = np.array([c[4] for c in compiled]) - offsets.sum(axis=1)
+
+        # Columnas constantes en serving: su término (con imputación) pasa al intercepto
+        constant = np.zeros(len(sources), dtype=bool)
+        constant_values = np.zeros(len(sources))
+        known = set(CARDIO_FEATURE_COLUMNS)
+        for j, src in enumerate(sources):
+            name = self.feature_names[src]
+            if name in CARDIO_SERVING_CONSTANTS or name not in known:
+                constant[j] = True
+                constant_values[j] = CARDIO_SERVING_CONSTANTS.get(name, np.nan)
+        constant_z = np.where(np.isnan(constant_values), fills, constant_values)
+        if np.isnan(constant_z[:, constant]).any():
+            raise NotCompilableError("Constant column without an imputation value")
+        const_terms = np.where(constant, weights * np.nan_to_num(constant_z), 0.0)
+        self.intercepts = intercepts + const_terms.sum(axis=1)
+
+        variable = ~constant
+        self.sources = sources[variable]
+        self.variable = np.flatnonzero(variable)
+        self.needs_fill = np.isnan(fills[:, variable]).any(axis=0)
+        w = weights[:, variable]
+        f = np.nan_to_num(fills[:, variable])
+        # [x0 | mask] @ stacked -> margen de cada fold en un solo producto
+        self.stacked = np.ascontiguousarray(np.vstack([w.T, (w * f).T]))
+
+        # Drivers: términos del fold 0 (valor escalado * coeficiente), constantes precalculadas
+        self.driver_weight = weights[0, variable]
+        self.driver_offset = offsets[0, variable]
+        self.driver_fill = f[0]
+        self.constant_contributions = np.where(constant, const_terms[0] - offsets[0], 0.0)
+
+    def margins(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Per-fold margins (n, folds), plus the gathered inputs and their NaN mask."""
+        values = np.asarray(X, dtype=np.float64)[:, self.sources]
+        mask = np.isnan(values)
+        if mask[:, self.needs_fill].any():
+            raise ValueError("Input X contains NaN in a column without imputation")
+        x0 = np.where(mask, 0.0, values)
+        margins = np.hstack([x0, mask]) @ self.stacked + self.intercepts
+        return margins, x0, mask
+
+    def predict_proba_positive(self, X: np.ndarray) -> np.ndarray:
+        margins, _, _ = self.margins(X)
+        return self._calibrate(margins)
+
+    def _calibrate(self, margins: np.ndarray) -> np.ndarray:
+        total = np.zeros(margins.shape[0])
+        for k, calibrator in enumerate(self.calibrators):
+            proba = np.asarray(calibrator.predict(margins[:, k]), dtype=np.float64)
+            proba[(1.0 < proba) & (proba <= 1.0 + 1e-5)] = 1.0
+            total += proba
+        return total / len(self.calibrators)
+
+    def score(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(calibrated probabilities, fold-0 contributions per output column) for N rows."""
+        margins, x0, mask = self.margins(X)
+        contributions = np.tile(self.constant_contributions, (x0.shape[0], 1))
+        z0 = np.where(mask, self.driver_fill, x0)
+        contributions[:, self.variable] = self.driver_weight * z0 - self.driver_offset
+        return self._calibrate(margins), contributions
+
+
+class _FusedFold:
+    """One XGBoost fold: booster output plus its calibration map, precomputed."""
+
+    def __init__(self, booster, iteration_range, missing, calibrator: FoldCalibrator):
+        self.booster = booster
+        self.iteration_range = tuple(iteration_range)
+        self.missing = missing
+        self.method = calibrator.method
+        if self.method == "sigmoid":
+            self.a, self.b = calibrator.a, calibrator.b
+            return
+
+        x, y = calibrator.x_thresholds, calibrator.y_thresholds
+        self.dtype = x.dtype
+        self.x_min, self.x_max = calibrator.x_min, calibrator.x_max
+        self.constant = y[0] if len(y) == 1 else None
+        if self.constant is None:
+            # Tabla por segmento con la misma aritmética (dtype de los umbrales) que interp1d
+            lo = np.arange(len(x) - 1)
+            self.x = np.ascontiguousarray(x)
+            self.x_lo = x[lo]
+            self.y_lo = y[lo]
+            self.slope = (y[lo + 1] - y[lo]) / (x[lo + 1] - x[lo])
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        positive = self.booster.inplace_predict(
+            X,
+            iteration_range=self.iteration_range,
+            predict_type="value",
+            missing=self.missing,
+            validate_features=False,
+        )
+        if self.method == "sigmoid":
+            return expit(-(self.a * positive + self.b))
+
+        T = np.clip(np.asarray(positive, dtype=self.dtype), self.x_min, self.x_max)
+        if self.constant is not None:
+            return np.full(T.shape[0], self.constant, dtype=T.dtype)
+        segment = np.clip(np.searchsorted(self.x, T), 1, len(self.x) - 1) - 1
+        return (self.slope[segment] * (T - self.x_lo[segment]) + self.y_lo[segment]).astype(T.dtype)
+
+
+class FusedDiabetesScorer:
+    """
+    Calibrated probability of the diabetes CalibratedClassifierCV(XGBClassifier)
+    without the sklearn wrappers: per fold, the booster's in-place prediction and the
+    fold's isotonic segment table (or closed-form sigmoid), averaged over all folds.
+
+    The booster's own probability output is used rather than re-applying the logistic
+    to its margin in numpy: that can differ from XGBoost's float32 result by one ulp
+    (~6e-8), beyond the 1e-9 parity target. Works for the pickled model and for the
+    exported bundle (`CalibratedBoosterModel`).
+    """
+
+    def __init__(self, model):
+        folds = getattr(model, "calibrated_classifiers_", None)
+        if not folds:
+            raise NotCompilableError("Expected a fitted CalibratedClassifierCV")
+        if list(getattr(model, "classes_", [0, 1])) != [0, 1]:
+            raise NotCompilableError("Expected binary classes [0, 1]")
+
+        self.folds: List[_FusedFold] = []
+        for fold in folds:
+            estimator = getattr(fold.estimator, "estimator", fold.estimator)  # FrozenEstimator
+            if not hasattr(estimator, "get_booster"):
+                raise NotCompilableError(f"Fold estimator {type(estimator).__name__} has no booster")
+            if isinstance(getattr(fold, "calibrator", None), FoldCalibrator):
+                # Bundle exportado: ya trae calibradores y rango de iteraciones
+                calibrator = fold.calibrator
+                iteration_range = estimator.iteration_range
+            else:
+                calibrator = _fold_calibrator(fold.calibrators[0], fold.method)
+                try:
+                    iteration_range = (0, int(estimator.best_iteration) + 1)
+                except AttributeError:
+                    iteration_range = (0, 0)
+            missing = getattr(estimator, "missing", np.nan)
+            self.folds.append(_FusedFold(
+                estimator.get_booster(), iteration_range, np.nan if missing is None else missing, calibrator,
+            ))
+
+    def predict_proba_positive(self, X) -> np.ndarray:
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        total = np.zeros(X.shape[0])
+        for fold in self.folds:
+            proba = np.asarray(fold.predict(X), dtype=np.float64)
+            proba[(1.0 < proba) & (proba <= 1.0 + 1e-5)] = 1.0
+            total += proba
+        return total / len(self.folds)
+
+
+def compile_diabetes_scorer(model) -> Optional[FusedDiabetesScorer]:
+    """Fuse the calibrated XGBoost folds, or None (sklearn path) when not supported."""
+    try:
+        return FusedDiabetesScorer(model)
+    except (NotCompilableError, AttributeError, KeyError, IndexError) as e:
+        logger.info("Diabetes model not fused (%s); using predict_proba", e)
+        return None
+
+
+def compile_cardiovascular_scorer(model, feature_names: Sequence[str]) -> Optional[CompiledCardiovascularScorer]:
+    """Compile the model, or None (sklearn path) when its structure is not supported."""
+    try:
+        return CompiledCardiovascularScorer(model, feature_names)
+    except (NotCompilableError, AttributeError, KeyError, IndexError) as e:
+        logger.info("Cardiovascular model not compiled (%s); using the sklearn pipeline", e)
+        return None
@@ -1,7 +1,7 @@
 import logging
 import numpy as np
 import pandas as pd
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Sequence, Union
 
 logger = logging.getLogger(__name__)
 
@@ -68,7 +68,70 @@ CARDIO_FEATURE_COLUMNS = [
     'etnia_5.0'
 ]
 
-def build_feature_frame(
+# Columnas del modelo cardiovascular sin equivalente en el formulario: en serving
+# siempre valen lo mismo (NaN -> imputadas por el pipeline, dummies de etnia en 0)
+CARDIO_SERVING_CONSTANTS: Dict[str, float] = {
+    'educacion': np.nan,
+    'ratio_ingreso_pobreza': np.nan,
+    'etnia_2.0': 0.0,
+    'etnia_3.0': 0.0,
+    'etnia_4.0': 0.0,
+    'etnia_5.0': 0.0,
+}
+
+class SharedInputs(NamedTuple):
+    """
+    Derived inputs that the diabetes and cardiovascular features have in common.
+    Each model keeps its historical rules for odd heights/weights (0 or negative), so
+    the cardiovascular BMI and waist-to-height ratio are stored separately; for any
+    realistic profile they are the very same values.
+    """
+    sex_code: str               # "M", "F" o "" (no informado)
+    bmi: Optional[float]        # Informado o calculado desde altura/peso; None si no se puede
+    waist_height_ratio: float   # NaN sin cintura o altura > 0
+    bmi_squared: float
+    bmi_age: float              # Interacción IMC × edad
+    cardio_bmi: Optional[float]     # Calculado solo con altura > 0 y peso distinto de 0
+    cardio_waist_height_ratio: float  # NaN sin cintura o con altura 0
+
+
+def compute_shared_inputs(
+    age: float,
+    sex: Optional[str],
+    height_cm: Optional[float] = None,
+    weight_kg: Optional[float] = None,
+    waist_cm: Optional[float] = None,
+    bmi: Optional[float] = None,
+) -> SharedInputs:
+    """
+    BMI, waist-to-height ratio, sex code and BMI interactions, derived once per profile
+    so that scoring several models (see `predict_risk_multi`) does not recompute them.
+    """
+    cardio_bmi = bmi
+    if bmi is None and height_cm is not None and weight_kg is not None and height_cm != 0:
+        bmi = weight_kg / ((height_cm / 100) ** 2)
+        if height_cm > 0 and weight_kg:
+            cardio_bmi = bmi
+
+    waist_height_ratio = np.nan
+    cardio_waist_height_ratio = np.nan
+    if waist_cm is not None and height_cm:
+        cardio_waist_height_ratio = float(waist_cm) / float(height_cm)
+        if height_cm > 0:
+            waist_height_ratio = cardio_waist_height_ratio
+
+    return SharedInputs(
+        sex_code=(sex or "").upper(),
+        bmi=bmi,
+        waist_height_ratio=waist_height_ratio,
+        bmi_squared=float(bmi ** 2) if bmi is not None else np.nan,
+        bmi_age=float(bmi * age) if bmi is not None else np.nan,
+        cardio_bmi=cardio_bmi,
+        cardio_waist_height_ratio=cardio_waist_height_ratio,
+    )
+
+
+def compute_feature_values(
     age: int,
     sex: str,
     height_cm: Optional[float] = None,
@@ -80,42 +143,25 @@ def build_feature_frame(
     bmi: Optional[float] = None,
     systolic_bp: Optional[float] = None,
     total_cholesterol: Optional[float] = None,
-    feature_names: list = None
-) -> pd.DataFrame:
+    shared: Optional[SharedInputs] = None,
+) -> Dict[str, float]:
     """
-    Build feature frame from user profile data.
-    Based on ml/api_main.py logic.
-    
-    Args:
-        age: User age
-        sex: User sex ('M' or 'F')
-        height_cm: Height in cm (optional if bmi provided)
-        weight_kg: Weight in kg (optional if bmi provided)
-        waist_cm: Waist circumference in cm
-        sleep_hours: Hours of sleep per night
-        smokes_cig_day: Cigarettes per day
-        days_mvpa_week: Days of moderate-vigorous physical activity per week
-        bmi: Pre-calculated BMI (if not provided, calculated from height/weight)
-        feature_names: List of expected feature names for ordering
-    
-    Returns:
-        DataFrame with engineered features
+    Compute the engineered diabetes features for one profile as plain floats
+    (NaN when an input is missing). Shared by `build_feature_frame` and the
+    pandas-free single-request path in the predictor. `shared` reuses inputs
+    already derived by `compute_shared_inputs` for the same profile.
     """
+    if shared is None:
+        shared = compute_shared_inputs(age, sex, height_cm, weight_kg, waist_cm, bmi)
+    bmi = shared.bmi
     if bmi is None:
-        if height_cm is None or weight_kg is None:
-            raise ValueError("Either bmi or both height_cm and weight_kg must be provided")
-        bmi = weight_kg / ((height_cm / 100) ** 2)
+        raise ValueError("Either bmi or both height_cm and weight_kg must be provided")
 
-    sex_code = (sex or "").upper()
+    sex_code = shared.sex_code
     sex_male = 1 if sex_code == 'M' else 0
 
     waist_cm = float(waist_cm) if waist_cm is not None else None
-    height_cm = float(height_cm) if height_cm is not None else None
-
-    if waist_cm is not None and height_cm is not None and height_cm > 0:
-        waist_height_ratio = waist_cm / height_cm
-    else:
-        waist_height_ratio = np.nan
+    waist_height_ratio = shared.waist_height_ratio
 
     sleep_hours = float(sleep_hours) if sleep_hours is not None else np.nan
 
@@ -171,7 +217,7 @@ def build_feature_frame(
     if waist_cm is not None:
         waist_age_interaction = float(waist_cm * age)
 
-    bmi_age_interaction = float(bmi * age) if bmi is not None else np.nan
+    bmi_age_interaction = shared.bmi_age
     bmi_age_sex_interaction = float(bmi * age * sex_male) if bmi is not None else np.nan
 
     age_poor_sleep = np.nan
@@ -190,7 +236,7 @@ def build_feature_frame(
         'age_squared': float(age ** 2),
         'sex_male': float(sex_male),
         'bmi': float(bmi),
-        'bmi_squared': float(bmi ** 2) if bmi is not None else np.nan,
+        'bmi_squared': shared.bmi_squared,
         'waist_height_ratio': waist_height_ratio,
         'waist_height_ratio_squared': waist_height_ratio ** 2 if not np.isnan(waist_height_ratio) else np.nan,
         'high_waist_height_ratio': high_waist_height_ratio,
@@ -213,15 +259,6 @@ def build_feature_frame(
         'triple_risk': triple_risk
     }
 
-    features_df = pd.DataFrame([feature_values])
-
-    missing_values = pd.Series(feature_values).isna()
-    if missing_values.any():
-        logger.info(
-            "Imputing missing engineered features: %s",
-            missing_values[missing_values].index.tolist()
-        )
-
     logger.debug(
         "Engineered features summary | bmi=%.2f, lifestyle_score=%s, waist_ratio=%s, bp_flag=%s, chol_flag=%s",
         feature_values['bmi'],
@@ -230,6 +267,65 @@ def build_feature_frame(
         bp_flag,
         chol_flag
     )
+
+    return feature_values
+
+
+def build_feature_frame(
+    age: int,
+    sex: str,
+    height_cm: Optional[float] = None,
+    weight_kg: Optional[float] = None,
+    waist_cm: Optional[float] = None,
+    sleep_hours: Optional[float] = None,
+    smokes_cig_day: Optional[float] = None,
+    days_mvpa_week: Optional[int] = None,
+    bmi: Optional[float] = None,
+    systolic_bp: Optional[float] = None,
+    total_cholesterol: Optional[float] = None,
+    feature_names: list = None
+) -> pd.DataFrame:
+    """
+    Build feature frame from user profile data.
+    Based on ml/api_main.py logic.
+    
+    Args:
+        age: User age
+        sex: User sex ('M' or 'F')
+        height_cm: Height in cm (optional if bmi provided)
+        weight_kg: Weight in kg (optional if bmi provided)
+        waist_cm: Waist circumference in cm
+        sleep_hours: Hours of sleep per night
+        smokes_cig_day: Cigarettes per day
+        days_mvpa_week: Days of moderate-vigorous physical activity per week
+        bmi: Pre-calculated BMI (if not provided, calculated from height/weight)
+        feature_names: List of expected feature names for ordering
+    
+    Returns:
+        DataFrame with engineered features
+    """
+    feature_values = compute_feature_values(
+        age=age,
+        sex=sex,
+        height_cm=height_cm,
+        weight_kg=weight_kg,
+        waist_cm=waist_cm,
+        sleep_hours=sleep_hours,
+        smokes_cig_day=smokes_cig_day,
+        days_mvpa_week=days_mvpa_week,
+        bmi=bmi,
+        systolic_bp=systolic_bp,
+        total_cholesterol=total_cholesterol,
+    )
+
+    features_df = pd.DataFrame([feature_values])
+
+    missing_values = pd.Series(feature_values).isna()
+    if missing_values.any():
+        logger.debug(
+            "Imputing missing engineered features: %s",
+            missing_values[missing_values].index.tolist()
+        )
     
     if feature_names:
         # Efficiently add missing features using reindex (avoids DataFrame fragmentation)
@@ -242,7 +338,7 @@ def get_feature_description(feature_name: str) -> str:
     return FEATURE_DESCRIPTIONS.get(feature_name, feature_name)
 
 
-def build_cardiovascular_feature_frame(
+def compute_cardiovascular_values(
     edad: int,
     genero: Optional[str],
     imc: Optional[float] = None,
@@ -253,31 +349,27 @@ def build_cardiovascular_feature_frame(
     hdl_mgdl: Optional[float] = None,
     trigliceridos_mgdl: Optional[float] = None,
     ldl_mgdl: Optional[float] = None,
-    feature_names: Optional[List[str]] = None
-) -> pd.DataFrame:
-    """Build the feature frame expected by the cardiovascular pipeline."""
+    shared: Optional[SharedInputs] = None,
+) -> Dict[str, float]:
+    """
+    Cardiovascular pipeline inputs for one profile as plain floats (NaN when missing).
+    `shared` reuses inputs already derived by `compute_shared_inputs`.
+    """
+    if shared is None:
+        shared = compute_shared_inputs(edad, genero, altura_cm, peso_kg, circunferencia_cintura, imc)
 
     sexo_value: float = np.nan
-    if genero:
-        genero_upper = genero.upper()
-        if genero_upper == 'M':
-            sexo_value = 0.0
-        elif genero_upper == 'F':
-            sexo_value = 1.0
-
-    bmi_value = imc
-    if bmi_value is None and altura_cm and peso_kg and altura_cm > 0:
-        bmi_value = peso_kg / ((altura_cm / 100) ** 2)
-
-    rel_cintura_altura = np.nan
-    if circunferencia_cintura is not None and altura_cm:
-        try:
-            rel_cintura_altura = float(circunferencia_cintura) / float(altura_cm)
-        except ZeroDivisionError:
-            rel_cintura_altura = np.nan
-
-    imc_cuadratico = float(bmi_value ** 2) if bmi_value is not None else np.nan
-    imc_x_edad = float(bmi_value * edad) if bmi_value is not None else np.nan
+    if shared.sex_code == 'M':
+        sexo_value = 0.0
+    elif shared.sex_code == 'F':
+        sexo_value = 1.0
+
+    imc_value = shared.cardio_bmi
+    if imc_value is shared.bmi:
+        imc_cuadratico, imc_x_edad = shared.bmi_squared, shared.bmi_age
+    else:
+        imc_cuadratico = float(imc_value ** 2) if imc_value is not None else np.nan
+        imc_x_edad = float(imc_value * edad) if imc_value is not None else np.nan
 
     ratio_hdl_ldl = np.nan
     if hdl_mgdl not in (None, 0) and ldl_mgdl not in (None, 0):
@@ -293,21 +385,13 @@ def build_cardiovascular_feature_frame(
         except Exception:
             trigliceridos_log = np.nan
 
-    # Log valores críticos antes de construir features
-    logger.info(f"🔍 Construyendo features cardiovasculares:")
-    logger.info(f"   edad={edad}, sexo={genero}, imc={bmi_value}")
-    logger.info(f"   cintura={circunferencia_cintura}, rel_cintura_altura={rel_cintura_altura}")
-    logger.info(f"   glucosa={glucosa_mgdl}, hdl={hdl_mgdl}, ldl={ldl_mgdl}, trig={trigliceridos_mgdl}")
-    logger.info(f"   Valores faltantes: hdl={hdl_mgdl is None}, ldl={ldl_mgdl is None}, trig={trigliceridos_mgdl is None}")
-    
-    cardio_values: Dict[str, Any] = {
+    return {
+        **CARDIO_SERVING_CONSTANTS,
         'edad': float(edad),
         'sexo': sexo_value,
-        'educacion': np.nan,
-        'ratio_ingreso_pobreza': np.nan,
-        'imc': float(bmi_value) if bmi_value is not None else np.nan,
+        'imc': float(imc_value) if imc_value is not None else np.nan,
         'cintura_cm': float(circunferencia_cintura) if circunferencia_cintura is not None else np.nan,
-        'rel_cintura_altura': rel_cintura_altura,
+        'rel_cintura_altura': shared.cardio_waist_height_ratio,
         'glucosa_mgdl': float(glucosa_mgdl) if glucosa_mgdl is not None else np.nan,
         'hdl_mgdl': float(hdl_mgdl) if hdl_mgdl is not None else np.nan,
         'trigliceridos_mgdl': float(trigliceridos_mgdl) if trigliceridos_mgdl is not None else np.nan,
@@ -316,30 +400,263 @@ def build_cardiovascular_feature_frame(
         'imc_x_edad': imc_x_edad,
         'ratio_hdl_ldl': ratio_hdl_ldl,
         'trigliceridos_log': trigliceridos_log,
-        'etnia_2.0': 0.0,
-        'etnia_3.0': 0.0,
-        'etnia_4.0': 0.0,
-        'etnia_5.0': 0.0
     }
-    
+
+
+def cardiovascular_values_frame(values: Dict[str, float], feature_names: Optional[List[str]] = None) -> pd.DataFrame:
+    """One-row frame in pipeline column order (missing columns as NaN)."""
+    return pd.DataFrame([values]).reindex(columns=feature_names or CARDIO_FEATURE_COLUMNS)
+
+
+def build_cardiovascular_feature_frame(
+    edad: int,
+    genero: Optional[str],
+    imc: Optional[float] = None,
+    altura_cm: Optional[float] = None,
+    peso_kg: Optional[float] = None,
+    circunferencia_cintura: Optional[float] = None,
+    glucosa_mgdl: Optional[float] = None,
+    hdl_mgdl: Optional[float] = None,
+    trigliceridos_mgdl: Optional[float] = None,
+    ldl_mgdl: Optional[float] = None,
+    feature_names: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """Build the feature frame expected by the cardiovascular pipeline."""
+    cardio_values = compute_cardiovascular_values(
+        edad, genero, imc, altura_cm, peso_kg, circunferencia_cintura,
+        glucosa_mgdl, hdl_mgdl, trigliceridos_mgdl, ldl_mgdl,
+    )
+    bmi_value = cardio_values['imc']
+    rel_cintura_altura = cardio_values['rel_cintura_altura']
+
+    # Detalle por petición solo a nivel DEBUG (corre en cada predicción cardiovascular)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "Construyendo features cardiovasculares: edad=%s, sexo=%s, imc=%s, cintura=%s, rel_cintura_altura=%s, "
+            "glucosa=%s, hdl=%s, ldl=%s, trig=%s",
+            edad, genero, bmi_value, circunferencia_cintura, rel_cintura_altura,
+            glucosa_mgdl, hdl_mgdl, ldl_mgdl, trigliceridos_mgdl,
+        )
+
     # Validar valores extremos que podrían indicar errores de entrada
-    if bmi_value is not None and bmi_value > 60:
+    if not np.isnan(bmi_value) and bmi_value > 60:
         logger.warning(f"⚠️ IMC extremadamente alto detectado: {bmi_value:.2f}. Verificar si los datos son correctos.")
-    if rel_cintura_altura is not None and not np.isnan(rel_cintura_altura) and rel_cintura_altura > 1.0:
+    if not np.isnan(rel_cintura_altura) and rel_cintura_altura > 1.0:
         logger.warning(f"⚠️ Relación cintura-altura extremadamente alta: {rel_cintura_altura:.2f}. Verificar si los datos son correctos.")
 
-    features_df = pd.DataFrame([cardio_values])
+    return cardiovascular_values_frame(cardio_values, feature_names)
+
+
+# ---------------------------------------------------------------------------
+# Versiones columnares (batch / what-if): mismas reglas que los builders de
+# una fila, calculadas con máscaras NumPy sobre N filas a la vez.
+# Un NaN (o None) en la entrada equivale a "no informado".
+# ---------------------------------------------------------------------------
+
+RawColumns = Union[pd.DataFrame, Mapping[str, Sequence[Any]]]
+
+
+def _raw_length(raw: RawColumns) -> int:
+    if isinstance(raw, pd.DataFrame):
+        return len(raw)
+    for values in raw.values():
+        return len(values)
+    return 0
+
+
+def _numeric_column(raw: RawColumns, name: str, n_rows: int) -> np.ndarray:
+    if name not in raw:
+        return np.full(n_rows, np.nan)
+    values = raw[name]
+    if isinstance(values, pd.Series):
+        return pd.to_numeric(values, errors="coerce").to_numpy(dtype=float)
+    return np.asarray(values, dtype=float).reshape(n_rows)
+
+
+def _sex_column(raw: RawColumns, name: str, n_rows: int) -> np.ndarray:
+    if name not in raw:
+        return np.full(n_rows, "", dtype=object)
+    # Normaliza cada valor distinto una sola vez (un lote suele repetir "M"/"F")
+    codes, uniques = pd.factorize(pd.Series(raw[name], dtype=object))
+    normalized = np.array([str(value).upper() for value in uniques] + [""], dtype=object)
+    return normalized[codes]
+
+
+def _flag(condition: np.ndarray, known: Optional[np.ndarray] = None) -> np.ndarray:
+    flags = condition.astype(float)
+    if known is not None:
+        flags[~known] = np.nan
+    return flags
+
+
+def build_feature_matrix(raw: RawColumns, feature_names: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Columnar version of `build_feature_frame`.
+
+    Args:
+        raw: DataFrame or mapping of arrays keyed by the `build_feature_frame` argument
+            names (age, sex, height_cm, weight_kg, waist_cm, sleep_hours, smokes_cig_day,
+            days_mvpa_week, bmi, systolic_bp, total_cholesterol). Missing keys are
+            treated as not provided for every row.
+        feature_names: List of expected feature names for ordering
+
+    Returns:
+        DataFrame with one row of engineered features per input row
+    """
+    n_rows = _raw_length(raw)
+    age = _numeric_column(raw, 'age', n_rows)
+    sex_code = _sex_column(raw, 'sex', n_rows)
+    height_cm = _numeric_column(raw, 'height_cm', n_rows)
+    weight_kg = _numeric_column(raw, 'weight_kg', n_rows)
+    waist_cm = _numeric_column(raw, 'waist_cm', n_rows)
+    sleep_hours = _numeric_column(raw, 'sleep_hours', n_rows)
+    cigarettes = _numeric_column(raw, 'smokes_cig_day', n_rows)
+    total_active_days = _numeric_column(raw, 'days_mvpa_week', n_rows)
+    bmi = _numeric_column(raw, 'bmi', n_rows)
+    systolic_bp = _numeric_column(raw, 'systolic_bp', n_rows)
+    total_cholesterol = _numeric_column(raw, 'total_cholesterol', n_rows)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        missing_bmi = np.isnan(bmi)
+        if missing_bmi.any():
+            # Altura 0 tampoco sirve (sería IMC infinito): mismo error que compute_feature_values
+            cannot_compute = missing_bmi & (np.isnan(height_cm) | np.isnan(weight_kg) | (height_cm == 0))
+            if cannot_compute.any():
+                raise ValueError(
+                    "Either bmi or both height_cm and weight_kg must be provided "
+                    f"(rows {np.flatnonzero(cannot_compute).tolist()})"
+                )
+            bmi = np.where(missing_bmi, weight_kg / ((height_cm / 100) ** 2), bmi)
+
+        sex_male = _flag(sex_code == 'M')
+
+        has_waist = ~np.isnan(waist_cm)
+        waist_height_ratio = np.full(n_rows, np.nan)
+        has_ratio = has_waist & ~np.isnan(height_cm) & (height_cm > 0)
+        waist_height_ratio[has_ratio] = waist_cm[has_ratio] / height_cm[has_ratio]
+
+        cigarettes = np.where(np.isnan(cigarettes), 0.0, cigarettes)
+        current_smoker = _flag(cigarettes > 0)
+        ever_smoker = current_smoker
+
+        has_activity = ~np.isnan(total_active_days)
+        meets_activity_guidelines = _flag(total_active_days >= 5, has_activity)
+        sedentary_flag = _flag(total_active_days < 5, has_activity)
+
+        poor_sleep = _flag((sleep_hours < 7) | (sleep_hours > 9), ~np.isnan(sleep_hours))
+
+        waist_threshold = np.where(sex_code == 'M', 102.0, 88.0)
+        waist_only = ~has_ratio & has_waist
+        central_obesity = _flag(waist_height_ratio > 0.5, has_ratio | waist_only)
+        high_waist_height_ratio = _flag(waist_height_ratio > 0.6, has_ratio | waist_only)
+        central_obesity[waist_only] = (waist_cm[waist_only] >= waist_threshold[waist_only]).astype(float)
+        high_waist_height_ratio[waist_only] = central_obesity[waist_only]
+
+        obesity_flag = _flag(bmi >= 30)
+        bp_flag = _flag(systolic_bp >= 130, ~np.isnan(systolic_bp))
+        chol_flag = _flag(total_cholesterol >= 240, ~np.isnan(total_cholesterol))
+
+        lifestyle_components = np.column_stack([poor_sleep, current_smoker, sedentary_flag, bp_flag, chol_flag])
+        lifestyle_risk_score = np.minimum(3.0, np.nansum(lifestyle_components, axis=1))
+
+        has_sedentary = ~np.isnan(sedentary_flag)
+        obesity_sedentary_combo = _flag((obesity_flag == 1.0) & (sedentary_flag == 1.0), has_sedentary)
+        triple_risk = _flag((obesity_flag + sedentary_flag + current_smoker) >= 2, has_sedentary)
+
+        features_df = pd.DataFrame({
+            'age': age,
+            'age_squared': age ** 2,
+            'sex_male': sex_male,
+            'bmi': bmi,
+            'bmi_squared': bmi ** 2,
+            'waist_height_ratio': waist_height_ratio,
+            'waist_height_ratio_squared': waist_height_ratio ** 2,
+            'high_waist_height_ratio': high_waist_height_ratio,
+            'central_obesity': central_obesity,
+            'high_risk_profile': _flag((bmi >= 30) & (age >= 45)),
+            'sleep_hours': sleep_hours,
+            'poor_sleep': poor_sleep,
+            'cigarettes_per_day': cigarettes,
+            'current_smoker': current_smoker,
+            'ever_smoker': ever_smoker,
+            'total_active_days': total_active_days,
+            'meets_activity_guidelines': meets_activity_guidelines,
+            'sedentary_flag': sedentary_flag,
+            'lifestyle_risk_score': lifestyle_risk_score,
+            'bmi_age_interaction': bmi * age,
+            'waist_age_interaction': waist_cm * age,
+            'bmi_age_sex_interaction': bmi * age * sex_male,
+            'obesity_sedentary_combo': obesity_sedentary_combo,
+            'age_poor_sleep': age * poor_sleep,
+            'triple_risk': triple_risk,
+        })
 
     if feature_names:
-        for feat in feature_names:
-            if feat not in features_df.columns:
-                features_df[feat] = np.nan
-        features_df = features_df[feature_names]
-    else:
-        missing = [col for col in CARDIO_FEATURE_COLUMNS if col not in features_df.columns]
-        for col in missing:
-            features_df[col] = np.nan
-        features_df = features_df[CARDIO_FEATURE_COLUMNS]
+        features_df = features_df.reindex(columns=feature_names, fill_value=0)
 
     return features_df
 
+
+def build_cardiovascular_feature_matrix(
+    raw: RawColumns,
+    feature_names: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Columnar version of `build_cardiovascular_feature_frame`.
+
+    `raw` is a DataFrame or mapping of arrays keyed by the argument names of
+    `build_cardiovascular_feature_frame` (edad, genero, imc, altura_cm, peso_kg,
+    circunferencia_cintura, glucosa_mgdl, hdl_mgdl, trigliceridos_mgdl, ldl_mgdl).
+    """
+    n_rows = _raw_length(raw)
+    edad = _numeric_column(raw, 'edad', n_rows)
+    genero = _sex_column(raw, 'genero', n_rows)
+    imc = _numeric_column(raw, 'imc', n_rows)
+    altura_cm = _numeric_column(raw, 'altura_cm', n_rows)
+    peso_kg = _numeric_column(raw, 'peso_kg', n_rows)
+    cintura = _numeric_column(raw, 'circunferencia_cintura', n_rows)
+    glucosa = _numeric_column(raw, 'glucosa_mgdl', n_rows)
+    hdl = _numeric_column(raw, 'hdl_mgdl', n_rows)
+    trigliceridos = _numeric_column(raw, 'trigliceridos_mgdl', n_rows)
+    ldl = _numeric_column(raw, 'ldl_mgdl', n_rows)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sexo = np.full(n_rows, np.nan)
+        sexo[genero == 'M'] = 0.0
+        sexo[genero == 'F'] = 1.0
+
+        has_altura = ~np.isnan(altura_cm) & (altura_cm != 0)
+        can_compute_bmi = np.isnan(imc) & has_altura & ~np.isnan(peso_kg) & (peso_kg != 0) & (altura_cm > 0)
+        bmi_value = imc.copy()
+        bmi_value[can_compute_bmi] = peso_kg[can_compute_bmi] / ((altura_cm[can_compute_bmi] / 100) ** 2)
+
+        rel_cintura_altura = np.full(n_rows, np.nan)
+        has_rel = ~np.isnan(cintura) & has_altura
+        rel_cintura_altura[has_rel] = cintura[has_rel] / altura_cm[has_rel]
+
+        ratio_hdl_ldl = np.full(n_rows, np.nan)
+        has_ratio = ~np.isnan(hdl) & (hdl != 0) & ~np.isnan(ldl) & (ldl != 0)
+        ratio_hdl_ldl[has_ratio] = hdl[has_ratio] / ldl[has_ratio]
+
+        cardio_values: Dict[str, np.ndarray] = {
+            **{name: np.full(n_rows, value) for name, value in CARDIO_SERVING_CONSTANTS.items()},
+            'edad': edad,
+            'sexo': sexo,
+            'imc': bmi_value,
+            'cintura_cm': cintura,
+            'rel_cintura_altura': rel_cintura_altura,
+            'glucosa_mgdl': glucosa,
+            'hdl_mgdl': hdl,
+            'trigliceridos_mgdl': trigliceridos,
+            'ldl_mgdl': ldl,
+            'imc_cuadratico': bmi_value ** 2,
+            'imc_x_edad': bmi_value * edad,
+            'ratio_hdl_ldl': ratio_hdl_ldl,
+            'trigliceridos_log': np.log1p(trigliceridos),
+        }
+
+    columns = feature_names or CARDIO_FEATURE_COLUMNS
+    return pd.DataFrame(
+        {col: cardio_values.get(col, np.full(n_rows, np.nan)) for col in columns},
+        columns=columns,
+    )
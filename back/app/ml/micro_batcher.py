@@ -0,0 +1,228 @@
+import functools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.utils.histogram import Histogram
+from app.utils.metrics import metrics
+from .predictor import cache_served_predictions, lookup_cached_prediction, predict_risk, predict_risk_batch
+
+if TYPE_CHECKING:
+    from app.services.inference_executor import InferenceExecutor
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+BATCH_WAIT_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+metrics.describe("micro_batch_size", "Predictions scored together per micro-batch", buckets=BATCH_SIZE_BUCKETS)
+metrics.describe("micro_batch_wait_seconds", "Time a prediction waited for its micro-batch", buckets=BATCH_WAIT_BUCKETS)
+
+
+class MicroBatchQueueFullError(RuntimeError):
+    """Demasiadas predicciones esperando al micro-batcher."""
+
+
+def _score_micro_batch(params_list: List[Dict[str, Any]]) -> Tuple[bool, List[Tuple[bool, Any]]]:
+    """
+    Runs on the inference executor (thread or forked worker). Returns (fell_back,
+    [(ok, result or exception)]): if the batch fails it is retried row by row, so an
+    invalid profile only fails its own caller.
+    """
+    try:
+        return False, [(True, result) for result in predict_risk_batch(params_list, fill_cache=True)]
+    except Exception as exc:
+        logger.warning("Micro-batch of %s failed (%s); scoring one by one", len(params_list), exc)
+    outcomes: List[Tuple[bool, Any]] = []
+    for params in params_list:
+        try:
+            outcomes.append((True, predict_risk(**params)))
+        except Exception as item_exc:
+            outcomes.append((False, item_exc))
+    return True, outcomes
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single-profile predictions for up to `max_wait_ms` after the
+    first one arrives, or until `max_batch_size` are waiting, and scores them with one
+    `predict_risk_batch` call (one predict_proba and one contribution call per model
+    type). Each caller gets its own result through a Future. Profiles already in the
+    prediction cache are answered at submit time and never enqueued, and every batch
+    fills the cache for the next caller.
+
+    Every batch is one task on the inference executor (`executor`, or the shared one),
+    so it shares the executor's bound, timeout and worker health checks with the rest
+    of the inference; while it runs the batcher keeps collecting the next one. In
+    process mode the worker's results are also stored in this process's cache, where
+    `submit` looks them up.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 2.0,
+        max_pending: int = 1024,
+        executor: Optional["InferenceExecutor"] = None,
+    ):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_pending = max_pending
+        self._executor = executor
+        self._stats_lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[Tuple[Dict[str, Any], Future, float]]]" = queue.Queue()
+        self._stopped = False
+        self.batches = 0
+        self.fallbacks = 0
+        self.cache_hits = 0
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self.wait_seconds = Histogram(BATCH_WAIT_BUCKETS)
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, params: Dict[str, Any]) -> Future:
+        """Encola los kwargs de `predict_risk`; el Future resuelve al dict de resultado."""
+        if self._stopped:
+            raise RuntimeError("MicroBatcher is stopped")
+        future: Future = Future()
+        try:
+            cached = lookup_cached_prediction(params)
+        except Exception:
+            # Perfil inválido: el lote (y su reintento fila a fila) reporta el error en el Future
+            cached = None
+        if cached is not None:
+            self.cache_hits += 1
+            future.set_result(cached)
+            return future
+        if self._queue.qsize() >= self.max_pending:
+            raise MicroBatchQueueFullError(f"Micro-batcher queue is full ({self.max_pending} pending)")
+        self._queue.put((params, future, time.perf_counter()))
+        return future
+
+    def predict(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Blocking drop-in for `predict_risk(**params)`."""
+        return self.submit(params).result()
+
+    def _collect(self) -> Optional[List[Tuple[Dict[str, Any], Future, float]]]:
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            if batch is None:
+                break
+
+            started = time.perf_counter()
+            batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            self.batches += 1
+            self.batch_size.observe(len(batch))
+            metrics.observe("micro_batch_size", len(batch))
+            for _, _, enqueued in batch:
+                self.wait_seconds.observe(started - enqueued)
+                metrics.observe("micro_batch_wait_seconds", started - enqueued)
+
+            params_list = [params for params, _, _ in batch]
+            futures = [future for _, future, _ in batch]
+            try:
+                executor = self._executor or _shared_executor()
+                task = executor.submit(_score_micro_batch, params_list)
+            except Exception as exc:
+                # InferenceQueueFullError incluido: cada caller lo recibe en su Future
+                for future in futures:
+                    future.set_exception(exc)
+                continue
+            task.add_done_callback(functools.partial(self._resolve, params_list, futures, executor.mode))
+
+    def _resolve(self, params_list: List[Dict[str, Any]], futures: List[Future], mode: str, done: Future) -> None:
+        try:
+            fell_back, outcomes = done.result()
+        except Exception as exc:
+            # El worker murió o se pasó del timeout: falla el lote entero
+            for future in futures:
+                future.set_exception(exc)
+            return
+        if fell_back:
+            with self._stats_lock:
+                self.fallbacks += 1
+        if mode == "process":
+            served = [(params, value) for params, (ok, value) in zip(params_list, outcomes) if ok]
+            try:
+                cache_served_predictions([params for params, _ in served], [result for _, result in served])
+            except Exception as e:
+                logger.warning("Could not cache micro-batch results in the API process: %s", e)
+        for future, (ok, value) in zip(futures, outcomes):
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def stop(self) -> None:
+        self._stopped = True
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "pending": self._queue.qsize(),
+            "batches": self.batches,
+            "fallbacks": self.fallbacks,
+            "cache_hits": self.cache_hits,
+            "batch_size": self.batch_size.snapshot(),
+            "wait_seconds": self.wait_seconds.snapshot(),
+        }
+
+
+def _shared_executor() -> "InferenceExecutor":
+    # Import diferido: inference_executor importa este módulo
+    from app.services.inference_executor import get_inference_executor
+
+    return get_inference_executor()
+
+
+_micro_batcher: Optional[MicroBatcher] = None
+_micro_batcher_lock = threading.Lock()
+
+
+def get_micro_batcher() -> MicroBatcher:
+    """Micro-batcher compartido, configurado con MICRO_BATCH_MAX_SIZE / MICRO_BATCH_MAX_WAIT_MS."""
+    global _micro_batcher
+    if _micro_batcher is None:
+        with _micro_batcher_lock:
+            if _micro_batcher is None:
+                _micro_batcher = MicroBatcher(
+                    max_batch_size=settings.MICRO_BATCH_MAX_SIZE,
+                    max_wait_ms=settings.MICRO_BATCH_MAX_WAIT_MS,
+                    max_pending=settings.MICRO_BATCH_MAX_PENDING,
+                )
+    return _micro_batcher
+
+
+def stop_micro_batcher() -> None:
+    global _micro_batcher
+    with _micro_batcher_lock:
+        if _micro_batcher is not None:
+            _micro_batcher.stop()
+            _micro_batcher = None
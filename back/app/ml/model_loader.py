@@ -1,17 +1,32 @@
+import hashlib
+import json
 import logging
-from functools import lru_cache
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
 import joblib
+import numpy as np
+
+from app.core.config import settings
+from .artifact_store import (
+    MANIFEST_NAME,
+    ArtifactIntegrityError,
+    get_exported_bundle_dir,
+    load_diabetes_bundle,
+    sha256_file,
+)
 
 logger = logging.getLogger(__name__)
 
 _MODEL_TYPES = {"diabetes", "cardiovascular"}
+MODEL_TYPES = tuple(sorted(_MODEL_TYPES))
 
 
 def get_models_dir() -> Path:
-    """Get the path to the models directory."""
+    """Get the path to the models directory (ML_MODELS_DIR overrides app/ml/models)."""
+    if settings.ML_MODELS_DIR:
+        return Path(settings.ML_MODELS_DIR)
     return Path(__file__).parent / "models"
 
 
@@ -22,10 +37,13 @@ def _normalize_model_type(model_type: str) -> str:
     return model_type_normalized
 
 
-@lru_cache(maxsize=len(_MODEL_TYPES))
 def load_model_bundle(model_type: str = "diabetes") -> Tuple[Any, Optional[Any], List[str]]:
     """
-    Load the model bundle (model, optional imputer, feature_names) for the requested type.
+    Get the model bundle (model, optional imputer, feature_names) for the requested type.
+
+    The bundle comes from the active version in the model registry (loaded on first use).
+    Code that needs the bundle, serving spec and version to agree across a hot swap
+    should use `get_active_model` once instead of calling these helpers separately.
 
     Args:
         model_type: Either "diabetes" or "cardiovascular".
@@ -33,58 +51,43 @@ def load_model_bundle(model_type: str = "diabetes") -> Tuple[Any, Optional[Any],
     Returns:
         Tuple of (model, imputer_or_none, feature_names).
     """
+    return get_active_model(model_type).bundle
+
+
+def get_active_model(model_type: str = "diabetes"):
+    """Snapshot (bundle, serving spec, version) of the version currently served."""
+    from .model_registry import get_registry
+
+    return get_registry().get(_normalize_model_type(model_type))
+
+
+def load_bundle_from_dir(model_type: str, models_dir: Path) -> Tuple[Any, Optional[Any], List[str]]:
+    """
+    Load (model, imputer_or_none, feature_names) for `model_type` from one artifacts
+    directory, preferring the exported diabetes bundle over the pickles.
+    """
 
     normalized_type = _normalize_model_type(model_type)
-    models_dir = get_models_dir()
+    models_dir = Path(models_dir)
 
     try:
         if normalized_type == "diabetes":
-            model_path = models_dir / "old_model_xgb_calibrated.pkl"
-            imputer_path = models_dir / "imputer.pkl"
-            feature_names_path = models_dir / "feature_names.pkl"
-
-            logger.info("Loading diabetes model artifacts (old version)...")
-
-            loaded_model = joblib.load(model_path)
-
-            if isinstance(loaded_model, dict):
-                model = loaded_model["model"]
-                if "imputer" in loaded_model and "feature_names" in loaded_model:
-                    imputer = loaded_model["imputer"]
-                    feature_names = loaded_model["feature_names"]
-                    logger.info("Loaded diabetes bundle with %s features", len(feature_names))
-                else:
-                    imputer = joblib.load(imputer_path)
-                    feature_names = joblib.load(feature_names_path)
-                    logger.info("Loaded diabetes model + separate imputer/feature names")
-            else:
-                model = loaded_model
-                imputer = joblib.load(imputer_path)
-                feature_names = joblib.load(feature_names_path)
-                logger.info("Diabetes model loaded successfully with %s features", len(feature_names))
-
-            return model, imputer, feature_names
+            bundle_dir = get_exported_bundle_dir(models_dir, normalized_type)
+            if bundle_dir is not None:
+                try:
+                    model, imputer, feature_names = load_diabetes_bundle(bundle_dir)
+                    logger.info("Loaded exported diabetes bundle from %s (%s features)", bundle_dir, len(feature_names))
+                    return model, imputer, feature_names
+                except Exception as exc:
+                    logger.error("Exported diabetes bundle unusable (%s); falling back to pickles", exc)
+
+            return load_pickled_diabetes_bundle(models_dir)
 
         # Cardiovascular model: pipeline already embeds preprocessing and imputation
         cardio_model_path = models_dir / "old_model_cardiovascular.pkl"
         logger.info("Loading cardiovascular model artifact (old version)...")
         cardio_model = joblib.load(cardio_model_path)
-
-        feature_names: List[str] = []
-        try:
-            pipeline = getattr(cardio_model, "estimator", None) or getattr(cardio_model, "base_estimator", None)
-            if pipeline is not None and hasattr(pipeline, "named_steps"):
-                preprocessor = pipeline.named_steps.get("pre")
-                if preprocessor is not None:
-                    try:
-                        feature_names_out = preprocessor.get_feature_names_out()
-                        feature_names = [str(name).split("__", 1)[-1] for name in feature_names_out]
-                    except Exception:
-                        transformers = getattr(preprocessor, "transformers_", [])
-                        if transformers:
-                            feature_names = list(transformers[0][2])
-        except Exception as exc:
-            logger.warning("Could not infer cardiovascular feature names automatically: %s", exc)
+        feature_names = infer_cardiovascular_feature_names(cardio_model)
 
         logger.info("Cardiovascular model loaded with %s derived features", len(feature_names))
         return cardio_model, None, feature_names
@@ -97,6 +100,160 @@ def load_model_bundle(model_type: str = "diabetes") -> Tuple[Any, Optional[Any],
         raise
 
 
+def infer_cardiovascular_feature_names(cardio_model) -> List[str]:
+    """Input columns of a cardiovascular pipeline, from its 'pre' ColumnTransformer."""
+    feature_names: List[str] = []
+    try:
+        pipeline = getattr(cardio_model, "estimator", None) or getattr(cardio_model, "base_estimator", None)
+        if pipeline is not None and hasattr(pipeline, "named_steps"):
+            preprocessor = pipeline.named_steps.get("pre")
+            if preprocessor is not None:
+                try:
+                    feature_names_out = preprocessor.get_feature_names_out()
+                    feature_names = [str(name).split("__", 1)[-1] for name in feature_names_out]
+                except Exception:
+                    transformers = getattr(preprocessor, "transformers_", [])
+                    if transformers:
+                        feature_names = list(transformers[0][2])
+    except Exception as exc:
+        logger.warning("Could not infer cardiovascular feature names automatically: %s", exc)
+    return feature_names
+
+
+def load_pickled_diabetes_bundle(models_dir: Path) -> Tuple[Any, Any, List[str]]:
+    """Load the legacy joblib artifacts (model, imputer, feature_names) for diabetes."""
+    model_path = models_dir / "old_model_xgb_calibrated.pkl"
+    imputer_path = models_dir / "imputer.pkl"
+    feature_names_path = models_dir / "feature_names.pkl"
+
+    logger.info("Loading diabetes model artifacts (old version)...")
+
+    loaded_model = joblib.load(model_path)
+
+    if isinstance(loaded_model, dict):
+        model = loaded_model["model"]
+        if "imputer" in loaded_model and "feature_names" in loaded_model:
+            imputer = loaded_model["imputer"]
+            feature_names = loaded_model["feature_names"]
+            logger.info("Loaded diabetes bundle with %s features", len(feature_names))
+        else:
+            imputer = joblib.load(imputer_path)
+            feature_names = joblib.load(feature_names_path)
+            logger.info("Loaded diabetes model + separate imputer/feature names")
+    else:
+        model = loaded_model
+        imputer = joblib.load(imputer_path)
+        feature_names = joblib.load(feature_names_path)
+        logger.info("Diabetes model loaded successfully with %s features", len(feature_names))
+
+    return model, imputer, feature_names
+
+
+@dataclass(frozen=True)
+class ServingSpec:
+    """
+    Per-model constants precomputed once at load time for the single-request path.
+
+    Attributes:
+        feature_names: Model column order (before imputation).
+        fill_values: Imputer statistics aligned with `feature_names` (NaN for dropped columns),
+            or None when the imputer does not expose `statistics_`.
+        valid_mask: Columns kept by the imputer.
+        valid_indices: Positions of the kept columns, for `np.take`.
+        valid_feature_names: Column names after imputation.
+    """
+
+    feature_names: Tuple[str, ...]
+    fill_values: Optional[np.ndarray]
+    valid_mask: np.ndarray
+    valid_indices: np.ndarray
+    valid_feature_names: Tuple[str, ...]
+
+    @property
+    def n_features(self) -> int:
+        return len(self.feature_names)
+
+
+def get_serving_spec(model_type: str = "diabetes") -> ServingSpec:
+    """Serving spec of the active version of `model_type`."""
+    return get_active_model(model_type).spec
+
+
+def build_serving_spec(imputer, feature_names: List[str]) -> ServingSpec:
+    """Precompute feature order, imputation fill vector and valid-column mask for a model."""
+    feature_names = tuple(feature_names)
+
+    statistics = getattr(imputer, "statistics_", None)
+    if statistics is not None and len(statistics) == len(feature_names):
+        fill_values = np.asarray(statistics, dtype=np.float64).copy()
+        valid_mask = ~np.isnan(fill_values)
+    else:
+        fill_values = None
+        valid_mask = np.ones(len(feature_names), dtype=bool)
+
+    valid_indices = np.flatnonzero(valid_mask)
+    for array in (fill_values, valid_mask, valid_indices):
+        if array is not None:
+            array.setflags(write=False)
+
+    return ServingSpec(
+        feature_names=feature_names,
+        fill_values=fill_values,
+        valid_mask=valid_mask,
+        valid_indices=valid_indices,
+        valid_feature_names=tuple(name for name, valid in zip(feature_names, valid_mask) if valid),
+    )
+
+
+# Escrito por ModelRegistry.register_version con el sha256 de cada archivo de la versión
+VERSION_FILE = "VERSION.json"
+
+# Artefactos que definen cada modelo; cualquier cambio en ellos cambia la versión
+_MODEL_ARTIFACTS = {
+    "diabetes": ("old_model_xgb_calibrated.pkl", "imputer.pkl", "feature_names.pkl"),
+    "cardiovascular": ("old_model_cardiovascular.pkl",),
+}
+
+
+def get_model_version(model_type: str = "diabetes") -> str:
+    """Version id of the model currently served for `model_type`."""
+    return get_active_model(model_type).version
+
+
+def artifacts_fingerprint(model_type: str, models_dir: Path) -> str:
+    """
+    Short fingerprint of the contents of the artifacts in `models_dir` for `model_type`:
+    the exported bundle's manifest, or the sha256 of each file as it is on disk. A
+    VERSION.json in the directory is only used to check those hashes; a file that no
+    longer matches it raises ArtifactIntegrityError instead of keeping a stale version.
+    """
+    normalized_type = _normalize_model_type(model_type)
+    models_dir = Path(models_dir)
+
+    digest = hashlib.sha1(normalized_type.encode())
+    bundle_dir = get_exported_bundle_dir(models_dir, normalized_type)
+    if bundle_dir is not None:
+        # El manifest ya lleva el sha256 de cada artefacto exportado
+        digest.update((bundle_dir / MANIFEST_NAME).read_bytes())
+        return digest.hexdigest()[:12]
+
+    recorded: Dict[str, str] = {}
+    try:
+        recorded = json.loads((models_dir / VERSION_FILE).read_text()).get("files", {})
+    except (OSError, ValueError):
+        pass
+    for name in _MODEL_ARTIFACTS[normalized_type]:
+        path = models_dir / name
+        try:
+            sha256 = sha256_file(path)
+        except FileNotFoundError:
+            sha256 = "missing"
+        if name in recorded and recorded[name] != sha256:
+            raise ArtifactIntegrityError(f"{path} does not match {models_dir / VERSION_FILE}")
+        digest.update(f"{name}:{sha256}".encode())
+    return digest.hexdigest()[:12]
+
+
 def get_model(model_type: str = "diabetes"):
     """Get the loaded model (loads if necessary)."""
     model, _, _ = load_model_bundle(model_type)
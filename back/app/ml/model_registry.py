@@ -0,0 +1,388 @@
+"""
+Versioned model registry.
+
+Layout (under MODEL_REGISTRY_DIR, default `<models_dir>/registry`):
+
+    registry.json                    {"active": {type: version}, "history": {type: [versions]}}
+    <model_type>/<version>/          artifacts in the same layout as models/ (pickles and/or
+                                     an exported bundle) + VERSION.json with their sha256
+
+Serving reads an immutable `ActiveModel` snapshot per request. Activating a version
+loads and smoke-tests it off the serving path, then swaps the snapshot in a single
+dict assignment, so in-flight requests finish on the version they started with.
+Without a registry.json the models in models/ are served as version `legacy-<fingerprint>`.
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from . import model_loader
+from .artifact_store import sha256_file
+from .model_loader import VERSION_FILE, ServingSpec
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_FILE = "registry.json"
+LEGACY_PREFIX = "legacy-"
+HISTORY_LIMIT = 20
+
+# Perfil mínimo para el smoke test de una versión antes de activarla
+_SMOKE_PROFILE = {
+    "age": 50, "sex": "M", "height_cm": 172.0, "weight_kg": 80.0, "waist_cm": 95.0,
+    "sleep_hours": 7.0, "smokes_cig_day": 0, "days_mvpa_week": 3, "bmi": 27.0,
+    "systolic_bp": 125.0, "total_cholesterol": 200.0, "glucosa_mgdl": 100.0,
+    "hdl_mgdl": 50.0, "trigliceridos_mgdl": 150.0, "ldl_mgdl": 120.0,
+}
+
+
+class ModelVersionError(ValueError):
+    """Unknown version, corrupted artifacts or a version that fails its smoke test."""
+
+
+@dataclass(frozen=True)
+class ActiveModel:
+    """Everything needed to serve one model version; never mutated after activation."""
+
+    model_type: str
+    version: str
+    model: Any
+    imputer: Optional[Any]
+    feature_names: Tuple[str, ...]
+    spec: ServingSpec
+    source_dir: Path
+    loaded_at: float
+    scorer: Optional[Any] = None  # Compiled closed-form scorer, when the model supports it
+
+    @property
+    def bundle(self) -> Tuple[Any, Optional[Any], List[str]]:
+        return self.model, self.imputer, list(self.feature_names)
+
+
+def make_active_model(
+    model_type: str, version: str, model, imputer, feature_names: List[str], source_dir: Path
+) -> ActiveModel:
+    """Snapshot with the serving spec and, if enabled and supported, a compiled scorer."""
+    scorer = None
+    if settings.COMPILED_SCORERS:
+        from .compiled_scorers import compile_cardiovascular_scorer, compile_diabetes_scorer
+
+        if model_type == "cardiovascular":
+            scorer = compile_cardiovascular_scorer(model, feature_names)
+        else:
+            scorer = compile_diabetes_scorer(model)
+    return ActiveModel(
+        model_type=model_type,
+        version=version,
+        model=model,
+        imputer=imputer,
+        feature_names=tuple(feature_names),
+        spec=model_loader.build_serving_spec(imputer, feature_names),
+        source_dir=Path(source_dir),
+        loaded_at=time.time(),
+        scorer=scorer,
+    )
+
+
+def _hash_tree(directory: Path) -> Dict[str, str]:
+    return {
+        path.relative_to(directory).as_posix(): sha256_file(path)
+        for path in sorted(directory.rglob("*"))
+        if path.is_file() and path.name != VERSION_FILE
+    }
+
+
+def _write_json_atomic(path: Path, payload: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(payload, f, indent=2, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def _smoke_test(active: ActiveModel) -> None:
+    """Score a reference profile with the candidate; raises if the output is unusable."""
+    from .predictor import score_profiles
+
+    scores = score_profiles(active, [_SMOKE_PROFILE])
+    if scores.shape != (1,) or not np.all(np.isfinite(scores)) or not 0.0 <= scores[0] <= 1.0:
+        raise ModelVersionError(f"Smoke test failed for {active.model_type}@{active.version}: {scores!r}")
+
+
+class ModelRegistry:
+    """Active model per type, with background preload, atomic swap and rollback."""
+
+    def __init__(self, root: Optional[Path] = None):
+        self._root = Path(root) if root is not None else None
+        self._active: Dict[str, ActiveModel] = {}
+        self._lock = threading.RLock()
+        self._listeners: List[Callable[[ActiveModel], None]] = []
+        self._activations: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def root(self) -> Path:
+        if self._root is not None:
+            return self._root
+        if settings.MODEL_REGISTRY_DIR:
+            return Path(settings.MODEL_REGISTRY_DIR)
+        return model_loader.get_models_dir() / "registry"
+
+    # -- state file ---------------------------------------------------------
+
+    def _read_state(self) -> Dict[str, Any]:
+        try:
+            state = json.loads((self.root / REGISTRY_FILE).read_text())
+        except FileNotFoundError:
+            state = {}
+        except ValueError as e:
+            raise ModelVersionError(f"Invalid {REGISTRY_FILE} in {self.root}: {e}") from e
+        state.setdefault("active", {})
+        state.setdefault("history", {})
+        return state
+
+    def _version_dir(self, model_type: str, version: str) -> Path:
+        if not version or "/" in version or version.startswith("."):
+            raise ModelVersionError(f"Invalid version id: {version!r}")
+        return self.root / model_type / version
+
+    # -- loading ------------------------------------------------------------
+
+    def _build(self, model_type: str, version: str, directory: Path) -> ActiveModel:
+        model, imputer, feature_names = model_loader.load_bundle_from_dir(model_type, directory)
+        return make_active_model(model_type, version, model, imputer, feature_names, directory)
+
+    def load_version(self, model_type: str, version: str) -> ActiveModel:
+        """Verify and load one registered version without activating it."""
+        if version.startswith(LEGACY_PREFIX):
+            directory = model_loader.get_models_dir()
+            current = LEGACY_PREFIX + model_loader.artifacts_fingerprint(model_type, directory)
+            if current != version:
+                raise ModelVersionError(f"Legacy artifacts changed on disk ({version} -> {current})")
+            return self._build(model_type, version, directory)
+
+        directory = self._version_dir(model_type, version)
+        try:
+            meta = json.loads((directory / VERSION_FILE).read_text())
+        except (OSError, ValueError) as e:
+            raise ModelVersionError(f"Unknown or invalid version {model_type}@{version}: {e}") from e
+        if _hash_tree(directory) != meta.get("files"):
+            raise ModelVersionError(f"Checksum mismatch in {directory}")
+        return self._build(model_type, version, directory)
+
+    def get(self, model_type: str) -> ActiveModel:
+        """Snapshot of the active version (lock-free once loaded)."""
+        active = self._active.get(model_type)
+        if active is not None:
+            return active
+
+        with self._lock:
+            active = self._active.get(model_type)
+            if active is None:
+                version = self._read_state()["active"].get(model_type)
+                if version:
+                    active = self.load_version(model_type, version)
+                else:
+                    directory = model_loader.get_models_dir()
+                    fingerprint = model_loader.artifacts_fingerprint(model_type, directory)
+                    active = self._build(model_type, LEGACY_PREFIX + fingerprint, directory)
+                self._active = {**self._active, model_type: active}
+                logger.info("Serving %s model version %s", model_type, active.version)
+        return active
+
+    # -- activation ---------------------------------------------------------
+
+    def activate(self, model_type: str, version: str) -> ActiveModel:
+        """
+        Load, verify and smoke-test `version`, then make it the served version.
+        Requests already running keep their snapshot of the previous version.
+        """
+        model_type = model_loader._normalize_model_type(model_type)
+        with self._lock:
+            candidate = self.load_version(model_type, version)
+            _smoke_test(candidate)
+
+            previous = self._active.get(model_type)
+            self._active = {**self._active, model_type: candidate}
+
+            state = self._read_state()
+            previous_version = previous.version if previous is not None else state["active"].get(model_type)
+            if not version.startswith(LEGACY_PREFIX):
+                state["active"][model_type] = version
+            else:
+                state["active"].pop(model_type, None)
+            history = state["history"].setdefault(model_type, [])
+            if previous_version and previous_version != version and (not history or history[-1] != previous_version):
+                history.append(previous_version)
+            del history[:-HISTORY_LIMIT]
+            _write_json_atomic(self.root / REGISTRY_FILE, state)
+            listeners = list(self._listeners)
+
+        logger.info(
+            "Activated %s model version %s (previous: %s)",
+            model_type, version, previous_version,
+        )
+        for listener in listeners:
+            try:
+                listener(candidate)
+            except Exception as e:
+                logger.warning("Model swap listener failed: %s", e)
+        return candidate
+
+    def activate_in_background(self, model_type: str, version: str) -> Future:
+        """Run `activate` on a daemon thread; progress is visible in `status()`."""
+        model_type = model_loader._normalize_model_type(model_type)
+        future: Future = Future()
+        record = {"version": version, "state": "loading", "started_at": time.time(), "error": None}
+        self._activations[model_type] = record
+
+        def _run() -> None:
+            try:
+                future.set_result(self.activate(model_type, version))
+                record["state"] = "active"
+            except Exception as e:
+                logger.error("Activation of %s@%s failed: %s", model_type, version, e)
+                record.update(state="failed", error=str(e))
+                future.set_exception(e)
+            record["finished_at"] = time.time()
+
+        threading.Thread(target=_run, name=f"model-activate-{model_type}", daemon=True).start()
+        return future
+
+    def rollback(self, model_type: str) -> ActiveModel:
+        """Re-activate the version served before the current one."""
+        model_type = model_loader._normalize_model_type(model_type)
+        with self._lock:
+            current = self.get(model_type).version
+            history = self._read_state()["history"].get(model_type, [])
+            previous = next((v for v in reversed(history) if v != current), None)
+            if previous is None:
+                raise ModelVersionError(f"No previous version to roll back to for {model_type}")
+            active = self.activate(model_type, previous)
+            # La versión desde la que volvimos no debe quedar como destino del siguiente rollback
+            state = self._read_state()
+            entries = state["history"].get(model_type, [])
+            while entries and entries[-1] in (current, previous):
+                entries.pop()
+            _write_json_atomic(self.root / REGISTRY_FILE, state)
+        return active
+
+    # -- registration and introspection -------------------------------------
+
+    def register_version(self, model_type: str, source_dir: Path, version: Optional[str] = None) -> str:
+        """Copy the artifacts in `source_dir` into the registry as a new version."""
+        model_type = model_loader._normalize_model_type(model_type)
+        source_dir = Path(source_dir)
+        version = version or time.strftime("%Y%m%d-%H%M%S") + "-" + model_loader.artifacts_fingerprint(model_type, source_dir)
+        dest = self._version_dir(model_type, version)
+        if dest.exists():
+            raise ModelVersionError(f"Version {model_type}@{version} already exists")
+
+        staging = dest.parent / f".{version}.staging"
+        if staging.exists():
+            shutil.rmtree(staging)
+        shutil.copytree(source_dir, staging, ignore=shutil.ignore_patterns("registry", ".*"))
+        _write_json_atomic(staging / VERSION_FILE, {
+            "model_type": model_type,
+            "version": version,
+            "created_at": time.time(),
+            "files": _hash_tree(staging),
+        })
+        os.replace(staging, dest)
+        logger.info("Registered %s model version %s", model_type, version)
+        return version
+
+    def list_versions(self, model_type: str) -> List[str]:
+        directory = self.root / model_loader._normalize_model_type(model_type)
+        if not directory.is_dir():
+            return []
+        return sorted(p.name for p in directory.iterdir() if (p / VERSION_FILE).is_file())
+
+    def status(self) -> Dict[str, Any]:
+        state = self._read_state()
+        models = {}
+        for model_type in model_loader.MODEL_TYPES:
+            active = self._active.get(model_type)
+            models[model_type] = {
+                "active_version": active.version if active else state["active"].get(model_type),
+                "loaded": active is not None,
+                "loaded_at": active.loaded_at if active else None,
+                "versions": self.list_versions(model_type),
+                "history": state["history"].get(model_type, []),
+                "activation": self._activations.get(model_type),
+            }
+        return {"registry_dir": str(self.root), "models": models}
+
+    def subscribe(self, listener: Callable[[ActiveModel], None]) -> None:
+        """Call `listener(active_model)` after every successful swap."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def reset(self) -> None:
+        """Forget loaded versions (the next `get` reloads from disk)."""
+        with self._lock:
+            self._active = {}
+            self._activations.clear()
+
+    def _reset_lock_after_fork(self) -> None:
+        self._lock = threading.RLock()
+
+
+_registry = ModelRegistry()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=lambda: _registry._reset_lock_after_fork())
+
+
+def get_registry() -> ModelRegistry:
+    return _registry
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Manage versioned model artifacts")
+    sub = parser.add_subparsers(dest="command", required=True)
+    register = sub.add_parser("register", help="Copy a models directory in as a new version")
+    register.add_argument("model_type")
+    register.add_argument("source_dir", type=Path)
+    register.add_argument("--version", default=None)
+    register.add_argument("--activate", action="store_true")
+    activate = sub.add_parser("activate", help="Mark a registered version as active")
+    activate.add_argument("model_type")
+    activate.add_argument("version")
+    sub.add_parser("status", help="Show active versions and history")
+    args = parser.parse_args(argv)
+
+    registry = get_registry()
+    if args.command == "register":
+        version = registry.register_version(args.model_type, args.source_dir, args.version)
+        print(version)
+        if args.activate:
+            registry.activate(args.model_type, version)
+    elif args.command == "activate":
+        registry.activate(args.model_type, args.version)
+    else:
+        print(json.dumps(registry.status(), indent=2, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    raise SystemExit(main())
@@ -0,0 +1,170 @@
+"""
+Percentil poblacional del score: "tu riesgo es mayor que el del 71% de los adultos de
+tu edad y sexo en NHANES".
+
+Offline, `build_reference` scores the NHANES reference file with the served model
+(`population_scoring.score_chunk`, so rows are scored exactly like a request) and
+stores one sorted float32 score array per (sex, age band) in
+`<POPULATION_REFERENCE_DIR>/<model_type>-<version>.npz`. At request time
+`lookup_percentile` finds the user's position with a binary search on the array of
+their group. Arrays are kept in memory per model type and reloaded when the model
+version of the score differs from the loaded one, so activating a registry version
+switches to its reference without a restart (the job must have been run for it).
+
+    python -m app.ml.population_percentiles data/nhanes_processed.csv --model diabetes
+"""
+
+import argparse
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from .model_loader import MODEL_TYPES, get_active_model, get_models_dir
+from .population_scoring import DEFAULT_CHUNK_SIZE, iter_chunks, nhanes_to_inputs, score_chunk
+
+logger = logging.getLogger(__name__)
+
+# Límite inferior de cada banda de edad; la última es abierta (70+)
+AGE_BAND_STARTS = (18, 30, 40, 50, 60, 70)
+SEXES = ("M", "F")
+# Grupos con menos personas de referencia no dan percentil (demasiado ruidoso)
+MIN_GROUP_SIZE = 30
+
+
+def get_reference_dir() -> Path:
+    if settings.POPULATION_REFERENCE_DIR:
+        return Path(settings.POPULATION_REFERENCE_DIR)
+    return get_models_dir() / "population"
+
+
+def reference_path(model_type: str, version: str, reference_dir: Optional[Path] = None) -> Path:
+    return (reference_dir or get_reference_dir()) / f"{model_type}-{version}.npz"
+
+
+def age_band(age: float) -> Optional[str]:
+    """Label of the age band of `age` ("40-49", "70+"), None below the first band."""
+    if age is None or np.isnan(age) or age < AGE_BAND_STARTS[0]:
+        return None
+    index = int(np.searchsorted(AGE_BAND_STARTS, age, side="right")) - 1
+    if index == len(AGE_BAND_STARTS) - 1:
+        return f"{AGE_BAND_STARTS[index]}+"
+    return f"{AGE_BAND_STARTS[index]}-{AGE_BAND_STARTS[index + 1] - 1}"
+
+
+def _group_key(sex: Optional[str], age: float) -> Optional[str]:
+    band = age_band(age)
+    sex_code = str(sex).strip().upper()[:1] if sex is not None else ""
+    if band is None or sex_code not in SEXES:
+        return None
+    return f"{sex_code}_{band}"
+
+
+def build_reference(
+    input_path: Path,
+    model_type: str = "diabetes",
+    reference_dir: Optional[Path] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Dict[str, Any]:
+    """Score the reference population with the active model and save the sorted arrays per group."""
+    active = get_active_model(model_type)
+    groups: Dict[str, List[np.ndarray]] = {}
+
+    for chunk in iter_chunks(input_path, chunk_size):
+        inputs = nhanes_to_inputs(chunk)
+        scores = score_chunk(model_type, inputs, top_drivers=0)["score"].to_numpy(dtype=np.float64)
+        keys = np.array([_group_key(sex, age) for sex, age in zip(inputs["sex"], inputs["age"].astype(float))], dtype=object)
+        for key in set(keys[~np.isnan(scores)]) - {None}:
+            rows = (keys == key) & ~np.isnan(scores)
+            groups.setdefault(key, []).append(scores[rows].astype(np.float32))
+
+    arrays = {key: np.sort(np.concatenate(parts)) for key, parts in groups.items()}
+    path = reference_path(model_type, active.version, reference_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(path, **arrays)
+
+    sizes = {key: int(array.size) for key, array in sorted(arrays.items())}
+    logger.info("Population reference for %s@%s written to %s (%s)", model_type, active.version, path, sizes)
+    return {"model_type": model_type, "model_version": active.version, "path": str(path), "groups": sizes}
+
+
+class PercentileTable:
+    """Sorted reference scores per group for the model versions being served."""
+
+    def __init__(self, reference_dir: Optional[Path] = None):
+        self.reference_dir = reference_dir
+        self._lock = threading.Lock()
+        # model_type -> (versión cargada, arrays por grupo o None si no hay referencia)
+        self._loaded: Dict[str, Tuple[str, Optional[Dict[str, np.ndarray]]]] = {}
+
+    def _arrays(self, model_type: str, version: str) -> Optional[Dict[str, np.ndarray]]:
+        loaded = self._loaded.get(model_type)
+        if loaded is not None and loaded[0] == version:
+            return loaded[1]
+        with self._lock:
+            loaded = self._loaded.get(model_type)
+            if loaded is not None and loaded[0] == version:
+                return loaded[1]
+            path = reference_path(model_type, version, self.reference_dir)
+            arrays = None
+            if path.exists():
+                with np.load(path) as data:
+                    arrays = {key: data[key] for key in data.files}
+                logger.info("Population reference loaded for %s@%s (%s groups)", model_type, version, len(arrays))
+            else:
+                logger.warning("No population reference for %s@%s (%s); percentiles disabled", model_type, version, path)
+            self._loaded[model_type] = (version, arrays)
+            return arrays
+
+    def lookup(self, model_type: str, version: str, age: float, sex: Optional[str], score: float) -> Optional[Dict[str, Any]]:
+        """
+        Share of the reference group (same sex and age band) with a lower score, or None
+        when there is no reference for this model version or the group is too small.
+        """
+        key = _group_key(sex, float(age) if age is not None else np.nan)
+        arrays = self._arrays(model_type, version)
+        if key is None or arrays is None or key not in arrays:
+            return None
+        reference = arrays[key]
+        if reference.size < MIN_GROUP_SIZE:
+            return None
+        below = int(np.searchsorted(reference, np.float32(score), side="left"))
+        sex_code, band = key.split("_", 1)
+        return {
+            "percentile": 100.0 * below / reference.size,
+            "sex": sex_code,
+            "age_band": band,
+            "reference_size": int(reference.size),
+        }
+
+
+_table = PercentileTable()
+
+
+def lookup_percentile(model_type: str, version: str, age: float, sex: Optional[str], score: float) -> Optional[Dict[str, Any]]:
+    """Percentile of `score` in the NHANES reference of the model version that produced it."""
+    return _table.lookup((model_type or "diabetes").lower(), version, age, sex, score)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    parser = argparse.ArgumentParser(description="Build the population percentile reference for the served model")
+    parser.add_argument("input", type=Path, help="CSV/Parquet from ml/prepare_dataset.py (or predict_risk columns)")
+    parser.add_argument("--model", choices=MODEL_TYPES, default="diabetes")
+    parser.add_argument("--output-dir", type=Path, default=None, help="Default: POPULATION_REFERENCE_DIR")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    logging.getLogger("app.ml.predictor").setLevel(logging.WARNING)
+    summary = build_reference(args.input, args.model, args.output_dir, args.chunk_size)
+    print(f"{summary['model_type']}@{summary['model_version']} -> {summary['path']}")
+    for key, size in summary["groups"].items():
+        print(f"  {key}: {size:,}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
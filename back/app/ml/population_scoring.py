@@ -0,0 +1,304 @@
+"""
+Scoring poblacional: puntúa ciclos NHANES completos con el modelo que se está sirviendo
+para revisar distribuciones de score.
+
+Reads the consolidated CSV written by `ml/prepare_dataset.py` (raw NHANES columns, labs
+prefixed with LAB_) or any CSV/Parquet that already uses the `predict_risk` input names.
+The file is streamed in chunks; each chunk goes through `predict_risk_batch` on a
+forked process pool that inherits the preloaded model snapshot, and results are
+appended to the output in input order. At most 2 chunks per worker are in flight, so
+memory stays bounded whatever the file size.
+
+    python -m app.ml.population_scoring data/nhanes_processed.csv scores.parquet --model diabetes
+    python -m app.ml.population_scoring cycle.parquet scores.csv --model cardiovascular --workers 4
+
+Parquet input/output needs pyarrow; CSV works with pandas alone.
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .model_loader import MODEL_TYPES, get_active_model
+from .predictor import predict_risk, predict_risk_batch
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_TOP_DRIVERS = 3
+
+# Entradas de predict_risk -> columnas NHANES candidatas (la primera presente gana)
+NHANES_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "age": ("RIDAGEYR",),
+    "sex": ("RIAGENDR",),
+    "height_cm": ("BMXHT",),
+    "weight_kg": ("BMXWT",),
+    "bmi": ("BMXBMI",),
+    "waist_cm": ("BMXWAIST",),
+    "sleep_hours": ("SLD012", "SLD010H"),
+    "total_cholesterol": ("LAB_LBXTC", "LBXTC"),
+    "glucosa_mgdl": ("LAB_LBXGLU", "LBXGLU"),
+    "hdl_mgdl": ("LAB_LBDHDD", "LBDHDD"),
+    "ldl_mgdl": ("LAB_LBDLDL", "LBDLDL"),
+    "trigliceridos_mgdl": ("LAB_LBXTR", "LBXTR"),
+}
+SYSTOLIC_COLUMNS = ("BPXSY1", "BPXSY2", "BPXSY3", "BPXOSY1", "BPXOSY2", "BPXOSY3")
+INPUT_COLUMNS = (
+    "age", "sex", "height_cm", "weight_kg", "bmi", "waist_cm", "sleep_hours", "smokes_cig_day",
+    "days_mvpa_week", "systolic_bp", "total_cholesterol", "glucosa_mgdl", "hdl_mgdl", "ldl_mgdl",
+    "trigliceridos_mgdl",
+)
+
+
+def _first_column(frame: pd.DataFrame, candidates) -> pd.Series:
+    for column in candidates:
+        if column in frame.columns:
+            return pd.to_numeric(frame[column], errors="coerce")
+    return pd.Series(np.nan, index=frame.index)
+
+
+def nhanes_to_inputs(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Columns of `predict_risk` from a chunk of raw NHANES columns. Frames that already use
+    the serving names (an "age" column) pass through unchanged.
+    """
+    if "age" in frame.columns:
+        return frame.reindex(columns=INPUT_COLUMNS)
+
+    inputs = pd.DataFrame({name: _first_column(frame, sources) for name, sources in NHANES_COLUMNS.items()})
+    # RIAGENDR: 1 = hombre, 2 = mujer
+    inputs["sex"] = inputs["sex"].map({1.0: "M", 2.0: "F"})
+
+    systolic = [pd.to_numeric(frame[c], errors="coerce") for c in SYSTOLIC_COLUMNS if c in frame.columns]
+    inputs["systolic_bp"] = pd.concat(systolic, axis=1).mean(axis=1) if systolic else np.nan
+
+    # SMQ020 = 2 (nunca fumó 100 cigarrillos) o SMQ040 = 3 (no fuma ahora) -> 0 cigarrillos/día
+    cigarettes = _first_column(frame, ("SMD650",))
+    never = _first_column(frame, ("SMQ020",)).eq(2) | _first_column(frame, ("SMQ040",)).eq(3)
+    inputs["smokes_cig_day"] = cigarettes.where(~never, 0.0)
+
+    # Días de actividad recreativa vigorosa o moderada; "no" en ambas preguntas -> 0
+    days = pd.concat([_first_column(frame, ("PAQ655",)), _first_column(frame, ("PAQ670",))], axis=1).max(axis=1)
+    inactive = _first_column(frame, ("PAQ650",)).eq(2) & _first_column(frame, ("PAQ665",)).eq(2)
+    inputs["days_mvpa_week"] = days.where(~inactive, 0.0).clip(upper=7)
+
+    return inputs.reindex(columns=INPUT_COLUMNS)
+
+
+def iter_chunks(path: Path, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Chunks of a CSV or Parquet file, never the whole file in memory."""
+    if path.suffix.lower() in (".parquet", ".pq"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+        return
+    yield from pd.read_csv(path, chunksize=chunk_size, low_memory=False)
+
+
+def _profiles(inputs: pd.DataFrame) -> List[Dict[str, Any]]:
+    records = inputs.astype(object).where(inputs.notna(), None).to_dict("records")
+    return records
+
+
+def score_chunk(model_type: str, inputs: pd.DataFrame, top_drivers: int = DEFAULT_TOP_DRIVERS) -> pd.DataFrame:
+    """
+    Score one chunk of `predict_risk` inputs with the active model. Rows without age or
+    sex, or rows that fail on their own, get a NaN score instead of failing the chunk.
+    """
+    valid = inputs["age"].notna() & inputs["sex"].notna()
+    profiles = _profiles(inputs[valid])
+
+    try:
+        results = predict_risk_batch(profiles, model_type=model_type)
+    except Exception as exc:
+        logger.warning("Chunk scoring failed (%s); scoring row by row", exc)
+        results = []
+        for profile in profiles:
+            try:
+                results.append(predict_risk(**profile, model_type=model_type))
+            except Exception:
+                results.append(None)
+
+    columns: Dict[str, List[Any]] = {
+        "score": [np.nan] * len(inputs),
+        "risk_level": [None] * len(inputs),
+        "model_version": [None] * len(inputs),
+    }
+    for rank in range(1, top_drivers + 1):
+        columns[f"driver_{rank}"] = [None] * len(inputs)
+        columns[f"driver_{rank}_contribution"] = [np.nan] * len(inputs)
+
+    for position, result in zip(np.flatnonzero(valid.to_numpy()), results):
+        if result is None:
+            continue
+        columns["score"][position] = result["score"]
+        columns["risk_level"][position] = result["risk_level"]
+        columns["model_version"][position] = result["model_version"]
+        for rank, driver in enumerate(result["drivers"][:top_drivers], start=1):
+            columns[f"driver_{rank}"][position] = driver["feature"]
+            columns[f"driver_{rank}_contribution"][position] = driver["shap_value"]
+
+    return pd.DataFrame(columns, index=inputs.index)
+
+
+class _ChunkWriter:
+    """Appends result chunks to a Parquet (one row group per chunk) or CSV file."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.parquet = path.suffix.lower() in (".parquet", ".pq")
+        self._writer = None
+        self._schema = None
+        self.rows = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists():
+            path.unlink()
+
+    def write(self, frame: pd.DataFrame) -> None:
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, schema=self._schema, preserve_index=False)
+            if self._writer is None:
+                self._schema = table.schema
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            self._writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode="a", header=self.rows == 0, index=False)
+        self.rows += len(frame)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+def _score_raw_chunk(model_type: str, chunk: pd.DataFrame, id_column: Optional[str], top_drivers: int, offset: int) -> pd.DataFrame:
+    inputs = nhanes_to_inputs(chunk)
+    scored = score_chunk(model_type, inputs, top_drivers)
+    ids = chunk[id_column].to_numpy() if id_column else np.arange(offset, offset + len(chunk))
+    scored.insert(0, id_column or "row", ids)
+    scored.insert(1, "model_type", model_type)
+    return scored
+
+
+def _init_worker() -> None:
+    # Un worker por núcleo: XGBoost no debe abrir sus propios hilos en cada uno
+    os.environ["OMP_NUM_THREADS"] = "1"
+
+
+def score_population(
+    input_path: Path,
+    output_path: Path,
+    model_type: str = "diabetes",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: Optional[int] = None,
+    top_drivers: int = DEFAULT_TOP_DRIVERS,
+    id_column: Optional[str] = "SEQN",
+) -> Dict[str, Any]:
+    """Stream `input_path` through the served model into `output_path`; returns a run summary."""
+    workers = workers or os.cpu_count() or 1
+    # Modelo cargado antes del fork: todos los workers puntúan con la misma instantánea
+    active = get_active_model(model_type)
+    writer = _ChunkWriter(output_path)
+    scores: List[np.ndarray] = []
+    levels: Dict[str, int] = {}
+    started = time.perf_counter()
+    resolved_id: Optional[str] = None
+
+    def collect(frame: pd.DataFrame) -> None:
+        writer.write(frame)
+        valid = frame["score"].to_numpy(dtype=np.float64)
+        scores.append(valid[~np.isnan(valid)].astype(np.float32))
+        for level, count in frame["risk_level"].value_counts().items():
+            levels[level] = levels.get(level, 0) + int(count)
+        elapsed = time.perf_counter() - started
+        logger.info("%s rows scored (%.0f rows/s)", writer.rows, writer.rows / elapsed if elapsed else 0.0)
+
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork"), initializer=_init_worker)
+    try:
+        pending: Dict[int, Future] = {}
+        next_to_write = 0
+        offset = 0
+        for index, chunk in enumerate(iter_chunks(input_path, chunk_size)):
+            if resolved_id is None:
+                resolved_id = id_column if id_column and id_column in chunk.columns else ""
+            args = (model_type, chunk, resolved_id or None, top_drivers, offset)
+            offset += len(chunk)
+            if pool is None:
+                collect(_score_raw_chunk(*args))
+                continue
+
+            pending[index] = pool.submit(_score_raw_chunk, *args)
+            # Memoria acotada: como mucho 2 chunks por worker en vuelo; se escribe en orden
+            while len(pending) >= 2 * workers or (next_to_write in pending and pending[next_to_write].done()):
+                collect(pending.pop(next_to_write).result())
+                next_to_write += 1
+        while pending:
+            collect(pending.pop(next_to_write).result())
+            next_to_write += 1
+    finally:
+        writer.close()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - started
+    all_scores = np.concatenate(scores) if scores else np.empty(0, dtype=np.float32)
+    quantiles = (0.05, 0.25, 0.5, 0.75, 0.95)
+    return {
+        "model_type": model_type,
+        "model_version": active.version,
+        "rows": writer.rows,
+        "scored": int(all_scores.size),
+        "skipped": writer.rows - int(all_scores.size),
+        "seconds": elapsed,
+        "rows_per_second": writer.rows / elapsed if elapsed else 0.0,
+        "score_mean": float(all_scores.mean()) if all_scores.size else None,
+        "score_quantiles": (
+            {str(q): float(v) for q, v in zip(quantiles, np.quantile(all_scores, quantiles))} if all_scores.size else {}
+        ),
+        "risk_levels": levels,
+        "output": str(output_path),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    parser = argparse.ArgumentParser(description="Score a full NHANES file with the served model")
+    parser.add_argument("input", type=Path, help="CSV/Parquet from ml/prepare_dataset.py (or predict_risk columns)")
+    parser.add_argument("output", type=Path, help="Output .parquet (needs pyarrow) or .csv")
+    parser.add_argument("--model", choices=MODEL_TYPES, default="diabetes")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=None, help="Scoring processes (default: CPU count)")
+    parser.add_argument("--top-drivers", type=int, default=DEFAULT_TOP_DRIVERS)
+    parser.add_argument("--id-column", default="SEQN", help="Copied to the output (row number if absent)")
+    args = parser.parse_args(argv)
+
+    # Los logs por predicción no aportan nada en corridas de millones de filas
+    logging.getLogger("app.ml.predictor").setLevel(logging.WARNING)
+    summary = score_population(
+        args.input, args.output, args.model, args.chunk_size, args.workers, args.top_drivers, args.id_column
+    )
+    print(
+        f"{summary['rows']:,} rows ({summary['skipped']:,} skipped) scored with {summary['model_type']}@"
+        f"{summary['model_version']} in {summary['seconds']:.1f}s ({summary['rows_per_second']:,.0f} rows/s)"
+    )
+    print(f"score mean={summary['score_mean']}, quantiles={summary['score_quantiles']}")
+    print(f"risk levels: {summary['risk_levels']}")
+    print(f"written to {summary['output']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
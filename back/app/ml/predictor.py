@@ -1,13 +1,26 @@
 import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any, Optional
-import shap
+from typing import Dict, List, Any, Mapping, Optional, Sequence, Tuple
+import xgboost as xgb
 
-from .model_loader import load_model_bundle
+from app.core.config import settings
+from app.utils.metrics import metrics, timed
+from .audit_log import get_audit_sink
+from .model_loader import ServingSpec, get_active_model
 from .feature_engineering import (
     build_cardiovascular_feature_frame,
-    build_feature_frame,
+    build_cardiovascular_feature_matrix,
+    build_feature_matrix,
+    cardiovascular_values_frame,
+    compute_cardiovascular_values,
+    compute_feature_values,
+    compute_shared_inputs,
     get_feature_description,
 )
 
@@ -15,32 +28,188 @@ logger = logging.getLogger(__name__)
 
 REFERRAL_THRESHOLD = 0.70
 TOP_DRIVERS_COUNT = 5
+# Score mínimo de cada nivel en _interpret_risk; "referral" agrega la derivación médica
+RISK_THRESHOLDS = {
+    "diabetes": {"moderate": 0.3, "high": 0.6, "referral": REFERRAL_THRESHOLD},
+    "cardiovascular": {"moderate": 0.20, "high": 0.30, "referral": 0.35},
+}
+
+DIABETES_INPUTS = (
+    "age", "sex", "height_cm", "weight_kg", "waist_cm", "sleep_hours",
+    "smokes_cig_day", "days_mvpa_week", "bmi", "systolic_bp", "total_cholesterol",
+)
+CARDIOVASCULAR_INPUTS = {
+    "age": "edad",
+    "sex": "genero",
+    "bmi": "imc",
+    "height_cm": "altura_cm",
+    "weight_kg": "peso_kg",
+    "waist_cm": "circunferencia_cintura",
+    "glucosa_mgdl": "glucosa_mgdl",
+    "hdl_mgdl": "hdl_mgdl",
+    "trigliceridos_mgdl": "trigliceridos_mgdl",
+    "ldl_mgdl": "ldl_mgdl",
+}
+
+# shap es opcional en serving: solo se importa si se usa DRIVER_BACKEND="shap" o como respaldo
+_explainers: Dict[str, Any] = {}
+
+_explainer_lock = threading.Lock()
+
+# Per-thread preallocated rows for the single-request path
+_row_buffers = threading.local()
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache with TTL for single-profile predictions.
+
+    Keys are (model_type, model_version, canonical feature bytes); values are
+    (score, drivers). Counters are kept so the size and TTL can be tuned.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, str, bytes], Tuple[float, float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get(self, key) -> Optional[Tuple[float, List[Dict[str, Any]]]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, score, drivers = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Copias: el llamador puede modificar el resultado sin afectar la entrada
+        return score, [dict(driver) for driver in drivers]
+
+    def put(self, key, score: float, drivers: List[Dict[str, Any]]) -> None:
+        entry = (time.monotonic() + self.ttl_seconds, score, [dict(driver) for driver in drivers])
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+prediction_cache = PredictionCache(
+    max_size=settings.PREDICTION_CACHE_SIZE,
+    ttl_seconds=settings.PREDICTION_CACHE_TTL_SECONDS,
+)
+
+
+def _reset_locks_after_fork() -> None:
+    # Un lock tomado por otro hilo al hacer fork quedaría bloqueado para siempre en el worker
+    global _explainer_lock
+    _explainer_lock = threading.Lock()
+    prediction_cache._lock = threading.Lock()
+
 
-_explainers: Dict[str, Optional[shap.TreeExplainer]] = {}
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_locks_after_fork)
 
 
-def get_explainer(model_type: str = "diabetes"):
-    """Get or create SHAP explainer for a specific model type."""
+def get_prediction_cache_stats() -> Dict[str, Any]:
+    """Hit/miss/eviction counters of the single-prediction cache."""
+    return prediction_cache.stats()
+
+
+def _prediction_cache_key(model_type: str, model_version: str, features: np.ndarray) -> Tuple[str, str, bytes]:
+    """
+    Canonical key for an engineered feature vector: values rounded to
+    PREDICTION_CACHE_DECIMALS, -0.0 folded into 0.0 and a single NaN bit pattern.
+    The model version is part of the key, so a hot swap never serves stale scores.
+    """
+    rounded = np.round(np.asarray(features, dtype=np.float64), settings.PREDICTION_CACHE_DECIMALS) + 0.0
+    rounded[np.isnan(rounded)] = np.nan
+    return model_type, model_version, rounded.tobytes()
+
+
+def _get_base_estimator(model):
+    """Estimator used for explanations: first calibrated fold of a CalibratedClassifierCV."""
+    if hasattr(model, 'calibrated_classifiers_') and len(model.calibrated_classifiers_) > 0:
+        return model.calibrated_classifiers_[0].estimator
+    return model
+
+
+def get_explainer(model_type: str = "diabetes", model=None):
+    """
+    Get or create SHAP explainer for a specific model type (None if shap is not installed).
+
+    The explainer is tied to the model object it was built from; after a hot swap the
+    first call with the new model rebuilds it.
+    """
     if model_type != "diabetes":
         return None
 
-    if model_type not in _explainers:
+    if model is None:
+        model = get_active_model(model_type).model
+
+    cached = _explainers.get(model_type)
+    if cached is not None and cached[0] is model:
+        return cached[1]
+
+    with _explainer_lock:
+        cached = _explainers.get(model_type)
+        if cached is not None and cached[0] is model:
+            return cached[1]
+
+        try:
+            import shap
+        except ImportError:
+            logger.info("shap is not installed; diabetes drivers use native XGBoost contributions")
+            _explainers[model_type] = (model, None)
+            return None
+
+        explainer = None
         try:
-            model, _, _ = load_model_bundle(model_type)
-            
-            # Extract base estimator from CalibratedClassifierCV if needed
-            base_model = model
-            if hasattr(model, 'calibrated_classifiers_') and len(model.calibrated_classifiers_) > 0:
-                base_model = model.calibrated_classifiers_[0].estimator
-                logger.info("Extracted base estimator from CalibratedClassifierCV for SHAP")
-            
-            _explainers[model_type] = shap.TreeExplainer(base_model)
+            estimator = _get_base_estimator(model)
+            # El booster nativo sirve tanto para XGBClassifier como para bundles exportados
+            booster = estimator.get_booster() if hasattr(estimator, "get_booster") else estimator
+            explainer = shap.TreeExplainer(booster)
             logger.info("SHAP explainer initialized for %s", model_type)
         except Exception as e:
             logger.warning("Failed to initialize SHAP explainer for %s: %s", model_type, e)
-            _explainers[model_type] = None
+        _explainers[model_type] = (model, explainer)
+
+    return explainer
 
-    return _explainers[model_type]
 
 def predict_risk(
     age: int,
@@ -62,179 +231,615 @@ def predict_risk(
 ) -> Dict[str, Any]:
     """Predict cardiometabolic risk using the requested local model."""
 
+    # Argumentos tal cual llegaron, para el modo sombra
+    profile = dict(locals())
     normalized_type = (model_type or "diabetes").lower()
+    started = time.perf_counter()
 
     try:
-        logger.info("=" * 80)
-        logger.info("🔬 USING LOCAL ML MODEL (%s)", normalized_type.upper())
-        logger.info(
-            "   Input: age=%s, sex=%s, bmi=%s, height_cm=%s, weight_kg=%s, waist_cm=%s, sleep_hours=%s, cig_day=%s, mvpa_days=%s, sys_bp=%s, chol=%s",
-            age,
-            sex,
-            bmi,
-            height_cm,
-            weight_kg,
-            waist_cm,
-            sleep_hours,
-            smokes_cig_day,
-            days_mvpa_week,
-            systolic_bp,
-            total_cholesterol,
-        )
-        logger.info("=" * 80)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "predict_risk(%s): age=%s, sex=%s, bmi=%s, height_cm=%s, weight_kg=%s, waist_cm=%s, "
+                "sleep_hours=%s, cig_day=%s, mvpa_days=%s, sys_bp=%s, chol=%s, glucosa=%s, hdl=%s, ldl=%s, trig=%s",
+                normalized_type, age, sex, bmi, height_cm, weight_kg, waist_cm, sleep_hours, smokes_cig_day,
+                days_mvpa_week, systolic_bp, total_cholesterol, glucosa_mgdl, hdl_mgdl, ldl_mgdl, trigliceridos_mgdl,
+            )
 
-        model, imputer, feature_names = load_model_bundle(normalized_type)
-        logger.info("✓ Model loaded: %s", type(model).__name__)
+        # Una sola instantánea por petición: modelo, spec y versión no cambian a mitad del cálculo
+        with timed("prediction_stage_seconds", model=normalized_type, stage="model"):
+            active = get_active_model(normalized_type)
+        feature_names = list(active.feature_names)
 
+        with timed("prediction_stage_seconds", model=normalized_type, stage="features"):
+            features = _single_row_features(normalized_type, profile, feature_names)
         if normalized_type == "cardiovascular":
-            logger.info("🔍 Construyendo features cardiovasculares:")
-            logger.info(f"   edad={age}, genero={sex}, imc={bmi}, altura={height_cm}, peso={weight_kg}")
-            logger.info(f"   cintura={waist_cm}, glucosa={glucosa_mgdl}, hdl={hdl_mgdl}, ldl={ldl_mgdl}, trig={trigliceridos_mgdl}")
-            logger.info(f"   NOTA: El modelo cardiovascular NO usa presión sistólica ni colesterol total directamente")
-            
-            features_df = build_cardiovascular_feature_frame(
-                edad=age,
-                genero=sex,
-                imc=bmi,
-                altura_cm=height_cm,
-                peso_kg=weight_kg,
-                circunferencia_cintura=waist_cm,
-                glucosa_mgdl=glucosa_mgdl,
-                hdl_mgdl=hdl_mgdl,
-                trigliceridos_mgdl=trigliceridos_mgdl,
-                ldl_mgdl=ldl_mgdl,
-                feature_names=feature_names,
-            )
-            
-            logger.info(f"🔍 Features construidas - IMC: {features_df['imc'].iloc[0] if 'imc' in features_df.columns else 'N/A'}, "
-                       f"rel_cintura_altura: {features_df['rel_cintura_altura'].iloc[0] if 'rel_cintura_altura' in features_df.columns else 'N/A'}")
+            risk_score, drivers, cached = _predict_cardiovascular_row(active, features)
 
-            # El modelo cardiovascular es un pipeline que maneja preprocesamiento internamente
-            risk_score = float(model.predict_proba(features_df)[0, 1])
-            
             # Validar score extremo que podría indicar problema con los datos
             if risk_score < 0.01:
                 logger.warning(f"⚠️ Score extremadamente bajo ({risk_score:.4f}) detectado. "
                              f"Verificar si los valores de entrada son correctos o si el modelo está fuera de rango.")
-                logger.warning(f"   Valores críticos: IMC={bmi}, edad={age}, rel_cintura_altura={features_df['rel_cintura_altura'].iloc[0] if 'rel_cintura_altura' in features_df.columns else 'N/A'}")
-            
-            drivers = _get_cardiovascular_drivers(model, features_df, feature_names)
-            
-            logger.info(f"🔍 Score predicho: {risk_score:.4f}")
+                logger.warning(f"   Valores críticos: IMC={bmi}, edad={age}, rel_cintura_altura={features['rel_cintura_altura'].iloc[0] if 'rel_cintura_altura' in features.columns else 'N/A'}")
         else:
-            X = build_feature_frame(
-                age=age,
-                sex=sex,
-                height_cm=height_cm,
-                weight_kg=weight_kg,
-                waist_cm=waist_cm,
-                sleep_hours=sleep_hours,
-                smokes_cig_day=smokes_cig_day,
-                days_mvpa_week=days_mvpa_week,
-                bmi=bmi,
-                systolic_bp=systolic_bp,
-                total_cholesterol=total_cholesterol,
-                feature_names=feature_names,
-            )
+            risk_score, drivers, cached = _predict_diabetes_row(active, features)
+
+        result = _build_result(risk_score, drivers, normalized_type, active.version)
+
+        elapsed = time.perf_counter() - started
+        metrics.observe("prediction_stage_seconds", elapsed, model=normalized_type, stage="total")
+        metrics.inc("predictions_total", model=normalized_type, path="cached" if cached else "single")
+        _log_prediction(
+            "Prediction complete: model=%s, version=%s, score=%.3f, level=%s, cached=%s, %.2f ms",
+            normalized_type, active.version, risk_score, result["risk_level"], cached, elapsed * 1000.0,
+        )
+
+        _submit_shadow([profile], [result])
+        _submit_audit(normalized_type, active.version, "cached" if cached else "single", [profile], features, [result], elapsed)
+
+        return result
+
+    except Exception as exc:
+        metrics.inc("prediction_stage_errors_total", model=normalized_type, stage="total")
+        logger.error("Error in prediction: %s", exc, exc_info=True)
+        raise
+
+
+def _single_row_features(normalized_type: str, profile: Mapping[str, Any], feature_names: List[str]) -> Any:
+    """Engineered features of one profile: a 1-row frame (cardiovascular) or a feature dict (diabetes)."""
+    if normalized_type == "cardiovascular":
+        # El modelo cardiovascular NO usa presión sistólica ni colesterol total directamente
+        return build_cardiovascular_feature_frame(
+            **{arg: profile.get(key) for key, arg in CARDIOVASCULAR_INPUTS.items()},
+            feature_names=feature_names,
+        )
+    return compute_feature_values(**{key: profile.get(key) for key in DIABETES_INPUTS})
+
+
+def _diabetes_cache_row(spec: ServingSpec, feature_values: Mapping[str, float]) -> np.ndarray:
+    return np.fromiter(
+        (feature_values.get(name, 0.0) for name in spec.feature_names),
+        dtype=np.float64,
+        count=spec.n_features,
+    )
+
+
+def lookup_cached_prediction(params: Mapping[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    `predict_risk(**params)` if its features are already in the prediction cache, else
+    None without touching the model. The micro-batcher checks this before enqueuing, so
+    a hit costs feature building only; a hit is counted, shadowed and audited like one
+    served by `predict_risk`.
+    """
+    if not prediction_cache.enabled:
+        return None
+    normalized_type = (params.get("model_type") or "diabetes").lower()
+    started = time.perf_counter()
+    active = get_active_model(normalized_type)
+    features = _single_row_features(normalized_type, params, list(active.feature_names))
+    if normalized_type == "cardiovascular":
+        row = features.to_numpy(dtype=np.float64)[0]
+    else:
+        row = _diabetes_cache_row(active.spec, features)
+    cached = prediction_cache.get(_prediction_cache_key(normalized_type, active.version, row))
+    if cached is None:
+        return None
+
+    result = _build_result(cached[0], cached[1], normalized_type, active.version)
+    elapsed = time.perf_counter() - started
+    metrics.observe("prediction_stage_seconds", elapsed, model=normalized_type, stage="total")
+    metrics.inc("predictions_total", model=normalized_type, path="cached")
+    _submit_shadow([params], [result])
+    _submit_audit(normalized_type, active.version, "cached", [params], features, [result], elapsed)
+    return result
+
+
+def _predict_cardiovascular_row(
+    active, features_df: pd.DataFrame, use_cache: bool = True
+) -> Tuple[float, List[Dict[str, Any]], bool]:
+    """Score and drivers of one cardiovascular feature row, through the prediction cache unless `use_cache` is False."""
+    cache_key = None
+    if use_cache and prediction_cache.enabled:
+        with timed("prediction_stage_seconds", model="cardiovascular", stage="cache"):
+            cache_key = _prediction_cache_key("cardiovascular", active.version, features_df.to_numpy(dtype=np.float64)[0])
+            cached = prediction_cache.get(cache_key)
+        if cached is not None:
+            return cached[0], cached[1], True
+
+    # El modelo cardiovascular es un pipeline que maneja preprocesamiento internamente
+    scores, drivers_by_row = _score_cardiovascular(active.model, features_df, list(active.feature_names), active.scorer)
+    risk_score, drivers = float(scores[0]), drivers_by_row[0]
+    if cache_key is not None:
+        prediction_cache.put(cache_key, risk_score, drivers)
+    return risk_score, drivers, False
+
+
+def _predict_diabetes_row(
+    active, feature_values: Dict[str, float], use_cache: bool = True
+) -> Tuple[float, List[Dict[str, Any]], bool]:
+    """Score and drivers of one diabetes profile's engineered features, through the prediction cache unless `use_cache` is False."""
+    model, imputer, feature_names = active.bundle
+    spec = active.spec
+    if imputer is None:
+        raise RuntimeError("Imputer is required for diabetes model but was not loaded.")
+
+    cache_key = None
+    if use_cache and prediction_cache.enabled:
+        with timed("prediction_stage_seconds", model="diabetes", stage="cache"):
+            row = _diabetes_cache_row(spec, feature_values)
+            cache_key = _prediction_cache_key("diabetes", active.version, row)
+            cached = prediction_cache.get(cache_key)
+        if cached is not None:
+            return cached[0], cached[1], True
+
+    if spec.fill_values is not None:
+        with timed("prediction_stage_seconds", model="diabetes", stage="impute"):
+            X_imp = _impute_diabetes_row(spec, feature_values)
+        with timed("prediction_stage_seconds", model="diabetes", stage="predict"):
+            scores = _positive_proba(model, active.scorer, X_imp)
+        with timed("prediction_stage_seconds", model="diabetes", stage="drivers"):
+            drivers_by_row = _get_diabetes_drivers(model, X_imp, list(spec.valid_feature_names))
+    else:
+        X = pd.DataFrame([feature_values]).reindex(columns=feature_names, fill_value=0)
+        scores, drivers_by_row = _score_diabetes(model, imputer, X, feature_names, active.scorer)
+
+    risk_score, drivers = float(scores[0]), drivers_by_row[0]
+    if cache_key is not None:
+        prediction_cache.put(cache_key, risk_score, drivers)
+    return risk_score, drivers, False
+
+
+def predict_risk_multi(
+    profile: Dict[str, Any], model_types: Sequence[str] = ("diabetes", "cardiovascular")
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Score one profile (keyword names of `predict_risk`) with several models in one call.
 
-            if imputer is None:
-                raise RuntimeError("Imputer is required for diabetes model but was not loaded.")
+    BMI, waist-to-height ratio, sex and the BMI interactions are derived once
+    (`compute_shared_inputs`) and fed to every model's feature builder; each model then
+    scores and explains its own row exactly as `predict_risk` would. Returns
+    {model_type: result} in the order of `model_types`.
+    """
+    started = time.perf_counter()
+    model_types = [model_type.lower() for model_type in model_types]
+    get = profile.get
 
-            X_imp = imputer.transform(X)
-            
-            # Get valid feature names after imputation (imputer drops features with no valid data)
-            if hasattr(imputer, 'statistics_'):
-                valid_mask = ~np.isnan(imputer.statistics_)
-                valid_feature_names = [name for name, valid in zip(feature_names, valid_mask) if valid]
+    try:
+        with timed("prediction_stage_seconds", model="multi", stage="shared_features"):
+            shared = compute_shared_inputs(
+                get("age"), get("sex"), get("height_cm"), get("weight_kg"), get("waist_cm"), get("bmi")
+            )
+
+        results: Dict[str, Dict[str, Any]] = {}
+        for model_type in model_types:
+            model_started = time.perf_counter()
+            active = get_active_model(model_type)
+            with timed("prediction_stage_seconds", model=model_type, stage="features"):
+                if model_type == "cardiovascular":
+                    values = compute_cardiovascular_values(
+                        get("age"), get("sex"), get("bmi"), get("height_cm"), get("weight_kg"), get("waist_cm"),
+                        get("glucosa_mgdl"), get("hdl_mgdl"), get("trigliceridos_mgdl"), get("ldl_mgdl"),
+                        shared=shared,
+                    )
+                    features = cardiovascular_values_frame(values, list(active.feature_names))
+                else:
+                    features = compute_feature_values(
+                        **{key: get(key) for key in DIABETES_INPUTS}, shared=shared
+                    )
+
+            if model_type == "cardiovascular":
+                risk_score, drivers, cached = _predict_cardiovascular_row(active, features)
             else:
-                valid_feature_names = feature_names
-            
-            features_df = pd.DataFrame(X_imp, columns=valid_feature_names)
-            risk_score = float(model.predict_proba(X_imp)[0, 1])
-            drivers = _get_diabetes_drivers(model, features_df, valid_feature_names)
+                risk_score, drivers, cached = _predict_diabetes_row(active, features)
+
+            results[model_type] = _build_result(risk_score, drivers, model_type, active.version)
+            metrics.inc("predictions_total", model=model_type, path="cached" if cached else "multi")
+            _submit_shadow([{**profile, "model_type": model_type}], [results[model_type]])
+            _submit_audit(
+                model_type, active.version, "cached" if cached else "multi", [profile], features,
+                [results[model_type]], time.perf_counter() - model_started,
+            )
 
-        risk_level, recommendation = _interpret_risk(risk_score, model_type=normalized_type)
+        elapsed = time.perf_counter() - started
+        metrics.observe("prediction_stage_seconds", elapsed, model="multi", stage="total")
+        _log_prediction(
+            "Multi-model prediction complete: %s, %.2f ms",
+            ", ".join(f"{t}={r['score']:.3f}" for t, r in results.items()), elapsed * 1000.0,
+        )
+        return results
 
-        logger.info("✓ Prediction complete: score=%.3f, level=%s", risk_score, risk_level)
-        logger.info("=" * 80)
+    except Exception as exc:
+        metrics.inc("prediction_stage_errors_total", model="multi", stage="total")
+        logger.error("Error in multi-model prediction: %s", exc, exc_info=True)
+        raise
+
+
+def predict_risk_batch(
+    profiles: Sequence[Dict[str, Any]],
+    model_type: str = "diabetes",
+    fill_cache: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Predict cardiometabolic risk for many profiles at once.
+
+    Each profile is a dict with the same keyword names as `predict_risk`; an optional
+    per-profile "model_type" overrides the default. Profiles are grouped by model type
+    and each group goes through feature building, imputation, predict_proba and driver
+    extraction as a single N-row matrix. Results keep the input order and match
+    `predict_risk` for every profile. With `fill_cache` (micro-batched single
+    predictions) every scored row is also stored in the prediction cache.
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(profiles)
 
-        return {
-            "score": risk_score,
-            "risk_level": risk_level,
-            "drivers": drivers,
-            "recommendation": recommendation,
-            "model_used": normalized_type,
-        }
+    groups: Dict[str, List[int]] = {}
+    for idx, profile in enumerate(profiles):
+        profile_type = (profile.get("model_type") or model_type or "diabetes").lower()
+        groups.setdefault(profile_type, []).append(idx)
+
+    try:
+        for normalized_type, indices in groups.items():
+            active = get_active_model(normalized_type)
+            model, imputer, feature_names = active.bundle
+            group_profiles = [profiles[idx] for idx in indices]
+
+            started = time.perf_counter()
+            with timed("prediction_stage_seconds", model=normalized_type, stage="batch_features"):
+                X = _build_group_features(normalized_type, group_profiles, feature_names)
+            if normalized_type == "cardiovascular":
+                scores, drivers_by_row = _score_cardiovascular(model, X, feature_names, active.scorer)
+            else:
+                scores, drivers_by_row = _score_diabetes(model, imputer, X, feature_names, active.scorer)
+
+            for idx, score, drivers in zip(indices, scores, drivers_by_row):
+                results[idx] = _build_result(float(score), drivers, normalized_type, active.version)
+            if fill_cache and prediction_cache.enabled:
+                _fill_prediction_cache(active, X, scores, drivers_by_row)
+
+            elapsed = time.perf_counter() - started
+            metrics.observe("prediction_stage_seconds", elapsed, model=normalized_type, stage="batch_total")
+            metrics.inc("predictions_total", len(indices), model=normalized_type, path="batch")
+            _log_prediction(
+                "Batch prediction complete: model=%s, rows=%s, %.2f ms", normalized_type, len(indices), elapsed * 1000.0
+            )
+            group_results = [results[idx] for idx in indices]
+            _submit_shadow(group_profiles, group_results)
+            _submit_audit(normalized_type, active.version, "batch", group_profiles, X, group_results, elapsed)
 
     except Exception as exc:
-        logger.error("Error in prediction: %s", exc, exc_info=True)
+        logger.error("Error in batch prediction: %s", exc, exc_info=True)
         raise
 
+    return results
+
+
+def _fill_prediction_cache(active, X: pd.DataFrame, scores: np.ndarray, drivers_by_row: List[List[Dict[str, Any]]]) -> None:
+    # Mismas claves que predict_risk: columnas en el orden del spec (diabetes) o del frame
+    if active.model_type == "diabetes":
+        X = X.reindex(columns=list(active.spec.feature_names), fill_value=0.0)
+    rows = X.to_numpy(dtype=np.float64)
+    for row, score, drivers in zip(rows, scores, drivers_by_row):
+        prediction_cache.put(_prediction_cache_key(active.model_type, active.version, row), float(score), drivers)
+
+
+def cache_served_predictions(
+    profiles: Sequence[Dict[str, Any]], results: Sequence[Mapping[str, Any]], model_type: str = "diabetes"
+) -> None:
+    """
+    Store results scored in another process (a forked inference worker) in this
+    process's prediction cache, under the keys `predict_risk_batch(fill_cache=True)`
+    uses. Results from a model version that is no longer active are skipped.
+    """
+    if not prediction_cache.enabled:
+        return
+    groups: Dict[str, List[Tuple[Dict[str, Any], Mapping[str, Any]]]] = {}
+    for profile, result in zip(profiles, results):
+        profile_type = (profile.get("model_type") or model_type or "diabetes").lower()
+        groups.setdefault(profile_type, []).append((profile, result))
+
+    for normalized_type, items in groups.items():
+        active = get_active_model(normalized_type)
+        items = [(profile, result) for profile, result in items if result.get("model_version") == active.version]
+        if not items:
+            continue
+        X = _build_group_features(normalized_type, [profile for profile, _ in items], list(active.feature_names))
+        _fill_prediction_cache(
+            active, X, [result["score"] for _, result in items], [result["drivers"] for _, result in items]
+        )
+
+
+def _build_group_features(
+    model_type: str, profiles: Sequence[Dict[str, Any]], feature_names: List[str]
+) -> pd.DataFrame:
+    """Engineered N-row feature frame for profiles that share a model type."""
+    keys = CARDIOVASCULAR_INPUTS if model_type == "cardiovascular" else DIABETES_INPUTS
+    return _build_column_features(
+        model_type, {key: [profile.get(key) for profile in profiles] for key in keys}, feature_names
+    )
+
+
+def _build_column_features(
+    model_type: str, columns: Mapping[str, Sequence[Any]], feature_names: List[str]
+) -> pd.DataFrame:
+    """Engineered feature frame from columns keyed by the `predict_risk` argument names."""
+    if model_type == "cardiovascular":
+        return build_cardiovascular_feature_matrix(
+            {arg: columns[key] for key, arg in CARDIOVASCULAR_INPUTS.items() if key in columns},
+            feature_names=feature_names,
+        )
+    return build_feature_matrix(
+        {key: columns[key] for key in DIABETES_INPUTS if key in columns},
+        feature_names=feature_names,
+    )
+
+
+def score_profiles(active, profiles: Sequence[Dict[str, Any]]) -> np.ndarray:
+    """
+    Scores only (no drivers) of `profiles` under one specific model snapshot
+    (`ActiveModel`), e.g. a shadow candidate or a version being smoke-tested.
+    """
+    X = _build_group_features(active.model_type, profiles, list(active.feature_names))
+    return _score_features(active, X)
+
+
+def score_columns(active, columns: Mapping[str, Sequence[Any]]) -> np.ndarray:
+    """
+    Scores only (no drivers) of profiles given as columns (arrays keyed by the
+    `predict_risk` argument names) under one model snapshot; used by scenario sweeps
+    that build their N-row inputs directly with numpy.
+    """
+    X = _build_column_features(active.model_type, columns, list(active.feature_names))
+    return _score_features(active, X)
+
+
+def _score_features(active, X: pd.DataFrame) -> np.ndarray:
+    if active.model_type == "cardiovascular":
+        if active.scorer is not None:
+            return active.scorer.predict_proba_positive(X.to_numpy(dtype=np.float64))
+    else:
+        if active.imputer is None:
+            raise RuntimeError("Imputer is required for diabetes model but was not loaded.")
+        spec = active.spec
+        if spec.fill_values is not None:
+            # Igual que imputer.transform pero sin la validación de sklearn (domina con N grande)
+            X = X.to_numpy(dtype=np.float64, copy=True)
+            np.copyto(X, spec.fill_values, where=np.isnan(X))
+            X = X[:, spec.valid_indices]
+        else:
+            X = active.imputer.transform(X)
+    return _positive_proba(active.model, active.scorer, X)
+
+
+def _positive_proba(model, scorer, X) -> np.ndarray:
+    """Positive-class probability, through the compiled/fused scorer when there is one."""
+    if scorer is not None:
+        return scorer.predict_proba_positive(X)
+    return np.asarray(model.predict_proba(X))[:, 1]
+
+
+def _log_prediction(message: str, *args) -> None:
+    """
+    Per-request summary line: always at DEBUG, and at INFO for a PREDICTION_LOG_SAMPLE_RATE
+    sample so production logs keep a trace without one banner per call.
+    """
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(message, *args)
+    elif settings.PREDICTION_LOG_SAMPLE_RATE > 0 and random.random() < settings.PREDICTION_LOG_SAMPLE_RATE:
+        logger.info(message, *args)
+
+
+def _submit_shadow(profiles: Sequence[Dict[str, Any]], results: Sequence[Dict[str, Any]]) -> None:
+    """Hand served results to the shadow scorer (no-op unless SHADOW_CANDIDATE is set)."""
+    if not settings.SHADOW_CANDIDATE:
+        return
+    from .shadow_scorer import get_shadow_scorer
+
+    try:
+        get_shadow_scorer().submit(profiles, results)
+    except Exception as exc:
+        # El modo sombra nunca debe afectar la respuesta al usuario
+        logger.warning("Shadow scoring skipped: %s", exc)
+
+
+def _submit_audit(
+    model_type: str,
+    version: Optional[str],
+    path: str,
+    profiles: Sequence[Dict[str, Any]],
+    features: Any,
+    results: Sequence[Dict[str, Any]],
+    latency: float,
+) -> None:
+    """Queue served predictions for the audit log (no-op unless AUDIT_LOG_ENABLED); O(1), no copies."""
+    if not settings.AUDIT_LOG_ENABLED:
+        return
+    try:
+        get_audit_sink().record(model_type, version, path, profiles, features, results, latency)
+    except Exception as exc:
+        # El audit log nunca debe afectar la respuesta al usuario
+        logger.warning("Prediction audit skipped: %s", exc)
+
+
+def _build_result(
+    risk_score: float, drivers: List[Dict[str, Any]], model_type: str, model_version: Optional[str] = None
+) -> Dict[str, Any]:
+    risk_level, recommendation = _interpret_risk(risk_score, model_type=model_type)
+    return {
+        "score": risk_score,
+        "risk_level": risk_level,
+        "drivers": drivers,
+        "recommendation": recommendation,
+        "model_used": model_type,
+        "model_version": model_version,
+    }
+
+
+def _score_diabetes(
+    model, imputer, X: pd.DataFrame, feature_names: List[str], scorer=None
+) -> Tuple[np.ndarray, List[List[Dict[str, Any]]]]:
+    """Impute, score and explain an N-row diabetes feature matrix."""
+    if imputer is None:
+        raise RuntimeError("Imputer is required for diabetes model but was not loaded.")
+
+    with timed("prediction_stage_seconds", model="diabetes", stage="impute"):
+        X_imp = imputer.transform(X)
+
+    # Get valid feature names after imputation (imputer drops features with no valid data)
+    if hasattr(imputer, 'statistics_'):
+        valid_mask = ~np.isnan(imputer.statistics_)
+        valid_feature_names = [name for name, valid in zip(feature_names, valid_mask) if valid]
+    else:
+        valid_feature_names = feature_names
+
+    with timed("prediction_stage_seconds", model="diabetes", stage="predict"):
+        scores = _positive_proba(model, scorer, X_imp)
+    with timed("prediction_stage_seconds", model="diabetes", stage="drivers"):
+        drivers = _get_diabetes_drivers(model, X_imp, valid_feature_names)
+    return scores, drivers
+
+
+def _impute_diabetes_row(spec: ServingSpec, feature_values: Dict[str, float]) -> np.ndarray:
+    """
+    Write one profile into this thread's preallocated row, impute it with the precomputed
+    fill vector and drop the columns the imputer discards. Equivalent to
+    `imputer.transform(frame.reindex(columns=feature_names, fill_value=0))` without pandas.
+
+    The returned (1, n_valid) array is reused by the next call on the same thread.
+    """
+    buffers = getattr(_row_buffers, "diabetes", None)
+    if buffers is None or buffers[0] is not spec:
+        buffers = (spec, np.empty(spec.n_features), np.empty((1, len(spec.valid_indices))))
+        _row_buffers.diabetes = buffers
+    _, row, imputed = buffers
+
+    for idx, name in enumerate(spec.feature_names):
+        row[idx] = feature_values.get(name, 0.0)
+    np.copyto(row, spec.fill_values, where=np.isnan(row))
+    np.take(row, spec.valid_indices, out=imputed[0])
+    return imputed
+
+
+def _score_cardiovascular(
+    model, features_df: pd.DataFrame, feature_names: List[str], scorer=None
+) -> Tuple[np.ndarray, List[List[Dict[str, Any]]]]:
+    """
+    Score and explain an N-row cardiovascular feature frame. With a compiled scorer
+    (see compiled_scorers) probabilities and contributions come from one matrix product.
+    """
+    if scorer is not None:
+        values = features_df.to_numpy(dtype=np.float64)
+        with timed("prediction_stage_seconds", model="cardiovascular", stage="predict"):
+            scores, contributions = scorer.score(values)
+        with timed("prediction_stage_seconds", model="cardiovascular", stage="drivers"):
+            return scores, _compiled_cardiovascular_drivers(scorer, values, contributions)
+
+    with timed("prediction_stage_seconds", model="cardiovascular", stage="predict"):
+        scores = model.predict_proba(features_df)[:, 1]
+    with timed("prediction_stage_seconds", model="cardiovascular", stage="drivers"):
+        drivers = _get_cardiovascular_drivers(model, features_df, feature_names)
+    return scores, drivers
+
 
 def _interpret_risk(score: float, model_type: str = "diabetes") -> tuple[str, str]:
     """
     Returns (risk_level, recommendation) where risk_level is in English for DB storage.
     Different thresholds are applied based on model type due to different calibration characteristics.
     """
-    if model_type == "cardiovascular":
-        if score < 0.20:
-            return "low", "Mantener hábitos saludables"
-        if score < 0.30:
-            return "moderate", "Mejorar estilo de vida con coaching personalizado"
-        
-        recommendation = "Consultar con profesional de salud urgentemente"
-        if score >= 0.35:
-            recommendation += " y coordinar evaluación médica profesional"
-        return "high", recommendation
-    else:
-        if score < 0.3:
-            return "low", "Mantener hábitos saludables"
-        if score < 0.6:
-            return "moderate", "Mejorar estilo de vida con coaching personalizado"
+    thresholds = RISK_THRESHOLDS["cardiovascular" if model_type == "cardiovascular" else "diabetes"]
+    if score < thresholds["moderate"]:
+        return "low", "Mantener hábitos saludables"
+    if score < thresholds["high"]:
+        return "moderate", "Mejorar estilo de vida con coaching personalizado"
 
-        recommendation = "Consultar con profesional de salud urgentemente"
-        if score >= REFERRAL_THRESHOLD:
-            recommendation += " y coordinar evaluación médica profesional"
-        return "high", recommendation
+    recommendation = "Consultar con profesional de salud urgentemente"
+    if score >= thresholds["referral"]:
+        recommendation += " y coordinar evaluación médica profesional"
+    return "high", recommendation
 
 
-def _get_diabetes_drivers(model, features_df: pd.DataFrame, feature_names: List[str]) -> List[Dict[str, Any]]:
-    drivers: List[Dict[str, Any]] = []
-    feature_index_map = {name: idx for idx, name in enumerate(feature_names)}
+def _native_contributions(model, values: np.ndarray) -> np.ndarray:
+    """
+    Per-feature TreeSHAP contributions (log-odds) for every row, from the booster's
+    built-in `pred_contribs` output. The trailing bias column is dropped.
+    """
+    booster = _get_base_estimator(model).get_booster()
+    dmatrix = xgb.DMatrix(values, feature_names=booster.feature_names)
+    return booster.predict(dmatrix, pred_contribs=True)[:, :-1]
 
-    explainer = get_explainer("diabetes")
-    if explainer is not None:
-        try:
-            shap_values = explainer.shap_values(features_df)
 
-            if isinstance(shap_values, list):
-                shap_values = shap_values[1] if len(shap_values) > 1 else shap_values[0]
+def _shap_contributions(model, values: np.ndarray) -> Optional[np.ndarray]:
+    """Per-feature contributions from shap.TreeExplainer (None if shap is unavailable)."""
+    explainer = get_explainer("diabetes", model)
+    if explainer is None:
+        return None
 
-            row_shap = shap_values[0]
-            shap_importance = [
-                (feat, abs(row_shap[idx])) for feat, idx in feature_index_map.items()
-            ]
-            shap_importance.sort(key=lambda x: x[1], reverse=True)
+    shap_values = explainer.shap_values(values)
+    if isinstance(shap_values, list):
+        shap_values = shap_values[1] if len(shap_values) > 1 else shap_values[0]
+    return np.asarray(shap_values)
 
-            for feature, _ in shap_importance[:TOP_DRIVERS_COUNT]:
-                idx = feature_index_map[feature]
-                shap_val = float(row_shap[idx])
-                raw_value = float(features_df.iloc[0, idx])
-                drivers.append(
-                    {
-                        "feature": feature,
-                        "description": get_feature_description(feature),
-                        "value": raw_value,
-                        "shap_value": shap_val,
-                        "impact": "aumenta" if shap_val > 0 else "reduce",
-                    }
-                )
+
+def _diabetes_contributions(model, values: np.ndarray) -> Optional[np.ndarray]:
+    backends = [_native_contributions, _shap_contributions]
+    if settings.DRIVER_BACKEND.lower() == "shap":
+        backends.reverse()
+
+    for backend in backends:
+        try:
+            contributions = backend(model, values)
         except Exception as exc:
-            logger.warning("SHAP calculation failed for diabetes model: %s", exc)
-            drivers.clear()
+            logger.warning("%s failed for diabetes model: %s", backend.__name__, exc)
+            continue
+        if contributions is not None:
+            return contributions
+    return None
 
-    if drivers:
-        return drivers
+
+def _top_driver_indices(contributions: np.ndarray, k: int = TOP_DRIVERS_COUNT) -> np.ndarray:
+    """
+    Column indices of the k largest |contribution| per row, in descending order.
+    Ties keep feature order, like a stable sort; argpartition avoids sorting every column.
+    """
+    magnitude = np.abs(contributions)
+    n_rows, n_features = magnitude.shape
+    k = min(k, n_features)
+    if k < n_features:
+        candidates = np.sort(np.argpartition(-magnitude, k - 1, axis=1)[:, :k], axis=1)
+    else:
+        candidates = np.tile(np.arange(n_features), (n_rows, 1))
+
+    order = np.argsort(-np.take_along_axis(magnitude, candidates, axis=1), axis=1, kind="stable")
+    top = np.take_along_axis(candidates, order, axis=1)
+
+    if 0 < k < n_features:
+        # With ties at the cut-off argpartition may keep any of them; match the stable sort
+        kth = np.take_along_axis(magnitude, top[:, -1:], axis=1)
+        for row in np.flatnonzero((magnitude >= kth).sum(axis=1) > k):
+            top[row] = np.argsort(-magnitude[row], kind="stable")[:k]
+    return top
+
+
+def _get_diabetes_drivers(
+    model, values: np.ndarray, feature_names: List[str]
+) -> List[List[Dict[str, Any]]]:
+    """Top drivers for every row of the imputed diabetes matrix (one contribution call for all rows)."""
+    n_rows = len(values)
+    feature_index_map = {name: idx for idx, name in enumerate(feature_names)}
+
+    contributions = _diabetes_contributions(model, values)
+    if contributions is not None:
+        top = _top_driver_indices(contributions)
+        return [
+            [
+                {
+                    "feature": feature_names[idx],
+                    "description": get_feature_description(feature_names[idx]),
+                    "value": float(values[row, idx]),
+                    "shap_value": float(contributions[row, idx]),
+                    "impact": "aumenta" if contributions[row, idx] > 0 else "reduce",
+                }
+                for idx in top[row]
+            ]
+            for row in range(n_rows)
+        ]
 
     if hasattr(model, "feature_importances_"):
         importances = model.feature_importances_
@@ -243,38 +848,67 @@ def _get_diabetes_drivers(model, features_df: pd.DataFrame, feature_names: List[
         ]
         importance_tuples.sort(key=lambda x: x[1], reverse=True)
 
-        for feature, importance in importance_tuples[:TOP_DRIVERS_COUNT]:
-            idx = feature_index_map[feature]
-            value = float(features_df.iloc[0, idx])
-            drivers.append(
+        return [
+            [
                 {
                     "feature": feature,
                     "description": get_feature_description(feature),
-                    "value": value,
+                    "value": float(values[row, feature_index_map[feature]]),
                     "shap_value": float(importance),
                     "impact": "aumenta" if importance > 0 else "reduce",
                 }
-            )
-    else:
-        key_features = ['bmi', 'age', 'waist_height_ratio', 'lifestyle_risk_score', 'central_obesity']
-        for feature in key_features[:TOP_DRIVERS_COUNT]:
-            if feature in feature_index_map:
-                idx = feature_index_map[feature]
-                drivers.append(
-                    {
-                        "feature": feature,
-                        "description": get_feature_description(feature),
-                        "value": float(features_df.iloc[0, idx]),
-                        "shap_value": 0.0,
-                        "impact": "aumenta",
-                    }
-                )
+                for feature, importance in importance_tuples[:TOP_DRIVERS_COUNT]
+            ]
+            for row in range(n_rows)
+        ]
 
-    return drivers
+    key_features = ['bmi', 'age', 'waist_height_ratio', 'lifestyle_risk_score', 'central_obesity']
+    key_features = [feature for feature in key_features[:TOP_DRIVERS_COUNT] if feature in feature_index_map]
+    return [
+        [
+            {
+                "feature": feature,
+                "description": get_feature_description(feature),
+                "value": float(values[row, feature_index_map[feature]]),
+                "shap_value": 0.0,
+                "impact": "aumenta",
+            }
+            for feature in key_features
+        ]
+        for row in range(n_rows)
+    ]
+
+
+def _compiled_cardiovascular_drivers(
+    scorer, values: np.ndarray, contributions: np.ndarray
+) -> List[List[Dict[str, Any]]]:
+    """Same drivers as `_get_cardiovascular_drivers`, from precomputed contributions."""
+    top = _top_driver_indices(contributions)
+    drivers_by_row: List[List[Dict[str, Any]]] = []
+    for row in range(len(values)):
+        drivers = []
+        for idx in top[row]:
+            feature = scorer.output_names[idx]
+            raw_value = values[row, scorer.output_sources[idx]]
+            contrib = contributions[row, idx]
+            drivers.append(
+                {
+                    "feature": feature,
+                    "description": get_feature_description(feature),
+                    "value": float(raw_value) if not np.isnan(raw_value) else None,
+                    "shap_value": float(contrib),
+                    "impact": "aumenta" if contrib > 0 else "reduce",
+                }
+            )
+        drivers_by_row.append(drivers)
+    return drivers_by_row
 
 
-def _get_cardiovascular_drivers(model, features_df: pd.DataFrame, feature_names: List[str]) -> List[Dict[str, Any]]:
-    drivers: List[Dict[str, Any]] = []
+def _get_cardiovascular_drivers(
+    model, features_df: pd.DataFrame, feature_names: List[str]
+) -> List[List[Dict[str, Any]]]:
+    """Top drivers (scaled value * coefficient) for every row of the cardiovascular frame."""
+    n_rows = len(features_df)
 
     try:
         pipeline = None
@@ -300,38 +934,45 @@ def _get_cardiovascular_drivers(model, features_df: pd.DataFrame, feature_names:
         except Exception:
             transformed_names = feature_names or list(features_df.columns)
 
-        contributions = scaled[0] * classifier.coef_[0]
-        pairs = list(zip(transformed_names, contributions))
-        pairs.sort(key=lambda x: abs(x[1]), reverse=True)
+        contributions = scaled * classifier.coef_[0]
+        drivers_by_row: List[List[Dict[str, Any]]] = []
+        for row in range(n_rows):
+            raw_row = features_df.iloc[row]
+            pairs = list(zip(transformed_names, contributions[row]))
+            pairs.sort(key=lambda x: abs(x[1]), reverse=True)
 
-        for feature, contrib in pairs[:TOP_DRIVERS_COUNT]:
-            raw_value = features_df.iloc[0].get(feature, np.nan)
-            drivers.append(
-                {
-                    "feature": feature,
-                    "description": get_feature_description(feature),
-                    "value": float(raw_value) if not pd.isna(raw_value) else None,
-                    "shap_value": float(contrib),
-                    "impact": "aumenta" if contrib > 0 else "reduce",
-                }
-            )
+            drivers: List[Dict[str, Any]] = []
+            for feature, contrib in pairs[:TOP_DRIVERS_COUNT]:
+                raw_value = raw_row.get(feature, np.nan)
+                drivers.append(
+                    {
+                        "feature": feature,
+                        "description": get_feature_description(feature),
+                        "value": float(raw_value) if not pd.isna(raw_value) else None,
+                        "shap_value": float(contrib),
+                        "impact": "aumenta" if contrib > 0 else "reduce",
+                    }
+                )
+            drivers_by_row.append(drivers)
+        return drivers_by_row
 
     except Exception as exc:
         logger.warning("Unable to compute cardiovascular drivers precisely: %s", exc)
-        ordered_features = feature_names or list(features_df.columns)
-        for feature in ordered_features[:TOP_DRIVERS_COUNT]:
-            raw_value = features_df.iloc[0].get(feature, np.nan)
-            drivers.append(
-                {
-                    "feature": feature,
-                    "description": get_feature_description(feature),
-                    "value": float(raw_value) if not pd.isna(raw_value) else None,
-                    "shap_value": 0.0,
-                    "impact": "aumenta",
-                }
-            )
-            if len(drivers) >= TOP_DRIVERS_COUNT:
-                break
-
-    return drivers
-
+        ordered_features = (feature_names or list(features_df.columns))[:TOP_DRIVERS_COUNT]
+        drivers_by_row = []
+        for row in range(n_rows):
+            raw_row = features_df.iloc[row]
+            drivers = []
+            for feature in ordered_features:
+                raw_value = raw_row.get(feature, np.nan)
+                drivers.append(
+                    {
+                        "feature": feature,
+                        "description": get_feature_description(feature),
+                        "value": float(raw_value) if not pd.isna(raw_value) else None,
+                        "shap_value": 0.0,
+                        "impact": "aumenta",
+                    }
+                )
+            drivers_by_row.append(drivers)
+        return drivers_by_row
@@ -5,6 +5,7 @@ from typing import List, Dict, Optional
 from dataclasses import dataclass
 import re
 import logging
+import threading
 
 try:
     from rank_bm25 import BM25Okapi
@@ -321,3 +322,18 @@ class RAGCoachSystem:
         """Método de conveniencia para generar plan."""
         return self.coach.generate_plan(user_profile, risk_score, top_drivers)
 
+
+_rag_system: Optional[RAGCoachSystem] = None
+_rag_system_lock = threading.Lock()
+
+
+def get_rag_system() -> RAGCoachSystem:
+    """Get or initialize the shared RAG system (the KB index is built once per process)."""
+    global _rag_system
+    if _rag_system is None:
+        with _rag_system_lock:
+            if _rag_system is None:
+                from app.core.config import settings
+
+                _rag_system = RAGCoachSystem(kb_dir=str(settings.KB_DIR), api_key=settings.OPENAI_API_KEY)
+    return _rag_system
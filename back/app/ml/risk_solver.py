@@ -0,0 +1,283 @@
+"""
+Solver de metas de riesgo: el cambio más pequeño en un factor modificable que lleva
+el score a un nivel objetivo de `_interpret_risk` ("¿cuánta cintura debo bajar para
+quedar en riesgo bajo?").
+
+Every factor moves on a lattice of `FACTOR_STEPS` from the base value toward each end
+of its allowed range. The search is "smallest lattice index k that reaches the target"
+for every (factor, direction) family at once:
+
+1. coarse pass: ~COARSE_POINTS indices per family, all scored in one batch;
+2. bisection between the last coarse index that misses and the first that reaches the
+   target, every family in lockstep (one batch per round, ~log2(range/step) rounds).
+
+A combined family (all factors moved together by the same fraction of their range, each
+toward its most helpful end) covers targets no single factor reaches. Tree models are
+not monotone, so the answer is the first crossing found on the lattice, not a global
+optimum.
+"""
+
+import time
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from app.utils.metrics import metrics
+from .model_loader import get_active_model
+from .predictor import RISK_THRESHOLDS, _interpret_risk, score_columns
+from .what_if import MODIFIABLE_INPUTS, base_columns, follow_weight
+
+# Resolución de la respuesta por factor (unidades de la entrada)
+FACTOR_STEPS: Dict[str, float] = {
+    "weight_kg": 0.5,
+    "waist_cm": 0.5,
+    "sleep_hours": 0.25,
+    "days_mvpa_week": 1.0,
+    "smokes_cig_day": 1.0,
+    "total_cholesterol": 1.0,
+    "hdl_mgdl": 1.0,
+    "ldl_mgdl": 1.0,
+    "trigliceridos_mgdl": 1.0,
+}
+COARSE_POINTS = 16
+COMBINED_STEPS = 100  # El combinado avanza en pasos de 1% del rango de cada factor
+TARGET_LEVELS = ("low", "moderate")
+
+
+def default_ranges(base: Mapping[str, Any]) -> Dict[str, Tuple[float, float]]:
+    """Plausible ranges around the base value of every modifiable input present in `base`."""
+    ranges = {
+        "weight_kg": lambda v: (v * 0.8, v),
+        "waist_cm": lambda v: (max(v - 25.0, 55.0), v),
+        "sleep_hours": lambda v: (min(v, 7.0), max(v, 9.0)),
+        "days_mvpa_week": lambda v: (v, 7.0),
+        "smokes_cig_day": lambda v: (0.0, v),
+        "total_cholesterol": lambda v: (min(v, 150.0), v),
+        "hdl_mgdl": lambda v: (v, max(v, 80.0)),
+        "ldl_mgdl": lambda v: (min(v, 70.0), v),
+        "trigliceridos_mgdl": lambda v: (min(v, 80.0), v),
+    }
+    return {key: bounds(float(base[key])) for key, bounds in ranges.items() if base.get(key) is not None}
+
+
+class _Family:
+    """Lattice of one search direction: index k -> overridden input values."""
+
+    def __init__(self, name: str, n_max: int, values: Callable[[np.ndarray], Dict[str, np.ndarray]]):
+        self.name = name
+        self.n_max = n_max
+        self.values = values
+        self.k_fail = 0
+        self.k_pass: Optional[int] = None
+        self.score: Optional[float] = None
+        self.end_score: Optional[float] = None  # Score en k = n_max (pasada gruesa)
+
+
+class _Evaluator:
+    """Scores (family, k) rows in batches against one model snapshot."""
+
+    def __init__(self, active, base: Mapping[str, Any], threshold: float):
+        self.active = active
+        self.base = base
+        self.threshold = threshold
+        self.rows = 0
+        self.batches = 0
+
+    def score(self, requests: List[Tuple[_Family, np.ndarray]]) -> List[np.ndarray]:
+        sizes = [ks.size for _, ks in requests]
+        columns = base_columns(self.base, sum(sizes))
+        weight_rows = np.zeros(sum(sizes), dtype=bool)
+        start = 0
+        for (family, ks), size in zip(requests, sizes):
+            rows = slice(start, start + size)
+            for key, values in family.values(ks).items():
+                columns[key][rows] = values
+                weight_rows[rows] |= key == "weight_kg"
+            start += size
+        if weight_rows.any():
+            follow_weight(columns, self.base, weight_rows)
+
+        scores = np.asarray(score_columns(self.active, columns), dtype=np.float64)
+        self.rows += scores.size
+        self.batches += 1
+        return np.split(scores, np.cumsum(sizes)[:-1])
+
+
+def _search(evaluator: _Evaluator, families: List[_Family]) -> None:
+    """Smallest k reaching the target per family: coarse batch, then lockstep bisection."""
+    families = [family for family in families if family.n_max > 0]
+    if not families:
+        return
+
+    coarse = [
+        np.unique(np.round(np.linspace(1, family.n_max, min(family.n_max, COARSE_POINTS))).astype(int))
+        for family in families
+    ]
+    for family, ks, scores in zip(families, coarse, evaluator.score(list(zip(families, coarse)))):
+        family.end_score = float(scores[-1])
+        reached = np.flatnonzero(scores < evaluator.threshold)
+        if reached.size:
+            first = reached[0]
+            family.k_pass, family.score = int(ks[first]), float(scores[first])
+            family.k_fail = int(ks[first - 1]) if first > 0 else 0
+
+    pending = [family for family in families if family.k_pass is not None]
+    while True:
+        pending = [family for family in pending if family.k_pass - family.k_fail > 1]
+        if not pending:
+            return
+        mids = [np.array([(family.k_pass + family.k_fail) // 2]) for family in pending]
+        for family, mid, scores in zip(pending, mids, evaluator.score(list(zip(pending, mids)))):
+            if scores[0] < evaluator.threshold:
+                family.k_pass, family.score = int(mid[0]), float(scores[0])
+            else:
+                family.k_fail = int(mid[0])
+
+
+def solve_target(
+    base: Mapping[str, Any],
+    target_level: str = "low",
+    ranges: Optional[Mapping[str, Tuple[float, float]]] = None,
+    model_type: str = "diabetes",
+) -> Dict[str, Any]:
+    """
+    Smallest change per modifiable input (within `ranges`) that brings the score of
+    `base` below the lower bound of the level above `target_level`.
+
+    Args:
+        base: Profile with the `predict_risk` keyword names.
+        target_level: "low" or "moderate".
+        ranges: Input -> (min, max) allowed values; default `default_ranges(base)`.
+            Inputs missing from `base` cannot be solved and are reported as unreachable.
+
+    Returns:
+        {"model_type", "model_version", "target_level", "threshold", "base": {"score", "risk_level"},
+         "already_met", "solutions": [{"input", "from", "to", "change", "score", "risk_level"}],
+         "unreachable": [...], "combined": {"changes", "score", "risk_level", "fraction"} | None,
+         "evaluations", "batches"}
+    """
+    normalized_type = (model_type or "diabetes").lower()
+    if target_level not in TARGET_LEVELS:
+        raise ValueError(f"Nivel objetivo no soportado: {target_level} (usa {', '.join(TARGET_LEVELS)})")
+    ranges = default_ranges(base) if ranges is None else dict(ranges)
+    unknown = set(ranges) - set(MODIFIABLE_INPUTS)
+    if unknown:
+        raise ValueError(f"Factores no modificables: {', '.join(sorted(unknown))}")
+
+    started = time.perf_counter()
+    thresholds = RISK_THRESHOLDS["cardiovascular" if normalized_type == "cardiovascular" else "diabetes"]
+    threshold = thresholds["moderate" if target_level == "low" else "high"]
+    active = get_active_model(normalized_type)
+    evaluator = _Evaluator(active, base, threshold)
+
+    def level(score: float) -> str:
+        return _interpret_risk(score, model_type=normalized_type)[0]
+
+    result: Dict[str, Any] = {
+        "model_type": normalized_type,
+        "model_version": active.version,
+        "target_level": target_level,
+        "threshold": threshold,
+        "solutions": [],
+        "unreachable": [],
+        "combined": None,
+    }
+
+    # Familias por factor y dirección dentro del rango permitido
+    families: List[_Family] = []
+    lattice: Dict[str, Dict[float, int]] = {}
+    for key, (low, high) in ranges.items():
+        if base.get(key) is None:
+            result["unreachable"].append(key)
+            continue
+        origin, step = float(base[key]), FACTOR_STEPS[key]
+        lattice[key] = {+1.0: int(np.floor((high - origin) / step + 1e-9)), -1.0: int(np.floor((origin - low) / step + 1e-9))}
+        for direction, n_max in lattice[key].items():
+            families.append(_Family(
+                f"{key}:{direction:+.0f}",
+                n_max,
+                lambda ks, key=key, origin=origin, step=step, direction=direction: {key: origin + direction * step * ks},
+            ))
+
+    # Perfil base primero: si ya cumple la meta no hay nada que buscar
+    base_family = _Family("base", 1, lambda ks: {})
+    base_score = float(evaluator.score([(base_family, np.array([0]))])[0][0])
+    result["base"] = {"score": base_score, "risk_level": level(base_score)}
+    result["already_met"] = base_score < threshold
+    if result["already_met"]:
+        return _finish(result, evaluator, normalized_type, started)
+
+    _search(evaluator, families)
+
+    best: Dict[str, _Family] = {}
+    for family in families:
+        key = family.name.split(":")[0]
+        if family.k_pass is not None and (key not in best or family.k_pass < best[key].k_pass):
+            best[key] = family
+    for key in lattice:
+        family = best.get(key)
+        if family is None:
+            result["unreachable"].append(key)
+            continue
+        to = float(family.values(np.array([family.k_pass]))[key][0])
+        result["solutions"].append({
+            "input": key,
+            "from": float(base[key]),
+            "to": to,
+            "change": to - float(base[key]),
+            "score": family.score,
+            "risk_level": level(family.score),
+        })
+    # Primero los cambios relativos más pequeños
+    result["solutions"].sort(key=lambda s: abs(s["change"]) / max(abs(s["from"]), 1.0))
+
+    if len(lattice) > 1:
+        result["combined"] = _solve_combined(evaluator, base, base_score, families, level)
+
+    return _finish(result, evaluator, normalized_type, started)
+
+
+def _solve_combined(evaluator, base, base_score, families, level) -> Optional[Dict[str, Any]]:
+    """All factors moved by the same fraction of their range, each toward the end that lowered risk most."""
+    # Dirección útil por factor: la del extremo con menor score en la pasada gruesa;
+    # los factores que no bajan el score (p. ej. no los usa el modelo) no se mueven
+    directions: Dict[str, Tuple[float, int]] = {}
+    best_score: Dict[str, float] = {}
+    for family in families:
+        if family.end_score is None:
+            continue
+        key, direction = family.name.split(":")
+        if key not in best_score or family.end_score < best_score[key]:
+            best_score[key] = family.end_score
+            directions[key] = (float(direction), family.n_max)
+    # Tolerancia: el mismo perfil puede variar en el último ulp según el tamaño del lote
+    directions = {key: direction for key, direction in directions.items() if best_score[key] < base_score - 1e-9}
+    if not directions:
+        return None
+
+    def values(ks: np.ndarray) -> Dict[str, np.ndarray]:
+        fractions = ks / COMBINED_STEPS
+        return {
+            key: float(base[key]) + direction * FACTOR_STEPS[key] * np.floor(fractions * n_max + 1e-9)
+            for key, (direction, n_max) in directions.items()
+        }
+
+    combined = _Family("combined", COMBINED_STEPS, values)
+    _search(evaluator, [combined])
+    if combined.k_pass is None:
+        return None
+    changes = {key: float(value[0]) for key, value in values(np.array([combined.k_pass])).items()}
+    return {
+        "changes": {key: value for key, value in changes.items() if value != float(base[key])},
+        "score": combined.score,
+        "risk_level": level(combined.score),
+        "fraction": combined.k_pass / COMBINED_STEPS,
+    }
+
+
+def _finish(result: Dict[str, Any], evaluator: _Evaluator, model_type: str, started: float) -> Dict[str, Any]:
+    result["evaluations"] = evaluator.rows
+    result["batches"] = evaluator.batches
+    metrics.observe("prediction_stage_seconds", time.perf_counter() - started, model=model_type, stage="target_solver")
+    metrics.inc("predictions_total", evaluator.rows, model=model_type, path="target_solver")
+    return result
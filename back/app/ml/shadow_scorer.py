@@ -0,0 +1,282 @@
+"""
+Shadow scoring: a candidate model re-scores a sample of live predictions off the
+request path, and the differences against the served model are aggregated.
+
+The continuous version of `back/test_new_cardiovascular.py`. Responses never wait on
+the candidate: sampled profiles go to a single background thread through a bounded
+queue, and samples are dropped (and counted) when the queue is full.
+"""
+
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import joblib
+
+from app.core.config import settings
+from app.utils.histogram import Histogram
+from . import model_loader
+from .model_registry import ActiveModel, get_registry, make_active_model
+from .predictor import _interpret_risk, score_profiles
+
+logger = logging.getLogger(__name__)
+
+DELTA_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.2, 0.5)
+SHADOW_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+def parse_candidate(spec: str) -> Tuple[str, str]:
+    """"cardiovascular@v2" -> ("cardiovascular", "v2")."""
+    model_type, sep, target = (spec or "").partition("@")
+    if not sep or not target:
+        raise ValueError(f"SHADOW_CANDIDATE must look like '<type>@<version or path>', got {spec!r}")
+    return model_loader._normalize_model_type(model_type.strip()), target.strip()
+
+
+def load_candidate(model_type: str, target: str) -> ActiveModel:
+    """
+    Load the candidate without activating it: a registry version, an artifacts
+    directory, or (cardiovascular) a single pipeline pickle such as model_cardiovascular.pkl.
+    """
+    path = Path(target)
+    if not path.exists():
+        return get_registry().load_version(model_type, target)
+
+    if path.is_dir():
+        model, imputer, feature_names = model_loader.load_bundle_from_dir(model_type, path)
+    elif model_type == "cardiovascular":
+        model, imputer = joblib.load(path), None
+        feature_names = model_loader.infer_cardiovascular_feature_names(model)
+    else:
+        raise ValueError("A diabetes candidate needs a registry version or an artifacts directory")
+
+    source_dir = path if path.is_dir() else path.parent
+    version = f"{path.name}@{model_loader.artifacts_fingerprint(model_type, source_dir)}"
+    return make_active_model(model_type, version, model, imputer, feature_names, source_dir)
+
+
+class ShadowScorer:
+    """
+    Samples served predictions of one model type, scores them with a candidate on a
+    background thread and keeps score-delta / risk-level disagreement statistics,
+    plus one JSON line per comparison in `log_path`.
+    """
+
+    def __init__(
+        self,
+        model_type: str,
+        target: str,
+        sample_rate: float = 0.1,
+        max_queue: int = 256,
+        log_path: Optional[Path] = None,
+    ):
+        self.model_type = model_type
+        self.target = target
+        self.sample_rate = sample_rate
+        self.max_queue = max_queue
+        self.log_path = Path(log_path) if log_path else None
+        self._candidate: Optional[ActiveModel] = None
+        self._candidate_error: Optional[str] = None
+        self._queue: "queue.Queue[Optional[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]]" = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self.sampled = 0
+        self.scored = 0
+        self.dropped = 0
+        self.failed = 0
+        self.disagreements = 0
+        self.delta_sum = 0.0
+        self.level_transitions: Counter = Counter()
+        self.abs_delta = Histogram(DELTA_BUCKETS)
+        self.latency = Histogram(SHADOW_LATENCY_BUCKETS)
+        self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+        self._thread.start()
+
+    def submit(self, profiles: Sequence[Dict[str, Any]], results: Sequence[Dict[str, Any]]) -> None:
+        """Sample from already-served (profile, result) pairs; never blocks."""
+        pairs = [
+            (profile, result)
+            for profile, result in zip(profiles, results)
+            if result.get("model_used") == self.model_type and self._random.random() < self.sample_rate
+        ]
+        if not pairs:
+            return
+        try:
+            self._queue.put_nowait(([dict(p) for p, _ in pairs], [r for _, r in pairs]))
+        except queue.Full:
+            with self._lock:
+                self.dropped += len(pairs)
+            return
+        with self._lock:
+            self.sampled += len(pairs)
+
+    def _get_candidate(self) -> Optional[ActiveModel]:
+        if self._candidate is None and self._candidate_error is None:
+            try:
+                self._candidate = load_candidate(self.model_type, self.target)
+                logger.info("Shadow candidate loaded: %s@%s", self.model_type, self._candidate.version)
+            except Exception as e:
+                self._candidate_error = str(e)
+                logger.error("Shadow candidate %s@%s unusable: %s", self.model_type, self.target, e)
+        return self._candidate
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            profiles, results = item
+            candidate = self._get_candidate()
+            if candidate is None:
+                with self._lock:
+                    self.failed += len(profiles)
+                continue
+
+            started = time.perf_counter()
+            try:
+                scores = score_profiles(candidate, profiles)
+            except Exception as e:
+                logger.warning("Shadow scoring failed: %s", e)
+                with self._lock:
+                    self.failed += len(profiles)
+                continue
+            elapsed = time.perf_counter() - started
+            self.latency.observe(elapsed)
+            self._record(candidate, results, scores, elapsed)
+
+    def _record(self, candidate: ActiveModel, results, scores, elapsed: float) -> None:
+        lines = []
+        comparisons = []
+        for result, shadow_score in zip(results, scores):
+            shadow_score = float(shadow_score)
+            shadow_level, _ = _interpret_risk(shadow_score, model_type=self.model_type)
+            delta = shadow_score - result["score"]
+            comparisons.append((delta, result["risk_level"], shadow_level))
+            lines.append(json.dumps({
+                "ts": time.time(),
+                "model_type": self.model_type,
+                "served_version": result.get("model_version"),
+                "candidate_version": candidate.version,
+                "served_score": result["score"],
+                "candidate_score": shadow_score,
+                "delta": delta,
+                "served_level": result["risk_level"],
+                "candidate_level": shadow_level,
+                "candidate_seconds": elapsed / len(scores),
+            }))
+        self._write_log(lines)
+
+        # Contadores al final: flush() da por terminada la muestra cuando ya está en el log
+        for delta, served_level, shadow_level in comparisons:
+            self.abs_delta.observe(abs(delta))
+            with self._lock:
+                self.scored += 1
+                self.delta_sum += delta
+                if shadow_level != served_level:
+                    self.disagreements += 1
+                self.level_transitions[f"{served_level}->{shadow_level}"] += 1
+
+    def _write_log(self, lines: List[str]) -> None:
+        if self.log_path is None or not lines:
+            return
+        try:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            # O_APPEND: líneas de varios workers forkeados no se pisan entre sí
+            with open(self.log_path, "a") as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError as e:
+            logger.warning("Could not write shadow log %s: %s", self.log_path, e)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until every queued sample has been scored (tests and shutdown)."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                done = self.scored + self.failed >= self.sampled
+            if done and self._queue.empty():
+                return True
+            time.sleep(0.01)
+        return False
+
+    def stop(self) -> None:
+        try:
+            self._queue.put(None, timeout=1)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=5)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            scored = self.scored
+            return {
+                "model_type": self.model_type,
+                "candidate": self.target,
+                "candidate_version": self._candidate.version if self._candidate else None,
+                "candidate_error": self._candidate_error,
+                "sample_rate": self.sample_rate,
+                "pending": self._queue.qsize(),
+                "sampled": self.sampled,
+                "scored": scored,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "disagreements": self.disagreements,
+                "disagreement_rate": self.disagreements / scored if scored else 0.0,
+                "mean_delta": self.delta_sum / scored if scored else 0.0,
+                "level_transitions": dict(self.level_transitions),
+                "abs_delta": self.abs_delta.snapshot(),
+                "candidate_seconds": self.latency.snapshot(),
+                "log_path": str(self.log_path) if self.log_path else None,
+            }
+
+
+_shadow_scorer: Optional[ShadowScorer] = None
+_shadow_lock = threading.Lock()
+
+
+def _default_log_path() -> Path:
+    if settings.SHADOW_LOG_PATH:
+        return Path(settings.SHADOW_LOG_PATH)
+    return Path(__file__).resolve().parents[2] / "logs" / "shadow_scores.jsonl"
+
+
+def get_shadow_scorer() -> ShadowScorer:
+    """Shadow scorer compartido, configurado con SHADOW_CANDIDATE / SHADOW_SAMPLE_RATE."""
+    global _shadow_scorer
+    if _shadow_scorer is None:
+        with _shadow_lock:
+            if _shadow_scorer is None:
+                model_type, target = parse_candidate(settings.SHADOW_CANDIDATE)
+                _shadow_scorer = ShadowScorer(
+                    model_type,
+                    target,
+                    sample_rate=settings.SHADOW_SAMPLE_RATE,
+                    max_queue=settings.SHADOW_MAX_QUEUE,
+                    log_path=_default_log_path(),
+                )
+    return _shadow_scorer
+
+
+def stop_shadow_scorer() -> None:
+    global _shadow_scorer
+    with _shadow_lock:
+        if _shadow_scorer is not None:
+            _shadow_scorer.stop()
+            _shadow_scorer = None
+
+
+def _reset_after_fork() -> None:
+    # El hilo del scorer no sobrevive al fork: cada worker crea el suyo al primer uso
+    global _shadow_scorer, _shadow_lock
+    _shadow_scorer = None
+    _shadow_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,134 @@
+"""
+Incertidumbre del riesgo por error de medición (Monte Carlo).
+
+Waist, weight and lab values are self-reported or single measurements, so one point
+score overstates precision. `predict_risk_interval` draws K perturbed copies of the
+profile from per-field error models, scores the point profile and all K copies in one
+vectorized batch (`score_columns`, no drivers), and summarizes the score distribution
+as an interval plus the probability of being at or above each threshold of
+`_interpret_risk`.
+"""
+
+import time
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.utils.metrics import metrics
+from .model_loader import get_active_model
+from .predictor import RISK_THRESHOLDS, _interpret_risk, score_columns
+
+# Campo -> (tipo, desviación): "abs" en unidades del campo, "rel" como coeficiente de variación.
+# Valores típicos de auto-reporte/medición casera y variabilidad analítica + biológica de laboratorio.
+ERROR_MODELS: Dict[str, Tuple[str, float]] = {
+    "height_cm": ("abs", 1.0),
+    "weight_kg": ("rel", 0.02),
+    "bmi": ("rel", 0.03),             # solo si no hay peso del que derivarlo
+    "waist_cm": ("abs", 2.5),
+    "sleep_hours": ("abs", 0.5),
+    "systolic_bp": ("abs", 6.0),
+    "total_cholesterol": ("rel", 0.05),
+    "glucosa_mgdl": ("rel", 0.06),
+    "hdl_mgdl": ("rel", 0.06),
+    "ldl_mgdl": ("rel", 0.08),
+    "trigliceridos_mgdl": ("rel", 0.15),
+}
+
+_INPUTS = (
+    "age", "height_cm", "weight_kg", "bmi", "waist_cm", "sleep_hours", "smokes_cig_day",
+    "days_mvpa_week", "systolic_bp", "total_cholesterol", "glucosa_mgdl", "hdl_mgdl", "ldl_mgdl",
+    "trigliceridos_mgdl",
+)
+# Ninguna muestra baja de esta fracción del valor informado (evita pesos o lípidos <= 0)
+_MIN_FRACTION = 0.25
+
+
+def sample_profiles(
+    profile: Mapping[str, Any],
+    samples: int,
+    rng: np.random.Generator,
+    error_models: Optional[Mapping[str, Tuple[str, float]]] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Columns for the unperturbed profile (row 0) followed by `samples` perturbed copies.
+    Missing fields stay missing; with a known weight, BMI follows the perturbed weight
+    and height (scaling the given BMI, or recomputed from both when none was given).
+    """
+    error_models = ERROR_MODELS if error_models is None else error_models
+    n_rows = samples + 1
+    columns: Dict[str, np.ndarray] = {
+        key: np.full(n_rows, np.nan if profile.get(key) is None else float(profile[key])) for key in _INPUTS
+    }
+    columns["sex"] = np.full(n_rows, profile.get("sex"), dtype=object)
+
+    for key, (kind, spread) in error_models.items():
+        value = columns[key][0]
+        if np.isnan(value) or spread <= 0:
+            continue
+        noise = rng.standard_normal(samples)
+        perturbed = value + spread * noise if kind == "abs" else value * (1.0 + spread * noise)
+        if value > 0:
+            np.maximum(perturbed, _MIN_FRACTION * value, out=perturbed)
+        columns[key][1:] = perturbed
+
+    height, weight, bmi = columns["height_cm"], columns["weight_kg"], columns["bmi"]
+    if bmi[0] > 0 and weight[0] > 0:
+        # IMC informado (fila 0): sigue al peso y la altura perturbados, sin recalcularse
+        scale = weight[1:] / weight[0]
+        if height[0] > 0:
+            scale *= (height[0] / height[1:]) ** 2
+        bmi[1:] = bmi[0] * scale
+    elif height[0] > 0 and weight[0] > 0:
+        bmi[1:] = weight[1:] / (height[1:] / 100) ** 2
+    return columns
+
+
+def predict_risk_interval(
+    profile: Mapping[str, Any],
+    model_type: str = "diabetes",
+    samples: Optional[int] = None,
+    level: float = 0.9,
+    seed: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Monte Carlo risk interval for a `predict_risk` profile.
+
+    Returns:
+        {"score": point score, "mean", "std", "interval": [low, high] (central `level`),
+         "samples", "level_probabilities": {"low", "moderate", "high"},
+         "threshold_probabilities": {"moderate", "high", "referral"}}  # P(score >= umbral)
+    """
+    normalized_type = (model_type or "diabetes").lower()
+    samples = settings.UNCERTAINTY_SAMPLES if samples is None else samples
+    if samples < 1:
+        raise ValueError("samples must be >= 1")
+    started = time.perf_counter()
+
+    columns = sample_profiles(profile, samples, np.random.default_rng(seed))
+    active = get_active_model(normalized_type)
+    scores = np.asarray(score_columns(active, columns), dtype=np.float64)
+    point, draws = float(scores[0]), scores[1:]
+
+    thresholds = RISK_THRESHOLDS["cardiovascular" if normalized_type == "cardiovascular" else "diabetes"]
+    above = {name: float(np.mean(draws >= threshold)) for name, threshold in thresholds.items()}
+    tail = (1.0 - level) / 2.0
+    low, high = np.quantile(draws, [tail, 1.0 - tail])
+
+    metrics.observe("prediction_stage_seconds", time.perf_counter() - started, model=normalized_type, stage="uncertainty")
+    return {
+        "score": point,
+        "risk_level": _interpret_risk(point, model_type=normalized_type)[0],
+        "mean": float(draws.mean()),
+        "std": float(draws.std()),
+        "interval": [float(low), float(high)],
+        "interval_level": level,
+        "samples": samples,
+        "level_probabilities": {
+            "low": 1.0 - above["moderate"],
+            "moderate": above["moderate"] - above["high"],
+            "high": above["high"],
+        },
+        "threshold_probabilities": above,
+        "model_version": active.version,
+    }
@@ -0,0 +1,132 @@
+"""
+Barridos "what-if": riesgo de un perfil base bajo una grilla de cambios en factores
+modificables (peso, cintura, sueño, actividad, tabaco, lípidos).
+
+The whole grid (cartesian product of the per-factor values, plus the unchanged base
+profile as row 0) is laid out as numpy columns and goes through the columnar feature
+builders and the model in a single batch call, instead of one `predict_risk` per
+scenario. Only scores are computed: drivers of every scenario are not needed to
+answer "what happens if...".
+"""
+
+import time
+from typing import Any, Dict, Mapping, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.utils.metrics import metrics
+from .model_loader import get_active_model
+from .predictor import _interpret_risk, score_columns
+
+# Entradas de `predict_risk` que el usuario puede cambiar
+MODIFIABLE_INPUTS = (
+    "weight_kg", "waist_cm", "sleep_hours", "days_mvpa_week", "smokes_cig_day",
+    "total_cholesterol", "hdl_mgdl", "ldl_mgdl", "trigliceridos_mgdl",
+)
+_ALL_INPUTS = (
+    "age", "sex", "height_cm", "weight_kg", "bmi", "waist_cm", "sleep_hours", "smokes_cig_day",
+    "days_mvpa_week", "systolic_bp", "total_cholesterol", "glucosa_mgdl", "hdl_mgdl", "ldl_mgdl",
+    "trigliceridos_mgdl",
+)
+
+
+def _as_float(value: Any) -> float:
+    return np.nan if value is None else float(value)
+
+
+def base_columns(base: Mapping[str, Any], n_rows: int) -> Dict[str, np.ndarray]:
+    """`predict_risk` input columns with the base profile repeated on every row."""
+    columns: Dict[str, np.ndarray] = {
+        key: np.full(n_rows, _as_float(base.get(key))) for key in _ALL_INPUTS if key != "sex"
+    }
+    columns["sex"] = np.full(n_rows, base.get("sex"), dtype=object)
+    return columns
+
+
+def follow_weight(columns: Dict[str, np.ndarray], base: Mapping[str, Any], rows) -> None:
+    """
+    Make BMI follow the weight of `rows` (index or mask): an explicit base BMI is
+    scaled by the weight ratio (row 0 keeps it as given, so the scenarios stay
+    comparable to it); without one, BMI is recomputed from height.
+    """
+    height = _as_float(base.get("height_cm"))
+    base_weight = _as_float(base.get("weight_kg"))
+    base_bmi = _as_float(base.get("bmi"))
+    if base_bmi > 0 and base_weight > 0:
+        columns["bmi"][rows] = base_bmi * columns["weight_kg"][rows] / base_weight
+    elif height > 0:
+        columns["bmi"][rows] = columns["weight_kg"][rows] / (height / 100) ** 2
+
+
+def build_scenario_columns(base: Mapping[str, Any], grid: Mapping[str, Sequence[float]]) -> Dict[str, np.ndarray]:
+    """
+    Columns of `predict_risk` inputs for the base profile (row 0) followed by every
+    combination of `grid` values, in row-major order of the grid keys. When weight
+    changes, BMI follows it (see `follow_weight`).
+    """
+    unknown = set(grid) - set(MODIFIABLE_INPUTS)
+    if unknown:
+        raise ValueError(f"Factores no modificables: {', '.join(sorted(unknown))}")
+
+    axes = [np.asarray(grid[key], dtype=np.float64) for key in grid]
+    n_scenarios = int(np.prod([axis.size for axis in axes])) if axes else 0
+    if n_scenarios > settings.WHAT_IF_MAX_SCENARIOS:
+        raise ValueError(
+            f"La grilla tiene {n_scenarios} escenarios (máximo {settings.WHAT_IF_MAX_SCENARIOS})"
+        )
+
+    columns = base_columns(base, n_scenarios + 1)
+    if axes:
+        mesh = np.meshgrid(*axes, indexing="ij")
+        for key, values in zip(grid, mesh):
+            columns[key][1:] = values.ravel()
+
+    if "weight_kg" in grid:
+        follow_weight(columns, base, slice(1, None))
+
+    return columns
+
+
+def sweep_risk(
+    base: Mapping[str, Any], grid: Mapping[str, Sequence[float]], model_type: str = "diabetes"
+) -> Dict[str, Any]:
+    """
+    Score the base profile and every scenario of `grid` in one batch.
+
+    Args:
+        base: Profile with the `predict_risk` keyword names.
+        grid: Modifiable input -> absolute values to try, e.g. {"weight_kg": [80, 75]}.
+
+    Returns:
+        {"model_type", "model_version", "base": {"score", "risk_level"},
+         "scenarios": [{"changes", "score", "delta", "risk_level"}, ...]}
+    """
+    normalized_type = (model_type or "diabetes").lower()
+    started = time.perf_counter()
+    columns = build_scenario_columns(base, grid)
+
+    active = get_active_model(normalized_type)
+    scores = np.asarray(score_columns(active, columns), dtype=np.float64)
+
+    base_score = float(scores[0])
+    keys = list(grid)
+    scenarios = []
+    for row in range(1, scores.size):
+        score = float(scores[row])
+        scenarios.append({
+            "changes": {key: float(columns[key][row]) for key in keys},
+            "score": score,
+            "delta": score - base_score,
+            "risk_level": _interpret_risk(score, model_type=normalized_type)[0],
+        })
+
+    metrics.observe("prediction_stage_seconds", time.perf_counter() - started, model=normalized_type, stage="what_if")
+    metrics.inc("predictions_total", scores.size, model=normalized_type, path="what_if")
+
+    return {
+        "model_type": normalized_type,
+        "model_version": active.version,
+        "base": {"score": base_score, "risk_level": _interpret_risk(base_score, model_type=normalized_type)[0]},
+        "scenarios": scenarios,
+    }
@@ -0,0 +1,62 @@
+# app/routes/admin_routes.py
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import BaseModel
+
+from app.core.security import verify_admin_token
+from app.ml.model_loader import MODEL_TYPES
+from app.ml.model_registry import ModelVersionError, get_registry
+
+router = APIRouter(dependencies=[Depends(verify_admin_token)])
+
+
+class ActivacionModelo(BaseModel):
+    version: str
+    background: bool = True  # False: espera a que la versión esté cargada y activa
+
+
+def _validar_tipo(model_type: str) -> str:
+    model_type = model_type.lower()
+    if model_type not in MODEL_TYPES:
+        raise HTTPException(status_code=400, detail="Modelo no soportado")
+    return model_type
+
+
+@router.get("/models")
+def listar_modelos():
+    """Versión activa, versiones registradas, historial y activaciones en curso por modelo."""
+    return get_registry().status()
+
+
+@router.post("/models/{model_type}/activate")
+def activar_version(model_type: str, data: ActivacionModelo):
+    """
+    Activa una versión registrada. Por defecto la carga y el smoke test ocurren en
+    segundo plano y el cambio es atómico: las peticiones en curso terminan con
+    la versión anterior.
+    """
+    model_type = _validar_tipo(model_type)
+    registry = get_registry()
+    if data.version not in registry.list_versions(model_type) and not data.version.startswith("legacy-"):
+        raise HTTPException(status_code=404, detail=f"Versión desconocida: {data.version}")
+
+    if data.background:
+        registry.activate_in_background(model_type, data.version)
+        return {"model_type": model_type, "version": data.version, "status": "loading"}
+
+    try:
+        active = registry.activate(model_type, data.version)
+    except ModelVersionError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return {"model_type": model_type, "version": active.version, "status": "active"}
+
+
+@router.post("/models/{model_type}/rollback")
+def revertir_version(model_type: str):
+    """Vuelve a servir la versión anterior del historial."""
+    model_type = _validar_tipo(model_type)
+    try:
+        active = get_registry().rollback(model_type)
+    except ModelVersionError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return {"model_type": model_type, "version": active.version, "status": "active"}
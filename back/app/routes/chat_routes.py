@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from starlette.concurrency import run_in_threadpool
 from app.core.security import verify_supabase_token
 from app.core.database import (
     get_or_create_session,
@@ -57,7 +58,10 @@ async def handle_chat_message(
     history = get_messages_by_session(session_id_str, access_token)
 
     # 4. Procesar con el Agente Conversacional
-    response_text, assessment_result, prediction_made = process_chat_message(history)
+    # Fuera del event loop: OpenAI es bloqueante y la predicción pasa por el executor de inferencia
+    response_text, assessment_result, prediction_made = await run_in_threadpool(
+        process_chat_message, history
+    )
 
     # Línea 62-63: Guardar respuesta del asistente
     assistant_message = save_chat_message(
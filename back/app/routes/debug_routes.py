@@ -1,7 +1,12 @@
 # app/routes/debug_routes.py
 
 from fastapi import APIRouter
+from app.core.config import settings
 from app.core.database import get_supabase
+from app.ml.micro_batcher import get_micro_batcher
+from app.ml.predictor import get_prediction_cache_stats
+from app.ml.shadow_scorer import get_shadow_scorer
+from app.services.inference_executor import get_inference_executor
 
 router = APIRouter()
 
@@ -23,3 +28,34 @@ def debug_supabase():
             "status": "error",
             "detail": str(e)
         }
+
+
+@router.get("/prediction-cache")
+def debug_prediction_cache():
+    """
+    Contadores del cache de predicciones (hits, misses, evictions, expirations)
+    para dimensionar PREDICTION_CACHE_SIZE y PREDICTION_CACHE_TTL_SECONDS.
+    """
+    return get_prediction_cache_stats()
+
+
+@router.get("/inference-executor")
+def debug_inference_executor():
+    """Estado del executor de inferencia: pendientes, rechazos y espera en cola."""
+    return get_inference_executor().stats()
+
+
+@router.get("/micro-batcher")
+def debug_micro_batcher():
+    """Histogramas de tamaño de lote y espera del micro-batcher (MICRO_BATCHING_ENABLED)."""
+    if not settings.MICRO_BATCHING_ENABLED:
+        return {"enabled": False}
+    return {"enabled": True, **get_micro_batcher().stats()}
+
+
+@router.get("/shadow")
+def debug_shadow():
+    """Comparación del modelo candidato (SHADOW_CANDIDATE) contra el servido: deltas y desacuerdos."""
+    if not settings.SHADOW_CANDIDATE:
+        return {"enabled": False}
+    return {"enabled": True, **get_shadow_scorer().stats()}
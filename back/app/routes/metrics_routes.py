@@ -0,0 +1,93 @@
+# app/routes/metrics_routes.py
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.ml import audit_log, micro_batcher, shadow_scorer
+from app.ml.model_registry import get_registry
+from app.ml.predictor import get_prediction_cache_stats
+from app.services import inference_executor
+from app.utils.metrics import metrics, render_metrics
+
+router = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _prediction_cache_samples():
+    stats = get_prediction_cache_stats()
+    for name in ("hits", "misses", "evictions", "expirations"):
+        yield f"prediction_cache_{name}_total", "counter", f"Prediction cache {name}", {}, stats[name]
+    yield "prediction_cache_entries", "gauge", "Entries in the prediction cache", {}, stats["size"]
+
+
+def _inference_executor_samples():
+    # Sin crear el executor: un scrape no debe arrancar el pool de procesos
+    executor = inference_executor._executor
+    if executor is None:
+        return
+    stats = executor.stats()
+    labels = {"mode": stats["mode"]}
+    yield "inference_pending", "gauge", "Inference calls running or queued", labels, stats["pending"]
+    for name in ("submitted", "completed", "failed", "rejected"):
+        yield f"inference_{name}_total", "counter", f"Inference calls {name}", labels, stats[name]
+    pool = stats.get("pool") or {}
+    if pool:
+        yield "inference_worker_restarts_total", "counter", "Forked inference workers replaced", labels, pool["restarts"]
+        yield "inference_worker_recycles_total", "counter", "Forked worker pool recycles", labels, pool["recycles"]
+
+
+def _micro_batcher_samples():
+    # Igual que el executor: solo se lee la instancia si ya existe, sin arrancar su hilo
+    batcher = micro_batcher._micro_batcher
+    if batcher is None:
+        return
+    stats = batcher.stats()
+    yield "micro_batcher_pending", "gauge", "Predictions waiting for a micro-batch", {}, stats["pending"]
+    yield "micro_batcher_batches_total", "counter", "Micro-batches scored", {}, stats["batches"]
+    yield "micro_batcher_fallbacks_total", "counter", "Micro-batches retried row by row", {}, stats["fallbacks"]
+    yield "micro_batcher_cache_hits_total", "counter", "Predictions answered from the cache without enqueuing", {}, stats["cache_hits"]
+
+
+def _model_registry_samples():
+    for model_type, status in get_registry().status()["models"].items():
+        if status["loaded"]:
+            labels = {"model": model_type, "version": status["active_version"]}
+            yield "model_loaded_timestamp_seconds", "gauge", "Load time of the served model version", labels, status["loaded_at"]
+
+
+def _shadow_samples():
+    scorer = shadow_scorer._shadow_scorer
+    if scorer is None:
+        return
+    stats = scorer.stats()
+    labels = {"model": stats["model_type"]}
+    for name in ("sampled", "scored", "dropped", "failed", "disagreements"):
+        yield f"shadow_{name}_total", "counter", f"Shadow comparisons {name}", labels, stats[name]
+
+
+def _audit_samples():
+    sink = audit_log._audit_sink
+    if sink is None:
+        return
+    stats = sink.stats()
+    for name in ("recorded", "written", "dropped", "failed"):
+        yield f"audit_records_{name}_total", "counter", f"Prediction audit records {name}", {}, stats[name]
+    yield "audit_records_pending", "gauge", "Prediction audit records waiting for a flush", {}, stats["pending"]
+
+
+for _collector in (
+    _prediction_cache_samples,
+    _inference_executor_samples,
+    _micro_batcher_samples,
+    _model_registry_samples,
+    _shadow_samples,
+    _audit_samples,
+):
+    metrics.register_collector(_collector)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Latencias por etapa, llamadas externas y contadores de serving en formato Prometheus."""
+    return PlainTextResponse(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
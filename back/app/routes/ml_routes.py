@@ -1,33 +1,59 @@
 # app/routes/ml_routes.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from datetime import date
+from typing import List, Optional
 from app.schemas.analisis_schema import (
     AnalisisEntrada, 
     PrediccionResultado, 
     CoachEntrada, 
     CoachResultado,
-    AnalisisRegistro
+    AnalisisRegistro,
+    PrediccionLoteEntrada,
+    PrediccionLoteResultado,
+    WhatIfEntrada,
+    WhatIfResultado,
+    MetaRiesgoEntrada,
+    MetaRiesgoResultado,
+    PrediccionMultiResultado,
 )
-from app.services.ml_service import obtener_prediccion
+from app.services.ml_service import (
+    obtener_meta_riesgo,
+    obtener_prediccion,
+    obtener_prediccion_multi,
+    obtener_predicciones_lote,
+    obtener_what_if,
+)
+from app.services.bulk_scoring import BULK_FORMATS, RespuestaNDJSONStreaming, detectar_formato, puntuar_stream
 from app.core.security import verify_supabase_token
 from app.core.database import guardar_analisis, obtener_historial_analisis
-from app.core.config import settings
-from app.ml.rag_system import RAGCoachSystem
+from app.ml.rag_system import get_rag_system
+from app.services.inference_executor import InferenceQueueFullError, run_inference, run_single_prediction
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-_rag_system = None
+async def _ejecutar_inferencia(func, *args, **kwargs) -> dict:
+    """Corre la predicción en el executor de inferencia; 503 si la cola está llena."""
+    return await _responder_503_si_saturado(run_inference(func, *args, **kwargs))
+
+
+async def _ejecutar_prediccion(data: AnalisisEntrada, model_type: str) -> dict:
+    """Predicción individual: pasa por el micro-batcher si está activo; 503 si la cola está llena."""
+    return await _responder_503_si_saturado(run_single_prediction(obtener_prediccion, data, model_type=model_type))
+
+
+async def _responder_503_si_saturado(llamada) -> dict:
+    try:
+        return await llamada
+    except InferenceQueueFullError as e:
+        logger.warning(f"Inferencia rechazada: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servicio de predicción saturado, intenta nuevamente en unos segundos",
+        )
 
-def get_rag_system():
-    """Get or initialize RAG system."""
-    global _rag_system
-    if _rag_system is None:
-        kb_dir = str(settings.KB_DIR)
-        _rag_system = RAGCoachSystem(kb_dir=kb_dir, api_key=settings.OPENAI_API_KEY)
-    return _rag_system
 
 # ENDPOINT 1: /predict (Requisito A4, C1)
 # Rápido, solo devuelve el score y los drivers.
@@ -36,7 +62,10 @@ def _build_prediction_response(pred: dict) -> PrediccionResultado:
         score=pred["score"],
         drivers=pred["drivers"],
         categoria_riesgo=pred["categoria_riesgo"],
-        model_used=pred.get("model_used", "diabetes")
+        model_used=pred.get("model_used", "diabetes"),
+        model_version=pred.get("model_version"),
+        incertidumbre=pred.get("incertidumbre"),
+        percentil=pred.get("percentil"),
     )
 
 
@@ -52,7 +81,7 @@ async def predecir_riesgo(
 ):
     """Endpoint legacy que utiliza el modelo por defecto (diabetes)."""
 
-    pred = obtener_prediccion(data, model_type=data.modelo or "diabetes")
+    pred = await _ejecutar_prediccion(data, data.modelo or "diabetes")
 
     if "error" in pred:
         raise HTTPException(
@@ -63,6 +92,159 @@ async def predecir_riesgo(
     return _build_prediction_response(pred)
 
 
+# Deben declararse antes de /predict/{model_type} para que "batch", "bulk", "multi", "what-if" y "target" no se tomen como modelo
+@router.post(
+    "/predict/batch",
+    response_model=PrediccionLoteResultado,
+    summary="1c. Obtener Riesgo y Drivers para varios perfiles",
+    tags=["Health (ML & Coach)"]
+)
+async def predecir_riesgo_lote(
+    data: PrediccionLoteEntrada,
+    usuario=Depends(verify_supabase_token)
+):
+    """Puntúa hasta 1000 perfiles en una sola pasada vectorizada por tipo de modelo."""
+
+    if data.modelo is not None and data.modelo.lower() not in {"diabetes", "cardiovascular"}:
+        raise HTTPException(status_code=400, detail="Modelo no soportado")
+
+    pred = await _ejecutar_inferencia(obtener_predicciones_lote, data.perfiles, model_type=data.modelo)
+
+    if "error" in pred:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=pred["error"]
+        )
+
+    return PrediccionLoteResultado(
+        resultados=[_build_prediction_response(p) for p in pred["resultados"]]
+    )
+
+
+@router.post(
+    "/predict/bulk",
+    summary="1g. Scoring masivo de archivos CSV/NDJSON (respuesta NDJSON en streaming)",
+    tags=["Health (ML & Coach)"],
+    response_class=RespuestaNDJSONStreaming,
+)
+async def predecir_riesgo_masivo(
+    request: Request,
+    modelo: Optional[str] = None,
+    formato: Optional[str] = None,
+    usuario=Depends(verify_supabase_token)
+):
+    """
+    Recibe el archivo como cuerpo de la petición (Content-Type text/csv o
+    application/x-ndjson, o `?formato=csv|ndjson`), con los campos de AnalisisEntrada
+    por fila, y devuelve una línea NDJSON por fila a medida que se puntúa cada chunk.
+    """
+
+    formato = (formato or detectar_formato(request.headers.get("content-type")) or "").lower()
+    if formato not in BULK_FORMATS:
+        raise HTTPException(status_code=415, detail="Formato no soportado: usa text/csv o application/x-ndjson")
+    if modelo is not None and modelo.lower() not in {"diabetes", "cardiovascular"}:
+        raise HTTPException(status_code=400, detail="Modelo no soportado")
+
+    return RespuestaNDJSONStreaming(puntuar_stream(request.stream(), formato, model_type=modelo))
+
+
+@router.post(
+    "/predict/multi",
+    response_model=PrediccionMultiResultado,
+    summary="1f. Obtener Riesgo y Drivers con varios modelos a la vez",
+    tags=["Health (ML & Coach)"]
+)
+async def predecir_riesgo_multi(
+    data: AnalisisEntrada,
+    modelos: List[str] = Query(["diabetes", "cardiovascular"]),
+    usuario=Depends(verify_supabase_token)
+):
+    """
+    Puntúa el mismo perfil con varios modelos (por defecto diabetes y cardiovascular)
+    en una sola llamada: IMC, relación cintura-altura e interacciones se calculan una vez.
+    """
+
+    model_types = list(dict.fromkeys(modelo.lower() for modelo in modelos))
+    if not model_types or any(model_type not in {"diabetes", "cardiovascular"} for model_type in model_types):
+        raise HTTPException(status_code=400, detail="Modelo no soportado")
+
+    pred = await _ejecutar_inferencia(obtener_prediccion_multi, data, model_types)
+
+    if "error" in pred:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=pred["error"]
+        )
+
+    return PrediccionMultiResultado(
+        resultados={model_type: _build_prediction_response(p) for model_type, p in pred["resultados"].items()}
+    )
+
+
+@router.post(
+    "/predict/what-if",
+    response_model=WhatIfResultado,
+    summary="1d. Riesgo bajo escenarios de cambios (what-if)",
+    tags=["Health (ML & Coach)"]
+)
+async def predecir_what_if(
+    data: WhatIfEntrada,
+    usuario=Depends(verify_supabase_token)
+):
+    """
+    Puntúa el perfil base y todas las combinaciones de cambios (p. ej. bajar 5 kg y
+    dormir 7 horas) en una sola llamada por lotes; devuelve una tabla de riesgo.
+    """
+
+    if data.modelo is not None and data.modelo.lower() not in {"diabetes", "cardiovascular"}:
+        raise HTTPException(status_code=400, detail="Modelo no soportado")
+
+    try:
+        pred = await _ejecutar_inferencia(obtener_what_if, data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if "error" in pred:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=pred["error"]
+        )
+
+    return WhatIfResultado(**pred)
+
+
+@router.post(
+    "/predict/target",
+    response_model=MetaRiesgoResultado,
+    summary="1e. Cambio mínimo para alcanzar un nivel de riesgo",
+    tags=["Health (ML & Coach)"]
+)
+async def predecir_meta_riesgo(
+    data: MetaRiesgoEntrada,
+    usuario=Depends(verify_supabase_token)
+):
+    """
+    Para cada factor modificable, el menor cambio dentro de su rango que deja el
+    riesgo en `nivel_objetivo` (p. ej. cuánta cintura bajar para quedar en riesgo bajo).
+    """
+
+    if data.modelo is not None and data.modelo.lower() not in {"diabetes", "cardiovascular"}:
+        raise HTTPException(status_code=400, detail="Modelo no soportado")
+
+    try:
+        pred = await _ejecutar_inferencia(obtener_meta_riesgo, data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if "error" in pred:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=pred["error"]
+        )
+
+    return MetaRiesgoResultado(**pred)
+
+
 @router.post(
     "/predict/{model_type}",
     response_model=PrediccionResultado,
@@ -80,7 +262,7 @@ async def predecir_riesgo_por_modelo(
     if model_key not in {"diabetes", "cardiovascular"}:
         raise HTTPException(status_code=400, detail="Modelo no soportado")
 
-    pred = obtener_prediccion(data, model_type=model_key)
+    pred = await _ejecutar_prediccion(data, model_key)
 
     if "error" in pred:
         raise HTTPException(
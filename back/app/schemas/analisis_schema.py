@@ -1,6 +1,6 @@
 # back/app/schemas/analisis_schema.py
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Dict, List, Literal, Optional, Union
 from datetime import date, datetime
 
 # ---------------------------------------------------------------------------
@@ -30,6 +30,8 @@ class AnalisisEntrada(BaseModel):
     edad: Optional[int] = None 
     genero: Optional[str] = None # Ej: "M", "F"
     modelo: Optional[str] = "diabetes"
+    incertidumbre: Optional[bool] = False # Intervalo Monte Carlo por error de medición (/predict)
+    percentil: Optional[bool] = False # Percentil del score en NHANES (misma edad y sexo)
 
     class Config:
         from_attributes = True
@@ -53,6 +55,32 @@ class DriverExplicacion(BaseModel):
         from_attributes = True
 
 
+class IncertidumbreRiesgo(BaseModel):
+    """
+    Distribución del score bajo error de medición de peso, cintura y laboratorio
+    (K copias perturbadas del perfil).
+    """
+    intervalo: List[float] # [bajo, alto] central al `nivel_intervalo`
+    nivel_intervalo: float
+    media: float
+    desviacion: float
+    muestras: int
+    prob_categorias: Dict[str, float] # P(low), P(moderate), P(high)
+    prob_umbrales: Dict[str, float] # P(score >= umbral) de moderate, high y referral
+
+
+class PercentilPoblacional(BaseModel):
+    """
+    Posición del score entre los adultos NHANES del mismo sexo y banda de edad,
+    puntuados con la misma versión del modelo.
+    """
+    percentil: float # % del grupo de referencia con un score menor
+    sexo: str
+    banda_edad: str # Ej: "40-49", "70+"
+    tamano_referencia: int
+    texto: str
+
+
 class PrediccionResultado(BaseModel):
     """
     Respuesta del endpoint /predict.
@@ -62,10 +90,145 @@ class PrediccionResultado(BaseModel):
     drivers: List[DriverExplicacion] # Lista de los factores con explicabilidad completa
     categoria_riesgo: str # "Bajo", "Moderado", "Alto"
     model_used: Optional[str] = "diabetes"
+    model_version: Optional[str] = None # Versión del registro de modelos que produjo el score
+    incertidumbre: Optional[IncertidumbreRiesgo] = None # Solo si la entrada pidió `incertidumbre`
+    percentil: Optional[PercentilPoblacional] = None # Solo si la entrada pidió `percentil` y hay referencia
 
     class Config:
         from_attributes = True
 
+# ---------------------------------------------------------------------------
+# Scoring por lotes: /predict/batch
+# ---------------------------------------------------------------------------
+class PrediccionLoteEntrada(BaseModel):
+    """
+    Entrada del endpoint /predict/batch.
+    Si `modelo` viene informado se aplica a todos los perfiles; si no,
+    cada perfil usa su propio campo `modelo`.
+    """
+    perfiles: List[AnalisisEntrada] = Field(..., min_length=1, max_length=1000)
+    modelo: Optional[str] = None
+
+
+class PrediccionLoteResultado(BaseModel):
+    """
+    Respuesta del endpoint /predict/batch, en el mismo orden que `perfiles`.
+    """
+    resultados: List[PrediccionResultado]
+
+
+# ---------------------------------------------------------------------------
+# Varios modelos en una llamada: /predict/multi
+# ---------------------------------------------------------------------------
+class PrediccionMultiResultado(BaseModel):
+    """
+    Respuesta del endpoint /predict/multi: un resultado completo (score y drivers)
+    por modelo, con las entradas derivadas compartidas calculadas una sola vez.
+    """
+    resultados: Dict[str, PrediccionResultado]
+
+
+# ---------------------------------------------------------------------------
+# Escenarios "what-if": /predict/what-if
+# ---------------------------------------------------------------------------
+FactorModificable = Literal[
+    "peso_kg", "circunferencia_cintura", "horas_sueno", "actividad_fisica", "tabaquismo",
+    "colesterol_total", "hdl_mgdl", "ldl_mgdl", "trigliceridos_mgdl",
+]
+
+
+class CambioWhatIf(BaseModel):
+    """
+    Valores a probar para un factor modificable: absolutos (`valores`, p. ej.
+    horas_sueno [7, 8] o actividad_fisica ["activo"]) o relativos al perfil base
+    (`deltas`, p. ej. peso_kg [-5, -10]).
+    """
+    factor: FactorModificable
+    valores: Optional[List[Union[bool, float, str]]] = Field(None, min_length=1, max_length=20)
+    deltas: Optional[List[float]] = Field(None, min_length=1, max_length=20)
+
+
+class WhatIfEntrada(BaseModel):
+    """
+    Entrada del endpoint /predict/what-if: perfil base y grilla de cambios.
+    Se puntúa el producto cartesiano de los cambios de todos los factores.
+    """
+    perfil: AnalisisEntrada
+    cambios: List[CambioWhatIf] = Field(..., min_length=1, max_length=6)
+    modelo: Optional[str] = None
+
+
+class EscenarioWhatIf(BaseModel):
+    cambios: Dict[str, Union[bool, float, str]] # Factor -> valor probado
+    score: float
+    delta: float # score - score_base
+    categoria_riesgo: str
+
+
+class WhatIfResultado(BaseModel):
+    """
+    Tabla de riesgo por escenario; `tabla` es la misma información en texto
+    compacto para que el coach la cite.
+    """
+    score_base: float
+    categoria_base: str
+    escenarios: List[EscenarioWhatIf]
+    tabla: str
+    model_used: str
+    model_version: Optional[str] = None
+
+
+# ---------------------------------------------------------------------------
+# Metas de riesgo: /predict/target
+# ---------------------------------------------------------------------------
+class MetaRiesgoEntrada(BaseModel):
+    """
+    Entrada del endpoint /predict/target: perfil, nivel de riesgo objetivo y rangos
+    permitidos por factor ([mín, máx] en las unidades del factor; actividad en
+    días/semana, tabaquismo en cigarrillos/día). Sin `rangos` se usan rangos
+    plausibles para todos los factores presentes en el perfil.
+    """
+    perfil: AnalisisEntrada
+    nivel_objetivo: Literal["low", "moderate"] = "low"
+    rangos: Optional[Dict[FactorModificable, List[float]]] = None
+    modelo: Optional[str] = None
+
+
+class SolucionMeta(BaseModel):
+    factor: str
+    desde: float
+    hasta: float
+    cambio: float
+    score: float
+    categoria_riesgo: str
+
+
+class CombinadoMeta(BaseModel):
+    cambios: Dict[str, float] # Factor -> valor objetivo, todos a la vez
+    score: float
+    categoria_riesgo: str
+    fraccion: float # Fracción del rango de cada factor que se recorrió
+
+
+class MetaRiesgoResultado(BaseModel):
+    """
+    Cambio mínimo por factor para alcanzar el nivel objetivo, ordenado de menor a
+    mayor cambio relativo; `texto` resume lo mismo para el prompt del coach.
+    """
+    score_base: float
+    categoria_base: str
+    nivel_objetivo: str
+    umbral: float # El score debe quedar por debajo de este valor
+    ya_cumple: bool
+    soluciones: List[SolucionMeta]
+    inalcanzables: List[str] # Factores que no alcanzan la meta dentro de su rango
+    combinado: Optional[CombinadoMeta] = None
+    texto: str
+    evaluaciones: int # Perfiles puntuados en total (en pocas llamadas por lotes)
+    model_used: str
+    model_version: Optional[str] = None
+
+
 # ---------------------------------------------------------------------------
 # REQUISITO B2: Entrada para el endpoint /coach
 # (Este schema es NUEVO y CRÍTICO)
@@ -137,6 +300,7 @@ class AnalisisRegistro(BaseModel):
     citas_kb: Optional[List[str]] = None # ¡Guardar las citas!
     fuente_modelo: Optional[str] = "NHANES_XGB_v1"
     model_used: Optional[str] = None
+    model_version: Optional[str] = None
 
     class Config:
         from_attributes = True
\ No newline at end of file
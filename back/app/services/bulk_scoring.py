@@ -0,0 +1,201 @@
+"""
+Scoring masivo en streaming: archivos CSV/NDJSON de tamizaje (miles de filas) que
+llegan como cuerpo de la petición y salen como NDJSON fila a fila.
+
+The upload is read incrementally, split into lines and parsed into rows; every
+`BULK_SCORING_CHUNK_ROWS` valid rows are scored with `obtener_predicciones_lote` on
+the inference executor and their results are yielded before the next bytes are
+read. Only one chunk of rows (plus a partial line) is held at a time, so memory stays
+flat whatever the file size, and a slow client reading the response slows down the
+reading of the upload instead of piling up results.
+
+Output lines, in input order:
+
+    {"fila": 1, "score": ..., "drivers": [...], "categoria_riesgo": ..., ...}
+    {"fila": 2, "error": "..."}                  # fila inválida o no puntuable
+    {"resumen": {"filas": 2, "puntuadas": 1, "errores": 1}}
+"""
+
+import csv
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from app.core.config import settings
+from app.schemas.analisis_schema import AnalisisEntrada
+from app.services.inference_executor import InferenceQueueFullError, run_inference
+from app.services.ml_service import obtener_predicciones_lote
+
+logger = logging.getLogger(__name__)
+
+BULK_FORMATS = ("csv", "ndjson")
+
+
+class RespuestaNDJSONStreaming(StreamingResponse):
+    """
+    StreamingResponse que no escucha `receive` mientras responde: el cuerpo de la
+    subida se sigue leyendo desde el generador (request.stream()) y un listener de
+    desconexión en paralelo se comería esos mensajes. Una desconexión del cliente se
+    detecta igual, como ClientDisconnect al leer la subida.
+    """
+
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+def detectar_formato(content_type: Optional[str]) -> Optional[str]:
+    """"csv" o "ndjson" según el Content-Type de la subida (None si no se reconoce)."""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in ("text/csv", "application/csv"):
+        return "csv"
+    if media_type in ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-lines"):
+        return "ndjson"
+    return None
+
+
+async def _iter_lines(body: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Complete text lines of a byte stream; only the trailing partial line is buffered."""
+    pending = b""
+    async for chunk in body:
+        pending += chunk
+        lines = pending.split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line.decode("utf-8-sig").rstrip("\r")
+    if pending:
+        yield pending.decode("utf-8-sig").rstrip("\r")
+
+
+def _fila_csv(header: List[str], line: str) -> Dict[str, Any]:
+    values = next(csv.reader([line]))
+    if len(values) != len(header):
+        raise ValueError(f"se esperaban {len(header)} columnas y llegaron {len(values)}")
+    # Celdas vacías = dato faltante; pydantic convierte "52" o "true" al tipo del campo
+    return {key: value if value.strip() != "" else None for key, value in zip(header, values)}
+
+
+async def iter_filas(body: AsyncIterator[bytes], formato: str) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    (número de fila, dict o Exception) por cada fila de datos, empezando en 1.
+    Las líneas vacías se ignoran; en CSV la primera línea es la cabecera.
+    Los campos entre comillas no pueden contener saltos de línea.
+    """
+    header: Optional[List[str]] = None
+    numero = 0
+    async for line in _iter_lines(body):
+        if not line.strip():
+            continue
+        if formato == "csv" and header is None:
+            header = [name.strip() for name in next(csv.reader([line]))]
+            continue
+        numero += 1
+        try:
+            if formato == "csv":
+                yield numero, _fila_csv(header, line)
+            else:
+                fila = json.loads(line)
+                if not isinstance(fila, dict):
+                    raise ValueError("cada línea debe ser un objeto JSON")
+                yield numero, fila
+        except ValueError as e:
+            yield numero, e
+
+
+def _validar(fila: Any) -> AnalisisEntrada:
+    if isinstance(fila, Exception):
+        raise fila
+    perfil = AnalisisEntrada.model_validate(fila)
+    if perfil.edad is None or not perfil.genero:
+        raise ValueError("edad y genero son obligatorios")
+    return perfil
+
+
+def _mensaje_error(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in error.errors())
+    return str(error)
+
+
+def _linea(payload: Dict[str, Any]) -> bytes:
+    return (json.dumps(payload, ensure_ascii=False, default=float) + "\n").encode("utf-8")
+
+
+MENSAJE_SATURADO = "Servicio de predicción saturado, intenta nuevamente en unos segundos"
+
+
+async def _inferir(perfiles: List[AnalisisEntrada], model_type: Optional[str]) -> Dict[str, Any]:
+    """Resultado de `obtener_predicciones_lote`; InferenceQueueFullError sube al llamador."""
+    return await run_inference(obtener_predicciones_lote, perfiles, model_type=model_type)
+
+
+async def _puntuar(pendientes: List[Tuple[int, Any]], model_type: Optional[str], resumen: Dict[str, int]) -> AsyncIterator[bytes]:
+    """Valida y puntúa un chunk; las líneas salen en el orden de entrada."""
+    perfiles: List[AnalisisEntrada] = []
+    errores: Dict[int, str] = {}
+    for numero, fila in pendientes:
+        try:
+            perfiles.append(_validar(fila))
+        except (ValueError, ValidationError) as e:
+            errores[numero] = _mensaje_error(e)
+
+    resultados: List[Dict[str, Any]] = []
+    try:
+        if perfiles:
+            pred = await _inferir(perfiles, model_type)
+            if "error" in pred and len(perfiles) > 1:
+                # Una fila que el modelo rechaza (p. ej. sin peso ni IMC) no tumba el chunk: fila a fila
+                logger.warning(f"Chunk masivo falló ({pred['error']}); puntuando fila a fila")
+                resultados = [await _inferir([perfil], model_type) for perfil in perfiles]
+                resultados = [r if "error" in r else r["resultados"][0] for r in resultados]
+            else:
+                resultados = pred["resultados"] if "error" not in pred else [pred]
+    except InferenceQueueFullError as e:
+        # Saturación: reintentar fila a fila solo sumaría carga a la cola llena
+        logger.warning(f"Chunk masivo rechazado: {e}")
+        resultados = [{"error": MENSAJE_SATURADO}] * len(perfiles)
+
+    validas = iter(resultados)
+    for numero, _ in pendientes:
+        resultado = {"error": errores[numero]} if numero in errores else next(validas)
+        if "error" in resultado:
+            resumen["errores"] += 1
+            yield _linea({"fila": numero, "error": resultado["error"]})
+        else:
+            resumen["puntuadas"] += 1
+            yield _linea({"fila": numero, **resultado})
+
+
+async def puntuar_stream(
+    body: AsyncIterator[bytes], formato: str, model_type: Optional[str] = None, chunk_rows: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """NDJSON con el resultado de cada fila de `body` y una línea final de resumen."""
+    chunk_rows = chunk_rows or settings.BULK_SCORING_CHUNK_ROWS
+    resumen = {"filas": 0, "puntuadas": 0, "errores": 0}
+    pendientes: List[Tuple[int, Any]] = []
+
+    try:
+        async for numero, fila in iter_filas(body, formato):
+            resumen["filas"] += 1
+            pendientes.append((numero, fila))
+            if len(pendientes) >= chunk_rows:
+                async for linea in _puntuar(pendientes, model_type, resumen):
+                    yield linea
+                pendientes = []
+        if pendientes:
+            async for linea in _puntuar(pendientes, model_type, resumen):
+                yield linea
+    except UnicodeDecodeError as e:
+        # La respuesta ya empezó: el error va como última línea en vez de un 400
+        logger.warning(f"Subida masiva con codificación inválida: {e}")
+        yield _linea({"error": "El archivo debe estar en UTF-8"})
+
+    logger.info(f"📊 Scoring masivo ({formato}): {resumen}")
+    yield _linea({"resumen": resumen})
@@ -0,0 +1,234 @@
+import asyncio
+import bisect
+import logging
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings
+from app.ml.micro_batcher import MicroBatchQueueFullError
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores (segundos) del histograma de espera en cola
+QUEUE_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+metrics.describe("inference_queue_wait_seconds", "Time inference calls waited for a worker", buckets=QUEUE_WAIT_BUCKETS)
+
+
+class InferenceQueueFullError(RuntimeError):
+    """La cola del executor de inferencia está llena; el llamador debe responder 503."""
+
+
+def _timed_call(func: Callable, submitted_at: float, args: tuple, kwargs: dict):
+    """
+    Runs in the worker. Returns (queue_wait, run_seconds, result); time.time() is used
+    because it is comparable across processes.
+    """
+    started_at = time.time()
+    result = func(*args, **kwargs)
+    return started_at - submitted_at, time.time() - started_at, result
+
+
+class InferenceExecutor:
+    """
+    Thread or process pool for CPU-bound inference, with a bounded number of
+    pending calls (running + queued) and queue-wait / run-time metrics.
+    """
+
+    def __init__(self, mode: str = "thread", max_workers: int = 4, max_queue: int = 64):
+        mode = (mode or "thread").lower()
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown inference executor mode: {mode}")
+
+        self.mode = mode
+        self.max_workers = max_workers
+        self.max_pending = max_workers + max_queue
+        self._pool: Executor = self._create_pool(mode, max_workers)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._wait_sum = 0.0
+        self._wait_max = 0.0
+        self._run_sum = 0.0
+        self._wait_buckets = [0] * (len(QUEUE_WAIT_BUCKETS) + 1)
+
+    @staticmethod
+    def _create_pool(mode: str, max_workers: int) -> Executor:
+        if mode == "thread":
+            return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+
+        from app.services.worker_pool import ForkedWorkerPool
+
+        try:
+            pool = ForkedWorkerPool(
+                max_workers=max_workers,
+                health_check_interval=settings.INFERENCE_HEALTH_CHECK_SECONDS,
+                task_timeout=settings.INFERENCE_TASK_TIMEOUT_SECONDS,
+                worker_threads=settings.INFERENCE_WORKER_THREADS,
+            )
+        except RuntimeError as e:
+            # Sin fork (p. ej. Windows) cada worker carga sus propios modelos
+            logger.warning(f"Forked worker pool unavailable ({e}); using ProcessPoolExecutor")
+            return ProcessPoolExecutor(max_workers=max_workers)
+
+        # Los workers heredan los modelos del padre: tras un cambio de versión se re-forkean
+        from app.ml.model_registry import get_registry
+
+        get_registry().subscribe(lambda active: pool.recycle())
+        return pool
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        """Schedule `func(*args, **kwargs)`; raises InferenceQueueFullError when saturated."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise InferenceQueueFullError(
+                    f"Inference queue is full ({self._pending} pending calls)"
+                )
+            self._pending += 1
+            self._submitted += 1
+
+        outer: Future = Future()
+        try:
+            inner = self._pool.submit(_timed_call, func, time.time(), args, kwargs)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+
+        def _complete(done: Future) -> None:
+            try:
+                queue_wait, run_seconds, result = done.result()
+            except BaseException as exc:
+                with self._lock:
+                    self._pending -= 1
+                    self._failed += 1
+                outer.set_exception(exc)
+                return
+
+            with self._lock:
+                self._pending -= 1
+                self._completed += 1
+                self._wait_sum += queue_wait
+                self._wait_max = max(self._wait_max, queue_wait)
+                self._run_sum += run_seconds
+                self._wait_buckets[bisect.bisect_left(QUEUE_WAIT_BUCKETS, queue_wait)] += 1
+            metrics.observe("inference_queue_wait_seconds", queue_wait, mode=self.mode)
+            outer.set_result(result)
+
+        inner.add_done_callback(_complete)
+        return outer
+
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        """Blocking variant, for sync code that already runs outside the event loop."""
+        return self.submit(func, *args, **kwargs).result()
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Await `func(*args, **kwargs)` without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        pool_stats = self._pool.stats() if hasattr(self._pool, "stats") else None
+        with self._lock:
+            finished = self._completed
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(QUEUE_WAIT_BUCKETS + (float("inf"),), self._wait_buckets):
+                cumulative += count
+                buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+            return {
+                "mode": self.mode,
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "queue_wait_seconds": {
+                    "avg": self._wait_sum / finished if finished else 0.0,
+                    "max": self._wait_max,
+                    "sum": self._wait_sum,
+                    "buckets": buckets,
+                },
+                "run_seconds_avg": self._run_sum / finished if finished else 0.0,
+                "pool": pool_stats,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+
+_executor: Optional[InferenceExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_inference_executor() -> InferenceExecutor:
+    """Executor compartido, configurado con INFERENCE_EXECUTOR / INFERENCE_MAX_WORKERS / INFERENCE_QUEUE_SIZE."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = InferenceExecutor(
+                    mode=settings.INFERENCE_EXECUTOR,
+                    max_workers=settings.INFERENCE_MAX_WORKERS,
+                    max_queue=settings.INFERENCE_QUEUE_SIZE,
+                )
+                logger.info(
+                    "Inference executor: mode=%s, workers=%s, queue=%s",
+                    _executor.mode, _executor.max_workers, settings.INFERENCE_QUEUE_SIZE,
+                )
+    return _executor
+
+
+def shutdown_inference_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
+
+
+async def run_inference(func: Callable, *args, **kwargs) -> Any:
+    """Punto único para ejecutar inferencia desde handlers async (executor acotado)."""
+    return await get_inference_executor().run(func, *args, **kwargs)
+
+
+def call_inference(func: Callable, *args, **kwargs) -> Any:
+    """Punto único para ejecutar inferencia desde código sync (p. ej. el agente conversacional)."""
+    return get_inference_executor().call(func, *args, **kwargs)
+
+
+async def run_single_prediction(func: Callable, *args, **kwargs) -> Any:
+    """
+    Like `run_inference`, for single-profile predictions (`obtener_prediccion`) only.
+
+    Con MICRO_BATCHING_ENABLED el micro-batcher manda cada lote al executor como una
+    sola tarea, así que `func` solo espera su Future: corre en el threadpool de
+    Starlette en vez de ocupar un worker del executor mientras espera. Everything else (batch, what-if, target,
+    multi, bulk) keeps going through `run_inference` and its bounded queue.
+    """
+    if settings.MICRO_BATCHING_ENABLED:
+        from starlette.concurrency import run_in_threadpool
+
+        try:
+            return await run_in_threadpool(func, *args, **kwargs)
+        except MicroBatchQueueFullError as e:
+            raise InferenceQueueFullError(str(e)) from e
+    return await run_inference(func, *args, **kwargs)
+
+
+def call_single_prediction(func: Callable, *args, **kwargs) -> Any:
+    """Sync counterpart of `run_single_prediction`."""
+    if settings.MICRO_BATCHING_ENABLED:
+        try:
+            return func(*args, **kwargs)
+        except MicroBatchQueueFullError as e:
+            raise InferenceQueueFullError(str(e)) from e
+    return call_inference(func, *args, **kwargs)
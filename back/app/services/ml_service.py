@@ -1,88 +1,421 @@
+import itertools
 import logging
-from app.schemas.analisis_schema import AnalisisEntrada
-from app.ml.predictor import predict_risk
+import math
+from typing import List
+from app.core.config import settings
+from app.schemas.analisis_schema import AnalisisEntrada, CambioWhatIf, MetaRiesgoEntrada, WhatIfEntrada
+from app.ml.micro_batcher import MicroBatchQueueFullError, get_micro_batcher
+from app.ml.population_percentiles import lookup_percentile
+from app.ml.predictor import predict_risk, predict_risk_batch, predict_risk_multi
+from app.ml.risk_solver import default_ranges, solve_target
+from app.ml.uncertainty import predict_risk_interval
+from app.ml.what_if import sweep_risk
+from app.services.inference_executor import InferenceQueueFullError, get_inference_executor
 
 logger = logging.getLogger(__name__)
 
+ACTIVITY_DAYS_MAP = {
+    "sedentario": 0,
+    "ligero": 2,
+    "moderado": 4,
+    "activo": 6,
+    "muy_activo": 7
+}
+
+# Factor del esquema -> (entrada de predict_risk, unidad para la tabla del coach)
+WHAT_IF_FACTORS = {
+    "peso_kg": ("weight_kg", "kg"),
+    "circunferencia_cintura": ("waist_cm", "cm"),
+    "horas_sueno": ("sleep_hours", "h"),
+    "actividad_fisica": ("days_mvpa_week", "días/sem"),
+    "tabaquismo": ("smokes_cig_day", "cig/día"),
+    "colesterol_total": ("total_cholesterol", "mg/dL"),
+    "hdl_mgdl": ("hdl_mgdl", "mg/dL"),
+    "ldl_mgdl": ("ldl_mgdl", "mg/dL"),
+    "trigliceridos_mgdl": ("trigliceridos_mgdl", "mg/dL"),
+}
+
+
+def construir_parametros_modelo(data: AnalisisEntrada, model_type: str | None = None) -> dict:
+    """
+    Traduce un AnalisisEntrada a los argumentos de `predict_risk`
+    (IMC, cigarrillos/día y días de actividad derivados).
+    """
+    height_cm = data.altura_cm
+    weight_kg = data.peso_kg
+
+    selected_model = (model_type or data.modelo or "diabetes").lower()
+
+    if data.imc is not None:
+        bmi = data.imc
+    elif height_cm is not None and weight_kg is not None:
+        try:
+            bmi = weight_kg / ((height_cm / 100) ** 2)
+        except ZeroDivisionError:
+            bmi = None
+    else:
+        bmi = None
+
+    smokes_cig_day = None
+    if data.tabaquismo is not None:
+        smokes_cig_day = 10 if data.tabaquismo else 0
+
+    days_mvpa_week = None
+    if data.actividad_fisica is not None:
+        days_mvpa_week = ACTIVITY_DAYS_MAP.get(data.actividad_fisica.lower(), 0)
+
+    return {
+        "age": data.edad,
+        "sex": data.genero,
+        "height_cm": height_cm,
+        "weight_kg": weight_kg,
+        "waist_cm": data.circunferencia_cintura,
+        "sleep_hours": data.horas_sueno,
+        "smokes_cig_day": smokes_cig_day,
+        "days_mvpa_week": days_mvpa_week,
+        "bmi": bmi,
+        "systolic_bp": data.presion_sistolica,
+        "total_cholesterol": data.colesterol_total,
+        "model_type": selected_model,
+        "glucosa_mgdl": data.glucosa_mgdl,
+        "hdl_mgdl": data.hdl_mgdl,
+        "trigliceridos_mgdl": data.trigliceridos_mgdl,
+        "ldl_mgdl": data.ldl_mgdl,
+    }
+
+
+def _formatear_resultado(result: dict, selected_model: str) -> dict:
+    # Preserve full driver objects with descriptions, values, and impact
+    return {
+        "score": result["score"],
+        "drivers": result["drivers"],
+        "categoria_riesgo": result["risk_level"],
+        "model_used": result.get("model_used", selected_model),
+        "model_version": result.get("model_version"),
+    }
+
+
 def obtener_prediccion(data: AnalisisEntrada, model_type: str | None = None) -> dict:
     """
     Obtiene predicción de riesgo usando el modelo ML local.
     Cumple con el requisito A4 (Explicabilidad).
     """
-    
+
     try:
-        height_cm = data.altura_cm
-        weight_kg = data.peso_kg
-        
-        selected_model = (model_type or data.modelo or "diabetes").lower()
-
-        if data.imc is not None:
-            bmi = data.imc
-        elif height_cm is not None and weight_kg is not None:
-            try:
-                bmi = weight_kg / ((height_cm / 100) ** 2)
-            except ZeroDivisionError:
-                bmi = None
+        params = construir_parametros_modelo(data, model_type)
+        selected_model = params["model_type"]
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Llamando predict_risk con modelo '%s': edad=%s, sexo=%s, altura=%s, peso=%s, IMC=%s, cintura=%s, "
+                "sueño=%s, tabaquismo=%s (→ %s cig/día), actividad=%s (→ %s días), presión_sistólica=%s, "
+                "colesterol_total=%s, glucosa=%s, hdl=%s, ldl=%s, trig=%s",
+                selected_model, data.edad, data.genero, params["height_cm"], params["weight_kg"], params["bmi"],
+                params["waist_cm"], params["sleep_hours"], data.tabaquismo, params["smokes_cig_day"],
+                data.actividad_fisica, params["days_mvpa_week"], data.presion_sistolica, data.colesterol_total,
+                data.glucosa_mgdl, data.hdl_mgdl, data.ldl_mgdl, data.trigliceridos_mgdl,
+            )
+
+        if settings.MICRO_BATCHING_ENABLED:
+            result = get_micro_batcher().predict(params)
         else:
-            bmi = None
-        
-        waist_cm = data.circunferencia_cintura
-        
-        sleep_hours = data.horas_sueno
-        
-        smokes_cig_day = None
-        if data.tabaquismo is not None:
-            smokes_cig_day = 10 if data.tabaquismo else 0
-        
-        days_mvpa_week = None
-        if data.actividad_fisica is not None:
-            activity_map = {
-                "sedentario": 0,
-                "ligero": 2,
-                "moderado": 4,
-                "activo": 6,
-                "muy_activo": 7
-            }
-            days_mvpa_week = activity_map.get(data.actividad_fisica.lower(), 0)
-        
-        logger.info(f"📊 Llamando predict_risk con modelo '{selected_model}':")
-        logger.info(f"   edad={data.edad}, sexo={data.genero}, altura={height_cm}, peso={weight_kg}")
-        logger.info(f"   IMC={bmi}, cintura={waist_cm}, sueño={sleep_hours}")
-        logger.info(f"   tabaquismo={data.tabaquismo} (→ {smokes_cig_day} cig/día), actividad={data.actividad_fisica} (→ {days_mvpa_week} días)")
-        logger.info(f"   presión_sistólica={data.presion_sistolica}, colesterol_total={data.colesterol_total}")
-        logger.info(f"   glucosa={data.glucosa_mgdl}, hdl={data.hdl_mgdl}, ldl={data.ldl_mgdl}, trig={data.trigliceridos_mgdl}")
-        
-        result = predict_risk(
-            age=data.edad,
-            sex=data.genero,
-            height_cm=height_cm,
-            weight_kg=weight_kg,
-            waist_cm=waist_cm,
-            sleep_hours=sleep_hours,
-            smokes_cig_day=smokes_cig_day,
-            days_mvpa_week=days_mvpa_week,
-            bmi=bmi,
-            systolic_bp=data.presion_sistolica,
-            total_cholesterol=data.colesterol_total,
-            model_type=selected_model,
-            glucosa_mgdl=data.glucosa_mgdl,
-            hdl_mgdl=data.hdl_mgdl,
-            trigliceridos_mgdl=data.trigliceridos_mgdl,
-            ldl_mgdl=data.ldl_mgdl
+            result = predict_risk(**params)
+
+        logger.debug("Resultado: score=%s, risk_level=%s", result.get("score"), result.get("risk_level"))
+
+        respuesta = _formatear_resultado(result, selected_model)
+        if data.incertidumbre:
+            if settings.MICRO_BATCHING_ENABLED:
+                # Con micro-batching esta función corre fuera del executor: el Monte Carlo vuelve a su cola acotada
+                respuesta["incertidumbre"] = get_inference_executor().call(obtener_incertidumbre, params)
+            else:
+                respuesta["incertidumbre"] = obtener_incertidumbre(params)
+        if data.percentil:
+            respuesta["percentil"] = obtener_percentil(result, params)
+        return respuesta
+
+    except (MicroBatchQueueFullError, InferenceQueueFullError):
+        # Saturación: el llamador responde 503 en vez de un error de predicción
+        raise
+    except Exception as e:
+        logger.error(f"Error procesando predicción: {e}", exc_info=True)
+        return {"error": f"Error inesperado en el servicio de ML: {e}"}
+
+
+def _texto_meta(resultado: dict, factores: dict) -> str:
+    """Resumen de /predict/target para el prompt del coach."""
+    def unidad(key: str) -> str:
+        return WHAT_IF_FACTORS[factores[key]][1]
+
+    lineas = [
+        f"Meta: riesgo {resultado['target_level']} (score < {resultado['threshold']:.0%}). "
+        f"Actual: {resultado['base']['score']:.1%} ({resultado['base']['risk_level']})."
+    ]
+    if resultado["already_met"]:
+        lineas.append("El perfil actual ya cumple la meta.")
+        return "\n".join(lineas)
+
+    for solucion in resultado["solutions"]:
+        key = solucion["input"]
+        lineas.append(
+            f"- {factores[key]}: {solucion['from']:g} → {solucion['to']:g} {unidad(key)} "
+            f"({solucion['change']:+g} {unidad(key)}) → {solucion['score']:.1%} ({solucion['risk_level']})"
+        )
+    combinado = resultado["combined"]
+    if combinado:
+        cambios = ", ".join(f"{factores[key]} {valor:g} {unidad(key)}" for key, valor in combinado["changes"].items())
+        lineas.append(f"- Combinado: {cambios} → {combinado['score']:.1%} ({combinado['risk_level']})")
+    if resultado["unreachable"]:
+        lineas.append(
+            "Sin solución dentro del rango por sí solos: " + ", ".join(factores[key] for key in resultado["unreachable"])
         )
-        
-        logger.info(f"📊 Resultado: score={result.get('score')}, risk_level={result.get('risk_level')}")
-        
-        # Preserve full driver objects with descriptions, values, and impact
-        drivers_full = result['drivers']
-        
+    return "\n".join(lineas)
+
+
+def obtener_meta_riesgo(data: MetaRiesgoEntrada) -> dict:
+    """
+    Cambio mínimo por factor modificable para llegar a `nivel_objetivo`.
+    Lanza ValueError si los rangos no son válidos; otros fallos devuelven {"error": ...}.
+    """
+    params = construir_parametros_modelo(data.perfil, data.modelo)
+    selected_model = params.pop("model_type")
+    factores = {key: factor for factor, (key, _) in WHAT_IF_FACTORS.items()}
+
+    if data.rangos is None:
+        rangos = default_ranges(params)
+    else:
+        rangos = {}
+        for factor, limites in data.rangos.items():
+            if len(limites) != 2 or limites[0] > limites[1]:
+                raise ValueError(f"Rango inválido para '{factor}': usa [mín, máx]")
+            rangos[WHAT_IF_FACTORS[factor][0]] = (float(limites[0]), float(limites[1]))
+
+    try:
+        resultado = solve_target(params, data.nivel_objetivo, rangos, model_type=selected_model)
+    except ValueError:
+        raise
+    except Exception as e:
+        logger.error(f"Error procesando meta de riesgo: {e}", exc_info=True)
+        return {"error": f"Error inesperado en el servicio de ML: {e}"}
+
+    combinado = resultado["combined"]
+    return {
+        "score_base": resultado["base"]["score"],
+        "categoria_base": resultado["base"]["risk_level"],
+        "nivel_objetivo": resultado["target_level"],
+        "umbral": resultado["threshold"],
+        "ya_cumple": resultado["already_met"],
+        "soluciones": [
+            {
+                "factor": factores[s["input"]],
+                "desde": s["from"],
+                "hasta": s["to"],
+                "cambio": s["change"],
+                "score": s["score"],
+                "categoria_riesgo": s["risk_level"],
+            }
+            for s in resultado["solutions"]
+        ],
+        "inalcanzables": [factores[key] for key in resultado["unreachable"]],
+        "combinado": None if combinado is None else {
+            "cambios": {factores[key]: valor for key, valor in combinado["changes"].items()},
+            "score": combinado["score"],
+            "categoria_riesgo": combinado["risk_level"],
+            "fraccion": combinado["fraction"],
+        },
+        "texto": _texto_meta(resultado, factores),
+        "evaluaciones": resultado["evaluations"],
+        "model_used": resultado["model_type"],
+        "model_version": resultado["model_version"],
+    }
+
+
+def obtener_incertidumbre(params: dict) -> dict:
+    """Intervalo Monte Carlo del score para los parámetros de `predict_risk`."""
+    perfil = {key: value for key, value in params.items() if key != "model_type"}
+    intervalo = predict_risk_interval(perfil, model_type=params["model_type"])
+    return {
+        "intervalo": intervalo["interval"],
+        "nivel_intervalo": intervalo["interval_level"],
+        "media": intervalo["mean"],
+        "desviacion": intervalo["std"],
+        "muestras": intervalo["samples"],
+        "prob_categorias": intervalo["level_probabilities"],
+        "prob_umbrales": intervalo["threshold_probabilities"],
+    }
+
+
+def obtener_percentil(result: dict, params: dict) -> dict | None:
+    """Percentil NHANES del score (misma edad, sexo y versión del modelo), o None sin referencia."""
+    percentil = lookup_percentile(
+        params["model_type"], result.get("model_version"), params["age"], params["sex"], result["score"]
+    )
+    if percentil is None:
+        return None
+    sexo = "hombres" if percentil["sex"] == "M" else "mujeres"
+    return {
+        "percentil": percentil["percentile"],
+        "sexo": percentil["sex"],
+        "banda_edad": percentil["age_band"],
+        "tamano_referencia": percentil["reference_size"],
+        "texto": f"Tu riesgo es mayor que el del {percentil['percentile']:.0f}% de los {sexo} de {percentil['age_band']} años en NHANES",
+    }
+
+
+def obtener_prediccion_multi(data: AnalisisEntrada, model_types: List[str]) -> dict:
+    """
+    Predicción con varios modelos en una sola llamada (entradas derivadas compartidas).
+    Devuelve {"resultados": {modelo: ...}} o {"error": ...}.
+    """
+    try:
+        params = construir_parametros_modelo(data)
+        params.pop("model_type")
+        logger.debug("Llamando predict_risk_multi con modelos %s", model_types)
+
+        results = predict_risk_multi(params, model_types)
+
+        resultados = {}
+        for model_type, result in results.items():
+            resultados[model_type] = _formatear_resultado(result, model_type)
+            if data.percentil:
+                resultados[model_type]["percentil"] = obtener_percentil(result, {**params, "model_type": model_type})
+        return {"resultados": resultados}
+
+    except Exception as e:
+        logger.error(f"Error procesando predicción multi-modelo: {e}", exc_info=True)
+        return {"error": f"Error inesperado en el servicio de ML: {e}"}
+
+
+def obtener_predicciones_lote(perfiles: List[AnalisisEntrada], model_type: str | None = None) -> dict:
+    """
+    Obtiene predicciones para varios perfiles con una sola pasada por modelo.
+    Devuelve {"resultados": [...]} en el mismo orden de entrada, o {"error": ...}.
+    """
+    try:
+        params = [construir_parametros_modelo(perfil, model_type) for perfil in perfiles]
+        logger.debug("Llamando predict_risk_batch con %s perfiles", len(params))
+
+        results = predict_risk_batch(params)
+
         return {
-            "score": result["score"],
-            "drivers": drivers_full,
-            "categoria_riesgo": result["risk_level"],
-            "model_used": result.get("model_used", selected_model)
+            "resultados": [
+                _formatear_resultado(result, p["model_type"]) for result, p in zip(results, params)
+            ]
         }
-    
+
     except Exception as e:
-        logger.error(f"Error procesando predicción: {e}", exc_info=True)
-        return {"error": f"Error inesperado en el servicio de ML: {e}"}
\ No newline at end of file
+        logger.error(f"Error procesando predicción por lotes: {e}", exc_info=True)
+        return {"error": f"Error inesperado en el servicio de ML: {e}"}
+
+
+def _cigarrillos_what_if(valor) -> float:
+    """
+    Cigarrillos/día de un valor de tabaquismo: sí/no como en el perfil (10 o 0) y
+    números como cigarrillos/día. Cualquier otra cosa es un error, no un "no fuma".
+    """
+    if isinstance(valor, bool):
+        return 10 if valor else 0
+    if isinstance(valor, str):
+        texto = valor.strip().lower()
+        if texto in ("true", "si", "sí"):
+            return 10
+        if texto in ("false", "no"):
+            return 0
+        try:
+            valor = float(texto)
+        except ValueError:
+            raise ValueError(f"Valor de tabaquismo no reconocido: {valor}")
+    numero = float(valor)
+    if not math.isfinite(numero) or numero < 0:
+        raise ValueError(f"Valor de tabaquismo no reconocido: {valor}")
+    return numero
+
+
+def _valores_what_if(cambio: CambioWhatIf, base: dict) -> list:
+    """(valor mostrado, valor numérico para el modelo) de cada opción de un factor."""
+    key, _ = WHAT_IF_FACTORS[cambio.factor]
+    if cambio.valores is None and cambio.deltas is None:
+        raise ValueError(f"'{cambio.factor}' necesita valores o deltas")
+
+    opciones = []
+    for valor in cambio.valores or []:
+        if cambio.factor == "tabaquismo":
+            numero = _cigarrillos_what_if(valor)
+        elif cambio.factor == "actividad_fisica" and isinstance(valor, str):
+            if valor.lower() not in ACTIVITY_DAYS_MAP:
+                raise ValueError(f"Nivel de actividad desconocido: {valor}")
+            numero = ACTIVITY_DAYS_MAP[valor.lower()]
+        elif isinstance(valor, str):
+            raise ValueError(f"Valor no numérico para '{cambio.factor}': {valor}")
+        else:
+            numero = float(valor)
+        opciones.append((valor, numero))
+
+    for delta in cambio.deltas or []:
+        if base.get(key) is None:
+            raise ValueError(f"'{cambio.factor}' no está en el perfil base; usa valores absolutos")
+        numero = base[key] + delta
+        if cambio.factor == "actividad_fisica":
+            numero = min(max(numero, 0), 7)
+        opciones.append((numero, numero))
+    return opciones
+
+
+def _tabla_what_if(score_base: float, categoria_base: str, escenarios: List[dict]) -> str:
+    """Una línea por escenario, ordenados de menor a mayor riesgo."""
+    lineas = [f"Actual: {score_base:.1%} ({categoria_base})"]
+    for escenario in sorted(escenarios, key=lambda e: e["score"]):
+        cambios = ", ".join(
+            f"{factor}={valor}" + (f" {WHAT_IF_FACTORS[factor][1]}" if not isinstance(valor, (bool, str)) else "")
+            for factor, valor in escenario["cambios"].items()
+        )
+        lineas.append(
+            f"{cambios}: {escenario['score']:.1%} ({escenario['delta'] * 100:+.1f} pts, {escenario['categoria_riesgo']})"
+        )
+    return "\n".join(lineas)
+
+
+def obtener_what_if(data: WhatIfEntrada) -> dict:
+    """
+    Riesgo del perfil base bajo cada combinación de cambios, puntuado en un solo lote.
+    Lanza ValueError si la grilla no es válida; otros fallos devuelven {"error": ...}.
+    """
+    params = construir_parametros_modelo(data.perfil, data.modelo)
+    selected_model = params.pop("model_type")
+
+    grid, etiquetas = {}, {}
+    for cambio in data.cambios:
+        key, _ = WHAT_IF_FACTORS[cambio.factor]
+        if key in grid:
+            raise ValueError(f"Factor repetido: {cambio.factor}")
+        opciones = _valores_what_if(cambio, params)
+        grid[key] = [numero for _, numero in opciones]
+        etiquetas[key] = (cambio.factor, [mostrado for mostrado, _ in opciones])
+
+    try:
+        result = sweep_risk(params, grid, model_type=selected_model)
+    except ValueError:
+        raise
+    except Exception as e:
+        logger.error(f"Error procesando what-if: {e}", exc_info=True)
+        return {"error": f"Error inesperado en el servicio de ML: {e}"}
+
+    # Mismo orden que la grilla (row-major) para devolver los valores tal como se pidieron
+    combinaciones = itertools.product(*(mostrados for _, mostrados in etiquetas.values()))
+    escenarios = []
+    for combinacion, escenario in zip(combinaciones, result["scenarios"]):
+        escenarios.append({
+            "cambios": {factor: valor for (factor, _), valor in zip(etiquetas.values(), combinacion)},
+            "score": escenario["score"],
+            "delta": escenario["delta"],
+            "categoria_riesgo": escenario["risk_level"],
+        })
+
+    return {
+        "score_base": result["base"]["score"],
+        "categoria_base": result["base"]["risk_level"],
+        "escenarios": escenarios,
+        "tabla": _tabla_what_if(result["base"]["score"], result["base"]["risk_level"], escenarios),
+        "model_used": result["model_type"],
+        "model_version": result["model_version"],
+    }
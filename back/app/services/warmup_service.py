@@ -0,0 +1,152 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.ml.model_loader import MODEL_TYPES, get_active_model
+from app.ml.predictor import (
+    _predict_cardiovascular_row,
+    _predict_diabetes_row,
+    _single_row_features,
+    get_explainer,
+    score_columns,
+)
+from app.ml.rag_system import get_rag_system
+from app.services.inference_executor import get_inference_executor
+from app.utils.token_counter import get_encoding
+
+logger = logging.getLogger(__name__)
+
+# Perfil de referencia para ejercitar features, predict_proba y drivers en el warm-up
+REFERENCE_PROFILE = {
+    "age": 45,
+    "sex": "M",
+    "height_cm": 172.0,
+    "weight_kg": 80.0,
+    "bmi": 80.0 / (1.72 ** 2),
+    "waist_cm": 95.0,
+    "sleep_hours": 7.0,
+    "smokes_cig_day": 0,
+    "days_mvpa_week": 3,
+    "systolic_bp": 125.0,
+    "total_cholesterol": 200.0,
+    "glucosa_mgdl": 95.0,
+    "hdl_mgdl": 50.0,
+    "ldl_mgdl": 120.0,
+    "trigliceridos_mgdl": 140.0,
+}
+
+_components: Dict[str, Dict] = {}
+_lock = threading.Lock()
+_started = False
+_finished = threading.Event()
+
+
+def _load_model(model_type: str) -> None:
+    get_active_model(model_type)
+
+
+def _load_explainer() -> Optional[str]:
+    if settings.DRIVER_BACKEND.lower() != "shap":
+        return "DRIVER_BACKEND=native: se usan contribuciones nativas de XGBoost"
+    if get_explainer("diabetes") is None:
+        raise RuntimeError("No se pudo inicializar el explainer SHAP")
+    return None
+
+
+def _warm_inference(model_type: str) -> None:
+    """
+    Features, predict_proba y drivers del perfil de referencia por el camino de una
+    petición y por el columnar, sin pasar por predict_risk: el warm-up no llena el
+    caché ni cuenta como predicción servida (predictions_total, sombra, audit log).
+    """
+    active = get_active_model(model_type)
+    features = _single_row_features(model_type, REFERENCE_PROFILE, list(active.feature_names))
+    if model_type == "cardiovascular":
+        _predict_cardiovascular_row(active, features, use_cache=False)
+    else:
+        _predict_diabetes_row(active, features, use_cache=False)
+    score_columns(active, {key: [value] for key, value in REFERENCE_PROFILE.items()})
+
+
+def _start_inference_executor() -> None:
+    # En modo "process" esto forkea los workers después de cargar los modelos en el padre
+    get_inference_executor()
+
+
+def _load_tokenizer() -> None:
+    if get_encoding() is None:
+        raise RuntimeError("No se pudo cargar el encoding de tiktoken")
+
+
+def _load_kb_index() -> None:
+    get_rag_system()
+
+
+def _warmup_steps() -> List[Tuple[str, Callable[[], Optional[str]], bool]]:
+    """(componente, función, requerido para readiness)."""
+    steps = [(f"model:{t}", lambda t=t: _load_model(t), True) for t in MODEL_TYPES]
+    steps.append(("explainer:diabetes", _load_explainer, True))
+    steps += [(f"inference:{t}", lambda t=t: _warm_inference(t), True) for t in MODEL_TYPES]
+    steps.append(("inference_executor", _start_inference_executor, True))
+    steps.append(("tokenizer", _load_tokenizer, False))
+    steps.append(("kb_index", _load_kb_index, False))
+    return steps
+
+
+def warm_up() -> Dict:
+    """
+    Carga una sola vez modelos, explainer, tokenizer e índice de la KB, midiendo el
+    tiempo de cada componente. Llamadas concurrentes o repetidas no repiten el trabajo:
+    esperan a que termine la primera.
+    """
+    global _started
+    with _lock:
+        first_call = not _started
+        _started = True
+        if first_call:
+            for name, _, required in _warmup_steps():
+                _components[name] = {"status": "pending", "required": required}
+
+    if not first_call:
+        _finished.wait()
+        return get_readiness()
+
+    logger.info("🔥 Iniciando warm-up de componentes de inferencia...")
+    for name, step, required in _warmup_steps():
+        start = time.perf_counter()
+        try:
+            detail = step()
+            status = "skipped" if detail else "ready"
+            _components[name].update(status=status, detail=detail)
+        except Exception as e:
+            logger.error(f"Warm-up falló para {name}: {e}", exc_info=True)
+            _components[name].update(status="failed", detail=str(e))
+        _components[name]["load_seconds"] = round(time.perf_counter() - start, 4)
+        logger.info(f"   {name}: {_components[name]['status']} ({_components[name]['load_seconds']}s)")
+
+    _finished.set()
+    readiness = get_readiness()
+    logger.info(f"🔥 Warm-up completo (ready={readiness['ready']})")
+    return readiness
+
+
+def start_background_warm_up() -> threading.Thread:
+    """Lanza el warm-up en un hilo para que /health responda mientras /ready sigue en 503."""
+    thread = threading.Thread(target=warm_up, name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def get_readiness() -> Dict:
+    """Estado de readiness con el tiempo de carga de cada componente."""
+    components = {name: dict(info) for name, info in _components.items()}
+    ready = _finished.is_set() and all(
+        info["status"] in ("ready", "skipped") for info in components.values() if info["required"]
+    )
+    return {
+        "ready": ready,
+        "warmup_finished": _finished.is_set(),
+        "components": components,
+    }
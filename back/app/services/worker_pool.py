@@ -0,0 +1,323 @@
+import gc
+import logging
+import multiprocessing as mp
+import os
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import Executor, Future
+from multiprocessing.reduction import ForkingPickler
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.ml.model_loader import MODEL_TYPES, get_active_model, load_model_bundle
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerDiedError(RuntimeError):
+    """El worker que ejecutaba la tarea murió o dejó de responder; ya fue reemplazado."""
+
+
+def preload_models() -> None:
+    """
+    Load the active version of every model in the parent before forking so workers
+    share the unpickled trees copy-on-write instead of each loading a private copy.
+    """
+    for model_type in MODEL_TYPES:
+        try:
+            get_active_model(model_type)
+        except Exception as e:
+            logger.error(f"No se pudo precargar el modelo {model_type}: {e}")
+
+    if settings.DRIVER_BACKEND.lower() == "shap":
+        from app.ml.predictor import get_explainer
+
+        get_explainer("diabetes")
+
+
+def _limit_model_threads(n_threads: int) -> None:
+    """N workers x N hilos de OpenMP sobresuscriben la CPU; cada worker usa n_threads."""
+    for model_type in MODEL_TYPES:
+        try:
+            model, _, _ = load_model_bundle(model_type)
+        except Exception:
+            continue
+        for calibrated in getattr(model, "calibrated_classifiers_", []):
+            estimator = calibrated.estimator
+            if hasattr(estimator, "get_booster"):
+                estimator.set_params(n_jobs=n_threads)
+
+
+def _worker_main(conn, worker_threads: int) -> None:
+    # El padre maneja Ctrl+C y el apagado; el worker solo termina al cerrarse el pipe
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _limit_model_threads(worker_threads)
+    # Las series heredadas ya están en el padre: el worker solo devuelve lo que registra él
+    metrics.reset()
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+
+        kind = message[0]
+        if kind == "stop":
+            break
+        if kind == "ping":
+            conn.send(("pong", os.getpid()))
+            continue
+
+        _, func, args, kwargs = message
+        try:
+            reply = ("ok", func(*args, **kwargs))
+        except BaseException as exc:
+            reply = ("error", exc)
+        # Métricas de la tarea (etapas del predictor, predictions_total) viajan con el resultado
+        deltas = metrics.drain()
+        try:
+            payload = ForkingPickler.dumps((*reply, deltas))
+        except Exception as exc:
+            error = RuntimeError(f"Unpicklable worker result: {exc!r}")
+            payload = ForkingPickler.dumps(("error", error, deltas))
+        conn.send_bytes(payload)
+
+    # El worker sale con os._exit (sin atexit): el audit log se vacía aquí o se pierde
+    from app.ml.audit_log import stop_audit_sink
+
+    stop_audit_sink()
+    conn.close()
+
+
+def _read_memory_kb(pid: int) -> Dict[str, Optional[int]]:
+    """RSS, PSS y memoria privada (kB) desde /proc; None fuera de Linux."""
+    fields = {"Rss": None, "Pss": None, "Private_Clean": None, "Private_Dirty": None}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in fields:
+                    fields[name] = int(rest.split()[0])
+    except (OSError, ValueError):
+        pass
+    private = None
+    if fields["Private_Clean"] is not None and fields["Private_Dirty"] is not None:
+        private = fields["Private_Clean"] + fields["Private_Dirty"]
+    return {"rss_kb": fields["Rss"], "pss_kb": fields["Pss"], "private_kb": private}
+
+
+class _Worker:
+    def __init__(self, process, conn, generation: int = 0):
+        self.process = process
+        self.conn = conn
+        self.generation = generation
+        self.tasks = 0
+        self.started_at = time.time()
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(("stop",))
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=1)
+        self.conn.close()
+
+
+class ForkedWorkerPool(Executor):
+    """
+    Pre-fork pool for inference: models are loaded once in the parent, frozen out of
+    the GC and shared copy-on-write with `max_workers` forked processes.
+
+    Each worker has a dedicated dispatcher thread that feeds it tasks from a shared
+    queue. While idle the dispatcher pings its worker every `health_check_interval`
+    seconds; a worker that died, does not answer the ping or exceeds `task_timeout`
+    is killed and replaced by a fresh fork.
+
+    After a model swap in the parent, `recycle()` bumps the pool generation and each
+    dispatcher re-forks its worker before the next task, so workers pick up the newly
+    active version without dropping queued work.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        health_check_interval: float = 5.0,
+        health_check_timeout: float = 2.0,
+        task_timeout: float = 30.0,
+        worker_threads: int = 1,
+        preload: Optional[Callable[[], None]] = preload_models,
+    ):
+        if "fork" not in mp.get_all_start_methods():
+            raise RuntimeError("ForkedWorkerPool requires the 'fork' start method")
+
+        self.max_workers = max_workers
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self.task_timeout = task_timeout
+        self.worker_threads = worker_threads
+        self.restarts = 0
+        self.recycles = 0
+        self._generation = 0
+        self._context = mp.get_context("fork")
+        self._tasks: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._shutdown = False
+        self._shutdown_lock = threading.Lock()
+
+        if preload is not None:
+            preload()
+        # Objetos ya cargados fuera del GC: los workers no ensucian sus páginas al recolectar
+        gc.freeze()
+
+        self._workers: List[_Worker] = [self._spawn() for _ in range(max_workers)]
+        self._threads = [
+            threading.Thread(target=self._dispatch_loop, args=(idx,), name=f"inference-worker-{idx}", daemon=True)
+            for idx in range(max_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(
+            "Forked inference pool started: workers=%s, pids=%s",
+            max_workers, [w.process.pid for w in self._workers],
+        )
+
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main, args=(child_conn, self.worker_threads), daemon=True
+        )
+        process.start()
+        child_conn.close()
+        return _Worker(process, parent_conn, self._generation)
+
+    def _replace(self, idx: int, reason: str) -> None:
+        old = self._workers[idx]
+        logger.warning("Replacing inference worker %s (pid %s): %s", idx, old.process.pid, reason)
+        old.stop()
+        self.restarts += 1
+        self._workers[idx] = self._spawn()
+
+    def _await_reply(self, worker: _Worker, timeout: float):
+        deadline = time.monotonic() + timeout
+        while not worker.conn.poll(min(0.5, timeout)):
+            if not worker.is_alive():
+                raise WorkerDiedError(f"worker pid {worker.process.pid} exited with code {worker.process.exitcode}")
+            if time.monotonic() >= deadline:
+                raise WorkerDiedError(f"worker pid {worker.process.pid} did not answer within {timeout}s")
+        return worker.conn.recv()
+
+    def recycle(self) -> None:
+        """Re-fork every worker (lazily, per dispatcher) so they see the current models."""
+        if self._shutdown:
+            return
+        gc.freeze()
+        self._generation += 1
+        self.recycles += 1
+        logger.info("Recycling inference workers (generation %s)", self._generation)
+
+    def _refresh_if_stale(self, idx: int) -> None:
+        if self._workers[idx].generation != self._generation and not self._shutdown:
+            self._replace(idx, f"recycled for model generation {self._generation}")
+
+    def _health_check(self, idx: int) -> None:
+        self._refresh_if_stale(idx)
+        worker = self._workers[idx]
+        try:
+            if not worker.is_alive():
+                raise WorkerDiedError(f"worker pid {worker.process.pid} exited with code {worker.process.exitcode}")
+            worker.conn.send(("ping",))
+            self._await_reply(worker, self.health_check_timeout)
+        except (WorkerDiedError, EOFError, OSError) as e:
+            if not self._shutdown:
+                self._replace(idx, f"health check failed: {e}")
+
+    def _dispatch_loop(self, idx: int) -> None:
+        while True:
+            try:
+                item = self._tasks.get(timeout=self.health_check_interval)
+            except queue.Empty:
+                self._health_check(idx)
+                continue
+            if item is None:
+                break
+
+            future, func, args, kwargs = item
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                payload = ForkingPickler.dumps(("task", func, args, kwargs))
+            except Exception as exc:
+                future.set_exception(exc)
+                continue
+
+            self._refresh_if_stale(idx)
+            worker = self._workers[idx]
+            try:
+                if not worker.is_alive():
+                    self._replace(idx, "found dead before dispatch")
+                    worker = self._workers[idx]
+                worker.conn.send_bytes(payload)
+                status, result, deltas = self._await_reply(worker, self.task_timeout)
+            except (WorkerDiedError, EOFError, OSError) as exc:
+                reason = f"{type(exc).__name__}: {exc}"
+                self._replace(idx, f"task failed: {reason}")
+                future.set_exception(WorkerDiedError(reason))
+                continue
+
+            worker.tasks += 1
+            metrics.merge(deltas)
+            if status == "ok":
+                future.set_result(result)
+            else:
+                future.set_exception(result)
+
+        self._workers[idx].stop()
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        with self._shutdown_lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            future: Future = Future()
+            self._tasks.put((future, fn, args, kwargs))
+            return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self._shutdown_lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            for _ in self._threads:
+                self._tasks.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado por worker (pid, vivo, tareas) y memoria frente al proceso padre."""
+        workers = []
+        for idx, worker in enumerate(list(self._workers)):
+            workers.append({
+                "index": idx,
+                "pid": worker.process.pid,
+                "alive": worker.is_alive(),
+                "tasks": worker.tasks,
+                "generation": worker.generation,
+                "uptime_seconds": round(time.time() - worker.started_at, 1),
+                **_read_memory_kb(worker.process.pid),
+            })
+        return {
+            "restarts": self.restarts,
+            "recycles": self.recycles,
+            "generation": self._generation,
+            "parent": _read_memory_kb(os.getpid()),
+            "workers": workers,
+        }
@@ -0,0 +1,54 @@
+import bisect
+import threading
+from typing import Any, Dict, List, Sequence, Tuple
+
+
+class Histogram:
+    """Thread-safe fixed-bucket histogram (cumulative counts, Prometheus style)."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+            self._count += 1
+            if value > self._max:
+                self._max = value
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(self.buckets, self._counts):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            buckets["+Inf"] = cumulative + self._counts[-1]
+            return {
+                "count": self._count,
+                "sum": self._sum,
+                "avg": self._sum / self._count if self._count else 0.0,
+                "max": self._max,
+                "buckets": buckets,
+            }
+
+    def state(self) -> Tuple[List[int], float, int, float]:
+        """Raw (per-bucket counts, sum, count, max), picklable for merging elsewhere."""
+        with self._lock:
+            return list(self._counts), self._sum, self._count, self._max
+
+    def merge(self, state: Tuple[List[int], float, int, float]) -> None:
+        counts, total, count, maximum = state
+        with self._lock:
+            for idx, value in enumerate(counts):
+                self._counts[idx] += value
+            self._sum += total
+            self._count += count
+            if maximum > self._max:
+                self._max = maximum
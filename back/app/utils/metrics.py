@@ -0,0 +1,265 @@
+"""
+Métricas en proceso (histogramas de latencia y contadores) con salida en formato
+de texto de Prometheus para /metrics.
+
+    with timed("prediction_stage_seconds", model="diabetes", stage="features"):
+        ...
+
+    @timed("supabase_request_seconds", operation="guardar_analisis")
+    def guardar_analisis(...): ...
+
+Each process keeps its own registry. With INFERENCE_EXECUTOR="process" the predictor
+stages are recorded inside the forked workers: each worker drains its registry after
+every task and sends the deltas back with the result, and the parent merges them, so
+/metrics on the API process covers the workers too.
+"""
+
+import math
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .histogram import Histogram
+
+NAMESPACE = "healthai"
+
+# Desde sub-milisegundo (etapas del predictor) hasta segundos (OpenAI, Supabase)
+LATENCY_BUCKETS = (
+    0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+# (name, type, help, labels, value) producido por un collector en cada scrape
+Sample = Tuple[str, str, str, Dict[str, str], float]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (
+        f'{key}="' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for key, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """Labelled histograms and counters, plus collectors read on every scrape."""
+
+    def __init__(self, namespace: str = NAMESPACE, buckets=LATENCY_BUCKETS):
+        self.namespace = namespace
+        self.buckets = tuple(buckets)
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._help: Dict[str, str] = {}
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help_text: str, buckets: Optional[Iterable[float]] = None) -> None:
+        """Help text of `name`; `buckets` overrides the default latency buckets of a histogram."""
+        self._help[name] = help_text
+        if buckets is not None:
+            self._buckets[name] = tuple(buckets)
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = _label_key(labels)
+        series = self._histograms.get(name)
+        histogram = series.get(key) if series is not None else None
+        if histogram is None:
+            with self._lock:
+                series = self._histograms.setdefault(name, {})
+                histogram = series.setdefault(key, Histogram(self._buckets.get(name, self.buckets)))
+        histogram.observe(value)
+
+    def inc(self, name: str, amount: float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + amount
+
+    def timer(self, name: str, **labels) -> "_Timer":
+        return _Timer(self, name, labels)
+
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        """`collector()` returns (name, type, help, labels, value) samples at scrape time."""
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        """Histogram snapshots and counter values keyed by name and label string (tests, debug)."""
+        with self._lock:
+            histograms = {name: dict(series) for name, series in self._histograms.items()}
+            counters = {name: dict(series) for name, series in self._counters.items()}
+        result: Dict[str, Dict[str, object]] = {}
+        for name, series in histograms.items():
+            result[name] = {_format_labels(key): histogram.snapshot() for key, histogram in series.items()}
+        for name, series in counters.items():
+            result[name] = {_format_labels(key): value for key, value in series.items()}
+        return result
+
+    def render(self) -> str:
+        """All series in the Prometheus text exposition format (version 0.0.4)."""
+        lines: List[str] = []
+        with self._lock:
+            histograms = {name: dict(series) for name, series in self._histograms.items()}
+            counters = {name: dict(series) for name, series in self._counters.items()}
+
+        for name in sorted(histograms):
+            full_name = f"{self.namespace}_{name}"
+            lines.append(f"# HELP {full_name} {self._help.get(name, name)}")
+            lines.append(f"# TYPE {full_name} histogram")
+            for key, histogram in sorted(histograms[name].items()):
+                snapshot = histogram.snapshot()
+                for bound, count in snapshot["buckets"].items():
+                    lines.append(f"{full_name}_bucket{_format_labels(key, ('le', bound))} {count}")
+                lines.append(f"{full_name}_sum{_format_labels(key)} {_format_value(snapshot['sum'])}")
+                lines.append(f"{full_name}_count{_format_labels(key)} {snapshot['count']}")
+
+        for name in sorted(counters):
+            full_name = f"{self.namespace}_{name}"
+            lines.append(f"# HELP {full_name} {self._help.get(name, name)}")
+            lines.append(f"# TYPE {full_name} counter")
+            for key, value in sorted(counters[name].items()):
+                lines.append(f"{full_name}{_format_labels(key)} {_format_value(value)}")
+
+        collected: Dict[str, Tuple[str, str, List[Tuple[LabelKey, float]]]] = {}
+        for collector in list(self._collectors):
+            try:
+                samples = list(collector())
+            except Exception:
+                # Un collector roto no debe tumbar el scrape completo
+                self.inc("metrics_collector_errors_total", collector=getattr(collector, "__name__", "unknown"))
+                continue
+            for name, metric_type, help_text, labels, value in samples:
+                entry = collected.setdefault(name, (metric_type, help_text, []))
+                entry[2].append((_label_key(labels), float(value)))
+
+        for name in sorted(collected):
+            metric_type, help_text, samples = collected[name]
+            full_name = f"{self.namespace}_{name}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {metric_type}")
+            for key, value in samples:
+                lines.append(f"{full_name}{_format_labels(key)} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms = {}
+            self._counters = {}
+
+    def drain(self) -> Dict[str, Any]:
+        """
+        Histogram states and counter values recorded since the last drain, then reset.
+        Forked workers call it between tasks (nothing else is observing at that point).
+        """
+        with self._lock:
+            histograms, counters = self._histograms, self._counters
+            self._histograms, self._counters = {}, {}
+        return {
+            "histograms": {
+                name: {key: histogram.state() for key, histogram in series.items()}
+                for name, series in histograms.items()
+            },
+            "counters": counters,
+        }
+
+    def merge(self, deltas: Dict[str, Any]) -> None:
+        """Add the output of another registry's `drain()` (same metric names and buckets)."""
+        for name, series in deltas.get("histograms", {}).items():
+            for key, state in series.items():
+                with self._lock:
+                    histogram = self._histograms.setdefault(name, {}).setdefault(
+                        key, Histogram(self._buckets.get(name, self.buckets))
+                    )
+                histogram.merge(state)
+        with self._lock:
+            for name, series in deltas.get("counters", {}).items():
+                target = self._counters.setdefault(name, {})
+                for key, value in series.items():
+                    target[key] = target.get(key, 0.0) + value
+
+    def _reset_lock_after_fork(self) -> None:
+        self._lock = threading.Lock()
+
+
+class _Timer:
+    """Context manager / decorator: observes elapsed seconds and counts exceptions."""
+
+    __slots__ = ("_registry", "_name", "_labels", "_started")
+
+    def __init__(self, registry: MetricsRegistry, name: str, labels: Dict[str, object]):
+        self._registry = registry
+        self._name = name
+        self._labels = labels
+        self._started = 0.0
+
+    def __enter__(self) -> "_Timer":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self._registry.observe(self._name, time.perf_counter() - self._started, **self._labels)
+        if exc_type is not None:
+            self._registry.inc(_errors_name(self._name), **self._labels)
+        return False
+
+    def __call__(self, func: Callable) -> Callable:
+        import functools
+
+        registry, name, labels = self._registry, self._name, self._labels
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # Un _Timer nuevo por llamada: el decorador se comparte entre hilos
+            with _Timer(registry, name, labels):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+
+def _errors_name(name: str) -> str:
+    base = name[: -len("_seconds")] if name.endswith("_seconds") else name
+    return f"{base}_errors_total"
+
+
+metrics = MetricsRegistry()
+
+metrics.describe("prediction_stage_seconds", "Time spent in each stage of predict_risk / predict_risk_batch")
+metrics.describe("prediction_stage_errors_total", "Exceptions raised inside a prediction stage")
+metrics.describe("predictions_total", "Served predictions by model and path")
+metrics.describe("kb_search_seconds", "Knowledge-base lookups (buscar_en_kb, retrieve_context_from_kb)")
+metrics.describe("openai_request_seconds", "Chat completion calls to OpenAI by call site")
+metrics.describe("openai_request_errors_total", "Failed chat completion calls to OpenAI by call site")
+metrics.describe("supabase_request_seconds", "app.core.database operations against Supabase")
+metrics.describe("supabase_request_errors_total", "Supabase operations that raised")
+metrics.describe("auth_request_seconds", "Supabase JWT verification round trips")
+metrics.describe("auth_request_errors_total", "Supabase JWT verifications that could not reach Supabase")
+
+
+def timed(name: str, **labels) -> _Timer:
+    """`with timed(...)` / `@timed(...)` on the shared registry."""
+    return metrics.timer(name, **labels)
+
+
+def render_metrics() -> str:
+    return metrics.render()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=metrics._reset_lock_after_fork)
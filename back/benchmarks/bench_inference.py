@@ -0,0 +1,304 @@
+"""
+Micro-benchmarks del camino de predicción (predict_risk / predict_risk_batch) con
+compuerta de regresión contra una línea base versionada.
+
+Each case runs in a freshly spawned interpreter, so the peak RSS belongs to that case
+alone and a cold start really is cold (imports done, nothing loaded). Reported per case:
+p50/p95/p99 latency per call, throughput in rows/s and peak RSS.
+
+Usage (from back/):
+    python benchmarks/bench_inference.py                      # run + compare with baseline.json
+    python benchmarks/bench_inference.py --update-baseline    # rewrite baseline.json
+    python benchmarks/bench_inference.py --cases diabetes.single,diabetes.batch
+    python benchmarks/bench_inference.py --models-dir app/ml/models   # real artifacts
+
+Without --models-dir the synthetic models from tests/conftest.py are trained into a temp
+directory, which keeps the baseline reproducible on any machine that can run the tests.
+Exit code 1 when a gated metric regresses beyond --tolerance.
+"""
+
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+BACK_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACK_DIR))
+sys.path.insert(0, str(BACK_DIR / "tests"))
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+RESULTS_PATH = Path(__file__).with_name("results") / "latest.json"
+
+# Métricas con compuerta: (clave, True si más alto es peor, factor sobre --tolerance).
+# Las colas (p95) son más ruidosas que la mediana, así que toleran el doble.
+GATED_METRICS = (
+    ("p50_ms", True, 1.0),
+    ("p95_ms", True, 2.0),
+    ("throughput_rows_per_s", False, 1.0),
+)
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    model_type: str
+    mode: str                       # "single", "cached", "batch" o "cold"
+    driver_backend: str = "native"  # "native" (pred_contribs) o "shap"
+
+
+CASES = (
+    Case("diabetes.cold", "diabetes", "cold"),
+    Case("diabetes.single", "diabetes", "single"),
+    Case("diabetes.single_shap", "diabetes", "single", driver_backend="shap"),
+    Case("diabetes.cached", "diabetes", "cached"),
+    Case("diabetes.batch", "diabetes", "batch"),
+    Case("diabetes.batch_shap", "diabetes", "batch", driver_backend="shap"),
+    Case("cardiovascular.cold", "cardiovascular", "cold"),
+    Case("cardiovascular.single", "cardiovascular", "single"),
+    Case("cardiovascular.cached", "cardiovascular", "cached"),
+    Case("cardiovascular.batch", "cardiovascular", "batch"),
+)
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _summary(latencies: Sequence[float], rows: int, elapsed: float) -> Dict[str, float]:
+    millis = np.asarray(latencies, dtype=np.float64) * 1000.0
+    return {
+        "calls": len(millis),
+        "rows": rows,
+        "p50_ms": float(np.percentile(millis, 50)),
+        "p95_ms": float(np.percentile(millis, 95)),
+        "p99_ms": float(np.percentile(millis, 99)),
+        "mean_ms": float(millis.mean()),
+        "throughput_rows_per_s": rows / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def measure(case: Case, profiles: List[Dict[str, Any]], iterations: int, batch_size: int) -> Dict[str, float]:
+    """
+    Time one case in the current process against whatever models the loader points at.
+    "cold" measures only the first call (load + explainer + first prediction).
+    """
+    from app.core.config import settings
+    from app.ml import predictor
+
+    settings.DRIVER_BACKEND = case.driver_backend
+    predictor.prediction_cache.max_size = settings.PREDICTION_CACHE_SIZE if case.mode == "cached" else 0
+    predictor.prediction_cache.clear()
+    profiles = [dict(profile, model_type=case.model_type) for profile in profiles]
+
+    if case.mode == "cold":
+        started = time.perf_counter()
+        predictor.predict_risk(**profiles[0])
+        elapsed = time.perf_counter() - started
+        return _summary([elapsed], 1, elapsed)
+
+    if case.mode == "batch":
+        batches = [profiles[i:i + batch_size] for i in range(0, len(profiles), batch_size)]
+        predictor.predict_risk_batch(batches[0])
+        latencies = []
+        rows = 0
+        started = time.perf_counter()
+        for idx in range(max(20, iterations // batch_size)):
+            batch = batches[idx % len(batches)]
+            call_started = time.perf_counter()
+            predictor.predict_risk_batch(batch)
+            latencies.append(time.perf_counter() - call_started)
+            rows += len(batch)
+        return _summary(latencies, rows, time.perf_counter() - started)
+
+    # single / cached: un calentamiento sobre todos los perfiles (llena el cache en "cached")
+    for profile in profiles:
+        predictor.predict_risk(**profile)
+    latencies = []
+    started = time.perf_counter()
+    for idx in range(iterations):
+        call_started = time.perf_counter()
+        predictor.predict_risk(**profiles[idx % len(profiles)])
+        latencies.append(time.perf_counter() - call_started)
+    return _summary(latencies, iterations, time.perf_counter() - started)
+
+
+def _run_case_in_child(case: Case, models_dir: str, iterations: int, batch_size: int, seed: int) -> Dict[str, float]:
+    import logging
+    import warnings
+
+    logging.disable(logging.WARNING)
+    warnings.simplefilter("ignore")
+    from conftest import random_profiles
+
+    from app.ml import model_loader
+
+    model_loader.get_models_dir = lambda: Path(models_dir)
+    n_profiles = 1 if case.mode == "cold" else max(batch_size, 64)
+    result = measure(case, random_profiles(n_profiles, seed=seed), iterations, batch_size)
+    result["peak_rss_mb"] = _peak_rss_mb()
+    return result
+
+
+def run_case(
+    case: Case, models_dir: Path, iterations: int, batch_size: int, repeat: int, cold_runs: int, seed: int
+) -> Dict[str, Any]:
+    """
+    Run `case` in fresh processes: `cold_runs` single-call processes for a cold start,
+    otherwise `repeat` full runs whose metrics are reduced to the median.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    runs = cold_runs if case.mode == "cold" else repeat
+    outputs = []
+    for run in range(runs):
+        with ctx.Pool(1) as pool:
+            outputs.append(pool.apply(_run_case_in_child, (case, str(models_dir), iterations, batch_size, seed)))
+
+    if case.mode == "cold":
+        # Un arranque en frío por proceso: los percentiles salen de los `runs` procesos
+        firsts = [output["p50_ms"] / 1000.0 for output in outputs]
+        result = _summary(firsts, runs, sum(firsts))
+        result["peak_rss_mb"] = float(np.median([output["peak_rss_mb"] for output in outputs]))
+    else:
+        result = {key: float(np.median([output[key] for output in outputs])) for key in outputs[0]}
+    result["runs"] = runs
+    return {**asdict(case), **result}
+
+
+def compare(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    tolerance: float,
+    rss_tolerance: float = 0.2,
+) -> List[str]:
+    """Human-readable regressions of gated metrics beyond their relative tolerance."""
+    gates = GATED_METRICS + (("peak_rss_mb", True, rss_tolerance / tolerance if tolerance else 1.0),)
+    regressions = []
+    for name, current in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        for metric, higher_is_worse, factor in gates:
+            if metric not in reference or metric not in current or reference[metric] <= 0:
+                continue
+            if current.get("mode") == "cold" and metric == "throughput_rows_per_s":
+                continue
+            allowed = 1 + tolerance * factor
+            ratio = current[metric] / reference[metric]
+            worse = ratio > allowed if higher_is_worse else ratio < 1 / allowed
+            if worse:
+                regressions.append(
+                    f"{name}: {metric} {current[metric]:.3f} vs baseline {reference[metric]:.3f} ({ratio:.2f}x)"
+                )
+    return regressions
+
+
+def _environment() -> Dict[str, Any]:
+    import sklearn
+    import xgboost
+
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": multiprocessing.cpu_count(),
+        "numpy": np.__version__,
+        "sklearn": sklearn.__version__,
+        "xgboost": xgboost.__version__,
+    }
+
+
+def _print_table(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]]) -> None:
+    header = f"{'case':<24}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rows/s':>12}{'RSS MB':>10}{'vs base p50':>13}"
+    print(header)
+    print("-" * len(header))
+    for name, row in results.items():
+        reference = baseline.get(name, {}).get("p50_ms")
+        delta = f"{row['p50_ms'] / reference:.2f}x" if reference else "new"
+        print(
+            f"{name:<24}{row['p50_ms']:>10.3f}{row['p95_ms']:>10.3f}{row['p99_ms']:>10.3f}"
+            f"{row['throughput_rows_per_s']:>12.0f}{row['peak_rss_mb']:>10.1f}{delta:>13}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Inference micro-benchmarks with baseline regression gates")
+    parser.add_argument("--models-dir", type=Path, help="Model artifacts (default: synthetic test models)")
+    parser.add_argument("--cases", help="Comma-separated case names (default: all)")
+    parser.add_argument("--iterations", type=int, default=500, help="Timed calls per single/cached case; rows per batch case (min 20 batches)")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh processes per warm case (median is kept)")
+    parser.add_argument("--cold-runs", type=int, default=7, help="Fresh processes per cold-start case")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed relative latency/throughput regression")
+    parser.add_argument("--rss-tolerance", type=float, default=0.2, help="Allowed relative peak RSS growth")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--output", type=Path, default=RESULTS_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    selected = set(args.cases.split(",")) if args.cases else None
+    cases = [case for case in CASES if selected is None or case.name in selected]
+    if selected and len(cases) != len(selected):
+        parser.error(f"Unknown cases: {sorted(selected - {case.name for case in CASES})}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        models_dir = args.models_dir
+        if models_dir is None:
+            import warnings
+
+            from conftest import build_synthetic_models
+
+            models_dir = Path(tmp)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                build_synthetic_models(models_dir)
+
+        results = {}
+        for case in cases:
+            results[case.name] = run_case(
+                case, models_dir, args.iterations, args.batch_size, args.repeat, args.cold_runs, args.seed
+            )
+
+    report = {"environment": _environment(), "models": "synthetic" if args.models_dir is None else str(args.models_dir), "cases": results}
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, indent=2) + "\n")
+
+    baseline_report = json.loads(args.baseline.read_text()) if args.baseline.exists() else {"cases": {}}
+    _print_table(results, baseline_report["cases"])
+    print(f"\nResults written to {args.output}")
+
+    if args.update_baseline:
+        merged = {**baseline_report, **report, "cases": {**baseline_report["cases"], **results}}
+        args.baseline.write_text(json.dumps(merged, indent=2) + "\n")
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    if baseline_report.get("environment") and baseline_report["environment"] != report["environment"]:
+        print("WARNING: baseline was recorded on a different environment; compare with care")
+    if baseline_report.get("models") and baseline_report["models"] != report["models"]:
+        print("WARNING: baseline was recorded with different models; gates skipped")
+        return 0
+
+    regressions = compare(results, baseline_report["cases"], args.tolerance, args.rss_tolerance)
+    if regressions:
+        print(f"\nPERFORMANCE REGRESSIONS (tolerance {args.tolerance:.0%}):")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1
+    print(f"\nNo regressions beyond {args.tolerance:.0%} of baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,160 @@
+"""
+Stand-in local de la API de OpenAI (POST /v1/chat/completions) con latencia
+configurable y guiones de tool calls, para pruebas de carga sin costo ni red.
+
+A script is a JSON list of steps. For requests that offer tools (the conversational
+agent), the step is picked by the number of user messages in the conversation (the last
+step repeats); requests without tools (RAG plan, coach) always get a text reply.
+
+    [
+      {"content": "¿Cuál es tu edad?"},
+      {"tool_call": {"name": "submit_for_prediction", "arguments": {"edad": 52, ...}}}
+    ]
+
+    python loadtest/fake_openai.py --port 8089 --latency-ms 400 --jitter-ms 200 --script my_script.json
+
+The backend picks it up with OPENAI_BASE_URL=http://127.0.0.1:8089/v1.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+
+# Dos preguntas y luego la herramienta con un perfil completo para el modelo de diabetes
+DEFAULT_SCRIPT: List[Dict[str, Any]] = [
+    {"content": "¡Hola! Para estimar tu riesgo necesito algunos datos. ¿Cuál es tu edad, sexo, altura y peso?"},
+    {"content": "Gracias. ¿Cuál es tu circunferencia de cintura, presión sistólica y colesterol total?"},
+    {
+        "tool_call": {
+            "name": "submit_for_prediction",
+            "arguments": {
+                "edad": 52,
+                "genero": "M",
+                "altura_cm": 175,
+                "peso_kg": 88,
+                "circunferencia_cintura": 101,
+                "presion_sistolica": 135,
+                "colesterol_total": 215,
+                "horas_sueno": 6.5,
+                "tabaquismo": False,
+                "actividad_fisica": "moderado",
+                "modelo_a_usar": "diabetes",
+            },
+        }
+    },
+]
+
+TEXT_REPLY = (
+    "Tu riesgo se explica sobre todo por el perímetro de cintura [Cita: cintura]. Camina 30 minutos "
+    "al día durante 2 semanas [Cita: actividad_fisica]. Recuerda que esto no es un diagnóstico médico."
+)
+
+
+def _estimate_tokens(messages: List[Dict[str, Any]]) -> int:
+    return sum(len(str(message.get("content") or "")) for message in messages) // 4 + 1
+
+
+def create_app(
+    latency_ms: float = 0.0,
+    jitter_ms: float = 0.0,
+    script: Optional[List[Dict[str, Any]]] = None,
+    text_reply: str = TEXT_REPLY,
+) -> FastAPI:
+    app = FastAPI(title="Fake OpenAI (load testing)")
+    app.state.latency_ms = latency_ms
+    app.state.jitter_ms = jitter_ms
+    app.state.script = script or DEFAULT_SCRIPT
+    app.state.text_reply = text_reply
+    app.state.requests = 0
+    app.state.tool_calls = 0
+    counter = itertools.count(1)
+
+    def _message_for(payload: Dict[str, Any]) -> Dict[str, Any]:
+        if not payload.get("tools"):
+            return {"role": "assistant", "content": app.state.text_reply}
+
+        user_turns = sum(1 for message in payload.get("messages", []) if message.get("role") == "user")
+        script = app.state.script
+        step = script[min(max(user_turns, 1), len(script)) - 1]
+        if "tool_call" in step:
+            app.state.tool_calls += 1
+            call = step["tool_call"]
+            arguments = call.get("arguments", {})
+            return {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [
+                    {
+                        "id": f"call_{next(counter)}",
+                        "type": "function",
+                        "function": {
+                            "name": call["name"],
+                            "arguments": arguments if isinstance(arguments, str) else json.dumps(arguments),
+                        },
+                    }
+                ],
+            }
+        return {"role": "assistant", "content": step.get("content", "")}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        payload = await request.json()
+        app.state.requests += 1
+        delay = app.state.latency_ms + random.uniform(0, app.state.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000.0)
+
+        message = _message_for(payload)
+        prompt_tokens = _estimate_tokens(payload.get("messages", []))
+        completion_tokens = len(message.get("content") or "") // 4 + 1
+        return {
+            "id": f"chatcmpl-fake-{next(counter)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "gpt-4o-mini"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": message,
+                    "finish_reason": "tool_calls" if message.get("tool_calls") else "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    @app.get("/_stats")
+    def stats():
+        return {"requests": app.state.requests, "tool_calls": app.state.tool_calls}
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local OpenAI chat completions stand-in for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Added latency per completion")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform random extra latency")
+    parser.add_argument("--script", type=Path, help="JSON list of steps (default: 2 questions + tool call)")
+    args = parser.parse_args()
+
+    script = json.loads(args.script.read_text()) if args.script else None
+    app = create_app(args.latency_ms, args.jitter_ms, script)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Stand-in local de Supabase para pruebas de carga: GoTrue (/auth/v1/user) y un PostgREST
+en memoria con las tablas que usa el backend (chat_sessions, chat_messages,
+assessments, profiles, analisis_salud, mensajes_agente).
+
+Supports the subset of PostgREST that supabase-py emits from app/core/database.py:
+select with eq/neq/in/gt/gte/lt/lte filters, order, limit, single() (object Accept
+header), insert, update and delete with return=representation.
+
+Any bearer token is a valid session; the user id is derived from the token, so a load
+generator can simulate N users with N tokens.
+
+    python loadtest/fake_supabase.py --port 54321 --latency-ms 15
+"""
+
+import argparse
+import asyncio
+import random
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+TABLES = ("chat_sessions", "chat_messages", "assessments", "profiles", "analisis_salud", "mensajes_agente")
+OBJECT_MEDIA_TYPE = "application/vnd.pgrst.object+json"
+USER_NAMESPACE = uuid.UUID("6f1d2c1e-3a57-4c1b-9a3e-5d6b0b0f9c11")
+
+
+def user_id_for_token(token: str) -> str:
+    return str(uuid.uuid5(USER_NAMESPACE, token))
+
+
+class Store:
+    """Filas por tabla en memoria; un solo lock porque las operaciones son triviales."""
+
+    def __init__(self):
+        self._tables: Dict[str, List[Dict[str, Any]]] = {name: [] for name in TABLES}
+        self._lock = threading.Lock()
+        self._serial = 0
+
+    def _defaults(self, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        self._serial += 1
+        now = datetime.now(timezone.utc).isoformat()
+        row = dict(row)
+        row.setdefault("id", self._serial if table in ("analisis_salud", "mensajes_agente") else str(uuid.uuid4()))
+        row.setdefault("created_at", now)
+        if table == "chat_sessions":
+            row.setdefault("title", "Nueva Conversación")
+            row.setdefault("assessment_id", None)
+        return row
+
+    def insert(self, table: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        with self._lock:
+            created = [self._defaults(table, row) for row in rows]
+            self._tables[table].extend(created)
+            return [dict(row) for row in created]
+
+    def select(self, table: str, filters, order=None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = [dict(row) for row in self._tables[table] if _matches(row, filters)]
+        for column, descending in reversed(order or []):
+            rows.sort(key=lambda row: (row.get(column) is None, str(row.get(column))), reverse=descending)
+        return rows[:limit] if limit is not None else rows
+
+    def update(self, table: str, filters, values: Dict[str, Any]) -> List[Dict[str, Any]]:
+        with self._lock:
+            updated = []
+            for row in self._tables[table]:
+                if _matches(row, filters):
+                    row.update(values)
+                    updated.append(dict(row))
+            return updated
+
+    def delete(self, table: str, filters) -> List[Dict[str, Any]]:
+        with self._lock:
+            kept, deleted = [], []
+            for row in self._tables[table]:
+                (deleted if _matches(row, filters) else kept).append(row)
+            self._tables[table] = kept
+            return deleted
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return {name: len(rows) for name, rows in self._tables.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._tables = {name: [] for name in TABLES}
+
+
+def _parse_value(raw: str):
+    return None if raw == "null" else raw
+
+
+def _parse_filters(params) -> List[tuple]:
+    filters = []
+    for column, expression in params.multi_items():
+        if column in ("select", "order", "limit", "offset", "on_conflict", "columns"):
+            continue
+        operator, _, value = expression.partition(".")
+        if operator == "not":
+            operator, _, value = value.partition(".")
+            operator = "not_" + operator
+        if operator in ("in", "not_in"):
+            value = [item.strip().strip('"') for item in value.strip("()").split(",") if item]
+        elif operator == "is":
+            value = _parse_value(value)
+        filters.append((column, operator, value))
+    return filters
+
+
+def _matches(row: Dict[str, Any], filters) -> bool:
+    for column, operator, value in filters:
+        actual = row.get(column)
+        text = None if actual is None else str(actual)
+        if operator == "eq" and text != value:
+            return False
+        if operator == "neq" and text == value:
+            return False
+        if operator == "in" and text not in value:
+            return False
+        if operator == "not_in" and text in value:
+            return False
+        if operator == "is" and actual is not value:
+            return False
+        if operator in ("gt", "gte", "lt", "lte"):
+            if text is None:
+                return False
+            try:
+                left, right = float(text), float(value)
+            except ValueError:
+                left, right = text, value
+            if not {"gt": left > right, "gte": left >= right, "lt": left < right, "lte": left <= right}[operator]:
+                return False
+    return True
+
+
+def _parse_order(raw: Optional[str]):
+    if not raw:
+        return None
+    order = []
+    for part in raw.split(","):
+        column, *modifiers = part.split(".")
+        order.append((column, "desc" in modifiers))
+    return order
+
+
+def create_app(latency_ms: float = 0.0, jitter_ms: float = 0.0) -> FastAPI:
+    app = FastAPI(title="Fake Supabase (load testing)")
+    app.state.store = Store()
+    app.state.latency_ms = latency_ms
+    app.state.jitter_ms = jitter_ms
+
+    async def _delay() -> None:
+        delay = app.state.latency_ms + random.uniform(0, app.state.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000.0)
+
+    def _table(name: str) -> str:
+        if name not in TABLES:
+            raise HTTPException(status_code=404, detail={"message": f"relation \"{name}\" does not exist"})
+        return name
+
+    def _respond(request: Request, rows: List[Dict[str, Any]], status_code: int = 200):
+        if OBJECT_MEDIA_TYPE in request.headers.get("accept", ""):
+            if len(rows) != 1:
+                return JSONResponse(
+                    status_code=406,
+                    content={
+                        "code": "PGRST116",
+                        "message": "JSON object requested, multiple (or no) rows returned",
+                        "details": f"The result contains {len(rows)} rows",
+                        "hint": None,
+                    },
+                )
+            return JSONResponse(status_code=status_code, content=rows[0])
+        if "return=minimal" in request.headers.get("prefer", ""):
+            return JSONResponse(status_code=status_code, content=[])
+        return JSONResponse(status_code=status_code, content=rows)
+
+    @app.get("/auth/v1/user")
+    async def auth_user(request: Request):
+        await _delay()
+        authorization = request.headers.get("authorization", "")
+        if not authorization.startswith("Bearer ") or not authorization[7:]:
+            raise HTTPException(status_code=401, detail="invalid JWT")
+        token = authorization[7:]
+        return {"id": user_id_for_token(token), "aud": "authenticated", "role": "authenticated", "email": f"{token}@loadtest.local"}
+
+    @app.get("/rest/v1/{table}")
+    async def select_rows(table: str, request: Request):
+        await _delay()
+        params = request.query_params
+        limit = int(params["limit"]) if "limit" in params else None
+        rows = app.state.store.select(_table(table), _parse_filters(params), _parse_order(params.get("order")), limit)
+        return _respond(request, rows)
+
+    @app.post("/rest/v1/{table}")
+    async def insert_rows(table: str, request: Request):
+        await _delay()
+        payload = await request.json()
+        rows = app.state.store.insert(_table(table), payload if isinstance(payload, list) else [payload])
+        return _respond(request, rows, status_code=201)
+
+    @app.patch("/rest/v1/{table}")
+    async def update_rows(table: str, request: Request):
+        await _delay()
+        rows = app.state.store.update(_table(table), _parse_filters(request.query_params), await request.json())
+        return _respond(request, rows)
+
+    @app.delete("/rest/v1/{table}")
+    async def delete_rows(table: str, request: Request):
+        await _delay()
+        rows = app.state.store.delete(_table(table), _parse_filters(request.query_params))
+        return _respond(request, rows)
+
+    @app.get("/_stats")
+    def stats():
+        return {"rows": app.state.store.counts()}
+
+    @app.post("/_reset")
+    def reset():
+        app.state.store.reset()
+        return {"status": "ok"}
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local Supabase (GoTrue + PostgREST) stand-in for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Added latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform random extra latency")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency_ms, args.jitter_ms), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
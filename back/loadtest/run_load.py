@@ -0,0 +1,358 @@
+"""
+Generador de carga para /api/chat/message y /api/chat/coach/message.
+
+Each virtual user has its own bearer token (a distinct user for the fake Supabase) and
+walks a conversation: it keeps its chat session until the agent makes a prediction, then
+starts a new one. Coach requests use an assessment seeded for that user in the fake
+Supabase. Reports requests/s and p50/p95/p99 latency per endpoint.
+
+Against servers that are already running:
+    python loadtest/run_load.py --base-url http://127.0.0.1:7860 --supabase-url http://127.0.0.1:54321 \\
+        --concurrency 16 --duration 30
+
+Self-contained (starts fake Supabase, fake OpenAI and the backend with synthetic models):
+    python loadtest/run_load.py --spawn --synthetic-models --openai-latency-ms 300 --duration 30
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+BACK_DIR = Path(__file__).resolve().parents[1]
+LOG_DIR = BACK_DIR / "logs"
+sys.path.insert(0, str(BACK_DIR))
+
+from loadtest.fake_supabase import user_id_for_token  # noqa: E402
+
+ENDPOINTS = {
+    "message": "/api/chat/message",
+    "coach": "/api/chat/coach/message",
+}
+# Con forma de JWT: supabase-py valida el formato de la anon key
+FAKE_ANON_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.loadtest"
+
+USER_MESSAGES = (
+    "Hola, quiero saber mi riesgo",
+    "Tengo 52 años, soy hombre, mido 175 cm y peso 88 kg",
+    "Mi cintura mide 101 cm, presión 135 y colesterol 215",
+    "¿Qué puedo hacer para bajar mi riesgo?",
+)
+
+
+@dataclass
+class EndpointStats:
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    statuses: Dict[int, int] = field(default_factory=dict)
+    predictions: int = 0
+
+    def summary(self, elapsed: float) -> Dict[str, float]:
+        count = len(self.latencies)
+        millis = np.asarray(self.latencies, dtype=np.float64) * 1000.0 if count else np.zeros(1)
+        return {
+            "requests": count,
+            "errors": self.errors,
+            "predictions": self.predictions,
+            "requests_per_s": count / elapsed if elapsed > 0 else 0.0,
+            "p50_ms": float(np.percentile(millis, 50)),
+            "p95_ms": float(np.percentile(millis, 95)),
+            "p99_ms": float(np.percentile(millis, 99)),
+            "max_ms": float(millis.max()),
+            "statuses": {str(code): n for code, n in sorted(self.statuses.items())},
+        }
+
+
+class LoadRun:
+    def __init__(self, base_url: str, weights: Dict[str, float], timeout: float):
+        self.base_url = base_url.rstrip("/")
+        self.weights = weights
+        self.timeout = timeout
+        self.stats = {name: EndpointStats() for name in weights}
+        self._remaining: Optional[int] = None
+        self._deadline: Optional[float] = None
+
+    def _take_slot(self) -> bool:
+        if self._deadline is not None and time.monotonic() >= self._deadline:
+            return False
+        if self._remaining is not None:
+            if self._remaining <= 0:
+                return False
+            self._remaining -= 1
+        return True
+
+    async def _request(self, client: httpx.AsyncClient, endpoint: str, token: str, payload: dict) -> Optional[dict]:
+        stats = self.stats[endpoint]
+        started = time.perf_counter()
+        try:
+            response = await client.post(
+                self.base_url + ENDPOINTS[endpoint],
+                json=payload,
+                headers={"Authorization": f"Bearer {token}"},
+            )
+        except httpx.HTTPError:
+            stats.latencies.append(time.perf_counter() - started)
+            stats.errors += 1
+            return None
+        stats.latencies.append(time.perf_counter() - started)
+        stats.statuses[response.status_code] = stats.statuses.get(response.status_code, 0) + 1
+        if response.status_code != 200:
+            stats.errors += 1
+            return None
+        return response.json()
+
+    async def _virtual_user(self, client: httpx.AsyncClient, index: int, assessment_id: Optional[str], seed: int) -> None:
+        rng = random.Random(seed + index)
+        token = f"loadtest-user-{index}"
+        names, weights = zip(*self.weights.items())
+        session_id = None
+        turn = 0
+        while self._take_slot():
+            endpoint = rng.choices(names, weights)[0]
+            if endpoint == "coach":
+                await self._request(client, "coach", token, {"content": "¿Cómo voy con mi plan?", "session_id": assessment_id})
+                continue
+
+            body = await self._request(client, "message", token, {"content": USER_MESSAGES[turn % len(USER_MESSAGES)], "session_id": session_id})
+            turn += 1
+            if body is None or body.get("prediction_made"):
+                if body is not None:
+                    self.stats["message"].predictions += 1
+                # Conversación terminada (o fallida): la siguiente empieza una sesión nueva
+                session_id, turn = None, 0
+            else:
+                session_id = body["session_id"]
+
+    async def run(
+        self,
+        concurrency: int,
+        duration: Optional[float],
+        requests: Optional[int],
+        assessment_ids: Dict[int, str],
+        seed: int,
+    ) -> float:
+        self._remaining = requests
+        self._deadline = time.monotonic() + duration if duration else None
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(timeout=self.timeout, limits=limits) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                self._virtual_user(client, index, assessment_ids.get(index), seed) for index in range(concurrency)
+            ))
+            return time.perf_counter() - started
+
+
+def seed_assessments(supabase_url: str, concurrency: int) -> Dict[int, str]:
+    """One assessment per virtual user, inserted straight into the (fake) PostgREST."""
+    assessment_ids = {}
+    with httpx.Client(timeout=10) as client:
+        for index in range(concurrency):
+            assessment_id = str(uuid.uuid4())
+            response = client.post(
+                supabase_url.rstrip("/") + "/rest/v1/assessments",
+                json={
+                    "id": assessment_id,
+                    "user_id": user_id_for_token(f"loadtest-user-{index}"),
+                    "risk_score": 0.42,
+                    "risk_level": "moderate",
+                    "drivers": [],
+                    "assessment_data": {
+                        "model_used": "diabetes",
+                        "plan_text": "Caminar 30 minutos al día y reducir bebidas azucaradas.",
+                        "citations": [],
+                    },
+                },
+                headers={"apikey": FAKE_ANON_KEY, "Prefer": "return=representation"},
+            )
+            response.raise_for_status()
+            assessment_ids[index] = assessment_id
+    return assessment_ids
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process for {url} exited with code {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout:.0f}s")
+
+
+def _spawn(stack: ExitStack, args: argparse.Namespace, models_dir: Optional[Path]) -> Dict[str, str]:
+    """Start fake Supabase, fake OpenAI and the backend as subprocesses; return their URLs."""
+
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+
+    def start(name: str, command: List[str], env: Optional[dict] = None) -> subprocess.Popen:
+        # La salida de cada proceso va a logs/loadtest_<name>.log para no mezclarla con el reporte
+        log = stack.enter_context(open(LOG_DIR / f"loadtest_{name}.log", "w"))
+        process = subprocess.Popen(command, cwd=BACK_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+        stack.callback(_terminate, process)
+        return process
+
+    supabase_port, openai_port, backend_port = _free_port(), _free_port(), _free_port()
+    supabase = start("supabase", [
+        sys.executable, "loadtest/fake_supabase.py", "--port", str(supabase_port),
+        "--latency-ms", str(args.supabase_latency_ms), "--jitter-ms", str(args.supabase_jitter_ms),
+    ])
+    openai_command = [
+        sys.executable, "loadtest/fake_openai.py", "--port", str(openai_port),
+        "--latency-ms", str(args.openai_latency_ms), "--jitter-ms", str(args.openai_jitter_ms),
+    ]
+    if args.openai_script:
+        openai_command += ["--script", str(args.openai_script)]
+    openai = start("openai", openai_command)
+
+    urls = {
+        "supabase": f"http://127.0.0.1:{supabase_port}",
+        "openai": f"http://127.0.0.1:{openai_port}",
+        "backend": f"http://127.0.0.1:{backend_port}",
+    }
+    env = {
+        **os.environ,
+        "SUPABASE_URL": urls["supabase"],
+        "SUPABASE_ANON_KEY": FAKE_ANON_KEY,
+        "OPENAI_API_KEY": "sk-loadtest",
+        "OPENAI_BASE_URL": urls["openai"] + "/v1",
+    }
+    if models_dir is not None:
+        env["ML_MODELS_DIR"] = str(models_dir)
+    backend = start("backend", [
+        sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(backend_port),
+        "--log-level", "warning",
+    ], env=env)
+
+    _wait_ready(urls["supabase"] + "/_stats", supabase, 30)
+    _wait_ready(urls["openai"] + "/_stats", openai, 30)
+    _wait_ready(urls["backend"] + "/ready", backend, args.ready_timeout)
+    return urls
+
+
+def _terminate(process: subprocess.Popen) -> None:
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def _parse_weights(raw: str) -> Dict[str, float]:
+    weights = {}
+    for part in raw.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint {name!r} (expected one of {sorted(ENDPOINTS)})")
+        weights[name] = float(weight) if weight else 1.0
+    return weights
+
+
+def print_report(report: Dict[str, Dict[str, float]], elapsed: float) -> None:
+    header = (
+        f"{'endpoint':<10}{'requests':>10}{'errors':>8}{'predict':>9}{'req/s':>9}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    )
+    print(header)
+    print("-" * len(header))
+    for name, row in report.items():
+        print(
+            f"{name:<10}{row['requests']:>10}{row['errors']:>8}{row['predictions']:>9}{row['requests_per_s']:>9.1f}"
+            f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}"
+        )
+    print(f"\n{elapsed:.1f}s elapsed")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load generator for the chat endpoints")
+    parser.add_argument("--base-url", default="http://127.0.0.1:7860", help="Backend URL (ignored with --spawn)")
+    parser.add_argument("--supabase-url", help="Fake Supabase URL, used to seed coach assessments")
+    parser.add_argument("--endpoints", type=_parse_weights, default=_parse_weights("message=3,coach=1"),
+                        help="Weighted mix, e.g. message=3,coach=1")
+    parser.add_argument("--concurrency", type=int, default=8, help="Virtual users")
+    parser.add_argument("--duration", type=float, default=None, help="Seconds to run (default 30 unless --requests)")
+    parser.add_argument("--requests", type=int, default=None, help="Total requests instead of a duration")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="Write the report as JSON")
+    spawn = parser.add_argument_group("self-contained mode")
+    spawn.add_argument("--spawn", action="store_true", help="Start fake Supabase, fake OpenAI and the backend")
+    spawn.add_argument("--models-dir", type=Path, help="ML_MODELS_DIR for the spawned backend")
+    spawn.add_argument("--synthetic-models", action="store_true", help="Train the test suite's synthetic models")
+    spawn.add_argument("--openai-latency-ms", type=float, default=300.0)
+    spawn.add_argument("--openai-jitter-ms", type=float, default=100.0)
+    spawn.add_argument("--openai-script", type=Path)
+    spawn.add_argument("--supabase-latency-ms", type=float, default=10.0)
+    spawn.add_argument("--supabase-jitter-ms", type=float, default=5.0)
+    spawn.add_argument("--ready-timeout", type=float, default=120.0)
+    args = parser.parse_args(argv)
+
+    if args.duration is None and args.requests is None:
+        args.duration = 30.0
+
+    with ExitStack() as stack:
+        base_url, supabase_url = args.base_url, args.supabase_url
+        if args.spawn:
+            models_dir = args.models_dir
+            if args.synthetic_models:
+                sys.path.insert(0, str(BACK_DIR / "tests"))
+                from conftest import build_synthetic_models
+
+                import warnings
+
+                models_dir = Path(stack.enter_context(tempfile.TemporaryDirectory()))
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    build_synthetic_models(models_dir)
+            urls = _spawn(stack, args, models_dir)
+            base_url, supabase_url = urls["backend"], urls["supabase"]
+            print(f"Spawned backend {base_url} (logs in {LOG_DIR})")
+
+        weights = dict(args.endpoints)
+        assessment_ids: Dict[int, str] = {}
+        if "coach" in weights:
+            if supabase_url:
+                assessment_ids = seed_assessments(supabase_url, args.concurrency)
+            else:
+                print("No --supabase-url to seed assessments: coach endpoint skipped")
+                weights.pop("coach")
+        if not weights:
+            parser.error("No endpoints left to load")
+
+        load = LoadRun(base_url, weights, args.timeout)
+        elapsed = asyncio.run(load.run(args.concurrency, args.duration, args.requests, assessment_ids, args.seed))
+
+    report = {name: stats.summary(elapsed) for name, stats in load.stats.items()}
+    print_report(report, elapsed)
+    if args.output:
+        args.output.write_text(json.dumps({"elapsed_s": elapsed, "concurrency": args.concurrency, "endpoints": report}, indent=2) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,14 +1,37 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import ml_routes, users_routes, debug_routes, chat_routes
+from fastapi.responses import JSONResponse
+from app.core.config import settings
+from app.routes import ml_routes, users_routes, debug_routes, chat_routes, admin_routes, metrics_routes
+from app.ml.micro_batcher import stop_micro_batcher
+from app.ml.audit_log import stop_audit_sink
+from app.ml.shadow_scorer import stop_shadow_scorer
+from app.services.inference_executor import shutdown_inference_executor
+from app.services.warmup_service import get_readiness, start_background_warm_up
 import os
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # El warm-up corre en segundo plano: /health responde de inmediato y /ready
+    # devuelve 503 hasta que modelos, explainer y tokenizer estén cargados.
+    if settings.WARMUP_ON_STARTUP:
+        start_background_warm_up()
+    yield
+    stop_micro_batcher()
+    shutdown_inference_executor()
+    stop_shadow_scorer()
+    stop_audit_sink()
+
+
 app = FastAPI(
     title="Health AI Backend (Hackathon NHANES)",
     version="2.0 - Conversational",
     description="FastAPI backend for health risk prediction and conversational AI coaching",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # CORS Configuration
@@ -56,6 +79,12 @@ app.include_router(
 # Debug
 app.include_router(debug_routes.router, prefix="/api/debug", tags=["Debug"])
 
+# Administración de modelos (requiere X-Admin-Token)
+app.include_router(admin_routes.router, prefix="/api/admin", tags=["Admin"])
+
+# Métricas en formato Prometheus (latencia por etapa, OpenAI, Supabase, KB)
+app.include_router(metrics_routes.router, tags=["Metrics"])
+
 @app.get("/")
 def root():
     return {
@@ -65,7 +94,9 @@ def root():
         "endpoints": {
             "docs": "/docs",
             "redoc": "/redoc",
-            "health": "/health"
+            "health": "/health",
+            "ready": "/ready",
+            "metrics": "/metrics"
         }
     }
 
@@ -74,6 +105,12 @@ def health_check():
     """Health check endpoint for monitoring."""
     return {"status": "healthy", "service": "HealthAI Backend"}
 
+@app.get("/ready")
+def readiness_check():
+    """Readiness: 200 solo cuando el warm-up terminó; incluye el tiempo de carga por componente."""
+    readiness = get_readiness()
+    return JSONResponse(status_code=200 if readiness["ready"] else 503, content=readiness)
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 7860))
@@ -0,0 +1,180 @@
+"""
+Fixtures compartidos para los tests del backend.
+
+Los artefactos reales (`*.pkl`) no se versionan, así que los tests entrenan
+modelos sintéticos pequeños con la misma estructura que los de producción:
+
+- diabetes: CalibratedClassifierCV(XGBClassifier) + SimpleImputer + feature_names
+- cardiovascular: CalibratedClassifierCV(ImbPipeline[pre, smote, clf])
+"""
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from imblearn.over_sampling import SMOTE
+from imblearn.pipeline import Pipeline as ImbPipeline
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from xgboost import XGBClassifier
+
+from app.ml import model_loader, predictor
+from app.ml.model_registry import get_registry
+from app.ml.feature_engineering import (
+    CARDIO_FEATURE_COLUMNS,
+    build_cardiovascular_feature_frame,
+    build_feature_frame,
+)
+
+DIABETES_FEATURES = [
+    'age', 'age_squared', 'sex_male', 'bmi', 'bmi_squared', 'waist_height_ratio',
+    'waist_height_ratio_squared', 'high_waist_height_ratio', 'central_obesity',
+    'high_risk_profile', 'sleep_hours', 'poor_sleep', 'cigarettes_per_day',
+    'current_smoker', 'ever_smoker', 'total_active_days', 'meets_activity_guidelines',
+    'sedentary_flag', 'lifestyle_risk_score', 'bmi_age_interaction',
+    'waist_age_interaction', 'bmi_age_sex_interaction', 'obesity_sedentary_combo',
+    'age_poor_sleep', 'triple_risk',
+    # Columna sin datos en entrenamiento: el imputer la descarta (statistics_ = NaN)
+    'diastolic_bp',
+]
+
+
+def random_profiles(n: int, seed: int = 0) -> list:
+    """Perfiles crudos con la firma de `predict_risk`, incluyendo valores faltantes."""
+    rng = np.random.default_rng(seed)
+    profiles = []
+    for _ in range(n):
+        height = float(rng.uniform(150, 195))
+        weight = float(rng.uniform(45, 130))
+        profile = {
+            'age': int(rng.integers(18, 85)),
+            'sex': str(rng.choice(['M', 'F'])),
+            'height_cm': height,
+            'weight_kg': weight,
+            'bmi': weight / ((height / 100) ** 2),
+            'waist_cm': float(rng.uniform(60, 135)),
+            'sleep_hours': float(rng.uniform(4, 10)),
+            'smokes_cig_day': int(rng.choice([0, 0, 0, 10])),
+            'days_mvpa_week': int(rng.integers(0, 8)),
+            'systolic_bp': float(rng.uniform(95, 170)),
+            'total_cholesterol': float(rng.uniform(140, 290)),
+            'glucosa_mgdl': float(rng.uniform(70, 180)),
+            'hdl_mgdl': float(rng.uniform(25, 90)),
+            'ldl_mgdl': float(rng.uniform(60, 200)),
+            'trigliceridos_mgdl': float(rng.uniform(50, 400)),
+        }
+        for key in ('waist_cm', 'sleep_hours', 'days_mvpa_week', 'systolic_bp',
+                    'total_cholesterol', 'hdl_mgdl', 'trigliceridos_mgdl'):
+            if rng.random() < 0.15:
+                profile[key] = None
+        profiles.append(profile)
+    return profiles
+
+
+def _diabetes_training_frame(profiles: list) -> pd.DataFrame:
+    rows = [
+        build_feature_frame(
+            age=p['age'], sex=p['sex'], height_cm=p['height_cm'], weight_kg=p['weight_kg'],
+            waist_cm=p['waist_cm'], sleep_hours=p['sleep_hours'],
+            smokes_cig_day=p['smokes_cig_day'], days_mvpa_week=p['days_mvpa_week'],
+            bmi=p['bmi'], systolic_bp=p['systolic_bp'],
+            total_cholesterol=p['total_cholesterol'], feature_names=DIABETES_FEATURES,
+        )
+        for p in profiles
+    ]
+    frame = pd.concat(rows, ignore_index=True)
+    frame['diastolic_bp'] = np.nan
+    return frame
+
+
+def _cardio_training_frame(profiles: list, rng) -> pd.DataFrame:
+    rows = [
+        build_cardiovascular_feature_frame(
+            edad=p['age'], genero=p['sex'], imc=p['bmi'], altura_cm=p['height_cm'],
+            peso_kg=p['weight_kg'], circunferencia_cintura=p['waist_cm'],
+            glucosa_mgdl=p['glucosa_mgdl'], hdl_mgdl=p['hdl_mgdl'],
+            trigliceridos_mgdl=p['trigliceridos_mgdl'], ldl_mgdl=p['ldl_mgdl'],
+        )
+        for p in profiles
+    ]
+    frame = pd.concat(rows, ignore_index=True)
+    # En NHANES estas columnas sí existen; en serving llegan siempre vacías / en cero
+    frame['educacion'] = rng.integers(1, 6, len(frame)).astype(float)
+    frame['ratio_ingreso_pobreza'] = rng.uniform(0, 5, len(frame))
+    etnia = rng.integers(1, 6, len(frame))
+    for code in (2, 3, 4, 5):
+        frame[f'etnia_{code}.0'] = (etnia == code).astype(float)
+    return frame
+
+
+def build_synthetic_models(models_dir, seed: int = 0) -> None:
+    """Entrena y serializa modelos sintéticos con el layout legacy de `models/`."""
+    rng = np.random.default_rng(seed)
+    profiles = random_profiles(600, seed=seed)
+
+    X_diab = _diabetes_training_frame(profiles)
+    imputer = SimpleImputer(strategy='median').fit(X_diab)
+    X_imp = imputer.transform(X_diab)
+    logit = 0.08 * (X_diab['bmi'].values - 27) + 0.05 * (X_diab['age'].values - 50)
+    y_diab = (rng.random(len(X_diab)) < 1 / (1 + np.exp(-logit))).astype(int)
+    diabetes_model = CalibratedClassifierCV(
+        XGBClassifier(n_estimators=30, max_depth=3, learning_rate=0.2, random_state=seed),
+        method='isotonic',
+        cv=3,
+    ).fit(X_imp, y_diab)
+
+    joblib.dump(diabetes_model, models_dir / 'old_model_xgb_calibrated.pkl')
+    joblib.dump(imputer, models_dir / 'imputer.pkl')
+    joblib.dump(DIABETES_FEATURES, models_dir / 'feature_names.pkl')
+
+    X_cardio = _cardio_training_frame(profiles, rng)
+    logit = 0.06 * (X_cardio['edad'].values - 55) - 0.03 * (X_cardio['hdl_mgdl'].fillna(50).values - 50)
+    y_cardio = (rng.random(len(X_cardio)) < 1 / (1 + np.exp(-logit))).astype(int)
+    numeric = Pipeline([
+        ('imputer', SimpleImputer(strategy='median')),
+        ('scaler', StandardScaler()),
+    ])
+    pipeline = ImbPipeline([
+        ('pre', ColumnTransformer([('num', numeric, CARDIO_FEATURE_COLUMNS)], remainder='drop')),
+        ('smote', SMOTE(random_state=seed, k_neighbors=3)),
+        ('clf', LogisticRegression(max_iter=1000, class_weight='balanced')),
+    ])
+    cardio_model = CalibratedClassifierCV(pipeline, method='sigmoid', cv=3).fit(X_cardio, y_cardio)
+    joblib.dump(cardio_model, models_dir / 'old_model_cardiovascular.pkl')
+
+
+def reset_model_caches() -> None:
+    get_registry().reset()
+    predictor.prediction_cache.clear()
+    predictor._explainers.clear()
+
+
+@pytest.fixture(scope='session')
+def synthetic_models_dir(tmp_path_factory):
+    models_dir = tmp_path_factory.mktemp('models')
+    build_synthetic_models(models_dir)
+    return models_dir
+
+
+@pytest.fixture(scope='session')
+def retrained_models_dir(tmp_path_factory):
+    """Segundo juego de modelos (otra semilla), como candidato o nueva versión."""
+    models_dir = tmp_path_factory.mktemp('models_v2')
+    build_synthetic_models(models_dir, seed=1)
+    return models_dir
+
+
+@pytest.fixture
+def synthetic_models(synthetic_models_dir, monkeypatch):
+    """Apunta el model_loader a los modelos sintéticos durante el test."""
+    monkeypatch.setattr(model_loader, 'get_models_dir', lambda: synthetic_models_dir)
+    reset_model_caches()
+    yield synthetic_models_dir
+    reset_model_caches()
@@ -7,3 +7,67 @@ def test_root():
     response = client.get("/")
     assert response.status_code == 200
     assert "Backend HealthAI" in response.text
+
+
+def test_ready_reports_component_load_times(synthetic_models, monkeypatch):
+    import threading
+    from app.services import warmup_service
+
+    monkeypatch.setattr(warmup_service, "_components", {})
+    monkeypatch.setattr(warmup_service, "_started", False)
+    monkeypatch.setattr(warmup_service, "_finished", threading.Event())
+    # Tokenizer y KB son opcionales; aquí no dependemos de red ni de la KB real
+    monkeypatch.setattr(warmup_service, "_load_tokenizer", lambda: None)
+    monkeypatch.setattr(warmup_service, "_load_kb_index", lambda: None)
+
+    assert client.get("/ready").status_code == 503
+
+    warmup_service.warm_up()
+    response = client.get("/ready")
+
+    assert response.status_code == 200
+    components = response.json()["components"]
+    for model_type in ("diabetes", "cardiovascular"):
+        assert components[f"model:{model_type}"]["status"] == "ready"
+        assert components[f"inference:{model_type}"]["load_seconds"] >= 0
+    assert components["explainer:diabetes"]["status"] == "skipped"
+
+
+def test_warm_up_does_not_count_as_served_predictions(synthetic_models, monkeypatch):
+    from app.ml import predictor
+    from app.services import warmup_service
+    from app.utils.metrics import metrics
+
+    metrics.reset()
+    served = []
+    monkeypatch.setattr(predictor, "_submit_shadow", lambda *args: served.append("shadow"))
+    monkeypatch.setattr(predictor, "_submit_audit", lambda *args: served.append("audit"))
+
+    for model_type in ("diabetes", "cardiovascular"):
+        warmup_service._warm_inference(model_type)
+
+    assert served == []
+    assert predictor.prediction_cache.stats()["size"] == 0
+    assert "predictions_total" not in metrics.snapshot()
+
+
+def test_predict_routes_run_through_inference_executor(synthetic_models, monkeypatch):
+    from app.core.security import verify_supabase_token
+    from app.services import inference_executor
+
+    executor = inference_executor.InferenceExecutor(mode="thread", max_workers=1, max_queue=0)
+    monkeypatch.setattr(inference_executor, "_executor", executor)
+    app.dependency_overrides[verify_supabase_token] = lambda: {"id": "user-1"}
+    payload = {"edad": 52, "genero": "M", "altura_cm": 175, "peso_kg": 92, "circunferencia_cintura": 104}
+    try:
+        response = client.post("/api/health/predict/cardiovascular", json=payload)
+        assert response.status_code == 200
+        assert response.json()["model_used"] == "cardiovascular"
+        assert executor.stats()["completed"] == 1
+
+        # Sin cupo en la cola el endpoint responde 503 en vez de bloquear el event loop
+        monkeypatch.setattr(executor, "max_pending", 0)
+        assert client.post("/api/health/predict", json=payload).status_code == 503
+    finally:
+        app.dependency_overrides.clear()
+        executor.shutdown()
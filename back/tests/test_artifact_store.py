@@ -0,0 +1,82 @@
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.ml import model_loader
+from app.ml.artifact_store import (
+    EXPORTED_BUNDLE_DIRS,
+    ArtifactIntegrityError,
+    export_diabetes_bundle,
+    load_diabetes_bundle,
+    read_manifest,
+)
+from app.ml.feature_engineering import build_feature_matrix
+from app.ml.predictor import predict_risk
+
+from conftest import random_profiles, reset_model_caches
+
+
+@pytest.fixture
+def models_dir(synthetic_models_dir, tmp_path, monkeypatch):
+    """Copia privada de los modelos sintéticos para poder exportar/corromper artefactos."""
+    models_dir = tmp_path / "models"
+    shutil.copytree(synthetic_models_dir, models_dir)
+    monkeypatch.setattr(model_loader, "get_models_dir", lambda: models_dir)
+    reset_model_caches()
+    yield models_dir
+    reset_model_caches()
+
+
+def _export(models_dir):
+    model, imputer, feature_names = model_loader.load_pickled_diabetes_bundle(models_dir)
+    export_diabetes_bundle(model, imputer, feature_names, models_dir / EXPORTED_BUNDLE_DIRS["diabetes"])
+    return model, imputer, feature_names
+
+
+def test_exported_bundle_matches_pickled_model_bit_for_bit(models_dir):
+    model, imputer, feature_names = _export(models_dir)
+    exported_model, exported_imputer, exported_names = load_diabetes_bundle(
+        models_dir / EXPORTED_BUNDLE_DIRS["diabetes"]
+    )
+
+    assert exported_names == list(feature_names)
+    assert isinstance(exported_imputer.statistics_, np.memmap)
+    X = build_feature_matrix(pd.DataFrame.from_records(random_profiles(500, seed=10)), feature_names)
+    np.testing.assert_array_equal(exported_imputer.transform(X), imputer.transform(X))
+    np.testing.assert_array_equal(
+        exported_model.predict_proba(imputer.transform(X)), model.predict_proba(imputer.transform(X))
+    )
+
+
+def test_loader_prefers_exported_bundle_and_versions_it(models_dir):
+    profiles = random_profiles(5, seed=11)
+    pickled_results = [predict_risk(**p) for p in profiles]
+    pickled_version = model_loader.get_model_version("diabetes")
+
+    _export(models_dir)
+    reset_model_caches()
+
+    model, _, _ = model_loader.load_model_bundle("diabetes")
+    assert type(model).__name__ == "CalibratedBoosterModel"
+    assert model_loader.get_model_version("diabetes") != pickled_version
+    exported_results = [predict_risk(**p) for p in profiles]
+    for result in pickled_results + exported_results:
+        result.pop("model_version")
+    assert exported_results == pickled_results
+
+
+def test_corrupted_artifact_falls_back_to_pickles(models_dir):
+    _export(models_dir)
+    bundle_dir = models_dir / EXPORTED_BUNDLE_DIRS["diabetes"]
+    with open(bundle_dir / "booster_0.ubj", "r+b") as f:
+        f.seek(10)
+        f.write(b"\x00\x00\x00\x00")
+
+    with pytest.raises(ArtifactIntegrityError):
+        read_manifest(bundle_dir)
+
+    reset_model_caches()
+    model, _, _ = model_loader.load_model_bundle("diabetes")
+    assert type(model).__name__ == "CalibratedClassifierCV"
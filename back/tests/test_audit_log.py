@@ -0,0 +1,140 @@
+import json
+import multiprocessing
+import time
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.ml import audit_log
+from app.ml.audit_log import AuditSink, read_audit_log
+from app.services.worker_pool import _worker_main
+from app.ml.predictor import predict_risk, predict_risk_batch, predict_risk_multi
+from conftest import random_profiles
+
+
+@pytest.fixture
+def audit_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "AUDIT_LOG_ENABLED", True)
+    monkeypatch.setattr(settings, "AUDIT_LOG_DIR", str(tmp_path / "audit"))
+    audit_log.stop_audit_sink()
+    yield tmp_path / "audit"
+    audit_log.stop_audit_sink()
+
+
+def test_every_served_prediction_is_recorded(synthetic_models, audit_dir):
+    profiles = random_profiles(6, seed=21)
+    single = predict_risk(**profiles[0], model_type="cardiovascular")
+    batch = predict_risk_batch(profiles[1:5])
+    multi = predict_risk_multi(profiles[5])
+    audit_log.stop_audit_sink()
+
+    log = read_audit_log(audit_dir)
+    assert list(log["path"]) == ["single", "batch", "batch", "batch", "batch", "multi", "multi"]
+    expected = [single] + batch + list(multi.values())
+    assert np.allclose(log["score"], [r["score"] for r in expected])
+    assert list(log["model_version"]) == [r["model_version"] for r in expected]
+    assert log["age"].tolist() == [p["age"] for p in profiles[:5]] + [profiles[5]["age"]] * 2
+    assert (log["latency_ms"] > 0).all()
+
+    drivers = json.loads(log["drivers"][0])
+    assert [d["feature"] for d in drivers] == [d["feature"] for d in single["drivers"]]
+    features = json.loads(log["features"][1])
+    assert "bmi" in features or "imc" in features
+
+
+def test_record_snapshots_values_callers_mutate_later(tmp_path):
+    sink = AuditSink(tmp_path, flush_seconds=60, parquet=False)
+    profile = {"age": 50, "sex": "M", "bmi": 27.0}
+    result = {"score": 0.4, "risk_level": "moderate", "drivers": [{"feature": "bmi", "impact": 0.1}]}
+    features = {"bmi": 27.0}
+    sink.record("diabetes", "v1", "single", [profile], features, [result], 0.001)
+    profile.update(age=99, sex="F")
+    result.update(score=0.9, risk_level="high")
+    result["drivers"][0]["feature"] = "age"
+    features["bmi"] = 0.0
+    sink.stop()
+
+    log = read_audit_log(tmp_path)
+    assert (log["age"][0], log["sex"][0], log["score"][0], log["risk_level"][0]) == (50, "M", 0.4, "moderate")
+    assert json.loads(log["drivers"][0])[0]["feature"] == "bmi"
+    assert json.loads(log["features"][0]) == {"bmi": 27.0}
+
+
+@pytest.mark.parametrize("parquet", [False, True])
+def test_files_rotate_and_full_buffer_drops(tmp_path, parquet):
+    if parquet:
+        pytest.importorskip("pyarrow")
+    sink = AuditSink(tmp_path, flush_seconds=60, rotate_records=3, max_buffer=5, parquet=parquet)
+    result = {"score": 0.4, "risk_level": "moderate", "drivers": []}
+    for age in range(7):
+        sink.record("diabetes", "v1", "single", [{"age": age, "sex": "F"}], {"bmi": float("nan")}, [result], 0.001)
+    assert sink.stats()["dropped"] == 2
+
+    sink.flush()
+    for age in range(3):
+        sink.record("diabetes", "v1", "single", [{"age": age}], {}, [result], 0.001)
+    sink.stop()
+
+    assert sink.stats()["written"] == 8
+    # Se rota entre flushes: el primer archivo se pasa de 3 filas, el segundo abre con la siguiente
+    suffix = "parquet" if parquet else "jsonl"
+    assert len(list(tmp_path.glob(f"predictions-*.{suffix}"))) == 2
+    assert not list(tmp_path.glob(".*"))
+    log = read_audit_log(tmp_path)
+    assert log["age"].tolist() == [0, 1, 2, 3, 4, 0, 1, 2]
+    assert json.loads(log["features"][0]) == {"bmi": None}
+
+
+def test_record_is_cheap_on_the_request_path(tmp_path):
+    sink = AuditSink(tmp_path, flush_seconds=60, flush_records=10**9, max_buffer=10**9, parquet=False)
+    profile, result = {"age": 50, "sex": "M"}, {"score": 0.2, "drivers": []}
+    n = 20000
+    started = time.perf_counter()
+    for _ in range(n):
+        sink.record("diabetes", "v1", "single", [profile], {}, [result], 0.001)
+    per_call = (time.perf_counter() - started) / n
+    sink.stop()
+    # Holgado para CI: en una máquina normal son unos pocos µs
+    assert per_call < 20e-6
+
+
+def _record_in_worker(n: int) -> int:
+    result = {"score": 0.3, "risk_level": "moderate", "drivers": []}
+    for age in range(n):
+        audit_log.get_audit_sink().record("diabetes", "v1", "single", [{"age": age}], {}, [result], 0.001)
+    return n
+
+
+def test_parquet_windows_are_complete_files_after_rotation_and_worker_exit(audit_dir, monkeypatch):
+    pd = pytest.importorskip("pandas")
+    pytest.importorskip("pyarrow")
+    monkeypatch.setattr(settings, "AUDIT_FLUSH_SECONDS", 60.0)
+    monkeypatch.setattr(settings, "AUDIT_ROTATE_RECORDS", 2)
+
+    sink = audit_log.get_audit_sink()
+    assert sink.parquet
+    result = {"score": 0.1, "risk_level": "low", "drivers": []}
+    for age in (40, 41, 42):
+        sink.record("diabetes", "v1", "single", [{"age": age}], {"bmi": 22.0}, [result], 0.001)
+        sink.flush()
+    # La primera ventana (2 filas) ya rotó y tiene footer; la abierta sigue oculta
+    assert pd.read_parquet(audit_dir)["age"].tolist() == [40, 41]
+    assert len(list(audit_dir.glob(".*.tmp"))) == 1
+
+    # Worker forkeado con la ventana del padre abierta: registra sin flush y sale por el
+    # camino normal ("stop" -> os._exit) sin tocar el archivo del padre
+    parent, child = multiprocessing.get_context("fork").Pipe()
+    worker = multiprocessing.get_context("fork").Process(target=_worker_main, args=(child, 1))
+    worker.start()
+    child.close()
+    parent.send(("task", _record_in_worker, (3,), {}))
+    assert parent.recv()[0] == "ok"
+    parent.send(("stop",))
+    worker.join(timeout=10)
+    assert worker.exitcode == 0
+
+    audit_log.stop_audit_sink()
+    ages = sorted(pd.read_parquet(audit_dir)["age"].tolist())
+    assert ages == [0, 1, 2, 40, 41, 42]
+    assert not list(audit_dir.glob(".*"))
@@ -0,0 +1,42 @@
+from app.core.config import settings
+from app.ml import predictor
+from benchmarks.bench_inference import CASES, compare, measure
+
+from conftest import random_profiles
+
+CASES_BY_NAME = {case.name: case for case in CASES}
+
+
+def test_compare_flags_only_regressions_beyond_tolerance():
+    baseline = {
+        "diabetes.single": {"mode": "single", "p50_ms": 2.0, "p95_ms": 3.0, "throughput_rows_per_s": 400.0, "peak_rss_mb": 200.0},
+        "diabetes.cold": {"mode": "cold", "p50_ms": 20.0, "p95_ms": 25.0, "throughput_rows_per_s": 50.0, "peak_rss_mb": 200.0},
+    }
+    results = {
+        # p50 +40% y p95 +90% caben en 50% (p95 tolera el doble); el throughput cae 3x
+        "diabetes.single": {"mode": "single", "p50_ms": 2.8, "p95_ms": 5.7, "throughput_rows_per_s": 130.0, "peak_rss_mb": 230.0},
+        # En frío el throughput no tiene compuerta; la RSS sí (20%)
+        "diabetes.cold": {"mode": "cold", "p50_ms": 21.0, "p95_ms": 26.0, "throughput_rows_per_s": 10.0, "peak_rss_mb": 260.0},
+        "cardiovascular.single": {"mode": "single", "p50_ms": 99.0},
+    }
+
+    regressions = compare(results, baseline, tolerance=0.5, rss_tolerance=0.2)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("diabetes.single: throughput_rows_per_s")
+    assert regressions[1].startswith("diabetes.cold: peak_rss_mb")
+    assert compare(baseline, baseline, tolerance=0.0, rss_tolerance=0.0) == []
+
+
+def test_measure_reports_latency_percentiles_and_throughput(synthetic_models, monkeypatch):
+    # measure() ajusta backend y cache del proceso (pensado para un proceso hijo)
+    monkeypatch.setattr(settings, "DRIVER_BACKEND", settings.DRIVER_BACKEND)
+    monkeypatch.setattr(predictor.prediction_cache, "max_size", predictor.prediction_cache.max_size)
+    profiles = random_profiles(8, seed=40)
+    single = measure(CASES_BY_NAME["cardiovascular.single"], profiles, iterations=16, batch_size=4)
+    batch = measure(CASES_BY_NAME["diabetes.batch"], profiles, iterations=16, batch_size=4)
+
+    assert single["calls"] == 16 and single["rows"] == 16
+    assert 0 < single["p50_ms"] <= single["p95_ms"] <= single["p99_ms"]
+    assert single["throughput_rows_per_s"] > 0
+    # Al menos 20 lotes, cada uno de batch_size filas
+    assert batch["calls"] == 20 and batch["rows"] == 80
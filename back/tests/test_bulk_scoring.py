@@ -0,0 +1,106 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from app.schemas.analisis_schema import AnalisisEntrada
+from app.services import bulk_scoring
+from app.services.inference_executor import InferenceQueueFullError
+from app.services.ml_service import obtener_prediccion
+from main import app
+
+CSV_HEADER = "edad,genero,altura_cm,peso_kg,circunferencia_cintura,tabaquismo,actividad_fisica\n"
+CSV_ROWS = [
+    "52,M,175,92,104,false,ligero\n",
+    "41,F,162,,80,true,\n",               # sin peso: el modelo la rechaza
+    ",F,160,60,75,false,activo\n",          # sin edad
+    "38,M,abc,80,90,false,moderado\n",     # altura no numérica
+    "67,F,158,71,95,false,sedentario\n",
+]
+
+
+def _lineas(body: str) -> list:
+    return [json.loads(line) for line in body.splitlines()]
+
+
+async def _trozos(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def _collect(data: bytes, formato: str, size: int = 7, chunk_rows: int = 2) -> list:
+    async def run():
+        return [line async for line in bulk_scoring.puntuar_stream(_trozos(data, size), formato, chunk_rows=chunk_rows)]
+    return _lineas(b"".join(asyncio.run(run())).decode())
+
+
+def test_csv_stream_matches_single_predictions_in_order(synthetic_models, monkeypatch):
+    async def inline(func, *args, **kwargs):
+        return func(*args, **kwargs)
+    monkeypatch.setattr(bulk_scoring, "run_inference", inline)
+
+    # Trozos de 7 bytes: las filas quedan partidas entre lecturas
+    lines = _collect((CSV_HEADER + "".join(CSV_ROWS)).encode(), "csv")
+    assert [line.get("fila") for line in lines[:-1]] == [1, 2, 3, 4, 5]
+    assert "bmi" in lines[1]["error"] and "edad" in lines[2]["error"] and "altura_cm" in lines[3]["error"]
+    assert lines[-1] == {"resumen": {"filas": 5, "puntuadas": 2, "errores": 3}}
+
+    esperado = obtener_prediccion(AnalisisEntrada(
+        edad=52, genero="M", altura_cm=175, peso_kg=92, circunferencia_cintura=104,
+        tabaquismo=False, actividad_fisica="ligero",
+    ))
+    assert lines[0]["score"] == esperado["score"]
+    assert lines[0]["categoria_riesgo"] == esperado["categoria_riesgo"]
+
+
+def test_ndjson_stream_scores_in_chunks(synthetic_models, monkeypatch):
+    lotes = []
+
+    async def inline(func, perfiles, **kwargs):
+        lotes.append(len(perfiles))
+        return func(perfiles, **kwargs)
+    monkeypatch.setattr(bulk_scoring, "run_inference", inline)
+
+    filas = [json.dumps({"edad": 30 + i, "genero": "F", "imc": 22 + i}) for i in range(7)]
+    data = ("\n".join(filas[:3]) + "\n\n[1, 2]\n{no json\n" + "\n".join(filas[3:]) + "\n").encode()
+    lines = _collect(data, "ndjson", size=64, chunk_rows=3)
+    assert lotes == [3, 1, 3]
+    assert [line["fila"] for line in lines if "error" in line] == [4, 5]
+    assert lines[-1]["resumen"] == {"filas": 9, "puntuadas": 7, "errores": 2}
+
+
+def test_saturated_queue_fails_the_chunk_without_row_retries(monkeypatch):
+    llamadas = []
+
+    async def saturado(func, perfiles, **kwargs):
+        llamadas.append(len(perfiles))
+        raise InferenceQueueFullError("Inference queue is full")
+    monkeypatch.setattr(bulk_scoring, "run_inference", saturado)
+
+    lines = _collect((CSV_HEADER + "".join(CSV_ROWS)).encode(), "csv", chunk_rows=5)
+    # Un solo intento por chunk; las filas válidas fallan con el mensaje de saturación
+    assert llamadas == [3]
+    assert [line["error"] for line in lines[:-1] if "saturado" in line["error"]] == [bulk_scoring.MENSAJE_SATURADO] * 3
+    assert lines[-1] == {"resumen": {"filas": 5, "puntuadas": 0, "errores": 5}}
+
+
+def test_bulk_endpoint_streams_ndjson(synthetic_models):
+    from app.core.security import verify_supabase_token
+
+    app.dependency_overrides[verify_supabase_token] = lambda: {"id": "user-1"}
+    try:
+        client = TestClient(app)
+        response = client.post(
+            "/api/health/predict/bulk?modelo=diabetes",
+            content=(CSV_HEADER + "".join(CSV_ROWS)).encode(),
+            headers={"Content-Type": "text/csv"},
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = _lineas(response.text)
+        assert lines[-1]["resumen"]["puntuadas"] == 2
+        assert lines[0]["model_used"] == "diabetes"
+
+        assert client.post("/api/health/predict/bulk", content=b"x", headers={"Content-Type": "text/plain"}).status_code == 415
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.ml.compiled_scorers import CompiledCardiovascularScorer
+from app.ml.feature_engineering import build_cardiovascular_feature_matrix
+from app.ml.model_loader import get_active_model
+from app.ml.predictor import CARDIOVASCULAR_INPUTS, _get_cardiovascular_drivers, _score_cardiovascular
+
+from conftest import random_profiles
+
+
+def _cardio_frame(profiles, feature_names):
+    frame = pd.DataFrame.from_records(profiles)
+    return build_cardiovascular_feature_matrix(
+        {arg: frame[key] for key, arg in CARDIOVASCULAR_INPUTS.items()}, feature_names=feature_names
+    )
+
+
+def test_compiled_cardiovascular_scorer_matches_pipeline(synthetic_models):
+    active = get_active_model("cardiovascular")
+    assert isinstance(active.scorer, CompiledCardiovascularScorer)
+
+    feature_names = list(active.feature_names)
+    X = _cardio_frame(random_profiles(400, seed=40), feature_names)
+    scores, drivers = _score_cardiovascular(active.model, X, feature_names, active.scorer)
+
+    expected = active.model.predict_proba(X)[:, 1]
+    np.testing.assert_allclose(scores, expected, rtol=1e-12, atol=1e-15)
+
+    expected_drivers = _get_cardiovascular_drivers(active.model, X, feature_names)
+    for row, expected_row in zip(drivers, expected_drivers):
+        assert [d["feature"] for d in row] == [d["feature"] for d in expected_row]
+        assert [d["value"] for d in row] == [d["value"] for d in expected_row]
+        assert [d["shap_value"] for d in row] == pytest.approx(
+            [d["shap_value"] for d in expected_row], rel=1e-12, abs=1e-12
+        )
+        assert [d["impact"] for d in row] == [d["impact"] for d in expected_row]
+
+
+def test_serving_constants_are_folded_out(synthetic_models):
+    scorer = get_active_model("cardiovascular").scorer
+    variable = {scorer.output_names[j] for j in scorer.variable}
+    assert not variable & {"educacion", "ratio_ingreso_pobreza", "etnia_2.0", "etnia_5.0"}
+    assert scorer.stacked.shape == (2 * len(variable), 3)
+
+
+def test_compiled_scorers_can_be_disabled(synthetic_models, monkeypatch):
+    from app.core.config import settings
+    from conftest import reset_model_caches
+
+    monkeypatch.setattr(settings, "COMPILED_SCORERS", False)
+    reset_model_caches()
+    assert get_active_model("cardiovascular").scorer is None
+
+
+def test_fused_diabetes_scorer_matches_predict_proba(synthetic_models, tmp_path):
+    from app.ml.artifact_store import EXPORTED_BUNDLE_DIRS, export_diabetes_bundle, load_diabetes_bundle
+    from app.ml.compiled_scorers import FusedDiabetesScorer
+    from app.ml.feature_engineering import build_feature_matrix
+
+    active = get_active_model("diabetes")
+    assert isinstance(active.scorer, FusedDiabetesScorer)
+
+    X = build_feature_matrix(pd.DataFrame.from_records(random_profiles(500, seed=41)), list(active.feature_names))
+    X_imp = active.imputer.transform(X)
+    expected = active.model.predict_proba(X_imp)[:, 1]
+    np.testing.assert_allclose(active.scorer.predict_proba_positive(X_imp), expected, rtol=0, atol=1e-9)
+
+    # El bundle exportado se fusiona igual
+    bundle_dir = export_diabetes_bundle(
+        active.model, active.imputer, list(active.feature_names),
+        tmp_path / EXPORTED_BUNDLE_DIRS["diabetes"],
+    ).parent
+    exported_model, _, _ = load_diabetes_bundle(bundle_dir)
+    np.testing.assert_allclose(
+        FusedDiabetesScorer(exported_model).predict_proba_positive(X_imp), expected, rtol=0, atol=1e-9
+    )
@@ -0,0 +1,79 @@
+import asyncio
+import operator
+import threading
+
+import pytest
+
+from app.core.config import settings
+from app.services import inference_executor
+from app.services.inference_executor import (
+    InferenceExecutor,
+    InferenceQueueFullError,
+    run_inference,
+    run_single_prediction,
+)
+
+
+def test_executor_rejects_calls_beyond_queue_depth():
+    executor = InferenceExecutor(mode="thread", max_workers=1, max_queue=1)
+    release = threading.Event()
+    try:
+        running = executor.submit(release.wait)
+        queued = executor.submit(operator.add, 1, 2)
+        with pytest.raises(InferenceQueueFullError):
+            executor.submit(operator.add, 3, 4)
+
+        release.set()
+        assert running.result(timeout=5) is True
+        assert queued.result(timeout=5) == 3
+        # La llamada encolada esperó a que se liberara el único worker
+        stats = executor.stats()
+        assert stats["rejected"] == 1
+        assert stats["completed"] == 2
+        assert stats["pending"] == 0
+        assert stats["queue_wait_seconds"]["buckets"]["+Inf"] == 2
+        assert executor.call(operator.mul, 6, 7) == 42
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_executor_propagates_errors_and_counts_failures():
+    executor = InferenceExecutor(mode="thread", max_workers=1, max_queue=0)
+    try:
+        with pytest.raises(ZeroDivisionError):
+            executor.call(operator.truediv, 1, 0)
+        assert executor.stats()["failed"] == 1
+        assert executor.stats()["pending"] == 0
+    finally:
+        executor.shutdown()
+
+
+def test_process_executor_runs_from_event_loop():
+    executor = InferenceExecutor(mode="process", max_workers=1, max_queue=4)
+    try:
+        assert asyncio.run(executor.run(operator.pow, 2, 10)) == 1024
+        assert executor.stats()["completed"] == 1
+    finally:
+        executor.shutdown()
+
+
+def test_micro_batching_keeps_other_inference_on_the_bounded_executor(monkeypatch):
+    executor = InferenceExecutor(mode="thread", max_workers=1, max_queue=0)
+    monkeypatch.setattr(inference_executor, "_executor", executor)
+    monkeypatch.setattr(settings, "MICRO_BATCHING_ENABLED", True)
+    release = threading.Event()
+    try:
+        running = executor.submit(release.wait)
+        # Lote, what-if, meta...: siguen limitados por la cola del executor
+        with pytest.raises(InferenceQueueFullError):
+            asyncio.run(run_inference(operator.add, 1, 2))
+        # Una predicción individual solo espera al micro-batcher, fuera del executor
+        assert asyncio.run(run_single_prediction(operator.add, 1, 2)) == 3
+        assert executor.stats()["submitted"] == 1
+
+        release.set()
+        assert running.result(timeout=5) is True
+    finally:
+        release.set()
+        executor.shutdown()
@@ -0,0 +1,97 @@
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+import uvicorn
+from openai import OpenAI
+
+from app.agents import coach_agent, conversational_agent, openai_agent
+from app.core import database
+from app.core.config import settings
+from loadtest import fake_openai, fake_supabase
+from loadtest.run_load import FAKE_ANON_KEY, LoadRun, seed_assessments
+from main import app as backend_app
+
+
+def _serve(app):
+    """uvicorn en un hilo sobre un puerto libre; devuelve (url, stop)."""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    def stop():
+        server.should_exit = True
+        thread.join(timeout=5)
+        sock.close()
+
+    return f"http://127.0.0.1:{sock.getsockname()[1]}", stop
+
+
+@pytest.fixture
+def fake_supabase_url(monkeypatch):
+    url, stop = _serve(fake_supabase.create_app())
+    monkeypatch.setattr(settings, "SUPABASE_URL", url)
+    monkeypatch.setattr(settings, "SUPABASE_ANON_KEY", FAKE_ANON_KEY)
+    monkeypatch.setattr(database, "_supabase_client", None)
+    yield url
+    stop()
+
+
+@pytest.fixture
+def fake_openai_url(monkeypatch):
+    url, stop = _serve(fake_openai.create_app(latency_ms=5))
+    client = OpenAI(api_key="sk-test", base_url=url + "/v1")
+    for module in (conversational_agent, openai_agent, coach_agent):
+        monkeypatch.setattr(module, "client", client)
+    yield url
+    stop()
+
+
+def test_fake_supabase_serves_the_database_module(fake_supabase_url):
+    user_id = fake_supabase.user_id_for_token("alice")
+    session = database.get_or_create_session(user_id, None, access_token="alice")
+    assert session["user_id"] == user_id
+    # Una sesión inexistente (p. ej. "coach_<id>") crea una nueva
+    assert database.get_or_create_session(user_id, "coach_x", "alice")["id"] != session["id"]
+    assert database.get_or_create_session(user_id, session["id"], "alice")["id"] == session["id"]
+
+    database.save_chat_message(session["id"], "user", "hola", "alice")
+    database.save_chat_message(session["id"], "assistant", "¿edad?", "alice")
+    assert [m["role"] for m in database.get_messages_by_session(session["id"], "alice")] == ["user", "assistant"]
+
+    saved = database.save_assessment(user_id, {"risk_level": "Alto", "risk_score": 0.8, "assessment_data": {}}, "alice")
+    assert saved["risk_level"] == "high"
+    single = (
+        database.get_supabase("alice").table("assessments").select("*")
+        .eq("id", saved["id"]).eq("user_id", user_id).single().execute()
+    )
+    assert single.data["id"] == saved["id"]
+
+    deleted = database.delete_all_user_data(user_id, "alice")
+    assert deleted["deleted"] == {"messages": 2, "sessions": 2, "assessments": 1, "analisis": 0}
+
+
+def test_load_generator_drives_chat_and_coach_end_to_end(synthetic_models, fake_supabase_url, fake_openai_url):
+    backend_url, stop = _serve(backend_app)
+    try:
+        load = LoadRun(backend_url, {"message": 3, "coach": 1}, timeout=30)
+        assessment_ids = seed_assessments(fake_supabase_url, 1)
+        # Un usuario con semilla 0: coach, coach y luego tres mensajes que terminan en predicción
+        elapsed = asyncio.run(load.run(1, duration=None, requests=5, assessment_ids=assessment_ids, seed=0))
+    finally:
+        stop()
+
+    message = load.stats["message"].summary(elapsed)
+    coach = load.stats["coach"].summary(elapsed)
+    assert (message["requests"], coach["requests"]) == (3, 2)
+    assert message["errors"] == 0 and coach["errors"] == 0
+    # El guion por defecto llama a la herramienta en el tercer mensaje de la conversación
+    assert message["predictions"] == 1
+    assert coach["p50_ms"] > 0 and message["requests_per_s"] > 0
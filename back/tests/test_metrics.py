@@ -0,0 +1,130 @@
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.ml.micro_batcher import MicroBatcher
+from app.ml.predictor import predict_risk, predict_risk_batch
+from app.services.inference_executor import InferenceExecutor
+from app.utils.metrics import MetricsRegistry, metrics
+from main import app
+
+from conftest import random_profiles
+
+client = TestClient(app)
+
+
+def _sample(text: str, name: str, **labels) -> float:
+    pattern = re.escape(name) + r"\{([^}]*)\} (\S+)"
+    for match in re.finditer(pattern, text):
+        found = dict(re.findall(r'(\w+)="([^"]*)"', match.group(1)))
+        if all(found.get(key) == value for key, value in labels.items()):
+            return float(match.group(2))
+    raise AssertionError(f"{name}{labels} not found")
+
+
+def test_timer_records_latency_and_errors():
+    registry = MetricsRegistry(namespace="t", buckets=(0.5, 1.0))
+
+    @registry.timer("call_seconds", operation="ok")
+    def ok():
+        return 1
+
+    assert ok() == 1
+    with pytest.raises(ValueError):
+        with registry.timer("call_seconds", operation="boom"):
+            raise ValueError("boom")
+    registry.observe("call_seconds", 0.75, operation="ok")
+
+    text = registry.render()
+    assert "# TYPE t_call_seconds histogram" in text
+    assert _sample(text, "t_call_seconds_bucket", operation="ok", le="0.5") == 1
+    assert _sample(text, "t_call_seconds_bucket", operation="ok", le="1.0") == 2
+    assert _sample(text, "t_call_seconds_count", operation="ok") == 2
+    assert _sample(text, "t_call_errors_total", operation="boom") == 1
+    assert "t_call_errors_total{operation=\"ok\"}" not in text
+
+
+def test_predictions_expose_stage_latencies_at_metrics_endpoint(synthetic_models):
+    metrics.reset()
+    profiles = random_profiles(4, seed=30)
+    predict_risk(**profiles[0])
+    predict_risk(**profiles[0])
+    predict_risk(**dict(profiles[1], model_type="cardiovascular"))
+    predict_risk_batch(profiles)
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+
+    for stage in ("model", "features", "cache", "predict", "drivers", "total"):
+        assert _sample(text, "healthai_prediction_stage_seconds_count", model="diabetes", stage=stage) >= 1
+    assert _sample(text, "healthai_prediction_stage_seconds_count", model="cardiovascular", stage="predict") >= 1
+    assert _sample(text, "healthai_predictions_total", model="diabetes", path="single") == 1
+    assert _sample(text, "healthai_predictions_total", model="diabetes", path="cached") == 1
+    assert _sample(text, "healthai_predictions_total", model="diabetes", path="batch") == 4
+    assert "healthai_prediction_cache_hits_total" in text
+    assert _sample(text, "healthai_model_loaded_timestamp_seconds", model="diabetes") > 0
+
+
+def test_queue_wait_and_micro_batch_histograms_are_exported(synthetic_models):
+    metrics.reset()
+    executor = InferenceExecutor(mode="thread", max_workers=1, max_queue=4)
+    batcher = MicroBatcher(max_batch_size=4, max_wait_ms=20, executor=executor)
+    try:
+        for value in range(3):
+            executor.call(abs, value)
+        futures = [batcher.submit(profile) for profile in random_profiles(3, seed=31)]
+        [future.result(timeout=10) for future in futures]
+    finally:
+        executor.shutdown()
+        batcher.stop()
+
+    text = client.get("/metrics").text
+    assert "# TYPE healthai_inference_queue_wait_seconds histogram" in text
+    # Las 3 llamadas directas más una tarea por micro-lote
+    calls = 3 + batcher.stats()["batches"]
+    assert _sample(text, "healthai_inference_queue_wait_seconds_bucket", mode="thread", le="+Inf") == calls
+    assert _sample(text, "healthai_inference_queue_wait_seconds_count", mode="thread") == calls
+    # Buckets propios de cada histograma, no los de latencia
+    assert _sample(text, "healthai_micro_batch_size_bucket", le="256") == batcher.stats()["batches"]
+    assert _sample(text, "healthai_micro_batch_wait_seconds_bucket", le="+Inf") == 3
+    assert re.search(r"^healthai_micro_batch_wait_seconds_sum \S+$", text, re.M)
+    assert text.count("healthai_inference_queue_wait_seconds_sum{") == 1
+
+
+def test_process_workers_report_stage_metrics_to_the_parent(synthetic_models):
+    metrics.reset()
+    profiles = random_profiles(3, seed=32)
+    predict_risk(**profiles[0])
+    # El fork hereda la serie de arriba; el worker no debe devolverla otra vez
+    executor = InferenceExecutor(mode="process", max_workers=1, max_queue=4)
+    try:
+        executor.call(predict_risk, **profiles[1])
+        executor.call(predict_risk_batch, profiles)
+    finally:
+        executor.shutdown()
+
+    text = client.get("/metrics").text
+    assert _sample(text, "healthai_predictions_total", model="diabetes", path="single") == 2
+    assert _sample(text, "healthai_predictions_total", model="diabetes", path="batch") == 3
+    assert _sample(text, "healthai_prediction_stage_seconds_count", model="diabetes", stage="total") >= 2
+    assert _sample(text, "healthai_inference_queue_wait_seconds_count", mode="process") == 2
+
+
+def test_scrape_does_not_start_background_workers(monkeypatch):
+    from app.core.config import settings
+    from app.ml import audit_log, micro_batcher, shadow_scorer
+
+    monkeypatch.setattr(settings, "MICRO_BATCHING_ENABLED", True)
+    monkeypatch.setattr(settings, "SHADOW_CANDIDATE", "diabetes:v2")
+    monkeypatch.setattr(settings, "AUDIT_LOG_ENABLED", True)
+    monkeypatch.setattr(micro_batcher, "_micro_batcher", None)
+    monkeypatch.setattr(shadow_scorer, "_shadow_scorer", None)
+    monkeypatch.setattr(audit_log, "_audit_sink", None)
+
+    assert client.get("/metrics").status_code == 200
+    assert micro_batcher._micro_batcher is None
+    assert shadow_scorer._shadow_scorer is None
+    assert audit_log._audit_sink is None
@@ -0,0 +1,108 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.ml.micro_batcher import MicroBatcher
+from app.ml import predictor
+from app.ml.predictor import predict_risk
+from app.services.inference_executor import InferenceExecutor, InferenceQueueFullError
+
+from conftest import random_profiles
+
+
+@pytest.fixture
+def batcher(synthetic_models):
+    batcher = MicroBatcher(max_batch_size=16, max_wait_ms=50)
+    yield batcher
+    batcher.stop()
+
+
+def test_concurrent_requests_are_scored_together(batcher):
+    profiles = random_profiles(32, seed=7)
+    for idx, profile in enumerate(profiles):
+        profile["model_type"] = "cardiovascular" if idx % 4 == 0 else "diabetes"
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(batcher.predict, profiles))
+
+    for profile, result in zip(profiles, results):
+        expected = predict_risk(**profile)
+        assert result.pop("score") == pytest.approx(expected.pop("score"), rel=1e-12, abs=1e-15)
+        assert result == expected
+
+    stats = batcher.stats()
+    assert stats["batch_size"]["sum"] == 32
+    assert stats["batches"] < 32
+    assert stats["batch_size"]["max"] <= 16
+    assert stats["wait_seconds"]["count"] == 32
+
+
+def test_invalid_profile_does_not_fail_the_batch(batcher):
+    good = random_profiles(3, seed=8)
+    bad = dict(good[0], bmi=None, height_cm=None, weight_kg=None)
+    futures = [batcher.submit(params) for params in good + [bad]]
+
+    for profile, future in zip(good, futures):
+        assert future.result(timeout=10)["score"] == pytest.approx(predict_risk(**profile)["score"])
+    with pytest.raises(Exception):
+        futures[-1].result(timeout=10)
+    assert batcher.stats()["fallbacks"] == 1
+
+
+def test_cached_profiles_are_answered_without_enqueuing(batcher, monkeypatch):
+    monkeypatch.setattr(predictor, "prediction_cache", predictor.PredictionCache(max_size=64, ttl_seconds=60))
+    profiles = random_profiles(2, seed=9)
+    profiles[1]["model_type"] = "cardiovascular"
+
+    first = [batcher.predict(profile) for profile in profiles]
+    assert batcher.stats()["batches"] == 2
+
+    # El lote llenó el caché: la segunda vuelta no pasa por la cola ni por el modelo
+    again = [batcher.predict(profile) for profile in profiles]
+    assert again == first
+    stats = batcher.stats()
+    assert stats["batches"] == 2 and stats["cache_hits"] == 2
+    assert predictor.prediction_cache.stats()["hits"] == 2
+    assert predict_risk(**profiles[0]) == first[0]
+
+
+def test_process_mode_batches_run_on_the_forked_workers(synthetic_models, monkeypatch):
+    monkeypatch.setattr(predictor, "prediction_cache", predictor.PredictionCache(max_size=64, ttl_seconds=60))
+    executor = InferenceExecutor(mode="process", max_workers=1, max_queue=4)
+    batcher = MicroBatcher(max_batch_size=8, max_wait_ms=50, executor=executor)
+    try:
+        profiles = random_profiles(6, seed=10)
+        profiles[0]["model_type"] = "cardiovascular"
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            results = list(pool.map(batcher.predict, profiles))
+        batches = batcher.stats()["batches"]
+        # Cada lote fue una tarea del pool de procesos
+        assert executor.stats()["completed"] == batches
+        for profile, result in zip(profiles, results):
+            assert result["score"] == pytest.approx(predict_risk(**profile)["score"], rel=1e-12)
+
+        # El padre guardó en su caché lo que calcularon los workers
+        again = [batcher.predict(profile) for profile in profiles]
+        assert again == results
+        assert batcher.stats()["cache_hits"] == 6
+        assert executor.stats()["completed"] == batches
+    finally:
+        batcher.stop()
+        executor.shutdown()
+
+
+def test_full_executor_fails_the_batch_callers(synthetic_models):
+    executor = InferenceExecutor(mode="thread", max_workers=1, max_queue=0)
+    batcher = MicroBatcher(max_batch_size=4, max_wait_ms=5, executor=executor)
+    release = threading.Event()
+    try:
+        executor.submit(release.wait)
+        futures = [batcher.submit(profile) for profile in random_profiles(2, seed=11)]
+        for future in futures:
+            with pytest.raises(InferenceQueueFullError):
+                future.result(timeout=10)
+    finally:
+        release.set()
+        batcher.stop()
+        executor.shutdown()
@@ -0,0 +1,122 @@
+import json
+import os
+import shutil
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.ml import model_loader
+from app.ml.artifact_store import ArtifactIntegrityError, sha256_file
+from app.ml.model_registry import ModelVersionError, get_registry
+from app.ml.predictor import predict_risk
+from main import app
+
+from conftest import random_profiles, reset_model_caches
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def registry(synthetic_models_dir, retrained_models_dir, tmp_path, monkeypatch):
+    """Registro vacío sobre una copia de los modelos sintéticos, con dos versiones registradas."""
+    models_dir = tmp_path / "models"
+    shutil.copytree(synthetic_models_dir, models_dir)
+    monkeypatch.setattr(model_loader, "get_models_dir", lambda: models_dir)
+    reset_model_caches()
+    registry = get_registry()
+    registry.register_version("diabetes", synthetic_models_dir, version="v1")
+    registry.register_version("diabetes", retrained_models_dir, version="v2")
+    yield registry
+    reset_model_caches()
+
+
+def test_activate_swaps_atomically_and_rolls_back(registry):
+    profile = random_profiles(1, seed=20)[0]
+    legacy = predict_risk(**profile)
+    assert legacy["model_version"].startswith("legacy-")
+
+    registry.activate("diabetes", "v1")
+    v1 = predict_risk(**profile)
+    assert v1["model_version"] == "v1"
+    assert v1["score"] == legacy["score"]
+
+    snapshot = registry.get("diabetes")
+    registry.activate("diabetes", "v2")
+    v2 = predict_risk(**profile)
+    # El cache incluye la versión: la v2 no puede devolver el score cacheado de la v1
+    assert v2["model_version"] == "v2"
+    assert v2["score"] != v1["score"]
+    # Quien tomó la instantánea antes del cambio sigue viendo la v1 completa
+    assert snapshot.version == "v1" and registry.get("diabetes") is not snapshot
+
+    assert registry.rollback("diabetes").version == "v1"
+    assert predict_risk(**profile)["model_version"] == "v1"
+
+    # El estado persiste: tras reiniciar se sirve la versión activa registrada
+    registry.reset()
+    assert registry.get("diabetes").version == "v1"
+
+
+def test_corrupted_version_is_never_activated(registry):
+    registry.activate("diabetes", "v1")
+    with open(registry.root / "diabetes" / "v2" / "imputer.pkl", "ab") as f:
+        f.write(b"\0")
+
+    with pytest.raises(ModelVersionError):
+        registry.activate("diabetes", "v2")
+    assert registry.get("diabetes").version == "v1"
+
+
+def test_fingerprint_follows_artifact_contents(registry, synthetic_models_dir, tmp_path):
+    source = tmp_path / "candidate"
+    source.mkdir()
+    artifact = source / "old_model_cardiovascular.pkl"
+    artifact.write_bytes(b"a" * 64)
+    os.utime(artifact, ns=(1_000_000_000, 1_000_000_000))
+    before = model_loader.artifacts_fingerprint("cardiovascular", source)
+
+    # Mismo tamaño y mtime restaurado (cp -p, rsync -t): el contenido cambió y la huella también
+    artifact.write_bytes(b"b" * 64)
+    os.utime(artifact, ns=(1_000_000_000, 1_000_000_000))
+    assert model_loader.artifacts_fingerprint("cardiovascular", source) != before
+    # Solo tocar el mtime no la cambia
+    os.utime(artifact)
+    changed = model_loader.artifacts_fingerprint("cardiovascular", source)
+    artifact.write_bytes(b"a" * 64)
+    assert model_loader.artifacts_fingerprint("cardiovascular", source) == before != changed
+
+    # Una versión registrada se hashea igual que su origen: misma huella
+    version_dir = registry.root / "diabetes" / "v1"
+    assert model_loader.artifacts_fingerprint("diabetes", version_dir) == model_loader.artifacts_fingerprint(
+        "diabetes", synthetic_models_dir
+    )
+    # Un VERSION.json viejo junto a artefactos cambiados no oculta el cambio: error
+    (source / "VERSION.json").write_text(json.dumps({"files": {artifact.name: sha256_file(artifact)}}))
+    assert model_loader.artifacts_fingerprint("cardiovascular", source) == before
+    artifact.write_bytes(b"b" * 64)
+    with pytest.raises(ArtifactIntegrityError):
+        model_loader.artifacts_fingerprint("cardiovascular", source)
+
+
+def test_admin_endpoints_require_token_and_activate(registry, monkeypatch):
+    headers = {"X-Admin-Token": "secret"}
+    legacy_version = registry.get("diabetes").version
+    assert client.get("/api/admin/models").status_code == 503
+
+    monkeypatch.setattr(settings, "ADMIN_API_TOKEN", "secret")
+    assert client.get("/api/admin/models", headers={"X-Admin-Token": "nope"}).status_code == 401
+
+    response = client.post(
+        "/api/admin/models/diabetes/activate", json={"version": "v2", "background": False}, headers=headers
+    )
+    assert response.status_code == 200
+    assert response.json()["version"] == "v2"
+    assert client.post(
+        "/api/admin/models/diabetes/activate", json={"version": "v9"}, headers=headers
+    ).status_code == 404
+
+    status = client.get("/api/admin/models", headers=headers).json()["models"]["diabetes"]
+    assert status["active_version"] == "v2"
+    assert status["versions"] == ["v1", "v2"]
+    assert status["history"] == [legacy_version]
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.ml import predictor
+from app.ml.feature_engineering import compute_shared_inputs
+from app.ml.predictor import predict_risk, predict_risk_batch, predict_risk_multi
+from conftest import random_profiles
+from main import app
+
+
+def test_multi_model_results_match_single_model_calls(synthetic_models, monkeypatch):
+    monkeypatch.setattr(predictor.prediction_cache, "max_size", 0)
+    calls = []
+    original = predictor.compute_shared_inputs
+    monkeypatch.setattr(predictor, "compute_shared_inputs", lambda *a: calls.append(a) or original(*a))
+
+    for profile in random_profiles(10, seed=11):
+        results = predict_risk_multi(profile)
+        assert list(results) == ["diabetes", "cardiovascular"]
+        for model_type, result in results.items():
+            expected = predict_risk(**profile, model_type=model_type)
+            assert result["score"] == pytest.approx(expected["score"], rel=1e-9)
+            assert result["drivers"] == expected["drivers"]
+            assert result["model_version"] == expected["model_version"]
+    # Las entradas derivadas se calculan una vez por perfil, no una vez por modelo
+    assert len(calls) == 10
+
+
+def test_shared_inputs_derive_bmi_and_ratio_once():
+    shared = compute_shared_inputs(50, "f", height_cm=160, weight_kg=64, waist_cm=88)
+    assert shared.sex_code == "F"
+    assert shared.bmi == pytest.approx(25.0)
+    assert shared.waist_height_ratio == pytest.approx(0.55)
+    assert shared.bmi_age == pytest.approx(1250.0)
+    assert compute_shared_inputs(50, None).bmi is None
+
+
+@pytest.mark.parametrize("model_type, overrides", [
+    ("cardiovascular", {"height_cm": 0}),
+    ("cardiovascular", {"height_cm": -170}),
+    ("cardiovascular", {"weight_kg": 0}),
+    ("cardiovascular", {"weight_kg": -70}),
+    ("diabetes", {"height_cm": -170}),
+    ("diabetes", {"weight_kg": 0}),
+    ("diabetes", {"weight_kg": -70}),
+])
+def test_odd_height_and_weight_score_like_the_batch_path(synthetic_models, monkeypatch, model_type, overrides):
+    monkeypatch.setattr(predictor.prediction_cache, "max_size", 0)
+    profile = dict(random_profiles(1, seed=12)[0], bmi=None, waist_cm=90.0, **overrides)
+
+    single = predict_risk(**profile, model_type=model_type)
+    [batch] = predict_risk_batch([profile], model_type=model_type)
+    assert single["score"] == pytest.approx(batch["score"], rel=1e-9)
+    assert single["drivers"] == batch["drivers"]
+    for result in predict_risk_multi(profile, [model_type]).values():
+        assert result["score"] == pytest.approx(single["score"], rel=1e-9)
+
+
+def test_cardiovascular_keeps_its_bmi_rules_for_zero_weight():
+    shared = compute_shared_inputs(50, "M", height_cm=-170, weight_kg=0, waist_cm=85)
+    # Diabetes: IMC 0 y sin relación con altura negativa; cardiovascular: sin IMC y relación negativa
+    assert shared.bmi == 0.0 and np.isnan(shared.waist_height_ratio)
+    assert shared.cardio_bmi is None
+    assert shared.cardio_waist_height_ratio == pytest.approx(-0.5)
+
+
+def test_multi_endpoint_returns_both_models(synthetic_models):
+    from app.core.security import verify_supabase_token
+
+    app.dependency_overrides[verify_supabase_token] = lambda: {"id": "user-1"}
+    payload = {
+        "edad": 52, "genero": "M", "altura_cm": 175, "peso_kg": 92, "circunferencia_cintura": 104,
+        "horas_sueno": 6, "tabaquismo": False, "presion_sistolica": 135, "colesterol_total": 215,
+        "glucosa_mgdl": 105, "hdl_mgdl": 42, "ldl_mgdl": 140, "trigliceridos_mgdl": 180,
+    }
+    try:
+        client = TestClient(app)
+        body = client.post("/api/health/predict/multi", json=payload).json()
+        assert set(body["resultados"]) == {"diabetes", "cardiovascular"}
+        assert all(r["drivers"] for r in body["resultados"].values())
+
+        only = client.post("/api/health/predict/multi?modelos=cardiovascular", json=payload).json()
+        assert list(only["resultados"]) == ["cardiovascular"]
+        assert client.post("/api/health/predict/multi?modelos=renal", json=payload).status_code == 400
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.config import settings
+from app.ml import population_percentiles
+from app.ml.model_loader import get_active_model
+from app.ml.population_percentiles import PercentileTable, age_band, build_reference, reference_path
+from app.ml.predictor import predict_risk
+from app.schemas.analisis_schema import AnalisisEntrada
+from app.services.ml_service import obtener_prediccion
+from conftest import random_profiles
+
+
+@pytest.fixture
+def reference(synthetic_models, tmp_path, monkeypatch):
+    source = tmp_path / "nhanes.csv"
+    pd.DataFrame(random_profiles(1200, seed=5)).to_csv(source, index=False)
+    monkeypatch.setattr(settings, "POPULATION_REFERENCE_DIR", str(tmp_path / "population"))
+    monkeypatch.setattr(population_percentiles, "_table", PercentileTable())
+    return build_reference(source, "diabetes", chunk_size=500)
+
+
+def test_reference_groups_are_sorted_scores_of_the_population(reference):
+    assert sum(reference["groups"].values()) == 1200
+    with np.load(reference["path"]) as data:
+        for key in data.files:
+            assert np.all(np.diff(data[key]) >= 0)
+
+    profile = random_profiles(1200, seed=5)[0]
+    score = predict_risk(**profile)["score"]
+    key = f"{profile['sex']}_{age_band(profile['age'])}"
+    with np.load(reference["path"]) as data:
+        assert np.isclose(data[key], score, atol=1e-6).any()
+
+
+def test_lookup_counts_lower_scores_and_reloads_on_version_change(tmp_path):
+    np.savez(reference_path("diabetes", "v1", tmp_path), M_40_49=np.arange(100, dtype=np.float32) / 100)
+    np.savez(reference_path("diabetes", "v2", tmp_path), **{"M_40-49": np.linspace(0, 0.5, 100, dtype=np.float32)})
+    table = PercentileTable(tmp_path)
+
+    # v1 no tiene el grupo con la clave esperada: sin percentil
+    assert table.lookup("diabetes", "v1", 45, "M", 0.3) is None
+    result = table.lookup("diabetes", "v2", 45, "m", 0.3)
+    assert result["age_band"] == "40-49" and result["reference_size"] == 100
+    assert result["percentile"] == pytest.approx(60.0, abs=1.0)
+    assert table.lookup("diabetes", "v3", 45, "M", 0.3) is None
+    assert table.lookup("diabetes", "v2", 15, "M", 0.3) is None
+    assert age_band(72) == "70+"
+
+
+def test_prediction_includes_percentile_when_requested(reference):
+    data = AnalisisEntrada(
+        edad=52, genero="M", altura_cm=175, peso_kg=92, circunferencia_cintura=104, horas_sueno=6,
+        tabaquismo=False, presion_sistolica=135, colesterol_total=215, percentil=True,
+    )
+    respuesta = obtener_prediccion(data)
+    assert respuesta["model_version"] == get_active_model("diabetes").version
+    assert respuesta["percentil"]["banda_edad"] == "50-59"
+    assert 0.0 <= respuesta["percentil"]["percentil"] <= 100.0
+    assert "percentil" not in obtener_prediccion(data.model_copy(update={"percentil": False}))
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.ml.population_scoring import main, nhanes_to_inputs, score_population
+from app.ml.predictor import predict_risk_batch
+from conftest import random_profiles
+
+
+def _nhanes_frame(profiles):
+    """Inverso del mapeo: perfiles crudos escritos con columnas NHANES de prepare_dataset."""
+    rows = []
+    for seqn, profile in enumerate(profiles, start=90000):
+        rows.append({
+            "SEQN": seqn,
+            "RIDAGEYR": profile["age"],
+            "RIAGENDR": 1 if profile["sex"] == "M" else 2,
+            "BMXHT": profile["height_cm"],
+            "BMXWT": profile["weight_kg"],
+            "BMXBMI": profile["bmi"],
+            "BMXWAIST": profile["waist_cm"],
+            "SLD012": profile["sleep_hours"],
+            "SMQ020": 1 if profile["smokes_cig_day"] else 2,
+            "SMD650": profile["smokes_cig_day"] or None,
+            "PAQ655": profile["days_mvpa_week"],
+            "BPXSY1": profile["systolic_bp"],
+            "LAB_LBXTC": profile["total_cholesterol"],
+            "LAB_LBXGLU": profile["glucosa_mgdl"],
+            "LAB_LBDHDD": profile["hdl_mgdl"],
+            "LAB_LBDLDL": profile["ldl_mgdl"],
+            "LAB_LBXTR": profile["trigliceridos_mgdl"],
+        })
+    return pd.DataFrame(rows)
+
+
+def test_nhanes_columns_map_to_predict_risk_inputs():
+    frame = pd.DataFrame({
+        "RIDAGEYR": [45, 60], "RIAGENDR": [1, 2], "BPXSY1": [120, 140], "BPXSY2": [130, np.nan],
+        "SMQ020": [2, 1], "SMQ040": [np.nan, 1], "SMD650": [np.nan, 15],
+        "PAQ650": [2, 1], "PAQ665": [2, 1], "PAQ655": [np.nan, 3], "PAQ670": [np.nan, 5],
+        "LAB_LBXGLU": [99, 130],
+    })
+    inputs = nhanes_to_inputs(frame)
+    assert inputs["sex"].tolist() == ["M", "F"]
+    assert inputs["systolic_bp"].tolist() == [125, 140]
+    assert inputs["smokes_cig_day"].tolist() == [0, 15]
+    assert inputs["days_mvpa_week"].tolist() == [0, 5]
+    assert inputs["glucosa_mgdl"].tolist() == [99, 130]
+    assert inputs["ldl_mgdl"].isna().all()
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_population_scores_match_the_served_model(synthetic_models, tmp_path, workers):
+    profiles = random_profiles(45, seed=3)
+    source = tmp_path / "nhanes.csv"
+    frame = _nhanes_frame(profiles)
+    frame.loc[7, "RIAGENDR"] = np.nan  # sin sexo: se escribe la fila, sin score
+    frame.to_csv(source, index=False)
+
+    output = tmp_path / "scores.csv"
+    summary = score_population(source, output, "diabetes", chunk_size=10, workers=workers, top_drivers=2)
+
+    scored = pd.read_csv(output)
+    assert summary["rows"] == 45 and summary["scored"] == 44 and summary["skipped"] == 1
+    assert scored["SEQN"].tolist() == frame["SEQN"].tolist()
+    assert np.isnan(scored.loc[7, "score"])
+
+    expected = predict_risk_batch([p for i, p in enumerate(profiles) if i != 7], model_type="diabetes")
+    actual = scored.drop(index=7)
+    np.testing.assert_allclose(actual["score"], [r["score"] for r in expected], rtol=1e-6)
+    assert actual["driver_1"].tolist() == [r["drivers"][0]["feature"] for r in expected]
+    assert set(actual["model_version"]) == {summary["model_version"]}
+
+
+def test_cli_reports_throughput(synthetic_models, tmp_path, capsys):
+    source = tmp_path / "inputs.csv"
+    pd.DataFrame(random_profiles(12, seed=5)).to_csv(source, index=False)
+    output = tmp_path / "out" / "scores.csv"
+
+    assert main([str(source), str(output), "--model", "cardiovascular", "--workers", "1"]) == 0
+    assert "rows/s" in capsys.readouterr().out
+    scored = pd.read_csv(output)
+    assert scored["row"].tolist() == list(range(12))
+    assert scored["score"].between(0, 1).all()
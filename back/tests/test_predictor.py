@@ -0,0 +1,155 @@
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.ml.feature_engineering import (
+    build_cardiovascular_feature_frame,
+    build_cardiovascular_feature_matrix,
+    build_feature_frame,
+    build_feature_matrix,
+)
+from app.ml.model_loader import get_serving_spec, load_model_bundle
+from app.ml.predictor import CARDIOVASCULAR_INPUTS, DIABETES_INPUTS, predict_risk, predict_risk_batch
+
+from conftest import DIABETES_FEATURES, random_profiles
+
+
+def test_batch_matches_single_predictions(synthetic_models):
+    profiles = random_profiles(40, seed=1)
+    for idx, profile in enumerate(profiles):
+        profile["model_type"] = "cardiovascular" if idx % 3 == 0 else "diabetes"
+
+    batch_results = predict_risk_batch(profiles)
+
+    assert len(batch_results) == len(profiles)
+    for profile, batch_result in zip(profiles, batch_results):
+        single_result = predict_risk(**profile)
+        if profile["model_type"] == "cardiovascular":
+            # El scorer compilado multiplica una matriz N x F (GEMM) o una fila (GEMV): BLAS
+            # puede acumular en otro orden, así que solo el último ulp puede diferir
+            assert batch_result.pop("score") == pytest.approx(single_result.pop("score"), rel=1e-15, abs=0)
+        assert batch_result == single_result
+
+
+def test_zero_height_without_bmi_matches_single_prediction(synthetic_models):
+    profile = dict(random_profiles(1, seed=3)[0], height_cm=0.0, bmi=None)
+
+    # Diabetes: sin IMC calculable ambas rutas rechazan la fila (el lote daba IMC infinito)
+    with pytest.raises(ValueError, match="bmi"):
+        predict_risk(**profile, model_type="diabetes")
+    with pytest.raises(ValueError, match="bmi"):
+        predict_risk_batch([profile], model_type="diabetes")
+
+    # Cardiovascular: el IMC queda faltante en ambas rutas y el pipeline lo imputa
+    single = predict_risk(**profile, model_type="cardiovascular")
+    [batch] = predict_risk_batch([profile], model_type="cardiovascular")
+    assert batch["score"] == pytest.approx(single["score"], rel=1e-15, abs=0)
+    assert batch["drivers"] == single["drivers"]
+
+
+def test_columnar_features_match_row_builders():
+    profiles = random_profiles(60, seed=2) + [
+        # cintura sin altura -> umbral por sexo; sexo no reconocido; lípidos en cero
+        {"age": 50, "sex": "M", "height_cm": None, "weight_kg": None, "bmi": 31.0,
+         "waist_cm": 104.0, "ldl_mgdl": 0.0, "hdl_mgdl": 40.0},
+        {"age": 61, "sex": "female", "height_cm": 160.0, "weight_kg": 70.0, "bmi": None,
+         "waist_cm": 90.0, "trigliceridos_mgdl": None},
+    ]
+
+    expected = pd.concat(
+        [
+            build_feature_frame(
+                **{key: p.get(key) for key in DIABETES_INPUTS}, feature_names=DIABETES_FEATURES
+            )
+            for p in profiles
+        ],
+        ignore_index=True,
+    )
+    raw = pd.DataFrame.from_records(profiles)
+    pd.testing.assert_frame_equal(build_feature_matrix(raw, DIABETES_FEATURES), expected, check_exact=True)
+
+    expected_cardio = pd.concat(
+        [
+            build_cardiovascular_feature_frame(**{arg: p.get(key) for key, arg in CARDIOVASCULAR_INPUTS.items()})
+            for p in profiles
+        ],
+        ignore_index=True,
+    )
+    raw_cardio = {arg: [p.get(key) for p in profiles] for key, arg in CARDIOVASCULAR_INPUTS.items()}
+    pd.testing.assert_frame_equal(
+        build_cardiovascular_feature_matrix(raw_cardio), expected_cardio, check_exact=True
+    )
+
+
+def test_native_contributions_match_shap(synthetic_models):
+    pytest.importorskip("shap")
+    from app.ml import predictor
+
+    model, imputer, feature_names = load_model_bundle("diabetes")
+    spec = get_serving_spec("diabetes")
+    X = build_feature_matrix(pd.DataFrame.from_records(random_profiles(50, seed=3)), feature_names)
+    X_imp = imputer.transform(X)
+
+    native = predictor._native_contributions(model, X_imp)
+    reference = predictor._shap_contributions(model, X_imp)
+    np.testing.assert_allclose(native, reference, rtol=1e-4, atol=1e-5)
+
+    names = list(spec.valid_feature_names)
+    native_drivers = predictor._get_diabetes_drivers(model, X_imp, names)
+    with patch.object(predictor.settings, "DRIVER_BACKEND", "shap"):
+        shap_drivers = predictor._get_diabetes_drivers(model, X_imp, names)
+    for native_row, shap_row in zip(native_drivers, shap_drivers):
+        assert [d["feature"] for d in native_row] == [d["feature"] for d in shap_row]
+
+
+def test_top_driver_indices_break_ties_by_feature_order():
+    from app.ml.predictor import _top_driver_indices
+
+    contributions = np.array([
+        [0.0, 0.5, -0.5, 0.0, 0.0, 0.0, 0.0, 0.1],
+        [0.3, -0.1, 0.2, 0.0, 0.9, -0.4, 0.05, 0.0],
+    ])
+    expected = np.argsort(-np.abs(contributions), axis=1, kind="stable")[:, :5]
+    np.testing.assert_array_equal(_top_driver_indices(contributions), expected)
+
+
+def test_prediction_cache_hits_on_equivalent_profiles(synthetic_models, monkeypatch):
+    from app.ml import predictor
+
+    cache = predictor.PredictionCache(max_size=2, ttl_seconds=60)
+    monkeypatch.setattr(predictor, "prediction_cache", cache)
+    profiles = random_profiles(3, seed=4)
+    for profile in profiles:
+        profile["model_type"] = "diabetes"
+
+    first = predict_risk(**profiles[0])
+    # Diferencias por debajo de la precisión del key reutilizan la predicción
+    nudged = dict(profiles[0], weight_kg=profiles[0]["weight_kg"] + 1e-7, bmi=profiles[0]["bmi"] + 1e-7)
+    assert predict_risk(**nudged) == first
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    predict_risk(**profiles[1])
+    predict_risk(**dict(profiles[2], model_type="cardiovascular"))
+    stats = cache.stats()
+    assert stats["size"] == 2 and stats["evictions"] == 1
+
+    # La entrada expulsada (LRU) vuelve a calcularse con el mismo resultado
+    assert predict_risk(**profiles[0]) == first
+    assert cache.stats()["misses"] == 4
+
+
+def test_prediction_cache_expires_entries(monkeypatch):
+    from app.ml import predictor
+
+    clock = [100.0]
+    monkeypatch.setattr(predictor.time, "monotonic", lambda: clock[0])
+    cache = predictor.PredictionCache(max_size=10, ttl_seconds=5)
+    cache.put(("diabetes", "v1", b"x"), 0.4, [{"feature": "bmi"}])
+
+    assert cache.get(("diabetes", "v1", b"x"))[0] == 0.4
+    assert cache.get(("diabetes", "v2", b"x")) is None
+    clock[0] += 6
+    assert cache.get(("diabetes", "v1", b"x")) is None
+    assert cache.stats()["expirations"] == 1
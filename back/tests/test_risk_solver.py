@@ -0,0 +1,70 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.ml.predictor import predict_risk
+from app.ml.risk_solver import FACTOR_STEPS, solve_target
+from main import app
+
+PROFILE = {
+    "age": 35, "sex": "M", "height_cm": 175.0, "weight_kg": 110.0, "waist_cm": 115.0, "sleep_hours": 6.0,
+    "smokes_cig_day": 10, "days_mvpa_week": 1, "systolic_bp": 135.0, "total_cholesterol": 215.0,
+    "glucosa_mgdl": 105.0, "hdl_mgdl": 42.0, "ldl_mgdl": 140.0, "trigliceridos_mgdl": 180.0,
+}
+
+
+@pytest.mark.parametrize("model_type,target", [("diabetes", "low"), ("cardiovascular", "low")])
+def test_solutions_are_minimal_on_the_lattice(synthetic_models, model_type, target):
+    result = solve_target(PROFILE, target, model_type=model_type)
+    assert not result["already_met"]
+    assert result["solutions"] or result["combined"]
+    # Pocas llamadas por lotes en vez de una predicción por candidato
+    assert result["batches"] <= 12 and result["evaluations"] > result["batches"]
+
+    for solution in result["solutions"]:
+        key = solution["input"]
+        reached = predict_risk(**{**PROFILE, key: solution["to"], "bmi": None}, model_type=model_type)["score"]
+        assert reached == pytest.approx(solution["score"]) and reached < result["threshold"]
+        # Un paso menos de cambio ya no alcanza la meta
+        one_step_less = solution["to"] - FACTOR_STEPS[key] * (1 if solution["change"] > 0 else -1)
+        missed = predict_risk(**{**PROFILE, key: one_step_less, "bmi": None}, model_type=model_type)["score"]
+        assert missed >= result["threshold"] - 1e-9
+
+    if result["combined"]:
+        reached = predict_risk(**{**PROFILE, **result["combined"]["changes"], "bmi": None}, model_type=model_type)
+        assert reached["score"] < result["threshold"]
+
+
+def test_ranges_limit_the_search_and_met_targets_short_circuit(synthetic_models):
+    result = solve_target(PROFILE, "low", {"waist_cm": (112.0, 115.0)}, model_type="diabetes")
+    assert result["unreachable"] == ["waist_cm"] and result["combined"] is None
+
+    easy = solve_target(PROFILE, "moderate", model_type="diabetes")
+    assert easy["already_met"] and easy["batches"] == 1
+
+    with pytest.raises(ValueError):
+        solve_target(PROFILE, "high")
+
+
+def test_target_endpoint_returns_coach_text(synthetic_models):
+    from app.core.security import verify_supabase_token
+
+    app.dependency_overrides[verify_supabase_token] = lambda: {"id": "user-1"}
+    perfil = {"edad": 35, "genero": "M", "altura_cm": 175, "peso_kg": 110, "circunferencia_cintura": 115,
+              "horas_sueno": 6, "tabaquismo": True, "actividad_fisica": "sedentario"}
+    try:
+        client = TestClient(app)
+        response = client.post("/api/health/predict/target", json={
+            "perfil": perfil, "rangos": {"circunferencia_cintura": [80, 115], "peso_kg": [85, 110]},
+        })
+        assert response.status_code == 200
+        body = response.json()
+        assert body["texto"].startswith("Meta: riesgo low")
+        factores = {s["factor"] for s in body["soluciones"]} | set(body["inalcanzables"])
+        assert factores == {"circunferencia_cintura", "peso_kg"}
+
+        response = client.post("/api/health/predict/target", json={
+            "perfil": perfil, "rangos": {"peso_kg": [110, 85]},
+        })
+        assert response.status_code == 400
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,72 @@
+import json
+import time
+
+from app.core.config import settings
+from app.ml import shadow_scorer
+from app.ml.predictor import predict_risk
+
+from conftest import random_profiles
+
+
+def _enable_shadow(monkeypatch, target, log_path, **overrides):
+    monkeypatch.setattr(settings, "SHADOW_CANDIDATE", f"cardiovascular@{target}")
+    monkeypatch.setattr(settings, "SHADOW_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(settings, "SHADOW_LOG_PATH", str(log_path))
+    for name, value in overrides.items():
+        monkeypatch.setattr(settings, name, value)
+    shadow_scorer.stop_shadow_scorer()
+
+
+def test_candidate_pickle_scores_sampled_requests(synthetic_models, retrained_models_dir, tmp_path, monkeypatch):
+    candidate_path = retrained_models_dir / "old_model_cardiovascular.pkl"
+    log_path = tmp_path / "shadow.jsonl"
+    _enable_shadow(monkeypatch, candidate_path, log_path)
+    try:
+        profiles = random_profiles(8, seed=30)
+        served = [predict_risk(**p, model_type="cardiovascular") for p in profiles]
+        # Los perfiles de diabetes no se comparan contra un candidato cardiovascular
+        predict_risk(**profiles[0])
+
+        scorer = shadow_scorer.get_shadow_scorer()
+        assert scorer.flush()
+        stats = scorer.stats()
+        assert stats["scored"] == len(profiles)
+        assert stats["dropped"] == stats["failed"] == 0
+        assert sum(stats["level_transitions"].values()) == len(profiles)
+
+        lines = [json.loads(line) for line in log_path.read_text().splitlines()]
+        assert len(lines) == len(profiles)
+        for line, result in zip(lines, served):
+            assert line["served_score"] == result["score"]
+            assert line["served_version"] == result["model_version"]
+            assert abs(line["delta"] - (line["candidate_score"] - result["score"])) < 1e-12
+        assert all(0.0 <= line["candidate_score"] <= 1.0 for line in lines)
+    finally:
+        shadow_scorer.stop_shadow_scorer()
+
+
+def test_slow_candidate_never_delays_responses(synthetic_models, retrained_models_dir, tmp_path, monkeypatch):
+    _enable_shadow(monkeypatch, retrained_models_dir, tmp_path / "shadow.jsonl", SHADOW_MAX_QUEUE=2)
+
+    def slow_score(active, profiles):
+        time.sleep(0.5)
+        raise RuntimeError("candidate exploded")
+
+    monkeypatch.setattr(shadow_scorer, "score_profiles", slow_score)
+    try:
+        profile = random_profiles(1, seed=31)[0]
+        predict_risk(**profile, model_type="cardiovascular")
+
+        started = time.perf_counter()
+        for _ in range(6):
+            assert predict_risk(**profile, model_type="cardiovascular")["score"] >= 0
+        assert time.perf_counter() - started < 0.5
+
+        scorer = shadow_scorer.get_shadow_scorer()
+        assert scorer.flush(timeout=10)
+        stats = scorer.stats()
+        assert stats["dropped"] > 0
+        assert stats["failed"] == stats["sampled"]
+        assert stats["scored"] == 0
+    finally:
+        shadow_scorer.stop_shadow_scorer()
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.ml.predictor import RISK_THRESHOLDS, _interpret_risk, predict_risk, score_columns
+from app.ml.model_loader import get_active_model
+from app.ml.uncertainty import predict_risk_interval, sample_profiles
+from main import app
+
+PROFILE = {
+    "age": 58, "sex": "F", "height_cm": 162.0, "weight_kg": 84.0, "waist_cm": 99.0, "sleep_hours": 6.0,
+    "smokes_cig_day": 0, "days_mvpa_week": 2, "systolic_bp": 138.0, "total_cholesterol": 230.0,
+    "glucosa_mgdl": 110.0, "hdl_mgdl": 45.0, "ldl_mgdl": 150.0, "trigliceridos_mgdl": 190.0,
+}
+
+
+def test_samples_perturb_measured_fields_only():
+    columns = sample_profiles({**PROFILE, "hdl_mgdl": None}, 2000, np.random.default_rng(0))
+    assert (columns["age"] == 58).all() and (columns["sex"] == "F").all()
+    assert np.isnan(columns["hdl_mgdl"]).all()
+    assert columns["waist_cm"][0] == 99.0
+    assert columns["waist_cm"][1:].std() == pytest.approx(2.5, rel=0.1)
+    assert (columns["trigliceridos_mgdl"] > 0).all()
+    # El IMC sigue al peso y la altura perturbados
+    np.testing.assert_allclose(columns["bmi"][1:], columns["weight_kg"][1:] / (columns["height_cm"][1:] / 100) ** 2)
+
+
+def test_samples_scale_an_explicit_bmi_instead_of_recomputing_it():
+    # IMC informado que no coincide con peso/altura: las muestras se centran en él
+    columns = sample_profiles({**PROFILE, "bmi": 40.0}, 2000, np.random.default_rng(1))
+    assert columns["bmi"][0] == 40.0
+    ratio = (columns["weight_kg"][1:] / 84.0) * (162.0 / columns["height_cm"][1:]) ** 2
+    np.testing.assert_allclose(columns["bmi"][1:], 40.0 * ratio)
+    assert columns["bmi"][1:].mean() == pytest.approx(40.0, rel=0.01)
+
+
+@pytest.mark.parametrize("model_type", ["diabetes", "cardiovascular"])
+def test_interval_is_consistent_with_the_sampled_scores(synthetic_models, model_type):
+    result = predict_risk_interval(PROFILE, model_type=model_type, samples=1000, seed=7)
+
+    assert result["score"] == pytest.approx(predict_risk(**PROFILE, model_type=model_type)["score"])
+    assert result["risk_level"] == _interpret_risk(result["score"], model_type)[0]
+    low, high = result["interval"]
+    assert low <= result["mean"] <= high
+
+    # Mismas muestras puntuadas a mano: las probabilidades son las fracciones sobre cada umbral
+    columns = sample_profiles(PROFILE, 1000, np.random.default_rng(7))
+    draws = score_columns(get_active_model(model_type), columns)[1:]
+    for name, threshold in RISK_THRESHOLDS[model_type].items():
+        assert result["threshold_probabilities"][name] == pytest.approx(np.mean(draws >= threshold))
+    assert sum(result["level_probabilities"].values()) == pytest.approx(1.0)
+
+
+def test_predict_endpoint_returns_uncertainty_on_request(synthetic_models):
+    from app.core.security import verify_supabase_token
+
+    app.dependency_overrides[verify_supabase_token] = lambda: {"id": "user-1"}
+    payload = {"edad": 58, "genero": "F", "altura_cm": 162, "peso_kg": 84, "circunferencia_cintura": 99}
+    try:
+        client = TestClient(app)
+        assert client.post("/api/health/predict", json=payload).json()["incertidumbre"] is None
+
+        body = client.post("/api/health/predict", json={**payload, "incertidumbre": True}).json()
+        assert body["incertidumbre"]["muestras"] == 1000
+        assert set(body["incertidumbre"]["prob_umbrales"]) == {"moderate", "high", "referral"}
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.ml.predictor import predict_risk
+from app.ml.what_if import build_scenario_columns, sweep_risk
+from app.schemas.analisis_schema import CambioWhatIf
+from app.services.ml_service import _valores_what_if
+from main import app
+
+BASE = {
+    "age": 52, "sex": "M", "height_cm": 175.0, "weight_kg": 92.0, "bmi": None, "waist_cm": 104.0,
+    "sleep_hours": 6.0, "smokes_cig_day": 10, "days_mvpa_week": 1, "systolic_bp": 135.0,
+    "total_cholesterol": 215.0, "glucosa_mgdl": 105.0, "hdl_mgdl": 42.0, "ldl_mgdl": 140.0,
+    "trigliceridos_mgdl": 180.0,
+}
+
+
+def test_scenario_columns_cover_the_grid_and_follow_weight_with_bmi():
+    columns = build_scenario_columns(BASE, {"weight_kg": [87, 82], "sleep_hours": [7, 8, 9]})
+    assert len(columns["weight_kg"]) == 7
+    assert columns["weight_kg"].tolist() == [92, 87, 87, 87, 82, 82, 82]
+    assert columns["sleep_hours"].tolist() == [6, 7, 8, 9, 7, 8, 9]
+    assert np.isnan(columns["bmi"][0])
+    np.testing.assert_allclose(columns["bmi"][1], 87 / 1.75 ** 2)
+
+    with pytest.raises(ValueError):
+        build_scenario_columns(BASE, {"age": [40]})
+
+
+def test_weight_scenarios_scale_an_explicit_bmi():
+    columns = build_scenario_columns(dict(BASE, bmi=33.0), {"weight_kg": [87]})
+    # La fila 0 conserva el IMC informado y el escenario lo escala con el peso
+    assert columns["bmi"][0] == 33.0
+    np.testing.assert_allclose(columns["bmi"][1], 33.0 * 87 / 92)
+
+
+@pytest.mark.parametrize("model_type", ["diabetes", "cardiovascular"])
+def test_sweep_matches_one_prediction_per_scenario(synthetic_models, model_type):
+    grid = {"weight_kg": [87, 82], "waist_cm": [98], "hdl_mgdl": [42, 55], "smokes_cig_day": [0]}
+    result = sweep_risk(BASE, grid, model_type=model_type)
+
+    assert len(result["scenarios"]) == 4
+    assert result["base"]["score"] == pytest.approx(predict_risk(**BASE, model_type=model_type)["score"])
+    for scenario in result["scenarios"]:
+        profile = {**BASE, **scenario["changes"]}
+        expected = predict_risk(**profile, model_type=model_type)
+        assert scenario["score"] == pytest.approx(expected["score"], rel=1e-6)
+        assert scenario["risk_level"] == expected["risk_level"]
+        assert scenario["delta"] == pytest.approx(scenario["score"] - result["base"]["score"])
+
+
+def test_what_if_endpoint_returns_a_quotable_table(synthetic_models):
+    from app.core.security import verify_supabase_token
+
+    app.dependency_overrides[verify_supabase_token] = lambda: {"id": "user-1"}
+    perfil = {"edad": 52, "genero": "M", "altura_cm": 175, "peso_kg": 92, "horas_sueno": 6, "tabaquismo": True}
+    try:
+        client = TestClient(app)
+        response = client.post("/api/health/predict/what-if", json={
+            "perfil": perfil,
+            "cambios": [
+                {"factor": "peso_kg", "deltas": [-5, -10]},
+                {"factor": "horas_sueno", "valores": [7]},
+                {"factor": "actividad_fisica", "valores": ["activo"]},
+            ],
+        })
+        assert response.status_code == 200
+        body = response.json()
+        assert [e["cambios"] for e in body["escenarios"]] == [
+            {"peso_kg": 87, "horas_sueno": 7, "actividad_fisica": "activo"},
+            {"peso_kg": 82, "horas_sueno": 7, "actividad_fisica": "activo"},
+        ]
+        assert body["tabla"].startswith("Actual: ") and len(body["tabla"].splitlines()) == 3
+
+        # Deltas sin valor base: error del cliente, no del servicio
+        response = client.post("/api/health/predict/what-if", json={
+            "perfil": perfil, "cambios": [{"factor": "circunferencia_cintura", "deltas": [-5]}],
+        })
+        assert response.status_code == 400
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_smoking_values_accept_cigarettes_per_day():
+    cambio = CambioWhatIf.model_validate({"factor": "tabaquismo", "valores": [True, False, 1, 20, "sí", "no", "5"]})
+    assert [numero for _, numero in _valores_what_if(cambio, BASE)] == [10, 0, 1, 20, 10, 0, 5]
+
+    # Lo que no se puede interpretar es un error, no "0 cigarrillos"
+    for valor in ("a veces", -3):
+        with pytest.raises(ValueError):
+            _valores_what_if(CambioWhatIf(factor="tabaquismo", valores=[valor]), BASE)
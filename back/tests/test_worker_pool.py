@@ -0,0 +1,64 @@
+import os
+import signal
+import time
+
+import pytest
+
+from app.ml.predictor import predict_risk
+from app.services.worker_pool import ForkedWorkerPool, WorkerDiedError, preload_models
+
+from conftest import random_profiles
+
+
+def _crash():
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def _wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.fixture
+def pool(synthetic_models):
+    pool = ForkedWorkerPool(max_workers=2, health_check_interval=0.1, health_check_timeout=2.0)
+    yield pool
+    pool.shutdown()
+
+
+def test_forked_workers_match_in_process_predictions(pool):
+    profiles = random_profiles(6, seed=5)
+    futures = [pool.submit(predict_risk, **profile) for profile in profiles]
+
+    for profile, future in zip(profiles, futures):
+        assert future.result(timeout=30) == predict_risk(**profile)
+    pids = {worker["pid"] for worker in pool.stats()["workers"]}
+    assert len(pids) == 2 and os.getpid() not in pids
+
+
+def test_dead_workers_are_replaced(pool):
+    with pytest.raises(WorkerDiedError):
+        pool.submit(_crash).result(timeout=30)
+
+    # Un worker matado desde fuera lo detecta el health check mientras está ocioso
+    victim = pool.stats()["workers"][0]["pid"]
+    os.kill(victim, signal.SIGKILL)
+    assert _wait_for(lambda: victim not in {w["pid"] for w in pool.stats()["workers"]})
+
+    stats = pool.stats()
+    assert stats["restarts"] >= 2
+    assert all(worker["alive"] for worker in stats["workers"])
+    assert pool.submit(predict_risk, **random_profiles(1, seed=6)[0]).result(timeout=30)["score"] >= 0
+
+
+def test_preload_populates_loader_caches(synthetic_models):
+    from app.ml.model_loader import MODEL_TYPES
+    from app.ml.model_registry import get_registry
+
+    preload_models()
+    status = get_registry().status()["models"]
+    assert all(status[model_type]["loaded"] for model_type in MODEL_TYPES)